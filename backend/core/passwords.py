@@ -0,0 +1,173 @@
+"""
+Password hashing, off the event loop.
+
+bcrypt is slow on purpose: at the default cost one hash or one check takes
+a few hundred milliseconds of CPU. Every route called it inline from an
+`async def`, so while a login was being checked the worker's event loop
+did nothing else — no product page, no cart, no health check. A burst of
+logins (or a credential-stuffing script the rate limiter has not caught up
+with yet) froze the storefront for everyone on that worker.
+
+Here bcrypt runs on a small thread pool of its own. bcrypt releases the GIL
+while it works, so the loop keeps serving while a hash is computed, and the
+pool's size caps how many cores logins may take at once. Requests beyond
+that wait their turn; once PASSWORD_HASH_MAX_WAITING of them are waiting
+the hasher answers 503 straight away, instead of building a queue no one
+will live to see the end of. stats() reports the queue, for
+/api/admin/password-hasher.
+
+The cost factor is BCRYPT_ROUNDS. Raising it does not lock anyone out:
+every stored hash carries its own cost, and login re-hashes a password at
+the new cost the moment it has been checked (needs_rehash).
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+import bcrypt
+from fastapi import HTTPException
+
+logger = logging.getLogger(__name__)
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_THREADS = int(os.getenv("PASSWORD_HASH_THREADS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_WAITING = int(os.getenv("PASSWORD_HASH_MAX_WAITING", "64"))
+
+
+def cost_of(hashed: str) -> Optional[int]:
+    """The cost a bcrypt hash was made with ("$2b$12$..." -> 12), or None."""
+    parts = (hashed or "").split("$")
+    if len(parts) < 4 or not parts[2].isdigit():
+        return None
+    return int(parts[2])
+
+
+class PasswordHasher:
+    """bcrypt on a bounded thread pool; see the module docstring."""
+
+    def __init__(self, rounds: int = BCRYPT_ROUNDS, threads: int = PASSWORD_HASH_THREADS,
+                 max_waiting: int = PASSWORD_HASH_MAX_WAITING):
+        self.rounds = rounds
+        self.threads = max(1, threads)
+        self.max_waiting = max_waiting
+        self._pool = ThreadPoolExecutor(self.threads, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self._running = 0
+        self._waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.rehashed = 0
+        self.max_waiting_seen = 0
+        self._wait_seconds = 0.0
+        self._work_seconds = 0.0
+        self._max_wait_seconds = 0.0
+
+    async def _run(self, fn, *args):
+        with self._lock:
+            if self._waiting >= self.max_waiting:
+                self.rejected += 1
+                raise HTTPException(status_code=503, detail="Too many sign-ins at once; please retry",
+                                    headers={"Retry-After": "2"})
+            self._waiting += 1
+            self.max_waiting_seen = max(self.max_waiting_seen, self._waiting)
+        submitted = time.perf_counter()
+        state = {"started": False, "abandoned": False}
+
+        def work():
+            started = time.perf_counter()
+            with self._lock:
+                if state["abandoned"]:
+                    return None
+                state["started"] = True
+                self._waiting -= 1
+                self._running += 1
+                wait = started - submitted
+                self._wait_seconds += wait
+                self._max_wait_seconds = max(self._max_wait_seconds, wait)
+            try:
+                return fn(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self.completed += 1
+                    self._work_seconds += time.perf_counter() - started
+
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._pool, work)
+        except asyncio.CancelledError:
+            # The client went away while its hash was still queued: give
+            # the place back rather than leak it.
+            with self._lock:
+                if not state["started"]:
+                    state["abandoned"] = True
+                    self._waiting -= 1
+            raise
+
+    async def hash(self, password: str) -> str:
+        rounds = self.rounds
+        hashed = await self._run(
+            lambda: bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds)))
+        return hashed.decode("utf-8")
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        """False, never an exception, for a malformed or empty stored hash."""
+        if not password or not hashed:
+            return False
+
+        def check():
+            try:
+                return bcrypt.checkpw(password.encode("utf-8"), hashed.encode("utf-8"))
+            except ValueError:
+                return False
+        return await self._run(check)
+
+    def needs_rehash(self, hashed: str) -> bool:
+        cost = cost_of(hashed)
+        return cost is not None and cost != self.rounds
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """
+        Check `password`; if it is right and `hashed` was made at another
+        cost, also return a fresh hash at the current one for the caller to
+        store. (ok, None) otherwise.
+        """
+        if not await self.verify(password, hashed):
+            return False, None
+        if not self.needs_rehash(hashed):
+            return True, None
+        self.rehashed += 1
+        return True, await self.hash(password)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            done = self.completed
+            return {
+                "rounds": self.rounds,
+                "threads": self.threads,
+                "running": self._running,
+                "waiting": self._waiting,
+                "max_waiting": self.max_waiting,
+                "max_waiting_seen": self.max_waiting_seen,
+                "completed": done,
+                "rejected": self.rejected,
+                "rehashed": self.rehashed,
+                "avg_wait_ms": round(self._wait_seconds / done * 1000, 2) if done else None,
+                "max_wait_ms": round(self._max_wait_seconds * 1000, 2),
+                "avg_work_ms": round(self._work_seconds / done * 1000, 2) if done else None,
+            }
+
+
+# The one pool every route hashes through.
+passwords = PasswordHasher()
+
+
+async def hash_password(password: str) -> str:
+    return await passwords.hash(password)
+
+
+async def verify_password(password: str, hashed: str) -> bool:
+    return await passwords.verify(password, hashed)
@@ -8,11 +8,14 @@ string. Tokens minted by one component could not be verified by another,
 and any deployment missing the env var silently signed with a key that is
 committed to a public repository.
 """
+import copy
 import os
 import logging
+import time
 import uuid
+from collections import OrderedDict
 from datetime import datetime, timezone, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 
 import jwt
 from fastapi import Depends, HTTPException, Request
@@ -213,6 +216,88 @@ def extract_token(request: Request) -> Optional[str]:
     return tokens[0] if tokens else None
 
 
+# ---------------------------------------------------------------------------
+# Signed-in users, kept for a moment
+# ---------------------------------------------------------------------------
+
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "30"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+
+
+class UserCache:
+    """
+    The user documents get_current_user_doc resolved, by (user id, the
+    token's auth_version), for USER_CACHE_TTL seconds.
+
+    Every authenticated request — the cart, the wishlist, every admin
+    screen — used to read the caller's whole row from db.users before doing
+    anything else. Now a kept row is checked with a projected read of its
+    auth_version alone, and the whole row is read once per TTL.
+
+    Revocation still holds, on every worker. Password, role and
+    active-flag writes $inc the user's auth_version, so a kept row whose
+    version is not the stored one is dropped and read again — a demoted
+    admin or a disabled account is seen on its next request, whichever
+    worker made the write. The sessions issued before the write then fail
+    the version check, and their refresh tokens are refused: the user signs
+    in again rather than carrying on under a token minted for what it was.
+    A deleted row has no version to read, and is refused the same way.
+
+    Everything else that changes the row — a profile edit — calls
+    forget_user(id) after its write. That reaches this process only; another
+    worker shows the old profile until its entry expires, which is what the
+    TTL bounds.
+    """
+
+    def __init__(self, ttl: float = USER_CACHE_TTL, size: int = USER_CACHE_SIZE):
+        self.ttl = ttl
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Tuple[str, Any], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._db = None
+
+    def get(self, db, user_id: str, version: Any) -> Optional[Dict[str, Any]]:
+        if db is not self._db:
+            # A different database (tests swap it) shares none of its users.
+            self._db = db
+            self._entries.clear()
+        entry = self._entries.get((user_id, version))
+        if entry is None or entry[0] <= time.monotonic():
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end((user_id, version))
+        # Handed out as a copy: routes are free to mutate what they get.
+        return copy.deepcopy(entry[1])
+
+    def put(self, db, user_id: str, version: Any, user: Dict[str, Any]) -> None:
+        if db is not self._db or self.ttl <= 0:
+            return
+        self._entries[(user_id, version)] = (time.monotonic() + self.ttl, copy.deepcopy(user))
+        self._entries.move_to_end((user_id, version))
+        while len(self._entries) > self.size:
+            self._entries.popitem(last=False)
+
+    def forget(self, user_id: Optional[str] = None) -> None:
+        if user_id is None:
+            self._entries.clear()
+            return
+        for key in [key for key in self._entries if key[0] == user_id]:
+            del self._entries[key]
+
+
+user_cache = UserCache()
+
+
+def forget_user(user_id: Optional[str] = None) -> None:
+    """
+    Drop what is kept about this user (everyone, with no id). Call it after
+    any write to a user row that a signed-in request should see at once.
+    """
+    user_cache.forget(user_id)
+
+
 async def get_current_user_doc(request: Request) -> Dict[str, Any]:
     """Resolve the caller as a raw user document."""
     tokens = candidate_tokens(request)
@@ -240,24 +325,35 @@ async def get_current_user_doc(request: Request) -> Dict[str, Any]:
         raise HTTPException(status_code=401, detail="Invalid token")
 
     db = request.app.state.db
-    user = await db.users.find_one({"id": user_id})
-    if not user:
-        raise HTTPException(status_code=401, detail="User not found")
-
-    # Tokens issued after the auth_version hardening carry this claim. A
-    # password reset increments the stored version and invalidates old
-    # sessions without forcing legacy tokens (which lack the claim) to fail.
     token_version = payload.get("auth_version")
-    if token_version is not None and int(token_version) != int(user.get("auth_version", 0)):
-        raise HTTPException(status_code=401, detail="Session expired; please sign in again")
+    user = user_cache.get(db, user_id, token_version)
+    if user is not None:
+        # Kept by this worker; the revoking write may have been another's.
+        stored = await db.users.find_one({"id": user_id}, {"_id": 0, "auth_version": 1})
+        if stored is None or stored.get("auth_version", 0) != user.get("auth_version", 0):
+            user_cache.forget(user_id)
+            user = None
+    if user is None:
+        user = await db.users.find_one({"id": user_id})
+        if not user:
+            raise HTTPException(status_code=401, detail="User not found")
+        user.pop("_id", None)
+        user.pop("password", None)
+        user_cache.put(db, user_id, token_version, user)
 
     # A token minted before the account was disabled must stop working too,
-    # otherwise disabling only takes effect at the next login.
+    # otherwise disabling only takes effect at the next login. Checked first:
+    # disabling also moves auth_version, and "disabled" is the true answer.
     if user.get("is_active") is False:
         raise HTTPException(status_code=403, detail="Account is disabled")
 
-    user.pop("_id", None)
-    user.pop("password", None)
+    # Tokens issued after the auth_version hardening carry this claim. A
+    # password reset or a role change increments the stored version and
+    # invalidates old sessions without forcing legacy tokens (which lack the
+    # claim) to fail.
+    if token_version is not None and int(token_version) != int(user.get("auth_version", 0)):
+        raise HTTPException(status_code=401, detail="Session expired; please sign in again")
+
     return user
 
 
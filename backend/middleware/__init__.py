@@ -1,5 +1,5 @@
 """Middleware package for Auraa Luxury Backend"""
+from .cors import CustomCORSMiddleware
 from .rate_limiter import RateLimitMiddleware
 
-__all__ = ['RateLimitMiddleware']
-
+__all__ = ['CustomCORSMiddleware', 'RateLimitMiddleware']
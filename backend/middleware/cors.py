@@ -0,0 +1,130 @@
+"""
+CORS for the API, as plain ASGI.
+
+The storefront and the API live on different subdomains, so every response
+the browser is to read needs these headers — including the 500s and the
+429s, or the frontend sees a network error instead of the message.
+
+This used to be a BaseHTTPMiddleware, as was the rate limiter inside it.
+Each of those runs the rest of the app in a task of its own and pipes the
+response body through a memory stream, on every request: /health and the
+public catalogue paid twice for two middlewares that, for them, only ever
+add three headers. Here a request costs a header lookup, a dictionary hit
+and a wrapped send (scripts/bench-middleware.py has the numbers).
+
+Whether an origin is allowed, and the exact headers that answer it, are
+worked out once per origin and kept: origins are few (the shop, its www,
+previews, localhost), while preflights come before nearly every credentialed
+call. The table is bounded, since the Origin header is whatever the client
+says it is.
+"""
+import logging
+from typing import Dict, Optional, Tuple
+
+from starlette.datastructures import MutableHeaders
+from starlette.responses import JSONResponse, Response
+
+from core.origins import is_origin_allowed
+
+logger = logging.getLogger(__name__)
+
+ALLOW_METHODS = "GET, POST, PUT, DELETE, PATCH, OPTIONS"
+ALLOW_HEADERS = ("Content-Type, Authorization, Accept, Origin, User-Agent, "
+                 "X-Requested-With, Idempotency-Key")
+PREFLIGHT_MAX_AGE = 3600
+
+# Distinct origins remembered before the oldest is forgotten.
+MAX_ORIGINS = 1024
+
+# (preflight headers, headers for every other response); None when the
+# origin is not allowed.
+_Answer = Optional[Tuple[Dict[str, str], Dict[str, str]]]
+
+
+class CustomCORSMiddleware:
+    def __init__(self, app):
+        self.app = app
+        self._answers: Dict[str, _Answer] = {}
+
+    def answer(self, origin: Optional[str]) -> _Answer:
+        """The CORS headers `origin` gets; computed once per origin."""
+        if not origin:
+            return None
+        try:
+            return self._answers[origin]
+        except KeyError:
+            pass
+        answer: _Answer = None
+        if is_origin_allowed(origin):
+            simple = {
+                "Access-Control-Allow-Origin": origin,
+                "Access-Control-Allow-Credentials": "true",
+                "Access-Control-Expose-Headers": "*",
+            }
+            preflight = {
+                **simple,
+                "Access-Control-Allow-Methods": ALLOW_METHODS,
+                "Access-Control-Allow-Headers": ALLOW_HEADERS,
+                "Access-Control-Max-Age": str(PREFLIGHT_MAX_AGE),
+            }
+            answer = (preflight, simple)
+        if len(self._answers) >= MAX_ORIGINS:
+            del self._answers[next(iter(self._answers))]
+        self._answers[origin] = answer
+        return answer
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        origin = None
+        for name, value in scope["headers"]:
+            if name == b"origin":
+                origin = value.decode("latin-1")
+                break
+        answer = self.answer(origin)
+
+        # Every OPTIONS is answered here, allowed origin or not; the routes
+        # never see one.
+        if scope["method"] == "OPTIONS":
+            response = Response(status_code=200, headers=answer[0] if answer else None)
+            await response(scope, receive, send)
+            return
+
+        started = False
+
+        async def send_with_cors(message):
+            nonlocal started
+            if message["type"] == "http.response.start":
+                started = True
+                if answer:
+                    headers = MutableHeaders(scope=message)
+                    for name, value in answer[1].items():
+                        headers[name] = value
+            await send(message)
+
+        # This except is the outermost one in the app, so whatever it does
+        # defines every unhandled crash's face:
+        # - str(e) as the body leaked driver messages (which can carry
+        #   connection strings) to the public, as plain text no UI could
+        #   read — the admin saw a shapeless "HTTP 500" all night while
+        #   three inner safety nets never got the chance to name anything.
+        # - The TYPE name leaks nothing and points somewhere. The traceback
+        #   goes to the log, where secrets are allowed to live.
+        # It must also go out through send_with_cors: an error response
+        # without those headers is unreadable cross-origin.
+        try:
+            await self.app(scope, receive, send_with_cors)
+        except Exception as e:
+            logger.exception("Unhandled %s on %s %s",
+                             type(e).__name__, scope["method"], scope["path"])
+            if started:
+                # Half a response is already out; nothing sensible can
+                # follow it but the connection closing.
+                raise
+            response = JSONResponse(
+                status_code=500,
+                content={"detail": f"Internal error: {type(e).__name__}"},
+            )
+            await response(scope, receive, send_with_cors)
@@ -3,26 +3,66 @@ Rate limiting for authentication endpoints.
 
 Prevents password guessing. This module existed but was never registered on
 the app, so /api/auth/login accepted unlimited attempts.
+
+Each client gets a sliding-window counter per route policy: two integers —
+the hits in the current fixed window and in the one before — and the
+window's start. The previous window's count is weighted by how much of it
+still overlaps the sliding window, so
+
+    estimate = previous * (1 - elapsed / window) + current
+
+is within a hair of the exact count, at a constant few bytes per client. It
+replaced a list of datetimes per IP, rebuilt on every request under one
+global lock that every auth request in the process queued on, and swept
+only once ten thousand IPs had piled up — a credential-stuffing burst both
+serialised the logins and grew the process without bound.
+
+Storage is pluggable:
+
+  MemoryStore   per process, the default. Counters are spread over shards,
+                each with its own lock and its own bounded table; a full
+                shard drops its least recently touched client first.
+  RedisStore    one limit for every worker, which separate uvicorn workers
+                otherwise each enforce on their own. Set RATE_LIMIT_REDIS_URL.
+                Anything with redis.asyncio's incr/decr/expire/get will do.
 """
 from fastapi import Request
 from fastapi.responses import JSONResponse
-from starlette.middleware.base import BaseHTTPMiddleware
-from datetime import datetime, timedelta
-from collections import defaultdict
-import asyncio
+from collections import OrderedDict
+from typing import Dict, NamedTuple, Optional, Tuple
 import logging
+import math
+import os
+import threading
+import time
+import zlib
 
 logger = logging.getLogger(__name__)
 
-# Paths that are rate limited, matched as prefixes.
-PROTECTED_PATHS = (
-    "/api/auth/login",
-    "/api/auth/register",
-    "/api/auth/refresh",
-    "/api/auth/forgot-password",
-    "/api/auth/reset-password",
-    "/api/auth/oauth/session",
-)
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL", "")
+
+
+class Policy(NamedTuple):
+    """At most `limit` requests per `window` seconds, per client."""
+    limit: int
+    window: int
+
+
+# Paths that are rate limited, matched as prefixes, each with its own budget.
+# None takes the middleware's default policy (AUTH_RATE_LIMIT_MAX per
+# AUTH_RATE_LIMIT_WINDOW). A separate budget per route means a shopper whose
+# page refreshes its token every few minutes does not spend their login
+# attempts doing it.
+PROTECTED_PATHS: Dict[str, Optional[Policy]] = {
+    "/api/auth/login": None,
+    "/api/auth/register": None,
+    "/api/auth/refresh": None,
+    # Every request here sends an email; a script looping on it is spam
+    # with the shop's name on it.
+    "/api/auth/forgot-password": Policy(limit=5, window=3600),
+    "/api/auth/reset-password": None,
+    "/api/auth/oauth/session": None,
+}
 
 
 def client_ip(request: Request) -> str:
@@ -45,65 +85,158 @@ def client_ip(request: Request) -> str:
     return request.client.host if request.client else "unknown"
 
 
-# Buckets live at module level so they can be inspected and cleared without a
-# handle on the middleware instance (which Starlette builds internally).
-_buckets = defaultdict(list)
-_lock = asyncio.Lock()
+def _decide(previous: int, current: int, elapsed: float, policy: Policy) -> Tuple[bool, int]:
+    """
+    Whether one more request fits, given the counts before it; and if not,
+    how many seconds until one would.
+    """
+    weight = 1.0 - elapsed / policy.window
+    if previous * weight + current < policy.limit:
+        return True, 0
+    if current >= policy.limit:
+        # Only the next window can help.
+        return False, max(1, math.ceil(policy.window - elapsed))
+    # Wait for the previous window's share to decay below the headroom.
+    wait = policy.window * (1.0 - (policy.limit - current) / previous) - elapsed
+    return False, max(1, math.ceil(wait))
+
+
+class MemoryStore:
+    """Sliding-window counters in this process; see the module docstring."""
+
+    def __init__(self, shards: int = 64, max_clients: int = 100_000):
+        self._shards = [OrderedDict() for _ in range(shards)]
+        self._locks = [threading.Lock() for _ in range(shards)]
+        self._per_shard = max(1, max_clients // shards)
+        self.evictions = 0
+
+    async def hit(self, key: str, policy: Policy, now: float) -> Tuple[bool, int]:
+        i = zlib.crc32(key.encode()) % len(self._shards)
+        shard = self._shards[i]
+        window_start = now - now % policy.window
+        with self._locks[i]:
+            start, previous, current = shard.get(key, (window_start, 0, 0))
+            if start != window_start:
+                # One window on, the current count becomes the previous one;
+                # more than one, and both have aged out.
+                previous = current if start == window_start - policy.window else 0
+                current = 0
+            allowed, retry_after = _decide(previous, current, now - window_start, policy)
+            shard[key] = (window_start, previous, current + 1 if allowed else current)
+            shard.move_to_end(key)
+            while len(shard) > self._per_shard:
+                shard.popitem(last=False)
+                self.evictions += 1
+        return allowed, retry_after
+
+    def clear(self) -> None:
+        for shard, lock in zip(self._shards, self._locks):
+            with lock:
+                shard.clear()
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self._shards)
+
+
+class RedisStore:
+    """
+    The same counters in Redis: one key per client per fixed window,
+    INCR'd, living two windows so the next one can still read it.
+    """
+
+    def __init__(self, client, prefix: str = "ratelimit:"):
+        self.client = client
+        self.prefix = prefix
+
+    async def hit(self, key: str, policy: Policy, now: float) -> Tuple[bool, int]:
+        index = int(now // policy.window)
+        current_key = f"{self.prefix}{key}:{index}"
+        current = int(await self.client.incr(current_key))
+        if current == 1:
+            await self.client.expire(current_key, policy.window * 2)
+        previous = int(await self.client.get(f"{self.prefix}{key}:{index - 1}") or 0)
+        allowed, retry_after = _decide(previous, current - 1, now - index * policy.window, policy)
+        if not allowed:
+            # Refused requests are not spent budget.
+            await self.client.decr(current_key)
+        return allowed, retry_after
+
+
+def _store_from_env():
+    if not RATE_LIMIT_REDIS_URL:
+        return MemoryStore()
+    try:
+        import redis.asyncio as redis
+    except ImportError:
+        logger.error("⚠️ RATE_LIMIT_REDIS_URL is set but the redis package is not installed; "
+                     "rate limiting per process instead")
+        return MemoryStore()
+    return RedisStore(redis.from_url(RATE_LIMIT_REDIS_URL))
+
+
+# The store lives at module level so it can be inspected and cleared without
+# a handle on the middleware instance (which Starlette builds internally).
+_store = _store_from_env()
 
 
 def reset_rate_limits() -> None:
     """Clear all rate-limit state. Used by tests and for operational resets."""
-    _buckets.clear()
-
+    if isinstance(_store, MemoryStore):
+        _store.clear()
 
-class RateLimitMiddleware(BaseHTTPMiddleware):
-    def __init__(self, app, max_requests: int = 10, window_seconds: int = 300):
-        super().__init__(app)
-        self.max_requests = max_requests
-        self.window_seconds = window_seconds
-        self.requests = _buckets
-        self.lock = _lock
 
-    async def dispatch(self, request: Request, call_next):
-        path = request.url.path
-        if not path.startswith(PROTECTED_PATHS):
-            return await call_next(request)
+class RateLimitMiddleware:
+    """
+    Plain ASGI, like the CORS middleware around it: every request passes
+    through here, and all but a handful only need the path looked at.
+    """
 
+    def __init__(self, app, max_requests: int = 10, window_seconds: int = 300,
+                 policies: Optional[Dict[str, Optional[Policy]]] = None, store=None):
+        self.app = app
+        default = Policy(limit=max_requests, window=window_seconds)
+        self.policies = {prefix: policy or default
+                         for prefix, policy in (policies or PROTECTED_PATHS).items()}
+        self.prefixes = tuple(self.policies)
+        self.store = store if store is not None else _store
+
+    def policy_for(self, path: str) -> Optional[Tuple[str, Policy]]:
+        for prefix in self.prefixes:
+            if path.startswith(prefix):
+                return prefix, self.policies[prefix]
+        return None
+
+    async def __call__(self, scope, receive, send):
         # Preflight carries no credentials and must not consume budget.
-        if request.method == "OPTIONS":
-            return await call_next(request)
-
-        ip = client_ip(request)
-        now = datetime.now()
-        cutoff = now - timedelta(seconds=self.window_seconds)
-
-        async with self.lock:
-            recent = [t for t in self.requests[ip] if t > cutoff]
-
-            if len(recent) >= self.max_requests:
-                self.requests[ip] = recent
-                logger.warning(f"Rate limit hit for {ip} on {path}")
-                # Returned rather than raised: HTTPException from middleware is
-                # not handled by FastAPI's exception handlers and would surface
-                # as a 500.
-                return JSONResponse(
-                    status_code=429,
-                    content={
-                        "detail": {
-                            "error": "too_many_requests",
-                            "message": "تم تجاوز الحد الأقصى لمحاولات تسجيل الدخول. يرجى المحاولة بعد 5 دقائق.",
-                            "retry_after": self.window_seconds,
-                        }
-                    },
-                    headers={"Retry-After": str(self.window_seconds)},
-                )
-
-            recent.append(now)
-            self.requests[ip] = recent
-
-            # Bound memory: drop buckets that have fully aged out.
-            if len(self.requests) > 10_000:
-                for key in [k for k, v in self.requests.items() if not v or v[-1] <= cutoff]:
-                    del self.requests[key]
-
-        return await call_next(request)
+        if (scope["type"] != "http" or scope["method"] == "OPTIONS"
+                or not scope["path"].startswith(self.prefixes)):
+            await self.app(scope, receive, send)
+            return
+
+        path = scope["path"]
+        prefix, policy = self.policy_for(path)
+        ip = client_ip(Request(scope))
+        try:
+            allowed, retry_after = await self.store.hit(f"{prefix}|{ip}", policy, time.time())
+        except Exception as e:
+            # A limiter whose store is down must not take logins down with it.
+            logger.error(f"⚠️ Rate limit store unavailable, letting {path} through: {e}")
+            allowed, retry_after = True, 0
+
+        if allowed:
+            await self.app(scope, receive, send)
+            return
+
+        logger.warning(f"Rate limit hit for {ip} on {path}")
+        response = JSONResponse(
+            status_code=429,
+            content={
+                "detail": {
+                    "error": "too_many_requests",
+                    "message": f"تم تجاوز الحد الأقصى للمحاولات. يرجى المحاولة بعد {math.ceil(retry_after / 60)} دقيقة.",
+                    "retry_after": retry_after,
+                }
+            },
+            headers={"Retry-After": str(retry_after)},
+        )
+        await response(scope, receive, send)
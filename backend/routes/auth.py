@@ -7,7 +7,6 @@ from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, Dict, Any
 from datetime import datetime, timezone, timedelta
 import jwt
-import bcrypt
 import hashlib
 import html
 import os
@@ -26,12 +25,14 @@ from auth.oauth_service import (
     oauth_service,
 )
 from core.origins import is_url_on_allowed_origin
+from core.passwords import hash_password, passwords
 from core.security import (
     ACCESS_TOKEN_EXPIRE_MINUTES,
     clear_auth_cookies,
     create_access_token,
     create_refresh_token,
     decode_token,
+    forget_user,
     get_current_user_doc,
     is_refresh_token_revoked,
     revoke_refresh_token,
@@ -133,16 +134,6 @@ async def _issue_session(db, response: Response, user: Dict[str, Any]) -> str:
     return access_token
 
 
-def hash_password(password: str) -> str:
-    """Hash password using bcrypt"""
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
-
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify password against hash"""
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
-
-
 # Routes
 @router.post("/register")
 async def register(user: UserRegister, request: Request, response: Response):
@@ -165,7 +156,7 @@ async def register(user: UserRegister, request: Request, response: Response):
         user_data = {
             "id": str(uuid.uuid4()),
             "email": user.email,
-            "password": hash_password(user.password),
+            "password": await hash_password(user.password),
             "name": user.name or full_name or user.email.split('@')[0],
             "first_name": user.first_name,
             "last_name": user.last_name,
@@ -281,7 +272,7 @@ async def reset_password(payload: ResetPasswordRequest, request: Request):
     if not user or user.get("is_active") is False:
         raise HTTPException(status_code=400, detail="Invalid or expired reset token")
 
-    hashed = bcrypt.hashpw(payload.new_password.encode("utf-8"), bcrypt.gensalt()).decode("utf-8")
+    hashed = await hash_password(payload.new_password)
     await db.users.update_one(
         {"id": user["id"]},
         {"$set": {
@@ -292,6 +283,7 @@ async def reset_password(payload: ResetPasswordRequest, request: Request):
             "auth_version": int(user.get("auth_version", 0)) + 1,
         }},
     )
+    forget_user(user["id"])
 
     return {"success": True, "message": "Password reset successfully"}
 
@@ -312,9 +304,15 @@ async def login(credentials: UserLogin, request: Request, response: Response):
         if not user:
             raise HTTPException(status_code=401, detail="Invalid email or password")
 
-        # Verify password
-        if not verify_password(credentials.password, user["password"]):
+        # Verify password — on the hashing pool, not the event loop.
+        ok, rehashed = await passwords.verify_and_update(credentials.password, user.get("password"))
+        if not ok:
             raise HTTPException(status_code=401, detail="Invalid email or password")
+        if rehashed:
+            # Stored at an older BCRYPT_ROUNDS; this was the one moment the
+            # plain password was at hand to bring it up to date.
+            await db.users.update_one({"id": user["id"], "password": user["password"]},
+                                      {"$set": {"password": rehashed}})
 
         # Disabled accounts must not authenticate, or the admin toggle is cosmetic.
         # Absent field means active, so existing users are unaffected.
@@ -479,6 +477,7 @@ async def oauth_google_callback(
                     {"$set": {"google_sub": profile["sub"],
                               "updated_at": datetime.now(timezone.utc).isoformat()}},
                 )
+                forget_user(user_data["id"])
             logger.info(f"✅ User logged in via {payload.provider}: {email}")
 
         user_data.pop("password", None)
@@ -599,6 +598,7 @@ async def update_profile(
 
     updates["updated_at"] = datetime.now(timezone.utc).isoformat()
     await db.users.update_one({"id": user["id"]}, {"$set": updates})
+    forget_user(user["id"])
 
     saved = await db.users.find_one({"id": user["id"]})
     if saved:
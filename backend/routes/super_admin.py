@@ -7,7 +7,6 @@ from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime, timezone
 import uuid
-import bcrypt
 from motor.motor_asyncio import AsyncIOMotorDatabase
 import os
 
@@ -17,6 +16,8 @@ router = APIRouter(prefix="/super-admin", tags=["Super Admin"])
 import sys
 sys.path.append('/app/backend')
 from server import db, get_current_user, User
+from core.passwords import hash_password, verify_password
+from core.security import forget_user
 
 # Models
 class SuperAdminCreate(BaseModel):
@@ -45,16 +46,6 @@ class SuperAdminResponse(BaseModel):
     last_login: Optional[str] = None
 
 # Helper functions
-def hash_password(password: str) -> str:
-    """Hash password using bcrypt"""
-    salt = bcrypt.gensalt()
-    hashed = bcrypt.hashpw(password.encode('utf-8'), salt)
-    return hashed.decode('utf-8')
-
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify password"""
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
-
 async def verify_super_admin(identifier: str, password: str, database=None) -> dict:
     """Verify super admin credentials"""
     admin = await db.super_admins.find_one({
@@ -62,7 +53,7 @@ async def verify_super_admin(identifier: str, password: str, database=None) -> d
         "is_active": True
     })
     
-    if not admin or not verify_password(password, admin["password_hash"]):
+    if not admin or not await verify_password(password, admin["password_hash"]):
         raise HTTPException(status_code=401, detail="invalid_super_admin_credentials")
     
     return admin
@@ -140,7 +131,7 @@ async def add_super_admin(
         "id": str(uuid.uuid4()),
         "identifier": new_admin.identifier,
         "type": new_admin.type,
-        "password_hash": hash_password(new_admin.password),
+        "password_hash": await hash_password(new_admin.password),
         "role": "super_admin",
         "created_at": datetime.now(timezone.utc).isoformat(),
         "created_by": current_admin["identifier"],
@@ -229,7 +220,7 @@ async def update_super_admin_profile(
         update_data["identifier"] = updates.identifier
     
     if updates.password:
-        update_data["password_hash"] = hash_password(updates.password)
+        update_data["password_hash"] = await hash_password(updates.password)
     
     # Update
     await db.super_admins.update_one(
@@ -286,7 +277,7 @@ async def transfer_super_admin(
         "id": str(uuid.uuid4()),
         "identifier": transfer.target_identifier,
         "type": "email" if "@" in transfer.target_identifier else "phone",
-        "password_hash": hash_password("change_me_" + str(uuid.uuid4())[:8]),  # Temp password
+        "password_hash": await hash_password("change_me_" + str(uuid.uuid4())[:8]),  # Temp password
         "role": "super_admin",
         "created_at": datetime.now(timezone.utc).isoformat(),
         "created_by": current_admin["identifier"],
@@ -462,7 +453,7 @@ async def change_user_role(
                 "id": str(uuid.uuid4()),
                 "identifier": target_identifier,
                 "type": "email" if target_user.get("email") else "phone",
-                "password_hash": hash_password(temp_password),
+                "password_hash": await hash_password(temp_password),
                 "role": "super_admin",
                 "created_at": datetime.now(timezone.utc).isoformat(),
                 "created_by": current_admin_identifier,
@@ -498,8 +489,9 @@ async def change_user_role(
     # Update user
     await db.users.update_one(
         {"id": request.user_id},
-        {"$set": updates}
+        {"$set": updates, "$inc": {"auth_version": 1}}
     )
+    forget_user(request.user_id)
     
     # Log action
     await log_admin_action(
@@ -539,14 +531,14 @@ async def reset_admin_password(
         raise HTTPException(status_code=404, detail="user_not_found")
     
     # Hash new password
-    from ..server import get_password_hash  # Import from main server
-    new_hashed_password = hash_password(request.new_password)
+    new_hashed_password = await hash_password(request.new_password)
     
     # Update password
     await db.users.update_one(
         {"id": request.user_id},
-        {"$set": {"password": new_hashed_password}}
+        {"$set": {"password": new_hashed_password}, "$inc": {"auth_version": 1}}
     )
+    forget_user(request.user_id)
     
     # Also update in super_admins if applicable
     target_identifier = target_user.get("email") or target_user.get("phone")
@@ -597,8 +589,9 @@ async def toggle_admin_status(
     # Update status
     await db.users.update_one(
         {"id": request.user_id},
-        {"$set": {"is_active": request.is_active}}
+        {"$set": {"is_active": request.is_active}, "$inc": {"auth_version": 1}}
     )
+    forget_user(request.user_id)
     
     # Also update in super_admins if applicable
     await db.super_admins.update_many(
@@ -668,6 +661,7 @@ async def delete_admin(
     
     # Delete from users
     await db.users.delete_one({"id": user_id})
+    forget_user(user_id)
     
     # Delete from super_admins
     await db.super_admins.delete_many({"identifier": target_identifier})
@@ -7,14 +7,15 @@ from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime, timezone
 import uuid
-import bcrypt
 
 router = APIRouter(prefix="/admin/super-admin", tags=["Super Admin"])
 
 # Import from main server
 import sys
 sys.path.append('/app/backend')
-from server import db, get_current_user, User, get_password_hash
+from server import db, get_current_user, User
+from core.passwords import hash_password, verify_password
+from core.security import forget_user
 
 # Models for admin management
 class ChangeRoleRequest(BaseModel):
@@ -28,13 +29,6 @@ class ResetPasswordRequest(BaseModel):
     current_password: str  # Super admin password verification
 
 # Helper functions
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify password"""
-    try:
-        return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
-    except:
-        return False
-
 async def verify_super_admin_password(identifier: str, password: str) -> dict:
     """Verify super admin credentials"""
     admin = await db.super_admins.find_one({
@@ -42,7 +36,7 @@ async def verify_super_admin_password(identifier: str, password: str) -> dict:
         "is_active": True
     })
     
-    if not admin or not verify_password(password, admin["password_hash"]):
+    if not admin or not await verify_password(password, admin["password_hash"]):
         raise HTTPException(status_code=401, detail="invalid_super_admin_credentials")
     
     return admin
@@ -174,7 +168,7 @@ async def change_user_role(
                 "id": str(uuid.uuid4()),
                 "identifier": target_identifier,
                 "type": "email" if target_user.get("email") else "phone",
-                "password_hash": get_password_hash(temp_password),
+                "password_hash": await hash_password(temp_password),
                 "role": "super_admin",
                 "created_at": datetime.now(timezone.utc).isoformat(),
                 "created_by": current_admin_identifier,
@@ -210,8 +204,9 @@ async def change_user_role(
     # Update user
     await db.users.update_one(
         {"id": request.user_id},
-        {"$set": updates}
+        {"$set": updates, "$inc": {"auth_version": 1}}
     )
+    forget_user(request.user_id)
     
     # Log action
     await log_admin_action(
@@ -251,13 +246,14 @@ async def reset_admin_password(
         raise HTTPException(status_code=404, detail="user_not_found")
     
     # Hash new password
-    new_hashed_password = get_password_hash(request.new_password)
+    new_hashed_password = await hash_password(request.new_password)
     
     # Update password
     await db.users.update_one(
         {"id": request.user_id},
-        {"$set": {"password": new_hashed_password}}
+        {"$set": {"password": new_hashed_password}, "$inc": {"auth_version": 1}}
     )
+    forget_user(request.user_id)
     
     # Also update in super_admins if applicable
     target_identifier = target_user.get("email") or target_user.get("phone")
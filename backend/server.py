@@ -1,17 +1,19 @@
 from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, File, UploadFile, Request, Form, BackgroundTasks
-from fastapi.responses import JSONResponse, FileResponse, StreamingResponse, Response, RedirectResponse
+from fastapi.responses import JSONResponse, FileResponse, Response, RedirectResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from fastapi.staticfiles import StaticFiles
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ReturnDocument, UpdateOne
 from pymongo.errors import DuplicateKeyError
 import os
 import logging
 import asyncio
+import time
 from pathlib import Path
 from pydantic import BaseModel, Field, EmailStr
-from typing import List, Optional, Dict, Any, Tuple
+from typing import List, Optional, Dict, Any, Iterable, Tuple, Union
 from collections import defaultdict
 import uuid
 import shutil
@@ -21,9 +23,10 @@ import io
 import re
 import html
 import hmac
+import json
+import base64
 from datetime import datetime, timezone, timedelta
 import jwt
-import bcrypt
 from passlib.context import CryptContext
 from enum import Enum
 
@@ -55,16 +58,25 @@ logger = logging.getLogger(__name__)
 # the repaired client while the import ran on a broken one. The duplicates are
 # gone; anything CJ goes through cj_client.
 from services.cj_client import credentials_configured as cj_credentials_configured
-from services.import_service import looks_like_adornment
+from services.import_service import (
+    ADORNMENT_VERSION, as_supplier_shape, looks_like_adornment, off_niche_fields,
+)
+from services.search_index import SearchIndex
+from services.sitemap import Sitemap
+from services.product_cache import catalogue_cache
+from services.bulk_writes import bulk_write
+from services import recommendations
+from services import sales_rollup
+from services import indexes
+from services import migrations
+from services.catalogue_text import (
+    CATALOGUE_TEXT_INPUTS,
+    catalogue_text_updates,
+    review_many,
+)
 from services.product_translation import (
     translate_title,
-    translate_description,
-    describe_in_english,
-    material_of,
     looks_untranslated,
-    states_unnameable_stone,
-    states_retired_metal,
-    sanitise_supplier_text,
     supplier_material,
     material_from_supplier,
 )
@@ -80,61 +92,11 @@ app = FastAPI(title="لورا لاكشري API", version="1.0.0")
 # Store database in app state for access in routes
 app.state.db = db
 
-# CORS Configuration — the allowlist itself lives in core.origins so the OAuth
-# route can vet its return address against exactly the same rule.
-from core.origins import is_origin_allowed  # noqa: E402
-
-
-# Custom CORS Handler
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import Response as StarletteResponse
-from middleware.rate_limiter import RateLimitMiddleware
-
-class CustomCORSMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request, call_next):
-        origin = request.headers.get("origin")
-        is_allowed = is_origin_allowed(origin)
-
-        # Handle preflight
-        if request.method == "OPTIONS":
-            response = StarletteResponse(status_code=200)
-            if is_allowed and origin:
-                response.headers["Access-Control-Allow-Origin"] = origin
-                response.headers["Access-Control-Allow-Credentials"] = "true"
-                response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, PATCH, OPTIONS"
-                response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization, Accept, Origin, User-Agent, X-Requested-With, Idempotency-Key"
-                response.headers["Access-Control-Expose-Headers"] = "*"
-                response.headers["Access-Control-Max-Age"] = "3600"
-            return response
-        
-        # Process request. This except is the outermost one in the app, so
-        # whatever it does defines every unhandled crash's face:
-        # - str(e) as the body leaked driver messages (which can carry
-        #   connection strings) to the public, as plain text no UI could
-        #   read — the admin saw a shapeless "HTTP 500" all night while
-        #   three inner safety nets never got the chance to name anything.
-        # - The TYPE name leaks nothing and points somewhere. The traceback
-        #   goes to the log, where secrets are allowed to live.
-        # It must also fall through to the CORS block below: an error
-        # response without those headers is unreadable cross-origin, and
-        # the storefront and API live on different subdomains.
-        try:
-            response = await call_next(request)
-        except Exception as e:
-            logger.exception("Unhandled %s on %s %s",
-                             type(e).__name__, request.method, request.url.path)
-            response = JSONResponse(
-                status_code=500,
-                content={"detail": f"Internal error: {type(e).__name__}"},
-            )
-        
-        # Add CORS headers to response
-        if is_allowed and origin:
-            response.headers["Access-Control-Allow-Origin"] = origin
-            response.headers["Access-Control-Allow-Credentials"] = "true"
-            response.headers["Access-Control-Expose-Headers"] = "*"
-        
-        return response
+# CORS — the allowlist itself lives in core.origins so the OAuth route can
+# vet its return address against exactly the same rule. Both middlewares are
+# plain ASGI; see middleware/cors.py for why.
+from middleware.cors import CustomCORSMiddleware  # noqa: E402
+from middleware.rate_limiter import RateLimitMiddleware  # noqa: E402
 
 # Middleware runs in reverse registration order, so registering the rate
 # limiter first and CORS second means CORS is outermost — a 429 still carries
@@ -169,7 +131,9 @@ async def _unhandled_error_names_itself(request: Request, exc: Exception):
 
 api_router = APIRouter(prefix="/api")
 
+from core.passwords import hash_password, passwords, verify_password
 from core.security import (
+    forget_user,
     get_current_user_doc,
     require_admin_doc,
     require_super_admin_doc,
@@ -189,7 +153,23 @@ from core.security import (
 # One rule, one name. A new query that forgets it is a leak, so anything
 # touching db.products for a shopper goes through LIVE_ONLY or live_product().
 # ---------------------------------------------------------------------------
-LIVE_ONLY: Dict[str, Any] = {"staging": {"$ne": True}, "is_active": {"$ne": False}}
+#
+# The rule is stored on the product as `listed` (see storefront_fields): out of
+# staging, not switched off, and passed by the storefront's rules. One field
+# matched by equality, so the listing indexes lead with it and return rows in
+# sort order. Three `$ne`s in front of the sort key gave each field two
+# ranges, and every page sorted the whole live catalogue in memory. A row not
+# stamped yet is not listed: the boundary fails closed, so the app stamps
+# every such row at startup, before it serves a request (stamp_storefront).
+#
+# staging and is_active are still checked as stored, outside the indexes, so
+# a product withdrawn by a write that did not restamp it — from a shell, or
+# another service — leaves the shop at once rather than at the next stamp.
+LIVE_ONLY: Dict[str, Any] = {
+    "listed": True,
+    "staging": {"$ne": True},
+    "is_active": {"$ne": False},
+}
 
 # Import feeds are never a substitute for catalogue review.  A few historic
 # supplier rows were published with broken JSON title fragments (for example
@@ -230,6 +210,39 @@ def _catalogue_ready(doc: Dict[str, Any]) -> bool:
     return not any(token in searchable_text for token in _NON_ACCESSORY_TOKENS)
 
 
+# The storefront search reads an in-memory index of the live catalogue rather
+# than the collection (services/search_index.py), so every write to
+# db.products in this process reports itself here. A write that forgets to is
+# caught up by the index's periodic rebuild — late, not never.
+search_index = SearchIndex(lambda doc: _storefront_ready(doc))
+
+
+def catalogue_changed(ids: Optional[Iterable[str]] = None) -> None:
+    """Report a write to db.products: these ids, or with none, anything."""
+    ids = list(ids) if ids is not None else None
+    search_index.mark_stale(ids)
+    catalogue_cache.invalidate(ids)
+    sitemap.invalidate()
+
+
+async def catalogue_written(ids: Iterable[str], recheck_text: bool = True) -> None:
+    """
+    After writing to these products: restamp what they show, then report it.
+
+    An edit can bring back a claim or a name the catalogue text rules would
+    correct, so the products lose their `translation_version` and the next
+    CATALOGUE_TEXT_MIGRATION run reads them again. Writes that leave the text
+    alone, or that just ran those rules over it, pass recheck_text=False.
+    """
+    ids = list(ids)
+    if recheck_text and ids:
+        await db.products.update_many(
+            {"id": {"$in": ids}, "translation_version": {"$exists": True}},
+            {"$unset": {"translation_version": ""}})
+    await refresh_storefront_fields(ids)
+    catalogue_changed(ids)
+
+
 # How long the shop tells a customer to expect delivery, in days. A single
 # store-wide window: CJ publishes no lead time per product, and no country
 # configuration in this project has ever set one, so the old
@@ -285,10 +298,51 @@ def missing_shipping_fields(address: Optional[Dict[str, Any]]) -> List[str]:
     return missing
 
 
+async def _load_live(ids: List[str]) -> List[Dict[str, Any]]:
+    return await db.products.find({"id": {"$in": ids}, **LIVE_ONLY}).to_list(length=None)
+
+
+async def live_docs(product_ids: Iterable[str], fresh: bool = False) -> Dict[str, Dict[str, Any]]:
+    """
+    id -> LIVE_ONLY document for those of `product_ids` that are live.
+
+    Read through the catalogue cache (services/product_cache.py): the hot
+    products a storefront keeps asking for cost one database read per
+    write, not one per request. Misses are fetched together, with one $in.
+    `fresh` skips the cached copies and refreshes them — checkout takes
+    money on what it reads, so it reads the database.
+    """
+    catalogue_cache.bind(db)
+    return await catalogue_cache.products(list(product_ids), _load_live, fresh=fresh)
+
+
 async def live_product(product_id: str) -> Optional[Dict[str, Any]]:
     """A product a shopper is allowed to see, or None. Staging is invisible."""
-    product = await db.products.find_one({"id": product_id, **LIVE_ONLY})
-    return product if product and _catalogue_ready(product) else None
+    product = (await live_docs([product_id])).get(product_id)
+    return product if product and _storefront_ready(product) else None
+
+
+async def find_products(
+    query: Dict[str, Any],
+    sort: Optional[List[Tuple[str, int]]] = None,
+    skip: int = 0,
+    limit: int = 0,
+) -> List[Dict[str, Any]]:
+    """db.products.find(query).sort(sort).skip(skip).limit(limit), through the catalogue cache."""
+    catalogue_cache.bind(db)
+
+    async def load() -> List[Dict[str, Any]]:
+        cursor = db.products.find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        if skip:
+            cursor = cursor.skip(skip)
+        if limit:
+            cursor = cursor.limit(limit)
+        return await cursor.to_list(length=None)
+
+    return await catalogue_cache.listing(
+        {"query": query, "sort": sort, "skip": skip, "limit": limit}, load)
 
 
 # =============================================================================
@@ -566,102 +620,55 @@ class CMSPage(BaseModel):
 # Google Search Console - Dynamic Sitemap
 # ============================================================================
 
-@app.get("/sitemap.xml")
-async def generate_sitemap():
-    """
-    Generate dynamic sitemap for Google Search Console
-    Includes: Products, Categories, Static Pages
-    """
+# Served by services/sitemap.py: built in one keyset pass over the catalogue,
+# split into a sitemap index and 50k-URL files once the catalogue outgrows
+# one, and kept in memory until catalogue_changed() reports a product write. The Sitemap object is made
+# below the storefront stamp section, whose projection it reads through.
+SITEMAP_BASE_URL = "https://auraaluxury.com"
+SITEMAP_PAGES = [
+    ('/', '1.0', 'daily'),
+    ('/products', '0.9', 'daily'),
+    ('/auth', '0.6', 'monthly'),
+    ('/cart', '0.5', 'weekly'),
+    ('/privacy-policy', '0.4', 'yearly'),
+    ('/terms-of-service', '0.4', 'yearly'),
+    ('/return-policy', '0.4', 'yearly'),
+    ('/contact-us', '0.5', 'monthly'),
+    ('/order-tracking', '0.5', 'weekly'),
+]
+SITEMAP_CATEGORIES = ['earrings', 'necklaces', 'bracelets', 'rings', 'watches', 'sets']
+
+
+async def _serve_sitemap(name: str, request: Request) -> Response:
     try:
-        from xml.etree.ElementTree import Element, SubElement, tostring
-        from xml.dom import minidom
-        
-        # Create root element
-        urlset = Element('urlset')
-        urlset.set('xmlns', 'http://www.sitemaps.org/schemas/sitemap/0.9')
-        
-        base_url = "https://auraaluxury.com"
-        
-        # Add static pages
-        static_pages = [
-            ('/', '1.0', 'daily'),
-            ('/products', '0.9', 'daily'),
-            ('/auth', '0.6', 'monthly'),
-            ('/cart', '0.5', 'weekly'),
-            ('/privacy-policy', '0.4', 'yearly'),
-            ('/terms-of-service', '0.4', 'yearly'),
-            ('/return-policy', '0.4', 'yearly'),
-            ('/contact-us', '0.5', 'monthly'),
-            ('/order-tracking', '0.5', 'weekly'),
-        ]
-        
-        for path, priority, changefreq in static_pages:
-            url = SubElement(urlset, 'url')
-            loc = SubElement(url, 'loc')
-            loc.text = f"{base_url}{path}"
-            lastmod = SubElement(url, 'lastmod')
-            lastmod.text = datetime.now(timezone.utc).strftime('%Y-%m-%d')
-            changefreq_elem = SubElement(url, 'changefreq')
-            changefreq_elem.text = changefreq
-            priority_elem = SubElement(url, 'priority')
-            priority_elem.text = priority
-        
-        # Add category pages
-        categories = [
-            'earrings', 'necklaces', 'bracelets', 'rings', 'watches', 'sets'
-        ]
-        
-        for category in categories:
-            url = SubElement(urlset, 'url')
-            loc = SubElement(url, 'loc')
-            loc.text = f"{base_url}/products?category={category}"
-            lastmod = SubElement(url, 'lastmod')
-            lastmod.text = datetime.now(timezone.utc).strftime('%Y-%m-%d')
-            changefreq_elem = SubElement(url, 'changefreq')
-            changefreq_elem.text = 'daily'
-            priority_elem = SubElement(url, 'priority')
-            priority_elem.text = '0.8'
-        
-        # Add product pages (fetch from database). Staging products are not
-        # submitted to search engines — the owner has not approved them yet.
-        products = await db.products.find({"in_stock": True, **LIVE_ONLY}).to_list(length=500)
-        products = [product for product in products if _catalogue_ready(product)]
-        
-        for product in products:
-            url = SubElement(urlset, 'url')
-            loc = SubElement(url, 'loc')
-            loc.text = f"{base_url}/product/{product['id']}"
-            lastmod = SubElement(url, 'lastmod')
-            # Use product's last_synced_at if available, otherwise created_at
-            last_updated = product.get('last_synced_at') or product.get('created_at') or datetime.now(timezone.utc)
-            if isinstance(last_updated, datetime):
-                lastmod.text = last_updated.strftime('%Y-%m-%d')
-            else:
-                lastmod.text = datetime.now(timezone.utc).strftime('%Y-%m-%d')
-            changefreq_elem = SubElement(url, 'changefreq')
-            changefreq_elem.text = 'weekly'
-            priority_elem = SubElement(url, 'priority')
-            priority_elem.text = '0.7'
-        
-        # Pretty print XML
-        xml_string = tostring(urlset, encoding='unicode')
-        dom = minidom.parseString(xml_string)
-        pretty_xml = dom.toprettyxml(indent="  ", encoding="UTF-8")
-        
-        logger.info(f"Sitemap generated with {len(static_pages) + len(categories) + len(products)} URLs")
-        
-        return Response(
-            content=pretty_xml,
-            media_type="application/xml",
-            headers={
-                "Content-Type": "application/xml; charset=UTF-8",
-                "Cache-Control": "public, max-age=3600"  # Cache for 1 hour
-            }
-        )
-        
+        copy = await sitemap.file(db, name)
     except Exception as e:
         logger.error(f"Error generating sitemap: {e}")
         raise HTTPException(status_code=500, detail="Failed to generate sitemap")
+    if copy is None:
+        raise HTTPException(status_code=404, detail="Sitemap not found")
+    headers = Sitemap.headers(copy.etag, copy.last_modified)
+    if Sitemap.not_modified(copy.etag, copy.last_modified,
+                            request.headers.get("if-none-match"),
+                            request.headers.get("if-modified-since")):
+        return Response(status_code=304, headers=headers)
+    return Response(content=copy.body, media_type="application/xml; charset=UTF-8", headers=headers)
+
+
+@app.get("/sitemap.xml")
+async def generate_sitemap(request: Request):
+    """
+    Sitemap for Google Search Console: static pages, categories and every
+    live product — or, past 50,000 URLs, the index of the files that hold them.
+    Staging products are not submitted; the owner has not approved them yet.
+    """
+    return await _serve_sitemap("sitemap", request)
+
+
+@app.get("/sitemap-{part}.xml")
+async def sitemap_part(part: str, request: Request):
+    """One file of a split sitemap: `pages` or `products-<n>`."""
+    return await _serve_sitemap(part, request)
 
 # ======================================
 # Import Service Endpoints
@@ -769,7 +776,9 @@ async def get_unified_import_status(job_id: str, admin: User = Depends(get_admin
             "rejected_off_category": job["progress"].get("rejected_off_category", 0),
             "failed": job["progress"]["failed"],
             # How the new arrivals spread over the shop's six shelves.
-            "by_category": job["progress"].get("by_category", {})
+            "by_category": job["progress"].get("by_category", {}),
+            # The closing report of jobs that have one (a reprice, say).
+            "result": job.get("result"),
         }
         
     except Exception as e:
@@ -824,17 +833,24 @@ async def check_readiness():
 @api_router.get("/products/staging")
 async def get_staging_products(
     job_id: Optional[str] = None,
+    limit: Optional[int] = None,
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     admin: User = Depends(get_admin_user)
 ):
     """
     Get products from staging area (imported but not yet published)
+
+    With `limit` or `cursor`, a page — `{items, next_cursor}` — as the admin
+    catalogue pages; without either, the newest 1000 as before.
     """
+    query: Dict[str, Any] = {"staging": True}
+    if job_id:
+        query["import_job_id"] = job_id
+    if limit is not None or cursor is not None:
+        items, next_cursor = await _newest_page(query, {"_id": 0}, limit, cursor)
+        return {"items": items, "next_cursor": next_cursor}
     try:
-        query = {"staging": True}
-        if job_id:
-            query["import_job_id"] = job_id
-        
-        products = await db.products.find(query).sort("created_at", -1).to_list(length=1000)
+        products = await db.products.find(query).sort(_NEWEST).to_list(length=1000)
         
         # Convert ObjectId to string if present
         for product in products:
@@ -882,6 +898,7 @@ async def update_staging_product(
         
         if result.modified_count == 0:
             raise HTTPException(status_code=404, detail="Product not found in staging")
+        await catalogue_written([product_id])
         
         return {"success": True, "message": "Product updated"}
     except HTTPException:
@@ -936,6 +953,7 @@ async def publish_staging_products(
         )
         
         logger.info(f"✅ Published {result.modified_count} products to live store")
+        await catalogue_written(product_ids, recheck_text=False)
 
         return {
             "success": True,
@@ -993,51 +1011,119 @@ async def update_pricing_settings(payload: PricingSettingsUpdate, admin: User =
     return await load_pricing_settings(db)
 
 
-@api_router.post("/admin/pricing-settings/reprice")
-async def reprice_catalogue(admin: User = Depends(get_admin_user)):
+# Products read, priced and written per round of the reprice job.
+REPRICE_CHUNK = 1000
+
+_REPRICE_FIELDS = {"_id": 0, "id": 1, "price": 1, "price_breakdown": 1,
+                   "supplier_price": 1, "supplier_shipping": 1, "weight_kg": 1}
+
+
+async def _reprice_job(job_id: str, cfg: Dict[str, float]) -> None:
     """
-    Recompute every auto-priced product with the margin saved right now.
-    Hand-edited prices keep the owner's number and are reported, not touched.
+    Reprice every auto-priced product, REPRICE_CHUNK at a time.
+
+    Each chunk is one keyset-paged read of the fields pricing needs, one
+    vectorized pass through PricingService.calculate_final_prices, and one
+    bulk_write of the rows whose price or breakdown actually moved. Pressing
+    the button twice with the same margin writes nothing the second time —
+    and leaves the storefront stamps and the search index alone.
     """
-    cfg = await load_pricing_settings(db)
+    jobs = ImportJobManager(db)
     # A missing flag counts as auto: products imported before the flag
     # existed were priced by the machine too, and requiring `== True` left
     # them out of repricing — the owner pressed the button and kept seeing
     # the old fractional prices on his older catalogue. Only an explicit
     # False (a hand-typed price) is spared.
-    auto_priced = await db.products.find(
-        {"pricing_auto_calculated": {"$ne": False}, "supplier_price": {"$gt": 0}}
-    ).to_list(100000)
-
-    repriced = 0
-    for product in auto_priced:
-        pricing = pricing_service.calculate_final_price(
-            base_cost=float(product.get("supplier_price") or 0),
-            shipping_cost=float(product.get("supplier_shipping") or 0),
-            country_code="SA",
-            weight_kg=float(product.get("weight_kg") or 0.5),
-            original_currency="USD",
-            profit_margin_percent=cfg["profit_margin_percent"],
-            minimum_profit_sar=cfg["minimum_profit_sar"],
-        )
-        await db.products.update_one(
-            {"id": product["id"]},
-            {"$set": {
-                "price": pricing["final_price_sar"],
-                "price_breakdown": pricing["breakdown"],
-                "updated_at": datetime.now(timezone.utc).isoformat(),
-            }},
+    query = {"pricing_auto_calculated": {"$ne": False}, "supplier_price": {"$gt": 0}}
+    started = time.monotonic()
+    try:
+        total = await db.products.count_documents(query)
+        processed = repriced = 0
+
+        async def progress() -> None:
+            await jobs.update_job_status(job_id, "running", progress={
+                "total": total, "processed": processed, "imported": repriced, "failed": 0,
+                "percent": min(100, round(processed * 100 / total)) if total else 100})
+
+        await progress()
+        last_id = None
+        while True:
+            page_query = dict(query)
+            if last_id is not None:
+                page_query["id"] = {"$gt": last_id}
+            chunk = await db.products.find(page_query, _REPRICE_FIELDS).sort(
+                "id", 1).limit(REPRICE_CHUNK).to_list(REPRICE_CHUNK)
+            if not chunk:
+                break
+            last_id = chunk[-1]["id"]
+            processed += len(chunk)
+
+            pricing = pricing_service.calculate_final_prices(
+                base_costs=[float(p.get("supplier_price") or 0) for p in chunk],
+                shipping_costs=[float(p.get("supplier_shipping") or 0) for p in chunk],
+                weights_kg=[float(p.get("weight_kg") or 0.5) for p in chunk],
+                country_codes="SA",
+                original_currency="USD",
+                profit_margin_percent=cfg["profit_margin_percent"],
+                minimum_profit_sar=cfg["minimum_profit_sar"],
+            )
+            now = datetime.now(timezone.utc).isoformat()
+            ops: List[UpdateOne] = []
+            changed: List[str] = []
+            for product, price, breakdown in zip(
+                    chunk, pricing["final_price_sar"].tolist(), pricing["breakdowns"]):
+                if product.get("price") == price and product.get("price_breakdown") == breakdown:
+                    continue
+                ops.append(UpdateOne({"id": product["id"]}, {"$set": {
+                    "price": price, "price_breakdown": breakdown, "updated_at": now}}))
+                changed.append(product["id"])
+
+            if ops:
+                await bulk_write(db.products, ops)
+                await catalogue_written(changed, recheck_text=False)
+                repriced += len(changed)
+            await progress()
+
+        kept_manual = await db.products.count_documents(
+            {"supplier_price": {"$gt": 0}, "pricing_auto_calculated": False}
         )
-        repriced += 1
+        duration = time.monotonic() - started
+        await jobs.update_job_status(job_id, "completed", progress={
+            "total": total, "processed": processed, "imported": repriced, "failed": 0,
+            "percent": 100,
+        }, result={
+            "repriced": repriced,
+            "unchanged": processed - repriced,
+            "kept_manual": kept_manual,
+            "profit_margin_percent": cfg["profit_margin_percent"],
+            "duration_seconds": round(duration, 2),
+            "products_per_sec": round(processed / duration, 1) if duration > 0 else None,
+        })
+        logger.info(f"✅ Repriced {repriced} of {processed} products in {duration:.1f}s")
+    except Exception as e:
+        logger.error(f"❌ Reprice {job_id} failed: {e}")
+        await jobs.update_job_status(job_id, "failed", error=str(e))
+
+
+@api_router.post("/admin/pricing-settings/reprice")
+async def reprice_catalogue(
+    background_tasks: BackgroundTasks,
+    admin: User = Depends(get_admin_user),
+):
+    """
+    Recompute every auto-priced product with the margin saved right now.
+    Hand-edited prices keep the owner's number and are reported, not touched.
 
-    kept_manual = await db.products.count_documents(
-        {"supplier_price": {"$gt": 0}, "pricing_auto_calculated": False}
+    Runs in the background: poll /imports/{jobId}/status, whose `result`
+    holds the report once the job completes.
+    """
+    cfg = await load_pricing_settings(db)
+    job_id = await ImportJobManager(db).create_job(
+        job_type="reprice", supplier="catalogue",
+        params={"triggered_by": admin.email, **cfg}, user_id=admin.id,
     )
-    return {
-        "repriced": repriced,
-        "kept_manual": kept_manual,
-        "profit_margin_percent": cfg["profit_margin_percent"],
-    }
+    background_tasks.add_task(_reprice_job, job_id, cfg)
+    return {"success": True, "jobId": job_id, "profit_margin_percent": cfg["profit_margin_percent"]}
 
 
 # ============================================================================
@@ -1130,10 +1216,166 @@ def _shorten_name(raw: str) -> str:
     return head.rstrip(" -–—")
 
 
+# ---------------------------------------------------------------------------
+# What the storefront shows, decided when a product is written
+#
+# _catalogue_ready, _readable_name and _sane_reference_price ran on every
+# product of every listing, search, recommendation row and sitemap — JSON
+# unwrapping three names and scanning six text fields for every row, on every
+# request, to reach the same answer as the request before. And because the
+# verdict was reached after the database had applied the limit, a page with a
+# refused row in it came back short.
+#
+# They now run when a product is written, and their answers are stored on it:
+#   storefront_ready      _catalogue_ready's verdict; part of `listed`, so
+#                         refused rows never leave the database
+#   storefront_overrides  the fields the two read-time corrections would have
+#                         changed, and to what — empty for nearly every row
+#   storefront_issue      why the storefront will not show the row as
+#                         displayed — the Product model's objection, or the
+#                         rules' — or null; what the admin catalogue's
+#                         visibility badge and filter read
+#   listed                storefront_ready, out of staging and not switched
+#                         off — LIVE_ONLY, as one field the indexes can lead with
+#   storefront_version    the revision of these rules that produced them all
+# A row whose version is not STOREFRONT_VERSION — older than this, or stamped
+# under rules since changed — is judged on read exactly as before until
+# backfill_storefront_fields reaches it. Bump the version when any of the three
+# functions, or the Product model, changes what it decides.
+#
+# The same stamp carries the off-niche broom's verdict, which has rules of its
+# own and so a revision of its own:
+#   off_niche             looks_like_adornment's "no", on the stored names
+#   off_niche_version     ADORNMENT_VERSION, which changes by itself whenever
+#                         the import gate's vocabularies do
+# A row stale on either revision is restamped whole by the backfill.
+# ---------------------------------------------------------------------------
+
+STOREFRONT_VERSION = 2
+
+# What the three functions read, so the stamp can be computed from a projection.
+_STOREFRONT_INPUTS = {
+    "_id": 0, "id": 1, "name": 1, "name_en": 1, "name_ar": 1, "description": 1,
+    "description_en": 1, "description_ar": 1, "imported_from_cj": 1, "source": 1,
+    "price": 1, "original_price": 1, "discount_percentage": 1,
+}
+_DISPLAY_FIELDS = ("name", "name_ar", "name_en", "original_price", "discount_percentage")
+# What the whole stamp reads: the above, and everything the Product model
+# validates, for storefront_issue.
+_STAMP_INPUTS = {**_STOREFRONT_INPUTS, **dict.fromkeys(Product.model_fields, 1),
+                 "supplier_category": 1, "staging": 1, "is_active": 1}
+# The rows the backfill has still to reach.
+_STALE_STAMP = {"$or": [{"storefront_version": {"$ne": STOREFRONT_VERSION}},
+                        {"off_niche_version": {"$ne": ADORNMENT_VERSION}},
+                        {"listed": {"$exists": False}}]}
+
+
+def _storefront_issue(shown: Dict[str, Any], ready: bool) -> Optional[str]:
+    """Why the storefront refuses `shown` (a row as displayed), or None."""
+    try:
+        # Absent is active, as in LIVE_ONLY; see admin_list_products.
+        Product(**{"is_active": True, **shown})
+    except Exception as e:
+        return str(e).split("\n")[1].strip() if "\n" in str(e) else str(e)
+    if not ready:
+        return "Refused by the storefront rules: no readable name, or not an accessory"
+    return None
+
+
+def storefront_fields(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """The storefront stamp for `doc`, ready to `$set`."""
+    shown = _readable_name(_sane_reference_price(dict(doc)))
+    ready = _catalogue_ready(doc)
+    return {
+        "storefront_ready": ready,
+        "storefront_overrides": {
+            field: shown.get(field) for field in _DISPLAY_FIELDS
+            if shown.get(field) != doc.get(field)
+        },
+        "storefront_issue": _storefront_issue(shown, ready),
+        "listed": ready and doc.get("staging") is not True and doc.get("is_active") is not False,
+        "storefront_version": STOREFRONT_VERSION,
+        **off_niche_fields(doc),
+    }
+
+
+def _stamped(doc: Dict[str, Any]) -> bool:
+    return doc.get("storefront_version") == STOREFRONT_VERSION
+
+
+def _storefront_ready(doc: Dict[str, Any]) -> bool:
+    """_catalogue_ready, read from the stamp when the stamp is current."""
+    return doc.get("storefront_ready") is True if _stamped(doc) else _catalogue_ready(doc)
+
+
+def _as_displayed(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """`doc` with the read-time corrections applied, from the stamp if current."""
+    if _stamped(doc):
+        doc.update(doc.get("storefront_overrides") or {})
+        return doc
+    return _readable_name(_sane_reference_price(doc))
+
+
+async def refresh_storefront_fields(ids: Iterable[str]) -> int:
+    """Restamp these products from what is stored now. Returns how many."""
+    ids = [i for i in ids if i]
+    if not ids:
+        return 0
+    docs = await db.products.find({"id": {"$in": ids}}, _STAMP_INPUTS).to_list(length=None)
+    await bulk_write(db.products, [
+        UpdateOne({"id": doc["id"]}, {"$set": storefront_fields(doc)}) for doc in docs
+    ])
+    return len(docs)
+
+
+async def backfill_storefront_fields(batch_size: int = 500, on_batch=None) -> int:
+    """
+    Stamp every product whose stamp is missing or out of date, a batch at a
+    time. Returns how many were stamped.
+
+    Every batch stamps the rows it read, so the next query no longer matches
+    them and the loop walks forward without keeping a position — and a product
+    written meanwhile is either already current or picked up by a later batch.
+    """
+    # Rows stamped before `listed` existed hold everything it is made of: set
+    # it in one update, rather than keep them off the shelves until a batch
+    # reaches them.
+    await db.products.update_many(
+        {"listed": {"$exists": False}, "storefront_ready": True,
+         "staging": {"$ne": True}, "is_active": {"$ne": False}},
+        {"$set": {"listed": True}})
+    done = 0
+    while True:
+        docs = await db.products.find(_STALE_STAMP, _STAMP_INPUTS).limit(batch_size).to_list(length=None)
+        if not docs:
+            break
+        result = await bulk_write(db.products, [
+            UpdateOne({"id": doc.get("id")}, {"$set": storefront_fields(doc)}) for doc in docs
+        ])
+        if not result["matched"]:
+            # Nothing could be stamped (rows with no id): stop rather than spin.
+            break
+        done += len(docs)
+        if on_batch is not None:
+            await on_batch(done)
+        await asyncio.sleep(0)
+    if done:
+        catalogue_changed()
+    return done
+
+
+sitemap = Sitemap(
+    SITEMAP_BASE_URL, SITEMAP_PAGES, SITEMAP_CATEGORIES,
+    query={"in_stock": True, **LIVE_ONLY},
+    projection={**_STOREFRONT_INPUTS, "storefront_ready": 1, "storefront_version": 1,
+                "last_synced_at": 1, "created_at": 1},
+    is_listed=_storefront_ready,
+)
+
+
 def _localize(doc: Dict[str, Any], language: Optional[str]) -> Dict[str, Any]:
     """Pick the localized name/description, falling back across languages."""
-    doc = _sane_reference_price(doc)
-    doc = _readable_name(doc)
+    doc = _as_displayed(doc)
 
     primary = "ar" if (language or "").startswith("ar") else "en"
     secondary = "en" if primary == "ar" else "ar"
@@ -1165,7 +1407,137 @@ def _localize(doc: Dict[str, Any], language: Optional[str]) -> Dict[str, Any]:
     return doc
 
 
-@api_router.get("/products", response_model=List[Product])
+# ---------------------------------------------------------------------------
+# Keyset pagination for the storefront grid
+#
+# skip/limit reads and throws away every product before the page — page 200
+# of the grid cost two hundred pages of reading — and the page was filtered
+# through _catalogue_ready *after* the limit, so a page could come back short
+# and the grid's "load more" decided the catalogue had ended. A cursor names
+# the last product the visitor saw; the next page starts right after it, in an
+# order the compound indexes in services/indexes.py serve directly.
+# ---------------------------------------------------------------------------
+
+# The orders the grid can be read in: sort name -> (field, direction). The
+# names are the ones /api/search already takes in `sortBy`.
+LISTING_SORTS: Dict[str, Tuple[str, int]] = {
+    "newest": ("created_at", -1),
+    "price-low-high": ("price", 1),
+    "price-high-low": ("price", -1),
+    "rating": ("rating", -1),
+}
+
+# MongoDB orders values of different types by type before value, and
+# `created_at` really is mixed: the admin form stores a datetime, the importer
+# an ISO string. `$lt` only compares within one type, so a cursor that did not
+# know which type it stopped at would silently drop every product of the other.
+_TYPE_ORDER = ("null", "number", "string", "date")
+
+
+def _type_of(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, bool):
+        raise ValueError("booleans are not a sort key")
+    if isinstance(value, (int, float)):
+        return "number"
+    if isinstance(value, str):
+        return "string"
+    if isinstance(value, datetime):
+        return "date"
+    raise ValueError(f"cannot paginate over {type(value).__name__}")
+
+
+def _encode_cursor(sort: str, value: Any, product_id: str) -> str:
+    kind = _type_of(value)
+    raw = value.isoformat() if kind == "date" else value
+    payload = json.dumps([sort, kind, raw, product_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> Tuple[str, Any, str]:
+    """(sort, value, product_id) from a cursor this API issued, or a 400."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort, kind, raw, product_id = json.loads(base64.urlsafe_b64decode(padded))
+        value = datetime.fromisoformat(raw) if kind == "date" else raw
+        if sort not in LISTING_SORTS or _type_of(value) != kind or not isinstance(product_id, str):
+            raise ValueError(cursor)
+        return sort, value, product_id
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def _after(field: str, direction: int, value: Any, product_id: str) -> Dict[str, Any]:
+    """Everything that sorts after (value, product_id) in (field, id) order."""
+    op = "$gt" if direction > 0 else "$lt"
+    kind = _type_of(value)
+    clauses: List[Dict[str, Any]] = [{field: value, "id": {op: product_id}}]
+    if kind != "null":
+        clauses.append({field: {op: value}})
+    at = _TYPE_ORDER.index(kind)
+    for later in (_TYPE_ORDER[at + 1:] if direction > 0 else _TYPE_ORDER[:at]):
+        clauses.append({field: None} if later == "null" else {field: {"$type": later}})
+    return {"$or": clauses}
+
+
+class ProductPage(BaseModel):
+    items: List[Product]
+    # Pass back as `cursor` for the page after this one; null at the end.
+    next_cursor: Optional[str] = None
+
+
+async def _listing_page(
+    query: Dict[str, Any],
+    sort: str,
+    after: Optional[Tuple[Any, str]],
+    limit: int,
+    language: Optional[str],
+) -> ProductPage:
+    """
+    Exactly `limit` displayable products after `after`, unless the catalogue
+    runs out first.
+
+    Rows the storefront refuses are read past rather than leaving a hole:
+    the next batch starts after the last row *read*, not the last one kept.
+    """
+    field, direction = LISTING_SORTS[sort]
+    order = [(field, direction), ("id", direction)]
+    items: List[Product] = []
+    last: Optional[Dict[str, Any]] = None
+    exhausted = False
+    batch = limit
+
+    while len(items) < limit:
+        page_query = query
+        position = (last.get(field), last.get("id", "")) if last is not None else after
+        if position is not None:
+            page_query = {"$and": [query, _after(field, direction, *position)]}
+        docs = await find_products(page_query, order, limit=batch)
+        exhausted = len(docs) < batch
+        for i, doc in enumerate(docs):
+            last = doc
+            if not _storefront_ready(doc):
+                continue
+            try:
+                items.append(Product(**_localize(doc, language)))
+            except Exception as e:
+                logger.warning(f"Skipping malformed product {doc.get('id', 'unknown')}: {e}")
+                continue
+            if len(items) == limit:
+                exhausted = exhausted and i == len(docs) - 1
+                break
+        if exhausted:
+            break
+        batch = min(batch * 2, 500)
+
+    next_cursor = None
+    if not exhausted and last is not None:
+        next_cursor = _encode_cursor(sort, last.get(field), last.get("id", ""))
+    return ProductPage(items=items, next_cursor=next_cursor)
+
+
+@api_router.get("/products", response_model=Union[List[Product], ProductPage])
 async def get_products(
     category: Optional[CategoryType] = None,
     min_price: Optional[float] = None,
@@ -1173,9 +1545,17 @@ async def get_products(
     search: Optional[str] = None,
     skip: int = 0,
     limit: int = 20,
-    language: Optional[str] = Query(None, description="Preferred language (ar|en)")
+    language: Optional[str] = Query(None, description="Preferred language (ar|en)"),
+    sort: Optional[str] = Query(None, description="newest | price-low-high | price-high-low | rating"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
 ):
-    """List live products: nothing in staging, nothing switched off."""
+    """
+    List live products: nothing in staging, nothing switched off.
+
+    With `sort` or `cursor` the answer is a page — `{items, next_cursor}` —
+    read by keyset and always full until the catalogue ends. Without either it
+    is the plain list old clients read through skip/limit, unchanged.
+    """
     # Built from LIVE_ONLY rather than repeating its terms. The listing carried
     # its own copy of the rule and so missed is_active the moment that field
     # became real — the exact drift LIVE_ONLY exists to prevent.
@@ -1194,13 +1574,27 @@ async def get_products(
                           "description_en", "description_ar")
         ]
 
-    products = await db.products.find(query).skip(skip).limit(limit).to_list(length=None)
+    if sort is not None or cursor is not None:
+        after = None
+        if cursor:
+            cursor_sort, value, product_id = _decode_cursor(cursor)
+            if sort is not None and sort != cursor_sort:
+                raise HTTPException(status_code=400, detail="Cursor belongs to a different sort")
+            sort, after = cursor_sort, (value, product_id)
+        if sort not in LISTING_SORTS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Unknown sort; use one of: {', '.join(LISTING_SORTS)}",
+            )
+        return await _listing_page(query, sort, after, max(1, min(limit, 100)), language)
+
+    products = await find_products(query, skip=skip, limit=limit)
 
     # Skip documents that don't satisfy the schema rather than failing the
     # whole listing — imported supplier data is not always well-formed.
     valid_products = []
     for product in products:
-        if not _catalogue_ready(product):
+        if not _storefront_ready(product):
             continue
         try:
             valid_products.append(Product(**_localize(product, language)))
@@ -1235,14 +1629,10 @@ async def _live_products(
     limit is applied here, so ordering a page that has already been truncated
     sorts an arbitrary handful rather than the cheapest products in the shop.
     """
-    query = {**query, "staging": {"$ne": True}}
-    cursor = db.products.find(query)
-    if sort:
-        cursor = cursor.sort(sort)
-    docs = await cursor.limit(max(1, min(limit, 50))).to_list(length=None)
+    docs = await find_products({**query, **LIVE_ONLY}, sort, limit=max(1, min(limit, 50)))
     out = []
     for doc in docs:
-        if not _catalogue_ready(doc):
+        if not _storefront_ready(doc):
             continue
         try:
             out.append(Product(**_localize(doc, language)))
@@ -1259,17 +1649,6 @@ async def _ordered_by_ids(ids: List[str], limit: int, language: Optional[str] =
     return [found[i] for i in ids if i in found][:limit]
 
 
-async def _bestseller_ids(limit: int, exclude: Optional[str] = None) -> List[str]:
-    """Product ids ranked by units actually sold, newest orders included."""
-    sold: Dict[str, int] = {}
-    async for order in db.orders.find({}, {"items": 1}):
-        for item in order.get("items") or []:
-            pid = item.get("product_id") or item.get("id")
-            if pid and pid != exclude:
-                sold[pid] = sold.get(pid, 0) + int(item.get("quantity") or 1)
-    return [pid for pid, _ in sorted(sold.items(), key=lambda kv: -kv[1])][:limit]
-
-
 @api_router.get("/recommendations", response_model=List[Product])
 async def get_recommendations(
     request: Request,
@@ -1286,46 +1665,40 @@ async def get_recommendations(
     Every strategy falls back to the next most general one rather than
     returning nothing, so the row is never empty on a young store — but every
     product in it is a product that exists.
+
+    Each strategy is one indexed read of a table services/recommendations.py
+    keeps current as orders are paid and products opened; none of them reads
+    the order history on a shopper's request any more.
     """
     if type not in RECOMMENDATION_TYPES:
         type = "personalized"
     limit = max(1, min(limit, 24))
 
-    seed = await db.products.find_one({"id": productId}) if productId else None
+    seed = await db.products.find_one({"id": productId}, {"category": 1}) if productId else None
     picks: List[str] = []
 
     if type == "similar" and seed:
         siblings = await _live_products(
-            {"category": seed.get("category"), "id": {"$ne": productId}}, limit * 2, language)
-        picks = [p.id for p in sorted(siblings, key=lambda p: -p.rating)]
+            {"category": seed.get("category"), "id": {"$ne": productId}}, limit * 2, language,
+            sort=[("rating", -1)])
+        picks = [p.id for p in siblings]
 
     elif type == "complements" and seed:
-        # Bought in the same order as this product, most frequent first.
-        together: Dict[str, int] = {}
-        async for order in db.orders.find({"items.product_id": productId}, {"items": 1}):
-            for item in order.get("items") or []:
-                pid = item.get("product_id") or item.get("id")
-                if pid and pid != productId:
-                    together[pid] = together.get(pid, 0) + 1
-        picks = [pid for pid, _ in sorted(together.items(), key=lambda kv: -kv[1])]
+        # Bought in the same paid order as this product, most often first.
+        picks = await recommendations.bought_with_ids(db, productId, limit * 2)
         if not picks:
             # Nothing bought alongside it yet: suggest other categories.
             others = await _live_products(
-                {"category": {"$ne": seed.get("category")}}, limit * 2, language)
-            picks = [p.id for p in sorted(others, key=lambda p: -p.rating)]
+                {"category": {"$ne": seed.get("category")}}, limit * 2, language,
+                sort=[("rating", -1)])
+            picks = [p.id for p in others]
 
     elif type == "trending":
-        # What visitors have actually been opening, last 14 days.
-        since = (datetime.now(timezone.utc) - timedelta(days=14)).isoformat()
-        counts: Dict[str, int] = {}
-        async for ev in db.recommendation_events.find({"created_at": {"$gte": since}}, {"product_id": 1}):
-            pid = ev.get("product_id")
-            if pid:
-                counts[pid] = counts.get(pid, 0) + 1
-        picks = [pid for pid, _ in sorted(counts.items(), key=lambda kv: -kv[1])]
+        # What visitors have actually been opening, the last few days weighing most.
+        picks = await recommendations.trending_ids(db, limit * 2)
 
     elif type == "bestsellers":
-        picks = await _bestseller_ids(limit * 2)
+        picks = await recommendations.bestseller_ids(db, limit * 2, category=category)
 
     elif type == "personalized":
         # The categories this shopper has actually bought from or opened.
@@ -1338,25 +1711,16 @@ async def get_recommendations(
                 user_id = None
 
         if user_id:
-            seen_categories: Dict[str, int] = {}
-            async for order in db.orders.find({"user_id": user_id}, {"items": 1}):
-                for item in order.get("items") or []:
-                    pid = item.get("product_id") or item.get("id")
-                    doc = await db.products.find_one({"id": pid}, {"category": 1}) if pid else None
-                    if doc and doc.get("category"):
-                        seen_categories[doc["category"]] = seen_categories.get(doc["category"], 0) + 2
-            async for ev in db.recommendation_events.find({"user_id": user_id}, {"product_id": 1}):
-                doc = await db.products.find_one({"id": ev.get("product_id")}, {"category": 1})
-                if doc and doc.get("category"):
-                    seen_categories[doc["category"]] = seen_categories.get(doc["category"], 0) + 1
-
-            for cat, _ in sorted(seen_categories.items(), key=lambda kv: -kv[1]):
-                for p in await _live_products({"category": cat}, limit, language):
-                    if p.id not in picks:
-                        picks.append(p.id)
+            favourites = await recommendations.favourite_categories(db, user_id)
+            if favourites:
+                found = await _live_products(
+                    {"category": {"$in": favourites}}, limit * len(favourites), language,
+                    sort=[("rating", -1)])
+                found.sort(key=lambda p: favourites.index(p.category))
+                picks = [p.id for p in found]
 
         if not picks:
-            picks = await _bestseller_ids(limit * 2)
+            picks = await recommendations.bestseller_ids(db, limit * 2)
 
     results = await _ordered_by_ids(picks, limit, language)
 
@@ -1376,6 +1740,21 @@ async def get_recommendations(
     return results[:limit]
 
 
+async def _count_paid_order(order_id: str) -> None:
+    """A sale, into the recommendation tables. Never allowed to fail a payment."""
+    try:
+        await recommendations.record_paid_order(db, order_id)
+    except Exception as e:
+        logger.error(f"⚠️ Could not count paid order {order_id} into recommendations: {e}")
+
+
+async def _uncount_paid_order(order_id: str) -> None:
+    try:
+        await recommendations.forget_paid_order(db, order_id)
+    except Exception as e:
+        logger.error(f"⚠️ Could not take order {order_id} back out of recommendations: {e}")
+
+
 class RecommendationEvent(BaseModel):
     productId: str
     type: Optional[str] = None
@@ -1398,12 +1777,14 @@ async def track_recommendation(payload: RecommendationEvent, request: Request):
         except Exception:
             user_id = None
 
+    now = datetime.now(timezone.utc)
     await db.recommendation_events.insert_one({
         "product_id": payload.productId,
         "type": payload.type,
         "user_id": user_id,
-        "created_at": datetime.now(timezone.utc).isoformat(),
+        "created_at": now.isoformat(),
     })
+    await recommendations.record_open(db, payload.productId, user_id, now)
     return {"success": True}
 
 
@@ -1424,8 +1805,7 @@ async def compare_products(payload: CompareRequest, language: Optional[str] = Qu
     if not ids:
         raise HTTPException(status_code=400, detail="No product IDs provided")
 
-    docs = await db.products.find({"id": {"$in": ids}, "staging": {"$ne": True}}).to_list(length=None)
-    by_id = {d["id"]: d for d in docs if d.get("id")}
+    by_id = await live_docs(ids)
 
     # Shipping, warranty and returns are properties of the shop, not of an
     # individual necklace. The old version varied them per row by array index,
@@ -1473,22 +1853,6 @@ async def compare_products(payload: CompareRequest, language: Optional[str] = Qu
     return out
 
 
-# Where a material is stated. The dedicated columns first, then the places the
-# specification is written out — a shopper asking for pearl means the piece,
-# not the column it happens to be recorded in.
-_MATERIAL_FIELDS = ("material_en", "material_ar", "description_en",
-                    "description_ar", "name", "name_en")
-
-_SORTS = {
-    "price-low-high": [("price", 1)],
-    "price-high-low": [("price", -1)],
-    "rating": [("rating", -1)],
-    "newest": [("created_at", -1)],
-    "popular": [("reviews_count", -1)],
-    "relevance": None,
-}
-
-
 @api_router.get("/search", response_model=List[Product])
 async def search_products(
     q: Optional[str] = Query(None),
@@ -1517,39 +1881,27 @@ async def search_products(
     Filters the shop has no data for are not accepted, and the panel no longer
     offers them — a colour swatch no product carries is a promise to sort by
     something nobody recorded.
-    """
-    conditions: List[Dict[str, Any]] = []
 
-    if q and q.strip():
-        fields = ("name", "description", "name_en", "name_ar", "description_en",
-                  "description_ar", "material_en", "material_ar", "sku", "category")
-        escaped = re.escape(q.strip())
-        conditions.append(
-            {"$or": [{f: {"$regex": escaped, "$options": "i"}} for f in fields]})
-
-    if material and material.strip():
-        escaped = re.escape(material.strip())
-        conditions.append(
-            {"$or": [{f: {"$regex": escaped, "$options": "i"}} for f in _MATERIAL_FIELDS]})
-
-    query: Dict[str, Any] = {"$and": conditions} if conditions else {}
-    if category:
-        query["category"] = category
-    if minPrice is not None:
-        query.setdefault("price", {})["$gte"] = minPrice
-    if maxPrice is not None:
-        query.setdefault("price", {})["$lte"] = maxPrice
-    if rating is not None:
-        query["rating"] = {"$gte": rating}
-    if inStock:
-        query["in_stock"] = True
-    if onSale:
-        # A real discount, which in this shop means the owner lowered a price
-        # himself: the importer deliberately sets no reference price, so
-        # nothing arrives from the supplier already "on sale".
-        query["discount_percentage"] = {"$gt": 0}
-
-    return await _live_products(query, limit, language, sort=_SORTS.get(sortBy or ""))
+    Answered from `search_index` rather than the collection: this used to be
+    ten unanchored `$regex` clauses, a full scan per keystroke that no index
+    could serve, ranked in whatever order the scan met the rows. Words are
+    matched whole or as the start of a word, in either language, and
+    "relevance" now means where in the product they were found.
+    """
+    await search_index.ensure_current(db)
+    ids = search_index.search(
+        q,
+        category=category.value if category else None,
+        min_price=minPrice,
+        max_price=maxPrice,
+        material=material,
+        rating=rating,
+        in_stock=inStock,
+        on_sale=onSale,
+        sort=sortBy,
+        limit=max(1, min(limit, 50)),
+    )
+    return await _ordered_by_ids(ids, len(ids), language)
 
 
 @api_router.get("/categories")
@@ -1589,6 +1941,7 @@ async def create_product(product_data: ProductCreate, admin: User = Depends(get_
     # the raw document and would otherwise show a product it had just been
     # given a SKU for as having none.
     await db.products.insert_one({**submitted, **product.model_dump()})
+    await catalogue_written([product.id])
     return product
 
 
@@ -1609,6 +1962,7 @@ async def update_product(
     )
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Product not found")
+    await catalogue_written([product_id])
 
     product = await db.products.find_one({"id": product_id})
     return Product(**product)
@@ -1619,6 +1973,7 @@ async def delete_product(product_id: str, admin: User = Depends(get_admin_user))
     result = await db.products.delete_one({"id": product_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Product not found")
+    catalogue_changed([product_id])
     return {"message": "Product deleted successfully"}
 
 
@@ -1638,6 +1993,101 @@ async def get_cart(current_user: User = Depends(get_current_user)):
     return Cart(**cart)
 
 
+_CART_TOTAL = {"_id": 0, "total_amount": 1}
+
+
+def _on_cart_line(product_id: str, value: Any) -> Dict[str, Any]:
+    """
+    Inside an update pipeline: `value` worked out on the cart's line for
+    `product_id` (as `$$line`), missing if there is no such line.
+    """
+    return {"$arrayElemAt": [{"$map": {
+        "input": {"$filter": {"input": {"$ifNull": ["$items", []]}, "as": "line",
+                              "cond": {"$eq": ["$$line.product_id", {"$literal": product_id}]}}},
+        "as": "line", "in": value,
+    }}, 0]}
+
+
+async def add_cart_line(user_id: str, product_id: str, quantity: int, price: float) -> float:
+    """
+    Put `quantity` more of a product in the shopper's cart; return its total.
+
+    One update, and the total moves with the line in it. The cart used to be
+    read, changed in Python and written back whole — two round trips, and two
+    tabs adding at once lost one of the adds.
+
+    An update pipeline, because what the update does depends on the cart —
+    an arrayFilters `$inc` can grow the line, but not the total by the price
+    the line holds. A line already there gets the quantity and keeps the
+    price it went in at, so the total grows by the quantity at that price;
+    otherwise the line is appended at `price`, and on a shopper's first add
+    the upsert creates the cart. The server evaluates all of it against the
+    cart as it is, so nothing is read first and there is no retry — with or
+    without the unique index on user_id, a concurrent add lands on the one
+    cart. find_one_and_update hands the total back in the same round trip.
+    Values from the request go in as $literal: a product id that starts
+    with "$" is an id, not a field path.
+    """
+    pid = {"$literal": product_id}
+    held = {"$in": [pid, {"$ifNull": ["$items.product_id", []]}]}
+    cart = await db.carts.find_one_and_update(
+        {"user_id": user_id},
+        [{"$set": {
+            "id": {"$ifNull": ["$id", str(uuid.uuid4())]},
+            "items": {"$cond": [
+                held,
+                {"$map": {"input": "$items", "as": "line", "in": {"$cond": [
+                    {"$eq": ["$$line.product_id", pid]},
+                    {"product_id": "$$line.product_id", "quantity": {"$add": ["$$line.quantity", quantity]},
+                     "price": "$$line.price"},
+                    "$$line",
+                ]}}},
+                {"$concatArrays": [{"$ifNull": ["$items", []]}, {"$literal": [
+                    {"product_id": product_id, "quantity": quantity, "price": price}]}]},
+            ]},
+            "total_amount": {"$add": [
+                {"$ifNull": ["$total_amount", 0.0]},
+                {"$multiply": [quantity, {"$ifNull": [_on_cart_line(product_id, "$$line.price"), price]}]},
+            ]},
+            "updated_at": datetime.now(timezone.utc),
+        }}],
+        projection=_CART_TOTAL,
+        upsert=True,
+        return_document=ReturnDocument.AFTER,
+    )
+    return cart["total_amount"]
+
+
+async def remove_cart_line(user_id: str, product_id: str) -> Optional[float]:
+    """
+    Take a product out of the shopper's cart; return its total, or None if
+    there is no cart.
+
+    One update pipeline, like add_cart_line: the line comes out and the total
+    loses its quantity times its price, both worked out by the server from
+    the line as it is at that moment — a quantity another tab has just
+    changed is the quantity taken off. A cart without the line is left as it
+    was, updated_at included.
+    """
+    pid = {"$literal": product_id}
+    held = {"$in": [pid, {"$ifNull": ["$items.product_id", []]}]}
+    cart = await db.carts.find_one_and_update(
+        {"user_id": user_id},
+        [{"$set": {
+            "items": {"$filter": {"input": {"$ifNull": ["$items", []]}, "as": "line",
+                                  "cond": {"$ne": ["$$line.product_id", pid]}}},
+            "total_amount": {"$subtract": [
+                {"$ifNull": ["$total_amount", 0.0]},
+                {"$ifNull": [_on_cart_line(product_id, {"$multiply": ["$$line.quantity", "$$line.price"]}), 0.0]},
+            ]},
+            "updated_at": {"$cond": [held, datetime.now(timezone.utc), "$updated_at"]},
+        }}],
+        projection=_CART_TOTAL,
+        return_document=ReturnDocument.AFTER,
+    )
+    return None if cart is None else cart["total_amount"]
+
+
 @api_router.post("/cart/add")
 async def add_to_cart(
     product_id: str,
@@ -1651,59 +2101,15 @@ async def add_to_cart(
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
 
-    cart = await db.carts.find_one({"user_id": current_user.id})
-    if not cart:
-        cart = Cart(user_id=current_user.id).model_dump()
-        await db.carts.insert_one(dict(cart))
-
-    cart_items = cart.get("items", [])
-    existing_item = next(
-        (item for item in cart_items if item["product_id"] == product_id), None
-    )
-
-    if existing_item:
-        existing_item["quantity"] += quantity
-    else:
-        cart_items.append({
-            "product_id": product_id,
-            "quantity": quantity,
-            "price": product["price"]
-        })
-
-    total = sum(item["quantity"] * item["price"] for item in cart_items)
-
-    await db.carts.update_one(
-        {"user_id": current_user.id},
-        {"$set": {
-            "items": cart_items,
-            "total_amount": total,
-            "updated_at": datetime.now(timezone.utc)
-        }}
-    )
-
+    total = await add_cart_line(current_user.id, product_id, quantity, product["price"])
     return {"message": "Item added to cart", "total_amount": total}
 
 
 @api_router.delete("/cart/remove/{product_id}")
 async def remove_from_cart(product_id: str, current_user: User = Depends(get_current_user)):
-    cart = await db.carts.find_one({"user_id": current_user.id})
-    if not cart:
+    total = await remove_cart_line(current_user.id, product_id)
+    if total is None:
         raise HTTPException(status_code=404, detail="Cart not found")
-
-    cart_items = [
-        item for item in cart.get("items", []) if item["product_id"] != product_id
-    ]
-    total = sum(item["quantity"] * item["price"] for item in cart_items)
-
-    await db.carts.update_one(
-        {"user_id": current_user.id},
-        {"$set": {
-            "items": cart_items,
-            "total_amount": total,
-            "updated_at": datetime.now(timezone.utc)
-        }}
-    )
-
     return {"message": "Item removed from cart", "total_amount": total}
 
 
@@ -1727,11 +2133,7 @@ async def _wishlist_products(product_ids: List[str]) -> List[Dict[str, Any]]:
 
     # A product pulled back to staging stops being shown, the same as one that
     # was deleted — the wishlist keeps the id, so it reappears if it goes live.
-    docs = await db.products.find({"id": {"$in": product_ids}, **LIVE_ONLY}).to_list(length=None)
-    by_id = {}
-    for doc in docs:
-        doc.pop("_id", None)
-        by_id[doc["id"]] = doc
+    by_id = await live_docs(product_ids)
 
     # Preserve the order the user added them in.
     return [by_id[pid] for pid in product_ids if pid in by_id]
@@ -1789,6 +2191,30 @@ async def remove_from_wishlist(
 # Orders
 # ---------------------------------------------------------------------------
 
+# What checkout reads of a product: the fields _storefront_ready judges by,
+# and the ones the order records. Not the images, variants or price breakdown.
+_CHECKOUT_FIELDS = {
+    **_STOREFRONT_INPUTS,
+    "in_stock": 1, "external_id": 1, "sku": 1,
+    "storefront_ready": 1, "storefront_version": 1,
+}
+
+
+async def checkout_docs(product_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    id -> live product for every line of a basket, in one projected $in.
+
+    Straight from the database and not through the catalogue cache: checkout
+    takes money on what it reads, so it must not be a TTL behind another
+    worker's write — and going through the cache only to refresh it cost a
+    round trip to its backend on top of the read.
+    """
+    ids = list(dict.fromkeys(product_ids))
+    docs = await db.products.find(
+        {"id": {"$in": ids}, **LIVE_ONLY}, _CHECKOUT_FIELDS).to_list(length=None)
+    return {doc["id"]: doc for doc in docs}
+
+
 @api_router.post("/orders", response_model=Order)
 async def create_order(
     order_data: OrderCreate,
@@ -1819,7 +2245,7 @@ async def create_order(
     # An order placed by a method the shop does not offer is an order nobody
     # can pay: the customer is told it went through and then hears nothing,
     # because there is no account for the money to arrive in.
-    methods = await available_payment_methods()
+    methods = await available_payment_methods(await payment_config_snapshot())
     if not methods:
         raise HTTPException(
             status_code=503,
@@ -1845,9 +2271,10 @@ async def create_order(
     # from sale, sold out, or repriced by the supplier sync still went through
     # at whatever the cart happened to remember.
     items, total = [], 0.0
+    in_cart = await checkout_docs([line["product_id"] for line in cart["items"]])
     for line in cart["items"]:
-        product = await live_product(line["product_id"])
-        if not product:
+        product = in_cart.get(line["product_id"])
+        if not product or not _storefront_ready(product):
             raise HTTPException(
                 status_code=409,
                 detail=f"A product in your cart is no longer available: {line['product_id']}",
@@ -2170,6 +2597,8 @@ async def iyzico_callback(request: Request, background_tasks: BackgroundTasks):
         "payment_error": None,
     }})
     logger.info("Order %s paid via iyzico (%s)", order_id, result.get("payment_id"))
+    await sales_rollup.order_changed(db, order.get("created_at"))
+    background_tasks.add_task(_count_paid_order, order_id)
 
     # Paid → bought, immediately, with no human in between. In the background
     # so the customer's redirect is instant: CJ's variant lookups and freight
@@ -2713,6 +3142,8 @@ async def confirm_order_payment(
         }
 
     await db.orders.update_one({"id": order_id}, {"$set": updates})
+    await sales_rollup.order_changed(db, order.get("created_at"))
+    await (_count_paid_order if payload.paid else _uncount_paid_order)(order_id)
     return {"success": True, "id": order_id, **updates}
 
 
@@ -2781,7 +3212,10 @@ async def admin_toggle_admin(user_id: str, admin: User = Depends(get_super_admin
         raise HTTPException(status_code=400, detail="Cannot change a super admin's role")
 
     new_value = not user.get("is_admin", False)
-    await db.users.update_one({"id": user_id}, {"$set": {"is_admin": new_value}})
+    # A new auth_version ends the sessions signed in under the old role.
+    await db.users.update_one({"id": user_id}, {"$set": {"is_admin": new_value},
+                                                "$inc": {"auth_version": 1}})
+    forget_user(user_id)
     return {"success": True, "user_id": user_id, "is_admin": new_value}
 
 
@@ -2798,8 +3232,10 @@ async def admin_change_user_password(
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
 
-    hashed = bcrypt.hashpw(payload.new_password.encode(), bcrypt.gensalt()).decode()
-    await db.users.update_one({"id": user_id}, {"$set": {"password": hashed}})
+    hashed = await hash_password(payload.new_password)
+    await db.users.update_one({"id": user_id}, {"$set": {"password": hashed},
+                                                "$inc": {"auth_version": 1}})
+    forget_user(user_id)
 
     # Force re-authentication everywhere this user was signed in.
     tokens = await db.refresh_tokens.find({"user_id": user_id}).to_list(length=None)
@@ -2824,6 +3260,7 @@ async def admin_delete_user(user_id: str, admin: User = Depends(get_super_admin_
         raise HTTPException(status_code=400, detail="Cannot delete your own account")
 
     await db.users.delete_one({"id": user_id})
+    forget_user(user_id)
     await db.carts.delete_many({"user_id": user_id})
     await db.wishlists.delete_many({"user_id": user_id})
     return {"success": True, "message": "User deleted"}
@@ -2860,7 +3297,7 @@ async def super_admin_change_role(
     caller = await db.users.find_one({"id": admin.id})
     if not payload.current_password or not caller or not caller.get("password"):
         raise HTTPException(status_code=400, detail="Current password is required")
-    if not bcrypt.checkpw(payload.current_password.encode(), caller["password"].encode()):
+    if not await verify_password(payload.current_password, caller["password"]):
         raise HTTPException(status_code=401, detail="Incorrect password")
 
     target = await db.users.find_one({"id": payload.user_id})
@@ -2872,7 +3309,8 @@ async def super_admin_change_role(
     await db.users.update_one({"id": payload.user_id}, {"$set": {
         "is_admin": payload.new_role in ("admin", "super_admin"),
         "is_super_admin": payload.new_role == "super_admin",
-    }})
+    }, "$inc": {"auth_version": 1}})
+    forget_user(payload.user_id)
 
     return {"success": True, "user_id": payload.user_id, "new_role": payload.new_role}
 
@@ -2918,6 +3356,8 @@ async def _put_singleton(doc_id: str, payload: Dict[str, Any]) -> Dict[str, Any]
     payload = {k: v for k, v in payload.items() if k != "_id"}
     payload["updated_at"] = datetime.now(timezone.utc).isoformat()
     await db.site_config.update_one({"_id": doc_id}, {"$set": payload}, upsert=True)
+    if doc_id == PAYMENT_DOC_ID:
+        forget_payment_config()
     return payload
 
 
@@ -2984,11 +3424,42 @@ def _bank_transfer_option(cfg: Dict[str, Any]) -> Optional[Dict[str, Any]]:
     }
 
 
-async def available_payment_methods() -> List[Dict[str, Any]]:
-    """Every method a customer can actually use right now."""
-    from services import iyzico_client
+# Seconds checkout trusts its copy of the payment document. Saving the
+# payment settings drops this worker's copy at once; another worker's copy
+# is at most this old. /payment-methods and the admin screen read the
+# document itself.
+PAYMENT_CONFIG_TTL = float(os.getenv("PAYMENT_CONFIG_TTL", "30"))
 
+# (database, time.monotonic() when read, the document) — bound to the
+# database it was read from, so a copy never outlives a switch of database.
+_payment_config: Optional[Tuple[Any, float, Dict[str, Any]]] = None
+
+
+async def payment_config_snapshot() -> Dict[str, Any]:
+    """The payment document, read at most once per PAYMENT_CONFIG_TTL."""
+    global _payment_config
+    kept = _payment_config
+    if kept and kept[0] is db and time.monotonic() - kept[1] < PAYMENT_CONFIG_TTL:
+        return kept[2]
     cfg = await _get_singleton(PAYMENT_DOC_ID)
+    _payment_config = (db, time.monotonic(), cfg)
+    return cfg
+
+
+def forget_payment_config() -> None:
+    global _payment_config
+    _payment_config = None
+
+
+async def available_payment_methods(cfg: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+    """
+    Every method a customer can actually use right now — from `cfg`, the
+    payment document, when the caller already holds it.
+    """
+    from services import iyzico_client
+
+    if cfg is None:
+        cfg = await _get_singleton(PAYMENT_DOC_ID)
     methods: List[Dict[str, Any]] = []
 
     # A card, on the site, from any country — what every shop in the world
@@ -3120,13 +3591,16 @@ async def admin_update_order_status(
     payload: OrderStatusUpdate,
     admin: User = Depends(get_admin_user)
 ):
-    result = await db.orders.update_one(
+    order = await db.orders.find_one_and_update(
         {"id": order_id},
         {"$set": {"status": payload.status.value,
-                  "updated_at": datetime.now(timezone.utc).isoformat()}}
+                  "updated_at": datetime.now(timezone.utc).isoformat()}},
+        projection={"_id": 0, "created_at": 1},
     )
-    if result.matched_count == 0:
+    if order is None:
         raise HTTPException(status_code=404, detail="Order not found")
+    # A cancellation takes the order's money out of the day it was placed on.
+    await sales_rollup.order_changed(db, order.get("created_at"))
 
     return {"success": True, "id": order_id, "status": payload.status.value}
 
@@ -3160,6 +3634,7 @@ async def admin_delete_order(order_id: str, admin: User = Depends(get_admin_user
             detail="A paid order must be cancelled before its record can be deleted.",
         )
     await db.orders.delete_one({"id": order_id})
+    await sales_rollup.order_changed(db, order.get("created_at"))
     return {"success": True, "id": order_id}
 
 
@@ -3500,63 +3975,53 @@ async def admin_analytics(
     range: str = Query("30d", description="7d | 30d | 90d | all"),
     admin: User = Depends(get_admin_user)
 ):
-    """Store metrics over a window, computed from orders/users/products."""
-    days = {"1d": 1, "7d": 7, "30d": 30, "90d": 90}.get(range)
-    since = datetime.now(timezone.utc) - timedelta(days=days) if days else None
-
-    orders = await db.orders.find({}).to_list(length=None)
+    """
+    Store metrics over a window, computed from orders/users/products.
 
-    def in_window(order) -> bool:
-        if since is None:
-            return True
-        created = order.get("created_at")
-        if isinstance(created, str):
-            try:
-                created = datetime.fromisoformat(created.replace("Z", "+00:00"))
-            except ValueError:
-                return False
-        if not isinstance(created, datetime):
-            return False
-        if created.tzinfo is None:
-            created = created.replace(tzinfo=timezone.utc)
-        return created >= since
+    Windows are whole UTC days: "7d" is today and the six days before it.
+    Closed days are read from the nightly rollup (services/sales_rollup.py);
+    today and anything not yet rolled are summed by MongoDB on the spot, so
+    no order is ever loaded into this process.
+    """
+    days = {"1d": 1, "7d": 7, "30d": 30, "90d": 90}.get(range)
+    today = datetime.now(timezone.utc).date()
+    first = today - timedelta(days=days - 1) if days else None
 
-    windowed = [o for o in orders if in_window(o)]
     # A created order is not revenue. Card and transfer attempts stay visible in
     # the order count, but only confirmed, non-cancelled payments may contribute
-    # to financial metrics or a "best seller" ranking.
-    paid_orders = [
-        o for o in windowed
-        if o.get("payment_status") == "paid" and o.get("status") != "cancelled"
-    ]
-    revenue = sum(o.get("total_amount", 0) or 0 for o in paid_orders)
-
+    # to financial metrics or a "best seller" ranking — the rollup's paid_orders,
+    # revenue and units already hold only those.
+    total_orders = paid_orders = 0
+    revenue = 0.0
     status_counts: Dict[str, int] = {}
-    for o in windowed:
-        key = o.get("status", "pending")
-        status_counts[key] = status_counts.get(key, 0) + 1
-
-    # Best sellers by paid quantity across the window.
     sold: Dict[str, int] = {}
-    for o in paid_orders:
-        for item in o.get("items", []):
-            sold[item["product_id"]] = sold.get(item["product_id"], 0) + item.get("quantity", 0)
-
-    top_products = []
-    for pid, qty in sorted(sold.items(), key=lambda kv: kv[1], reverse=True)[:5]:
-        product = await db.products.find_one({"id": pid})
-        top_products.append({
-            "product_id": pid,
-            "name": product.get("name") if product else "Unknown",
-            "quantity_sold": qty,
-        })
+    for row in await sales_rollup.window(db, first, today):
+        total_orders += row.get("orders", 0)
+        paid_orders += row.get("paid_orders", 0)
+        revenue += row.get("revenue", 0) or 0
+        for key, count in (row.get("orders_by_status") or {}).items():
+            status_counts[key] = status_counts.get(key, 0) + count
+        for line in row.get("units") or []:
+            sold[line["product_id"]] = sold.get(line["product_id"], 0) + line["units"]
+
+    top = sorted(sold.items(), key=lambda kv: kv[1], reverse=True)[:5]
+    names = {
+        p["id"]: p.get("name")
+        for p in await db.products.find(
+            {"id": {"$in": [pid for pid, _ in top]}}, {"_id": 0, "id": 1, "name": 1}
+        ).to_list(None)
+    }
+    top_products = [
+        {"product_id": pid, "name": names.get(pid, "Unknown"), "quantity_sold": qty}
+        for pid, qty in top
+    ]
 
     return {
         "range": range,
         "total_revenue": round(revenue, 2),
-        "total_orders": len(windowed),
-        "paid_orders": len(paid_orders),
-        "average_order_value": round(revenue / len(paid_orders), 2) if paid_orders else 0,
+        "total_orders": total_orders,
+        "paid_orders": paid_orders,
+        "average_order_value": round(revenue / paid_orders, 2) if paid_orders else 0,
         "total_users": await db.users.count_documents({}),
         "total_products": await db.products.count_documents({"staging": {"$ne": True}}),
         "orders_by_status": status_counts,
@@ -3614,7 +4079,7 @@ async def create_first_admin(payload: FirstAdminRequest):
     user = {
         "id": str(uuid.uuid4()),
         "email": payload.email,
-        "password": bcrypt.hashpw(payload.password.encode(), bcrypt.gensalt()).decode(),
+        "password": await hash_password(payload.password),
         "name": payload.name or payload.email.split("@")[0],
         "phone": None,
         "is_admin": True,
@@ -3642,16 +4107,127 @@ class BulkUpdateRequest(BaseModel):
     data: Dict[str, Any]
 
 
-@api_router.get("/admin/products")
-async def admin_list_products(
-    include_staging: bool = False,
-    admin: User = Depends(get_admin_user)
-):
-    """Unlike the storefront listing, this returns raw documents unfiltered by
-    schema validity — the admin needs to see malformed rows in order to fix them."""
-    query = {} if include_staging else {"staging": {"$ne": True}}
-    products = await db.products.find(query).sort("created_at", -1).to_list(length=None)
-    for p in products:
+# The most rows one page of the admin catalogue returns.
+ADMIN_PAGE_MAX = 200
+# At or under this many in stock, a product counts as low on stock.
+LOW_STOCK = 5
+
+# What a card or a row of the admin catalogue shows — `view=list`. Not the
+# descriptions, the gallery past its first image, or whatever else the
+# supplier sent; the editor reads the whole product when it opens.
+_ADMIN_LIST_FIELDS = {
+    "_id": 0, "id": 1, "name": 1, "name_ar": 1, "name_en": 1, "sku": 1, "category": 1,
+    "price": 1, "original_price": 1, "discount_percentage": 1, "supplier_price": 1,
+    "images": {"$slice": 1}, "stock_quantity": 1, "stock": 1, "is_active": 1,
+    "is_featured": 1, "rating": 1, "reviews_count": 1, "material": 1, "material_ar": 1,
+    "material_en": 1, "color": 1, "staging": 1, "source": 1, "imported_from_cj": 1,
+    "created_at": 1, "storefront_overrides": 1, "storefront_issue": 1, "storefront_version": 1,
+}
+
+# The admin catalogue's status menu, as queries.
+_ADMIN_STATUSES: Dict[str, Dict[str, Any]] = {
+    "active": {"is_active": {"$ne": False}},
+    "inactive": {"is_active": False},
+    "featured": {"is_featured": True},
+    # Missing is the model's default of 100, not none. Some importers wrote
+    # the count as `stock` instead; where stock_quantity is absent, that is
+    # the count, as the admin card and the comparison table read it.
+    "low-stock": {"$or": [{"stock_quantity": {"$lte": LOW_STOCK}},
+                          {"stock_quantity": None, "stock": {"$lte": LOW_STOCK}}]},
+}
+
+# Stated in neither language: missing, null, empty or blank.
+_NO_MATERIAL = {field: {"$not": {"$regex": r"\S"}} for field in ("material_ar", "material_en")}
+
+
+_NEWEST = [("created_at", -1), ("id", -1)]
+
+
+async def _newest_page(
+    query: Dict[str, Any],
+    projection: Dict[str, Any],
+    limit: Optional[int],
+    cursor: Optional[str],
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Up to `limit` products of `query`, newest first, after `cursor`; and the
+    cursor for the page after, or None at the end. The storefront's keyset
+    (see _after) on its "newest" order, so a page costs the same at the end
+    of the catalogue as at the start.
+    """
+    if cursor:
+        _, value, product_id = _decode_cursor(cursor)
+        query = {"$and": [query, _after("created_at", -1, value, product_id)]}
+    limit = max(1, min(limit or ADMIN_PAGE_MAX, ADMIN_PAGE_MAX))
+    docs = await db.products.find(query, projection).sort(_NEWEST).limit(limit).to_list(length=None)
+    next_cursor = None
+    if len(docs) == limit:
+        last = docs[-1]
+        next_cursor = _encode_cursor("newest", last.get("created_at"), last.get("id", ""))
+    return docs, next_cursor
+
+
+def _admin_catalogue_query(
+    include_staging: bool,
+    staging: Optional[bool],
+    category: Optional[str],
+    source: Optional[str],
+    status: Optional[str],
+    visibility: Optional[str],
+    missing_material: bool,
+    q: Optional[str],
+) -> Dict[str, Any]:
+    clauses: List[Dict[str, Any]] = []
+    if staging is not None:
+        clauses.append({"staging": True} if staging else {"staging": {"$ne": True}})
+    elif not include_staging:
+        clauses.append({"staging": {"$ne": True}})
+    if category:
+        clauses.append({"category": category})
+    if source:
+        clauses.append({"source": source})
+    if status:
+        if status not in _ADMIN_STATUSES:
+            raise HTTPException(status_code=400,
+                                detail=f"Unknown status; use one of: {', '.join(_ADMIN_STATUSES)}")
+        clauses.append(_ADMIN_STATUSES[status])
+    if visibility:
+        if visibility not in ("visible", "hidden"):
+            raise HTTPException(status_code=400, detail="Unknown visibility; use visible or hidden")
+        verdict = {"storefront_issue": None} if visibility == "visible" \
+            else {"storefront_issue": {"$type": "string"}}
+        # Rows not stamped under these rules come back too, and are judged on
+        # read by _admin_rows.
+        clauses.append({"$or": [{"storefront_version": STOREFRONT_VERSION, **verdict},
+                                {"storefront_version": {"$ne": STOREFRONT_VERSION}}]})
+    if missing_material:
+        clauses.append(_NO_MATERIAL)
+    if q and q.strip():
+        pattern = {"$regex": re.escape(q.strip()), "$options": "i"}
+        clauses.append({"$or": [{field: pattern} for field in ("name", "name_ar", "name_en", "sku")]})
+    return {"$and": clauses} if len(clauses) > 1 else (clauses[0] if clauses else {})
+
+
+async def _admin_rows(
+    docs: List[Dict[str, Any]], visibility: Optional[str], projected: bool,
+) -> List[Dict[str, Any]]:
+    """
+    `docs` as the admin catalogue shows them: displayed, and flagged with
+    whether the storefront will show them, and why not.
+
+    The flag is the stored verdict (see storefront_fields). A row not yet
+    stamped under these rules is judged here — from its Product fields, read
+    in one query when `docs` were read `projected` — and those are the only
+    rows that still pay for a validation at read time.
+    """
+    unstamped = [doc["id"] for doc in docs if not _stamped(doc) and doc.get("id")]
+    judged: Dict[str, Dict[str, Any]] = {}
+    if unstamped and projected:
+        inputs = await db.products.find({"id": {"$in": unstamped}}, _STAMP_INPUTS).to_list(length=None)
+        judged = {doc["id"]: storefront_fields(doc) for doc in inputs}
+
+    rows = []
+    for p in docs:
         p.pop("_id", None)
         # Everything imported before is_active existed has no such key, and the
         # admin catalogue reads a missing key as "inactive" — which is how every
@@ -3659,47 +4235,279 @@ async def admin_list_products(
         # means active, the same rule LIVE_ONLY applies when deciding what
         # shoppers see; state it here rather than leave the UI to guess.
         p.setdefault("is_active", True)
-        _sane_reference_price(p)
-        _readable_name(p)
+        stamp = p if _stamped(p) else judged.get(p.get("id")) or storefront_fields(p)
+        p.update(stamp.get("storefront_overrides") or {})
         # Flag rows the storefront will refuse to render, with the reason, so
         # a product that exists but is invisible to customers is visible here.
-        try:
-            Product(**p)
-            p["storefront_visible"] = True
-            p["storefront_issue"] = None
-        except Exception as e:
-            p["storefront_visible"] = False
-            p["storefront_issue"] = str(e).split("\n")[1].strip() if "\n" in str(e) else str(e)
-    return products
+        p["storefront_issue"] = stamp.get("storefront_issue")
+        p["storefront_visible"] = p["storefront_issue"] is None
+        if visibility and p["storefront_visible"] != (visibility == "visible"):
+            continue
+        rows.append(p)
+    return rows
 
 
-async def _duplicate_product_groups() -> List[List[Dict[str, Any]]]:
+@api_router.get("/admin/products")
+async def admin_list_products(
+    include_staging: bool = False,
+    staging: Optional[bool] = Query(None, description="only staging (true) or only published (false)"),
+    category: Optional[str] = None,
+    source: Optional[str] = None,
+    status: Optional[str] = Query(None, description="active | inactive | featured | low-stock"),
+    visibility: Optional[str] = Query(None, description="visible | hidden — to shoppers"),
+    missing_material: bool = False,
+    q: Optional[str] = Query(None, description="in the names and the SKU"),
+    view: Optional[str] = Query(None, description="list — only what a card shows"),
+    limit: Optional[int] = None,
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    admin: User = Depends(get_admin_user)
+):
+    """Unlike the storefront listing, this returns raw documents unfiltered by
+    schema validity — the admin needs to see malformed rows in order to fix them.
+
+    With `limit` or `cursor` the answer is a page — `{items, next_cursor}` —
+    newest first, read by keyset; without either it is the whole filtered
+    list, as the screen read it before it paged. A page can come back short
+    of `limit` when `visibility` drops rows judged on read; only a null
+    next_cursor means the end.
+    """
+    if view not in (None, "list"):
+        raise HTTPException(status_code=400, detail="Unknown view; use list")
+    query = _admin_catalogue_query(include_staging, staging, category, source, status,
+                                   visibility, missing_material, q)
+    projection = _ADMIN_LIST_FIELDS if view == "list" else {"_id": 0}
+
+    if limit is None and cursor is None:
+        docs = await db.products.find(query, projection).sort(_NEWEST).to_list(length=None)
+        return await _admin_rows(docs, visibility, projected=view == "list")
+
+    docs, next_cursor = await _newest_page(query, projection, limit, cursor)
+    return {"items": await _admin_rows(docs, visibility, projected=view == "list"),
+            "next_cursor": next_cursor}
+
+
+@api_router.get("/admin/products/summary")
+async def admin_products_summary(admin: User = Depends(get_admin_user)):
+    """The admin catalogue's headline counts, over everything published."""
+    published = {"staging": {"$ne": True}}
+    counts = {"total": await db.products.count_documents(published)}
+    for name, key in (("active", "active"), ("featured", "featured"), ("low_stock", "low-stock")):
+        counts[name] = await db.products.count_documents({"$and": [published, _ADMIN_STATUSES[key]]})
+    counts["hidden"] = await db.products.count_documents(
+        {**published, "storefront_version": STOREFRONT_VERSION, "storefront_issue": {"$type": "string"}})
+    return counts
+
+
+# Removed copies handled per round of the dedupe job: one $in read and one
+# bulk_write each for carts and wishlists, then one delete.
+DEDUPE_CHUNK = 1000
+# Groups named in a dedupe report, the rest being counted.
+DEDUPE_REPORT_GROUPS = 100
+# Reads of the carts (or wishlists) still pointing at a chunk's removed
+# copies. A guarded write misses only when the shopper changed that cart
+# between its read and the write; the next read picks it up as it is now.
+DEDUPE_PASSES = 3
+
+
+async def _duplicate_product_groups() -> List[Dict[str, Any]]:
     """
     Products that are the same supplier item living under different ids.
 
     Identity is (source, external_id) and nothing looser: name-matching would
     be guesswork, and this shop does not guess. Products with no external_id —
     ones the owner typed in by hand — can never be called duplicates here.
+
+    One $group in the database, so what comes back is only the groups with
+    more than one copy: each its key, a name for the report, and per copy
+    the id and the fields the survivor is chosen by — never whole products.
+    The copies' fields are $ifNull'd: a copy missing one must still be
+    pushed, and the ranking reads a missing one as false or empty anyway.
     """
-    docs = await db.products.find({"external_id": {"$exists": True}}).to_list(length=None)
-    groups: Dict[Any, List[Dict[str, Any]]] = {}
-    for doc in docs:
-        doc.pop("_id", None)
-        if not doc.get("external_id") or not doc.get("id"):
-            continue
-        key = (doc.get("source") or "", str(doc["external_id"]))
-        groups.setdefault(key, []).append(doc)
-    return [group for group in groups.values() if len(group) > 1]
+    return await db.products.aggregate([
+        {"$match": {"external_id": {"$nin": [None, "", 0, False]}, "id": {"$nin": [None, ""]}}},
+        {"$group": {
+            "_id": {"source": {"$ifNull": ["$source", ""]},
+                    "external_id": {"$toString": "$external_id"}},
+            "count": {"$sum": 1},
+            "name": {"$first": "$name"},
+            "copies": {"$push": {
+                "id": "$id",
+                "staging": {"$ifNull": ["$staging", False]},
+                "created_at": {"$ifNull": ["$created_at", ""]},
+            }},
+        }},
+        {"$match": {"count": {"$gt": 1}}},
+        {"$sort": {"_id.source": 1, "_id.external_id": 1}},
+    ], allowDiskUse=True).to_list(length=None)
 
 
-async def _order_referenced_product_ids() -> set:
-    ids = set()
-    orders = await db.orders.find({}, {"items.product_id": 1}).to_list(length=None)
-    for order in orders:
-        for item in order.get("items") or []:
-            if item.get("product_id"):
-                ids.add(item["product_id"])
-    return ids
+async def _order_referenced_product_ids(product_ids: List[str]) -> set:
+    """Those of `product_ids` an order's items point at."""
+    wanted, found = set(product_ids), set()
+    for start in range(0, len(product_ids), DEDUPE_CHUNK):
+        part = product_ids[start:start + DEDUPE_CHUNK]
+        found.update(await db.orders.distinct("items.product_id", {"items.product_id": {"$in": part}}))
+    return found & wanted
+
+
+def _dedupe_plan(groups: List[Dict[str, Any]], referenced: set) -> List[Dict[str, Any]]:
+    """
+    Per group, the copy that survives and the ones that go.
+
+    Which copy survives is not arbitrary:
+      1. one an order's history points at — deleting it would orphan the very
+         records that prove what was sold;
+      2. else a live one over a staging one — the storefront must not blink;
+      3. else the oldest, so running this twice picks the same survivor.
+    """
+    def keep_rank(copy: Dict[str, Any]):
+        return (
+            0 if copy["id"] in referenced else 1,
+            0 if not copy.get("staging") else 1,
+            str(copy.get("created_at") or ""),
+            str(copy["id"]),
+        )
+
+    plan = []
+    for group in groups:
+        keeper = min(group["copies"], key=keep_rank)["id"]
+        plan.append({
+            "source": group["_id"]["source"] or None,
+            "external_id": group["_id"]["external_id"],
+            "name": group.get("name"),
+            "keep": keeper,
+            "remove": sorted(copy["id"] for copy in group["copies"] if copy["id"] != keeper),
+        })
+    return plan
+
+
+def _repointed_cart(items: List[Dict[str, Any]], survivor: Dict[str, str]) -> List[Dict[str, Any]]:
+    """`items` with removed copies swapped for their survivor, lines merged."""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for item in items:
+        pid = survivor.get(item.get("product_id"), item.get("product_id"))
+        if pid in merged:
+            merged[pid]["quantity"] = (int(merged[pid].get("quantity") or 1)
+                                       + int(item.get("quantity") or 1))
+        else:
+            merged[pid] = {**item, "product_id": pid}
+    return list(merged.values())
+
+
+def _repointed_wishlist(product_ids: List[str], survivor: Dict[str, str]) -> List[str]:
+    """`product_ids` with removed copies swapped for their survivor, in order, once each."""
+    return list(dict.fromkeys(survivor.get(pid, pid) for pid in product_ids))
+
+
+async def _repoint(losers: List[str], survivor: Dict[str, str]) -> Tuple[int, int]:
+    """
+    Point every cart and wishlist holding one of `losers` at its survivor.
+    Returns how many carts and wishlists were rewritten.
+
+    A read of the ones holding any of them, and a bulk_write of the
+    rewrites; each write is guarded on the list as it was read, so a line a
+    shopper added meanwhile is never written over — that cart is read again.
+    A cart's total is recomputed with its lines, which merging can change.
+    """
+    carts = wishlists = 0
+    for _ in range(DEDUPE_PASSES):
+        docs = await db.carts.find({"items.product_id": {"$in": losers}},
+                                   {"_id": 1, "items": 1}).to_list(length=None)
+        if not docs:
+            break
+        ops = []
+        for doc in docs:
+            items = _repointed_cart(doc.get("items") or [], survivor)
+            ops.append(UpdateOne({"_id": doc["_id"], "items": doc.get("items")}, {"$set": {
+                "items": items,
+                "total_amount": sum(int(i.get("quantity") or 1) * float(i.get("price") or 0)
+                                    for i in items),
+            }}))
+        carts += (await bulk_write(db.carts, ops))["modified"]
+    for _ in range(DEDUPE_PASSES):
+        docs = await db.wishlists.find({"product_ids": {"$in": losers}},
+                                       {"_id": 1, "product_ids": 1}).to_list(length=None)
+        if not docs:
+            break
+        wishlists += (await bulk_write(db.wishlists, [
+            UpdateOne({"_id": doc["_id"], "product_ids": doc.get("product_ids")},
+                      {"$set": {"product_ids": _repointed_wishlist(doc.get("product_ids") or [],
+                                                                    survivor)}})
+            for doc in docs
+        ]))["modified"]
+    return carts, wishlists
+
+
+async def _dedupe_job(job_id: str, dry_run: bool, triggered_by: str) -> None:
+    """
+    Collapse each group of copies down to one product — or, as a dry run,
+    say which would go and what points at them, and write nothing.
+
+    Carts and wishlists pointing at a removed copy are re-pointed at the
+    survivor: the product is still on sale, and a checkout that answers
+    "no longer available" about it would be a lie. DEDUPE_CHUNK removed
+    copies at a time: re-point, then delete, so a run cut short leaves
+    nothing pointing at a product that is gone. Whatever was added to a cart
+    between a chunk's re-pointing and its delete is re-pointed by a last
+    sweep over every removed copy.
+    """
+    jobs = ImportJobManager(db)
+    started = time.monotonic()
+    try:
+        groups = await _duplicate_product_groups()
+        candidates = [copy["id"] for group in groups for copy in group["copies"]]
+        plan = _dedupe_plan(groups, await _order_referenced_product_ids(candidates))
+        survivor = {loser: group["keep"] for group in plan for loser in group["remove"]}
+        losers = list(survivor)
+        counts = {"removed": 0, "carts_repointed": 0, "wishlists_repointed": 0}
+
+        async def progress(processed: int) -> None:
+            await jobs.update_job_status(job_id, "running", progress={
+                "total": len(losers), "processed": processed, "imported": counts["removed"],
+                "failed": 0,
+                "percent": min(100, round(processed * 100 / len(losers))) if losers else 100})
+
+        await progress(0)
+        for start in range(0, len(losers), DEDUPE_CHUNK):
+            part = losers[start:start + DEDUPE_CHUNK]
+            if dry_run:
+                counts["carts_repointed"] += await db.carts.count_documents(
+                    {"items.product_id": {"$in": part}})
+                counts["wishlists_repointed"] += await db.wishlists.count_documents(
+                    {"product_ids": {"$in": part}})
+            else:
+                carts, wishlists = await _repoint(part, survivor)
+                counts["carts_repointed"] += carts
+                counts["wishlists_repointed"] += wishlists
+                counts["removed"] += (await db.products.delete_many({"id": {"$in": part}})).deleted_count
+                catalogue_changed(part)
+            await progress(start + len(part))
+        if losers and not dry_run:
+            for start in range(0, len(losers), DEDUPE_CHUNK):
+                carts, wishlists = await _repoint(losers[start:start + DEDUPE_CHUNK], survivor)
+                counts["carts_repointed"] += carts
+                counts["wishlists_repointed"] += wishlists
+
+        duration = time.monotonic() - started
+        await jobs.update_job_status(job_id, "completed", progress={
+            "total": len(losers), "processed": len(losers), "imported": counts["removed"],
+            "failed": 0, "percent": 100,
+        }, result={
+            "dry_run": dry_run,
+            "groups": len(plan),
+            # What would go, on a dry run; what went, otherwise.
+            "removed": len(losers) if dry_run else counts["removed"],
+            "carts_repointed": counts["carts_repointed"],
+            "wishlists_repointed": counts["wishlists_repointed"],
+            "group_list": plan[:DEDUPE_REPORT_GROUPS],
+            "duration_seconds": round(duration, 2),
+        })
+        if counts["removed"]:
+            logger.info(f"🧹 {triggered_by} removed {counts['removed']} duplicate products "
+                        f"in {duration:.1f}s")
+    except Exception as e:
+        logger.error(f"❌ Dedupe {job_id} failed: {e}")
+        await jobs.update_job_status(job_id, "failed", error=str(e))
 
 
 @api_router.get("/admin/products/duplicates")
@@ -3715,76 +4523,35 @@ async def admin_find_duplicate_products(admin: User = Depends(get_admin_user)):
     groups = await _duplicate_product_groups()
     return {
         "groups": [{
-            "source": group[0].get("source"),
-            "external_id": group[0].get("external_id"),
-            "name": group[0].get("name"),
-            "count": len(group),
+            "source": group["_id"]["source"] or None,
+            "external_id": group["_id"]["external_id"],
+            "name": group.get("name"),
+            "count": group["count"],
         } for group in groups],
-        "duplicates": sum(len(group) - 1 for group in groups),
+        "duplicates": sum(group["count"] - 1 for group in groups),
     }
 
 
 @api_router.post("/admin/products/dedupe")
-async def admin_dedupe_products(admin: User = Depends(get_admin_user)):
+async def admin_dedupe_products(
+    background_tasks: BackgroundTasks,
+    dry_run: bool = False,
+    admin: User = Depends(get_admin_user),
+):
     """
-    Collapse each group of copies down to one product.
-
-    Which copy survives is not arbitrary:
-      1. one an order's history points at — deleting it would orphan the very
-         records that prove what was sold;
-      2. else a live one over a staging one — the storefront must not blink;
-      3. else the oldest, so running this twice picks the same survivor.
+    Collapse each group of copies down to one product; see _dedupe_job.
 
-    Carts and wishlists pointing at a removed copy are re-pointed at the
-    survivor: the product is still on sale, and a checkout that answers
-    "no longer available" about it would be a lie.
+    Runs in the background: it used to hold every product with a supplier id
+    and every order in memory, and rewrite carts one at a time, inside this
+    request. Poll /imports/{jobId}/status, whose `result` holds the report.
+    With `dry_run` the report says what would go, and nothing is written.
     """
-    groups = await _duplicate_product_groups()
-    referenced = await _order_referenced_product_ids()
-
-    def keep_rank(doc: Dict[str, Any]):
-        return (
-            0 if doc["id"] in referenced else 1,
-            0 if not doc.get("staging") else 1,
-            str(doc.get("created_at") or ""),
-            str(doc["id"]),
-        )
-
-    removed_ids: List[str] = []
-    for group in groups:
-        keeper = sorted(group, key=keep_rank)[0]
-        losers = [doc["id"] for doc in group if doc["id"] != keeper["id"]]
-        removed_ids.extend(losers)
-
-        carts = await db.carts.find({"items.product_id": {"$in": losers}}).to_list(length=None)
-        for cart in carts:
-            merged: Dict[str, Dict[str, Any]] = {}
-            for item in cart.get("items") or []:
-                pid = keeper["id"] if item.get("product_id") in losers else item.get("product_id")
-                if pid in merged:
-                    merged[pid]["quantity"] = (int(merged[pid].get("quantity") or 1)
-                                               + int(item.get("quantity") or 1))
-                else:
-                    merged[pid] = {**item, "product_id": pid}
-            await db.carts.update_one(
-                {"user_id": cart["user_id"]}, {"$set": {"items": list(merged.values())}})
-
-        wishlists = await db.wishlists.find({"product_ids": {"$in": losers}}).to_list(length=None)
-        for wishlist in wishlists:
-            pointed = [keeper["id"] if pid in losers else pid
-                       for pid in wishlist.get("product_ids") or []]
-            deduped: List[str] = []
-            for pid in pointed:
-                if pid not in deduped:
-                    deduped.append(pid)
-            await db.wishlists.update_one(
-                {"user_id": wishlist["user_id"]}, {"$set": {"product_ids": deduped}})
-
-    if removed_ids:
-        await db.products.delete_many({"id": {"$in": removed_ids}})
-        logger.info(f"🧹 {admin.email} removed {len(removed_ids)} duplicate products")
-
-    return {"success": True, "groups": len(groups), "removed": len(removed_ids)}
+    job_id = await ImportJobManager(db).create_job(
+        job_type="dedupe", supplier="catalogue",
+        params={"triggered_by": admin.email, "dry_run": dry_run}, user_id=admin.id,
+    )
+    background_tasks.add_task(_dedupe_job, job_id, dry_run, admin.email)
+    return {"success": True, "jobId": job_id, "dry_run": dry_run}
 
 
 @api_router.post("/admin/products/bulk-delete")
@@ -3796,6 +4563,7 @@ async def admin_bulk_delete_products(
         raise HTTPException(status_code=400, detail="No product ids provided")
 
     result = await db.products.delete_many({"id": {"$in": payload.ids}})
+    catalogue_changed(payload.ids)
     logger.info(f"🗑️  {admin.email} bulk-deleted {result.deleted_count} products")
     return {"success": True, "deleted": result.deleted_count}
 
@@ -3815,30 +4583,52 @@ async def admin_bulk_update_products(
 
     updates["updated_at"] = datetime.now(timezone.utc).isoformat()
     result = await db.products.update_many({"id": {"$in": payload.ids}}, {"$set": updates})
+    await catalogue_written(payload.ids)
     return {"success": True, "updated": result.modified_count}
 
 
-def _as_supplier_shape(doc: Dict[str, Any]) -> Dict[str, Any]:
-    """Adapt a stored product document to the import gate's field names, so
-    one vocabulary decides what belongs to the shop — at import and here."""
-    return {
-        "productNameEn": doc.get("name") or doc.get("name_en") or "",
-        "productName": doc.get("name_ar") or "",
-        "categoryName": doc.get("supplier_category") or "",
-    }
+# What a row of the off-niche screen shows, and what judging it reads.
+_OFF_NICHE_FIELDS = {
+    "_id": 0, "id": 1, "name": 1, "name_en": 1, "name_ar": 1, "price": 1, "category": 1,
+    "supplier_category": 1, "staging": 1, "images": {"$slice": 1}, "created_at": 1,
+    "off_niche": 1, "off_niche_version": 1,
+}
 
 
 @api_router.get("/admin/products/off-niche")
-async def list_off_niche_products(admin: User = Depends(get_admin_user)):
+async def list_off_niche_products(
+    limit: Optional[int] = None,
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    admin: User = Depends(get_admin_user),
+):
     """
     Products that do not look like adornment — clothes, shoes, home decor —
     whether live or still in staging. Earlier imports had no gate, so dresses
     and dried-flower bouquets entered the shop dressed as «أطقم»; this is the
     broom that finds them for the owner to confirm and sweep.
+
+    The verdict is the stored one (see storefront_fields), so this is an
+    indexed query rather than the whole catalogue read and judged on every
+    visit. A row not yet judged under the current vocabularies comes back
+    too and is judged here, until the backfill reaches it.
+
+    With `limit` or `cursor` the answer is a page — `{items, next_cursor}` —
+    newest first; a page can come back short when rows judged here turn out
+    to belong. Without either it is the whole list.
     """
-    docs = await db.products.find({}).to_list(100000)
-    suspects = [d for d in docs if not looks_like_adornment(_as_supplier_shape(d))]
-    return [{
+    query = {"$or": [{"off_niche": True, "off_niche_version": ADORNMENT_VERSION},
+                     {"off_niche_version": {"$ne": ADORNMENT_VERSION}}]}
+    if limit is None and cursor is None:
+        docs = await db.products.find(query, _OFF_NICHE_FIELDS).sort(_NEWEST).to_list(length=None)
+        next_cursor = None
+    else:
+        docs, next_cursor = await _newest_page(query, _OFF_NICHE_FIELDS, limit, cursor)
+
+    suspects = [d for d in docs if (
+        d.get("off_niche") if d.get("off_niche_version") == ADORNMENT_VERSION
+        else not looks_like_adornment(as_supplier_shape(d))
+    )]
+    rows = [{
         "id": d["id"],
         "name": d.get("name", ""),
         "name_ar": d.get("name_ar", ""),
@@ -3848,25 +4638,33 @@ async def list_off_niche_products(admin: User = Depends(get_admin_user)):
         "staging": bool(d.get("staging")),
         "image": (d.get("images") or [None])[0],
     } for d in suspects]
+    if limit is None and cursor is None:
+        return rows
+    return {"items": rows, "next_cursor": next_cursor}
 
 
 @api_router.post("/admin/products/off-niche/purge")
 async def purge_off_niche_products(data: Dict[str, Any], admin: User = Depends(get_admin_user)):
     """Delete the confirmed intruders — and only ids that STILL look
     off-niche right now, so a stale list in a forgotten tab cannot delete an
-    innocent product."""
+    innocent product. Judged afresh rather than from the stored verdict, and
+    only the submitted ids are read to do it."""
     ids = [str(x) for x in (data.get("ids") or [])]
     if not ids:
         raise HTTPException(status_code=400, detail="No product ids provided")
 
-    docs = await db.products.find({"id": {"$in": ids}}).to_list(100000)
-    confirmed = [d["id"] for d in docs if not looks_like_adornment(_as_supplier_shape(d))]
+    docs = await db.products.find(
+        {"id": {"$in": ids}},
+        {"_id": 0, "id": 1, "name": 1, "name_en": 1, "name_ar": 1, "supplier_category": 1},
+    ).to_list(length=None)
+    confirmed = [d["id"] for d in docs if not looks_like_adornment(as_supplier_shape(d))]
     refused = sorted(set(ids) - set(confirmed))
 
     deleted = 0
     if confirmed:
         result = await db.products.delete_many({"id": {"$in": confirmed}})
         deleted = result.deleted_count
+        catalogue_changed(confirmed)
 
     return {"deleted": deleted, "refused": refused}
 
@@ -3900,171 +4698,193 @@ async def count_untranslated_products(admin: User = Depends(get_admin_user)):
     }
 
 
-def states_unbacked_claim(*values: Optional[str]) -> bool:
-    """A stone or a metal this shop cannot vouch for, in any of these strings."""
-    return states_unnameable_stone(*values) or states_retired_metal(*values)
-
-
-def unnameable_stone_corrections(doc: Dict[str, Any]) -> Dict[str, Any]:
-    """
-    Strip a material claim this shop cannot stand behind, wherever it is stored.
-
-    This exists because of a real deception that reached real customers. The
-    shop sold «خاتم لامع فاخر مرصّع بالألماس» — a ring set with diamonds — for
-    fifty-four dollars, with «الخامة: الماس» printed under it, and a pearl ring
-    for thirty-seven. The supplier pays a few dollars for those pieces. There
-    is no diamond and no pearl in them, and the shop said there was, in
-    writing, on the page where the customer presses buy.
-
-    Correcting the composer is not enough on its own: the sentences are already
-    written into the database, and the gentle backfill beside this one only
-    fills fields that are empty. This one overwrites — it has to — and it does
-    so only for products that came from the supplier, because a name the owner
-    wrote himself about goods he has held is his to stand behind, not mine to
-    rewrite. Those are reported instead.
-    """
-    english = sanitise_supplier_text(doc.get("name") or doc.get("name_en") or "")
-    english_description = sanitise_supplier_text(doc.get("description") or "")
-    updates: Dict[str, Any] = {}
-
-    for field, value in (("name", doc.get("name")), ("name_en", doc.get("name_en")),
-                         ("description", doc.get("description"))):
-        if value and states_unbacked_claim(value):
-            cleaned = sanitise_supplier_text(value)
-            if cleaned and cleaned != value:
-                updates[field] = cleaned
-
-    if states_unbacked_claim(doc.get("name_ar")):
-        # Recomposed from the cleaned English, not patched: removing a phrase
-        # from Arabic by hand leaves «خاتم لامع فاخر مرصّع ب» behind.
-        updates["name_ar"] = translate_title(english)
-
-    if states_unbacked_claim(doc.get("description_ar")):
-        updates["description_ar"] = translate_description(english, english_description)
-
-    if states_unbacked_claim(doc.get("description_en")):
-        updates["description_en"] = describe_in_english(english, english_description)
-
-    if states_unbacked_claim(doc.get("material_ar"), doc.get("material_en")):
-        material = material_of(english, english_description)
-        updates["material_ar"] = material["ar"] if material else None
-        updates["material_en"] = material["en"] if material else None
-
-    # A recomposition that comes back empty is still a correction: no name is
-    # better than a false one, and the storefront falls back to the English.
-    return {k: v for k, v in updates.items() if k not in ("name",) or v}
+# Products read, reviewed and written per round of the translate job.
+TRANSLATE_CHUNK = 500
+# Report rows returned at most per page of /admin/products/translate/{job_id}/report.
+TRANSLATE_REPORT_PAGE = 100
+# A translate job writes its progress after every chunk. One silent for this
+# long died with its worker: it no longer blocks a new run, and is marked
+# failed so its report can go.
+TRANSLATE_STALE_AFTER = timedelta(minutes=10)
+# What the job names for the owner, by the review() flag that puts a product in it.
+_TRANSLATE_REPORTS = {
+    "unreadable": "unreadable",
+    "without_material": "without_material",
+    "owner_written_claims": "owner_written_claim",
+}
 
 
-def catalogue_language_updates(doc: Dict[str, Any]) -> Dict[str, Any]:
+async def _translate_job(job_id: str) -> None:
     """
-    What a product document is still missing in either language.
+    Give the whole catalogue its Arabic and its English specification.
 
-    One function because there are two callers — the admin's button and the
-    boot-time pass — and they were separate copies of the same loop. The copies
-    had already begun to differ, and the next field added to one of them would
-    have been missing from the other.
-
-    Nothing here overwrites. A field the owner filled in himself is left as he
-    wrote it, and running this twice changes nothing the second time.
+    TRANSLATE_CHUNK products at a time: one keyset-paged read of the fields
+    the rules read, review_many() over the chunk in worker processes, one
+    bulk_write of the products that changed, and the chunk's report rows
+    appended to translation_reports. The same rules as the boot pass — see
+    services/catalogue_text.py — so a second press writes nothing.
     """
-    english = doc.get("name") or doc.get("name_en") or ""
-    english_description = doc.get("description") or ""
-    updates: Dict[str, Any] = {}
-
-    if looks_untranslated(doc.get("name_ar")):
-        arabic_name = translate_title(english)
-        if arabic_name:
-            updates["name_ar"] = arabic_name
-
-    if looks_untranslated(doc.get("description_ar")):
-        arabic_description = translate_description(english, english_description)
-        if arabic_description:
-            updates["description_ar"] = arabic_description
-
-    # The English specification, and the material on a line of its own. This is
-    # the half iyzico asked for: the Arabic description had been naming the
-    # material since the day it was written, and the English one — the one a
-    # Turkish reviewer opens — named none.
-    if not (doc.get("description_en") or "").strip():
-        english_specification = describe_in_english(english, english_description)
-        if english_specification:
-            updates["description_en"] = english_specification
-
-    if not (doc.get("material_ar") or "").strip() and not (doc.get("material_en") or "").strip():
-        material = material_of(english, english_description)
-        if material:
-            updates["material_ar"] = material["ar"]
-            updates["material_en"] = material["en"]
-
-    return updates
+    jobs = ImportJobManager(db)
+    projection = {**CATALOGUE_TEXT_INPUTS, "_id": 0, "id": 1}
+    started = time.monotonic()
+    counts = {"translated": 0, "corrected_claims": 0,
+              **{kind: 0 for kind in _TRANSLATE_REPORTS}}
+    first_pages: Dict[str, List[Dict[str, Any]]] = {kind: [] for kind in _TRANSLATE_REPORTS}
+    try:
+        # The report belongs to the latest run; an older run's rows would
+        # only name products that have been fixed since. Only finished runs
+        # started before this one: a report someone is still paging through
+        # from a newer run is not this job's to delete.
+        this = await jobs.get_job(job_id) or {}
+        finished = await db.import_jobs.distinct("job_id", {
+            "type": "translate", "status": {"$in": ["completed", "failed"]},
+            "created_at": {"$lt": this.get("created_at") or ""}})
+        if finished:
+            await db.translation_reports.delete_many({"job_id": {"$in": finished}})
+        total = await db.products.count_documents({})
+        processed = 0
+
+        async def progress() -> None:
+            await jobs.update_job_status(job_id, "running", progress={
+                "total": total, "processed": processed, "imported": counts["translated"],
+                "failed": 0,
+                "percent": min(100, round(processed * 100 / total)) if total else 100})
+
+        await progress()
+        last_id = None
+        while True:
+            query = {"id": {"$gt": last_id}} if last_id is not None else {}
+            chunk = await db.products.find(query, projection).sort(
+                "id", 1).limit(TRANSLATE_CHUNK).to_list(TRANSLATE_CHUNK)
+            if not chunk:
+                break
+            last_id = chunk[-1]["id"]
+
+            now = datetime.now(timezone.utc).isoformat()
+            ops: List[UpdateOne] = []
+            changed: List[str] = []
+            rows: List[Dict[str, Any]] = []
+            for verdict in await review_many(chunk):
+                if verdict["updates"]:
+                    ops.append(UpdateOne({"id": verdict["id"]},
+                                         {"$set": {**verdict["updates"], "updated_at": now}}))
+                    changed.append(verdict["id"])
+                counts["corrected_claims"] += verdict["corrected"]
+                for kind, flag in _TRANSLATE_REPORTS.items():
+                    if not verdict[flag]:
+                        continue
+                    item = {"id": verdict["id"], "name": verdict["name"]}
+                    rows.append({"job_id": job_id, "kind": kind, "seq": counts[kind], **item})
+                    if counts[kind] < TRANSLATE_REPORT_PAGE:
+                        first_pages[kind].append(item)
+                    counts[kind] += 1
+
+            if ops:
+                await bulk_write(db.products, ops)
+                await catalogue_written(changed, recheck_text=False)
+                counts["translated"] += len(changed)
+            if rows:
+                await db.translation_reports.insert_many(rows)
+            processed += len(chunk)
+            await progress()
+
+        duration = time.monotonic() - started
+        await jobs.update_job_status(job_id, "completed", progress={
+            "total": total, "processed": processed, "imported": counts["translated"],
+            "failed": 0, "percent": 100,
+        }, result={
+            "translated": counts["translated"],
+            "unreadable": counts["unreadable"],
+            # The lists, not just the counts: these are the ones the owner has
+            # to name himself, and he cannot do that without knowing which they
+            # are. The first page is here; the rest is paged from
+            # /admin/products/translate/{jobId}/report.
+            "unreadable_products": first_pages["unreadable"],
+            "without_material": counts["without_material"],
+            "without_material_products": first_pages["without_material"],
+            # The false claims that were on sale, and the ones only the owner
+            # can settle because he wrote them.
+            "corrected_claims": counts["corrected_claims"],
+            "owner_written_claims": counts["owner_written_claims"],
+            "owner_written_claim_products": first_pages["owner_written_claims"],
+            "duration_seconds": round(duration, 2),
+            "products_per_sec": round(processed / duration, 1) if duration > 0 else None,
+        })
+        logger.info(f"✅ Translate {job_id}: {counts['translated']} of {processed} products "
+                    f"changed in {duration:.1f}s")
+    except Exception as e:
+        logger.error(f"❌ Translate {job_id} failed: {e}")
+        await jobs.update_job_status(job_id, "failed", error=str(e))
 
 
 @api_router.post("/admin/products/translate")
-async def translate_products(admin: User = Depends(get_admin_user)):
+async def translate_products(
+    background_tasks: BackgroundTasks,
+    admin: User = Depends(get_admin_user),
+):
     """
     Give the existing catalogue its Arabic, and its English specification.
 
     Products whose English names it cannot read are reported, not guessed at —
     and so are the ones that name no material, because those are the ones the
     owner has to state himself before a payment provider will look at the shop.
-    """
-    docs = await db.products.find({}).to_list(100000)
 
-    translated, unreadable, without_material = 0, [], []
-    corrected, owner_written_claims = 0, []
-    for doc in docs:
-        english = doc.get("name") or doc.get("name_en") or ""
-        updates: Dict[str, Any] = {}
-
-        claims = states_unbacked_claim(
-            doc.get("name"), doc.get("name_en"), doc.get("name_ar"),
-            doc.get("description"), doc.get("description_ar"),
-            doc.get("description_en"), doc.get("material_ar"), doc.get("material_en"),
-        )
-        if claims:
-            if (doc.get("source") or "").startswith("cj"):
-                updates.update(unnameable_stone_corrections(doc))
-                doc = {**doc, **updates}
-                english = doc.get("name") or doc.get("name_en") or ""
-                corrected += 1
-            else:
-                # Not rewritten: the owner may have held this piece and known
-                # what is in it. Named so he can check it himself.
-                owner_written_claims.append({"id": doc.get("id"), "name": english})
+    Runs in the background: it used to read the whole catalogue inside this
+    request and outlived Cloudflare's ~100 s cut-off on a large one. Poll
+    /imports/{jobId}/status, whose `result` holds the report once the job
+    completes.
 
-        updates.update(catalogue_language_updates(doc))
-
-        if looks_untranslated(doc.get("name_ar")) and "name_ar" not in updates:
-            unreadable.append({"id": doc.get("id"), "name": english})
-
-        if updates:
-            updates["updated_at"] = datetime.now(timezone.utc).isoformat()
-            await db.products.update_one({"id": doc["id"]}, {"$set": updates})
-            translated += 1
-
-        stated = (
-            updates.get("material_ar")
-            or doc.get("material_ar")
-            or updates.get("material_en")
-            or doc.get("material_en")
-        )
-        if not (stated or "").strip():
-            without_material.append({"id": doc.get("id"), "name": english})
-
-    return {
-        "translated": translated,
-        "unreadable": len(unreadable),
-        # The list, not just the count: these are the ones the owner has to
-        # name himself, and he cannot do that without knowing which they are.
-        "unreadable_products": unreadable[:100],
-        "without_material": len(without_material),
-        "without_material_products": without_material[:100],
-        # The false claims that were on sale, and the ones only the owner can
-        # settle because he wrote them.
-        "corrected_claims": corrected,
-        "owner_written_claims": len(owner_written_claims),
-        "owner_written_claim_products": owner_written_claims[:100],
-    }
+    One run at a time: a second press while one is under way is refused with
+    409, rather than two jobs rewriting the same products and each other's
+    report.
+    """
+    jobs = ImportJobManager(db)
+    active = {"type": "translate", "status": {"$in": ["pending", "running"]}}
+    cutoff = (datetime.now(timezone.utc) - TRANSLATE_STALE_AFTER).isoformat()
+    await db.import_jobs.update_many(
+        {**active, "$or": [{"updated_at": {"$lt": cutoff}},
+                           {"updated_at": None, "created_at": {"$lt": cutoff}}]},
+        {"$set": {"status": "failed", "error": "stopped reporting progress",
+                  "completed_at": datetime.now(timezone.utc).isoformat()}})
+
+    # Created first and checked after, so two presses at once cannot both
+    # see nothing running: the earlier of the two runs, the later is refused.
+    job_id = await jobs.create_job(
+        job_type="translate", supplier="catalogue",
+        params={"triggered_by": admin.email}, user_id=admin.id,
+    )
+    first = await db.import_jobs.find(active, {"_id": 0, "job_id": 1}) \
+        .sort([("created_at", 1), ("job_id", 1)]).limit(1).to_list(1)
+    if first and first[0]["job_id"] != job_id:
+        await db.import_jobs.delete_one({"job_id": job_id})
+        raise HTTPException(status_code=409,
+                            detail="A translation is already running; wait for its report")
+    background_tasks.add_task(_translate_job, job_id)
+    return {"success": True, "jobId": job_id}
+
+
+@api_router.get("/admin/products/translate/{job_id}/report")
+async def translate_products_report(
+    job_id: str,
+    kind: str = "unreadable",
+    skip: int = 0,
+    limit: int = TRANSLATE_REPORT_PAGE,
+    admin: User = Depends(get_admin_user),
+):
+    """
+    One page of a translate run's list of products needing the owner:
+    `unreadable`, `without_material` or `owner_written_claims`.
+    """
+    if kind not in _TRANSLATE_REPORTS:
+        raise HTTPException(status_code=400,
+                            detail=f"kind must be one of: {', '.join(_TRANSLATE_REPORTS)}")
+    skip = max(0, skip)
+    limit = max(1, min(limit, TRANSLATE_REPORT_PAGE))
+    query = {"job_id": job_id, "kind": kind}
+    rows = await db.translation_reports.find(query, {"_id": 0, "id": 1, "name": 1}) \
+        .sort("seq", 1).skip(skip).limit(limit).to_list(limit)
+    total = await db.translation_reports.count_documents(query)
+    return {"kind": kind, "total": total, "skip": skip, "limit": limit, "items": rows}
 
 
 @api_router.post("/admin/products/refresh-materials")
@@ -4130,6 +4950,7 @@ async def refresh_materials_from_supplier(
             "supplier_material": declared,
             "updated_at": datetime.now(timezone.utc).isoformat(),
         }})
+        catalogue_changed([doc["id"]])
         filled += 1
 
     return {
@@ -4145,11 +4966,89 @@ async def refresh_materials_from_supplier(
     }
 
 
+async def _storefront_backfill_job(job_id: str) -> None:
+    jobs = ImportJobManager(db)
+    try:
+        total = await db.products.count_documents(_STALE_STAMP)
+        await jobs.update_job_status(job_id, "running", progress={
+            "total": total, "processed": 0, "imported": 0, "failed": 0, "percent": 0})
+
+        async def progress(done: int) -> None:
+            await jobs.update_job_status(job_id, "running", progress={
+                "total": total, "processed": done, "imported": done, "failed": 0,
+                "percent": min(100, round(done * 100 / total)) if total else 100})
+
+        done = await backfill_storefront_fields(on_batch=progress)
+        await jobs.update_job_status(job_id, "completed", progress={
+            "total": total, "processed": done, "imported": done, "failed": 0, "percent": 100,
+        }, result={"stamped": done, "storefront_version": STOREFRONT_VERSION,
+                   "off_niche_version": ADORNMENT_VERSION})
+    except Exception as e:
+        logger.error(f"❌ Storefront backfill {job_id} failed: {e}")
+        await jobs.update_job_status(job_id, "failed", error=str(e))
+
+
+@api_router.post("/admin/products/storefront-backfill")
+async def start_storefront_backfill(
+    background_tasks: BackgroundTasks,
+    admin: User = Depends(get_admin_user),
+):
+    """
+    Re-judge every product whose stored storefront verdict is missing or was
+    reached under older rules. Runs at every boot too; this is for after a
+    bulk change made outside the API. Poll /imports/{jobId}/status.
+    """
+    job_id = await ImportJobManager(db).create_job(
+        job_type="storefront_backfill", supplier="catalogue",
+        params={"triggered_by": admin.email}, user_id=admin.id,
+    )
+    background_tasks.add_task(_storefront_backfill_job, job_id)
+    return {"success": True, "jobId": job_id}
+
+
+@api_router.get("/admin/indexes")
+async def admin_index_report(admin: User = Depends(get_admin_user)):
+    """Declared indexes that are missing or conflict, and present ones nobody declared or uses."""
+    return await indexes.reconcile(db, create=False)
+
+
+@api_router.post("/admin/indexes/reconcile")
+async def admin_reconcile_indexes(admin: User = Depends(get_admin_user)):
+    """Create whatever is missing — after a dedupe, say — and report what is left."""
+    return await indexes.reconcile(db)
+
+
+@api_router.get("/admin/catalogue-cache")
+async def catalogue_cache_stats(admin: User = Depends(get_admin_user)):
+    """Hits, misses and evictions of the catalogue cache, for the ops dashboard."""
+    return catalogue_cache.stats()
+
+
+@api_router.get("/admin/password-hasher")
+async def password_hasher_stats(admin: User = Depends(get_admin_user)):
+    """The bcrypt pool's queue: how long sign-ins wait, and how many were turned away."""
+    return passwords.stats()
+
+
+@api_router.get("/admin/products/{product_id}")
+async def admin_get_product(product_id: str, admin: User = Depends(get_admin_user)):
+    """
+    One product whole, as the editor needs it — the catalogue's list view
+    carries only what a card shows. Declared after every fixed
+    /admin/products/... path, which it would otherwise swallow.
+    """
+    doc = await db.products.find_one({"id": product_id}, {"_id": 0})
+    if not doc:
+        raise HTTPException(status_code=404, detail="Product not found")
+    return (await _admin_rows([doc], None, projected=False))[0]
+
+
 @api_router.delete("/admin/products/{product_id}")
 async def admin_delete_product(product_id: str, admin: User = Depends(get_admin_user)):
     result = await db.products.delete_one({"id": product_id})
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Product not found")
+    catalogue_changed([product_id])
     return {"success": True, "id": product_id}
 
 
@@ -4193,7 +5092,9 @@ async def super_admin_toggle_status(
     new_value = payload.is_active if payload.is_active is not None \
         else not user.get("is_active", True)
 
-    await db.users.update_one({"id": payload.user_id}, {"$set": {"is_active": new_value}})
+    await db.users.update_one({"id": payload.user_id}, {"$set": {"is_active": new_value},
+                                                        "$inc": {"auth_version": 1}})
+    forget_user(payload.user_id)
     return {"success": True, "user_id": payload.user_id, "is_active": new_value}
 
 
@@ -4270,9 +5171,20 @@ async def auto_update_status(admin: User = Depends(get_admin_user)):
         if doc:
             doc.pop("_id", None)
 
+    from services.currency_service import kept_snapshot
+    rates = kept_snapshot()
+
     return {
         "scheduler_running": bool(getattr(app.state, "scheduler_running", False)),
         "last_currency_update": (last_currency or {}).get("updated_at"),
+        # The table this worker converts with, which is not necessarily the
+        # last one stored: each process keeps its own.
+        "currency_snapshot": {
+            "version": rates.version,
+            "source": rates.source,
+            "fetched_at": rates.fetched_at.isoformat(),
+            "currencies": len(rates.usd),
+        } if rates else None,
         "last_product_sync": (last_sync or {}).get("created_at"),
         "total_products": await db.products.count_documents({}),
         "pending_import_jobs": await db.import_jobs.count_documents(
@@ -4294,14 +5206,16 @@ async def auto_update_currency_rates():
     """
     try:
         from services.currency_service import get_currency_service
-        service = get_currency_service(db)
-        rates = await service.get_latest_rates("USD")
-        return {"base": "USD", "rates": rates,
+        # The process's kept snapshot, not a provider call per page load;
+        # see RateSnapshot.
+        snapshot = await get_currency_service(db).snapshot()
+        return {"base": "USD", "rates": snapshot.usd,
                 # "live" or "fallback". The provider failing used to leave the
                 # store with an empty rate table and no sign of it: prices
                 # simply stopped following the currency switcher.
-                "source": getattr(service, "last_source", "unknown"),
-                "updated_at": datetime.now(timezone.utc).isoformat()}
+                "source": snapshot.source,
+                "version": snapshot.version,
+                "updated_at": snapshot.fetched_at.isoformat()}
     except Exception as e:
         logger.error(f"Could not load currency rates: {e}")
         raise HTTPException(status_code=502, detail="Currency service unavailable")
@@ -4375,6 +5289,7 @@ async def auto_update_all_prices(admin: User = Depends(get_admin_user)):
 
     products = await db.products.find({}).to_list(length=None)
     updated = skipped = 0
+    repriced_ids: List[str] = []
 
     for product in products:
         cost = product.get("cost_price") or product.get("source_price")
@@ -4390,9 +5305,11 @@ async def auto_update_all_prices(admin: User = Depends(get_admin_user)):
                           "updated_at": datetime.now(timezone.utc).isoformat()}},
             )
             updated += 1
+            repriced_ids.append(product["id"])
         except Exception as e:
             logger.warning(f"Price update skipped for {product.get('id')}: {e}")
             skipped += 1
+    await catalogue_written(repriced_ids, recheck_text=False)
 
     await db.scheduled_task_logs.insert_one({
         "task": "update-all-prices", "updated": updated, "skipped": skipped,
@@ -4463,10 +5380,42 @@ try:
 except Exception as e:
     logger.error(f"⚠️ Failed to load CJ Admin routes: {e}")
 
+# ---------------------------------------------------------------------------
+# The catalogue's text, brought up to the current rules in the background
+#
+# Every product is stamped with the TRANSLATION_VERSION it was last checked
+# under. Bump it when states_unbacked_claim, unnameable_stone_corrections or
+# catalogue_language_updates change what they decide, and the next boot
+# re-checks the whole catalogue; until then it only reads products added
+# since. See services/migrations.py.
+# ---------------------------------------------------------------------------
+
+TRANSLATION_VERSION = 1
+
+CATALOGUE_TEXT_MIGRATION = migrations.Migration(
+    name="catalogue_text",
+    version=TRANSLATION_VERSION,
+    stamp_field="translation_version",
+    projection=CATALOGUE_TEXT_INPUTS,
+    apply=catalogue_text_updates,
+)
+
+
+async def migrate_catalogue_text() -> Dict[str, Any]:
+    """Run CATALOGUE_TEXT_MIGRATION to the end. Never raises: it logs."""
+    try:
+        return await migrations.run(db, CATALOGUE_TEXT_MIGRATION, on_written=lambda ids: catalogue_written(
+            ids, recheck_text=False))
+    except Exception as e:
+        logger.error(f"⚠️ Could not bring the catalogue's text up to date: {e}")
+        return {"status": "failed", "error": str(e)}
+
+
 @app.on_event("startup")
 async def fill_missing_arabic_names():
     """
-    Give any product without Arabic a name in Arabic, once per boot.
+    Give any product without Arabic a name in Arabic, and take down any
+    material claim the shop cannot back — without anyone pressing a button.
 
     The admin button that does this on demand still exists, but a shop whose
     catalogue is in the wrong language for half its visitors must not stay that
@@ -4474,57 +5423,133 @@ async def fill_missing_arabic_names():
     writes its Arabic; this is what catches the products that predate that, and
     any that a future supplier route forgets.
 
-    Cheap after the first run: it only reads the two name fields, and only
-    writes to products whose Arabic column holds no Arabic — so a name the
-    owner wrote himself is never touched, and a second boot changes nothing.
-    Failure here must never stop the API from starting: the store selling in
-    English beats the store not answering at all.
+    It used to read the whole catalogue and write it back a row at a time
+    before the API would answer. It now starts the migration and returns:
+    the work happens in the background, in batches, and only on products not
+    yet checked at TRANSLATION_VERSION. A name the owner wrote himself is
+    never touched, and failure never stops the API from starting.
     """
+    asyncio.create_task(migrate_catalogue_text())
+
+
+@api_router.get("/admin/migrations")
+async def list_migrations(admin: User = Depends(get_admin_user)):
+    """Every catalogue migration's progress, and what it still has to read."""
+    rows = {row["_id"]: row for row in await db.migrations.find({}).to_list(length=None)}
+    out = []
+    for migration in (CATALOGUE_TEXT_MIGRATION,):
+        row = rows.get(migration.name) or {}
+        out.append({
+            "name": migration.name,
+            "version": migration.version,
+            "status": row.get("status") if row.get("version") == migration.version else "pending",
+            "checkpoint": row.get("checkpoint"),
+            "processed": row.get("processed", 0),
+            "changed": row.get("changed", 0),
+            "started_at": row.get("started_at"),
+            "finished_at": row.get("finished_at"),
+            "error": row.get("error"),
+            "remaining": await db.products.count_documents(migration.pending()),
+        })
+    return out
+
+
+# The scheduler's jobs this server runs: the nightly sales rollup the
+# analytics page reads, and the hourly exchange-rate refresh that swaps in the
+# snapshot every conversion reads (requests refetch only if it falls behind).
+# The supplier sync jobs stay off — the sources they read are still simulated
+# — and so does the nightly price_update: it never ran in production, and
+# turning it on would reprice the catalogue every night.
+SCHEDULED_JOBS = ("daily_sales_rollup", "currency_rates_update")
+# Off for a worker that should leave them to another: RUN_SCHEDULER=false.
+RUN_SCHEDULER = os.getenv("RUN_SCHEDULER", "true").lower() not in ("false", "0", "no")
+
+
+@app.on_event("startup")
+async def start_scheduled_upkeep():
+    """
+    Start the scheduler, and roll the sales up once now.
+
+    Nothing ever started it, so the rollup never ran: /admin/analytics found
+    no rolled day and summed the whole order book live on every request. The
+    jobs are idempotent, so each worker running its own copy costs time, not
+    correctness. The boot rollup catches up the days a stopped server missed,
+    in the background.
+    """
+    from services.scheduler_service import SchedulerService
+    if not RUN_SCHEDULER:
+        return
     try:
-        try:
-            await db.orders.create_index(
-                [("user_id", 1), ("idempotency_key", 1)],
-                unique=True,
-                sparse=True,
-                name="orders_user_id_idempotency_unique",
-            )
-        except Exception:
-            logger.exception("Could not create the non-critical order idempotency index")
+        scheduler = SchedulerService(db)
+        await scheduler.start_scheduler(only=SCHEDULED_JOBS)
+        app.state.scheduler = scheduler
+        app.state.scheduler_running = True
+    except Exception as e:
+        logger.error(f"⚠️ Could not start the scheduler: {e}")
+        return
+    app.state.boot_rollup = asyncio.create_task(scheduler.roll_up_daily_sales())
 
-        docs = await db.products.find(
-            {}, {"id": 1, "name": 1, "name_en": 1, "name_ar": 1, "source": 1,
-                 "description": 1, "description_ar": 1, "description_en": 1,
-                 "material_ar": 1, "material_en": 1}
-        ).to_list(100000)
 
-        filled, corrected = 0, 0
-        for doc in docs:
-            updates: Dict[str, Any] = {}
-            # First, and on every boot: take down any claim of a material the
-            # shop cannot stand behind. This does not wait for the owner to
-            # press a button — a ring advertised as set with diamonds for
-            # fifty-four dollars is on sale to somebody right now.
-            if (doc.get("source") or "").startswith("cj") and states_unbacked_claim(
-                doc.get("name"), doc.get("name_en"), doc.get("name_ar"),
-                doc.get("description"), doc.get("description_ar"),
-                doc.get("description_en"), doc.get("material_ar"), doc.get("material_en"),
-            ):
-                updates.update(unnameable_stone_corrections(doc))
-                doc = {**doc, **updates}
-                corrected += 1
-
-            updates.update(catalogue_language_updates(doc))
-            if updates:
-                await db.products.update_one({"id": doc["id"]}, {"$set": updates})
-                filled += 1
-
-        if corrected:
-            logger.warning(
-                f"🚫 Removed an unverifiable material claim from {corrected} product(s) at startup")
-        if filled:
-            logger.info(f"✅ Names, specifications and materials filled in for {filled} product(s) at startup")
+@app.on_event("shutdown")
+async def stop_scheduled_upkeep():
+    scheduler = getattr(app.state, "scheduler", None)
+    if scheduler is not None:
+        await scheduler.stop_scheduler()
+        app.state.scheduler = None
+        app.state.scheduler_running = False
+
+
+@app.on_event("startup")
+async def create_indexes():
+    """Every index services/indexes.py declares. Never fatal: it logs and reports."""
+    await indexes.reconcile(db)
+
+
+@app.on_event("startup")
+async def stamp_storefront():
+    """
+    Stamp every product the storefront rules have not judged yet, before the
+    app serves its first request.
+
+    A row the backfill has not reached is not listed (see LIVE_ONLY). Run in
+    the background, that made a first deploy serve an empty storefront and
+    search, then a partial one, until the backfill reached the last row.
+    Rows stamped under the same rules before `listed` existed are given it
+    in one update first, so a boot with nothing stale costs that update and
+    one empty find.
+    """
+    async def progress(done: int):
+        logger.info(f"⏳ Storefront verdict stored for {done} product(s) so far")
+
+    try:
+        stamped = await backfill_storefront_fields(on_batch=progress)
+        if stamped:
+            logger.info(f"✅ Storefront verdict stored for {stamped} product(s)")
     except Exception as e:
-        logger.error(f"⚠️ Could not fill Arabic product names at startup: {e}")
+        logger.error(f"⚠️ Could not backfill storefront fields at startup: {e}")
+
+
+@app.on_event("startup")
+async def prepare_storefront():
+    """
+    Build the recommendation tables if this database has never had them, then
+    the search index — in the background, not on a shopper's time. It runs
+    after stamp_storefront, so the index is built from stamped rows.
+
+    Left to the first /api/search, the whole catalogue would be read and
+    tokenised inside that visitor's request.
+    """
+    async def prepare():
+        try:
+            await recommendations.ensure_built(db)
+        except Exception as e:
+            logger.error(f"⚠️ Could not build the recommendation tables at startup: {e}")
+        try:
+            await search_index.ensure_current(db)
+        except Exception as e:
+            logger.error(f"⚠️ Could not build the search index at startup: {e}")
+
+    asyncio.create_task(prepare())
 
 
 # Include the router in the main app (MUST be after all routes are defined)
@@ -5,13 +5,17 @@ Handles async product imports that continue even if user closes browser
 import asyncio
 import json
 import re
+import time
 import uuid
 from datetime import datetime, timezone
 from typing import Optional, Dict, Any
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import BulkWriteError
 import logging
 from .pricing_service import pricing_service, load_pricing_settings
-from .import_service import bulk_import_products
+from .import_service import bulk_import_products, off_niche_fields
+from .product_cache import catalogue_cache
+from . import indexes
 from .product_translation import (
     translate_title, translate_description, describe_in_english, material_of,
     supplier_material, material_from_supplier,
@@ -19,6 +23,11 @@ from .product_translation import (
 
 logger = logging.getLogger(__name__)
 
+# Products transformed and written per round trip by the importer.
+IMPORT_PAGE_SIZE = 200
+# How often a running import reports its progress, in seconds.
+PROGRESS_INTERVAL_SECONDS = 1.0
+
 
 class ImportJobManager:
     """Manages background import jobs with database tracking"""
@@ -342,6 +351,125 @@ def _sweep_plan(total_count: int):
     ]
 
 
+def _product_document(product: dict, job_id: str, pricing_cfg: Dict[str, Any], now: str) -> dict:
+    """One CJ listing as the staged product it becomes. No I/O: a whole page
+    is transformed before anything is written."""
+    # Calculate pricing with automatic markup (200% profit + taxes + shipping)
+    base_cost = float(product.get('sellPrice', 0))
+    shipping_cost = float(product.get('shippingPrice', 0))
+    weight = float(product.get('weight', 0.5))
+
+    # Calculate final price for Saudi Arabia (default)
+    pricing = pricing_service.calculate_final_price(
+        base_cost=base_cost,
+        shipping_cost=shipping_cost,
+        country_code="SA",  # Default country
+        weight_kg=weight,
+        original_currency="USD",  # CJ prices are usually in USD
+        profit_margin_percent=pricing_cfg["profit_margin_percent"],
+        minimum_profit_sar=pricing_cfg["minimum_profit_sar"],
+    )
+
+    english_name = _product_name(
+        product.get('productNameEn') or product.get('productName', '')
+    )
+    english_description = _clean_description(product)
+    # CJ's own materials field first, and the title only when it
+    # sent none. The field is a taxonomy — "Stainless Steel",
+    # "Zinc Alloy", "Copper", "Iron" — while the title is
+    # advertising, and reading the advertising when the taxonomy
+    # was right there is why so much of this catalogue states no
+    # material at all.
+    declared = supplier_material(product)
+    material = material_from_supplier(declared) \
+        or material_of(english_name, english_description)
+
+    # The product document, in STAGING for editing before publish
+    document = {
+        "id": str(uuid.uuid4()),
+        "source": "cj_dropshipping",
+        "external_id": str(product.get('pid')),
+        "name": english_name,
+        # CJ has no Arabic. Both of its title fields are English, so
+        # writing productName here — as this did — filled the Arabic
+        # column with English and the store's language button had
+        # nothing to switch the catalogue to. The Arabic is composed
+        # from the attributes the supplier actually stated; when the
+        # title states none we know, it stays None and the storefront
+        # falls back to the English above, which is at least true.
+        "name_ar": translate_title(english_name),
+        # The supplier's full title becomes the description when CJ
+        # sends no real one. It must never fall back to `name` —
+        # that printed the identical sentence as heading and as body
+        # on every product page.
+        "description": english_description or (product.get('productNameEn') or ''),
+        "description_ar": translate_description(english_name, english_description),
+        # The English half of the same specification. CJ's own text
+        # is keyword padding that names no material, and naming the
+        # material is what iyzico refused this shop for missing —
+        # in the language its reviewer reads. None when the title
+        # states too little, and then the storefront falls back to
+        # `description` above, which is what it always showed.
+        "description_en": describe_in_english(english_name, english_description),
+        # And on a line of its own, because a material buried in a
+        # sentence is one the shopper skips and the reviewer hunts
+        # for. None when the supplier named none — the product page
+        # then shows no material row rather than an invented one,
+        # and the admin catalogue lists it as needing one.
+        "material_ar": material["ar"] if material else None,
+        "material_en": material["en"] if material else None,
+        # Kept raw and unread by any screen: when a customer asks
+        # what a piece is made of, the answer has to be traceable
+        # to something the supplier actually said, not to a parse
+        # of its marketing.
+        "supplier_material": declared,
+        "price": pricing['final_price_sar'],  # profit + tax + shipping included
+        # Deliberately no "original_price". It used to be set to the
+        # supplier's cost, which the product page renders struck
+        # through next to a "Save %" badge — so every import claimed
+        # a discount off a price that was *lower* than the one being
+        # charged, and printed the wholesale cost for every shopper
+        # to read. A crossed-out price means "this used to cost
+        # more"; only the owner lowering a price can create one.
+        "supplier_price": base_cost,  # CJ price, admin-only
+        "is_active": True,
+        "supplier_shipping": shipping_cost,
+        "price_breakdown": pricing['breakdown'],  # Full pricing details
+        "images": _collect_images(product),
+        "sku": product.get('productSku', ''),
+        "stock": product.get('sellQuantity', 0),
+        "in_stock": True,
+        "category": classify_category(product),
+        "supplier_category": product.get('categoryName', ''),
+        "category_auto": True,
+        "weight_kg": weight,
+        "created_at": now,
+        "updated_at": now,
+        "imported_from_cj": True,
+        "import_job_id": job_id,
+        "pricing_auto_calculated": True,
+        "staging": True  # Mark as staging - not yet published to live store
+    }
+    # Judged by the broom's rules as it is stored, so the off-niche screen
+    # finds it by index rather than by reading the catalogue.
+    document.update(off_niche_fields(document))
+    return document
+
+
+async def ensure_import_indexes(db: AsyncIOMotorDatabase) -> None:
+    """
+    One product per supplier item, enforced by the database.
+
+    Two imports running at once both read "not in the shop" for the same item
+    and both wrote it; the `$in` check narrows that window, this closes it.
+    Partial, so products with no supplier identity (owner-made ones) are not
+    all the same key. Creating it fails while duplicates exist — the dedupe
+    screen removes them — and then imports still run, guarded by the check.
+    Declared with the rest of the catalogue's indexes in services/indexes.py.
+    """
+    await indexes.reconcile(db, collections=["products"])
+
+
 async def background_import_cj_products(
     job_id: str,
     keyword: Optional[str],
@@ -379,6 +507,7 @@ async def background_import_cj_products(
         # The margin the owner saved on the pricing screen — read once per
         # job, applied to every product it prices.
         pricing_cfg = await load_pricing_settings(db)
+        await ensure_import_indexes(db)
 
         # Both modes run the same machinery over a fetch plan: the sweep walks
         # every store category with its own search phrasings and quota; the
@@ -389,11 +518,8 @@ async def background_import_cj_products(
         else:
             plan = [("keyword", [keyword or "luxury jewelry"], max_products)]
 
-        products = []
-        skipped_existing = 0
-        rejected_off_category = 0
-        fetch_report = []
-        for plan_cat, keywords, quota in plan:
+        async def fetch_plan_part(plan_cat: str, keywords, quota: int) -> Dict[str, Any]:
+            found = {"products": [], "skipped_existing": 0, "rejected_off_category": 0, "report": []}
             remaining = quota
             for kw in keywords:
                 if remaining <= 0:
@@ -404,13 +530,40 @@ async def background_import_cj_products(
                     exclude_ids=owned_ids,
                 )
                 got = part.get("products", [])
-                products.extend(got)
+                found["products"].extend(got)
                 remaining -= len(got)
-                skipped_existing += int(part.get("skipped_existing", 0))
-                rejected_off_category += int(part.get("rejected_off_category", 0))
-                fetch_report.append({"plan": plan_cat, "keyword": kw, "fetched": len(got)})
+                found["skipped_existing"] += int(part.get("skipped_existing", 0))
+                found["rejected_off_category"] += int(part.get("rejected_off_category", 0))
+                found["report"].append({"plan": plan_cat, "keyword": kw, "fetched": len(got)})
                 # The next search must not re-fetch what this one just found.
                 owned_ids.update(str(p.get("pid")) for p in got if p.get("pid"))
+            return found
+
+        # The categories are independent searches, so they run side by side:
+        # a sweep takes about as long as its slowest category rather than the
+        # sum of all six. cj_client's limiter still paces every request they
+        # make between them.
+        parts = await asyncio.gather(*(
+            fetch_plan_part(plan_cat, keywords, quota) for plan_cat, keywords, quota in plan
+        ))
+
+        products = []
+        skipped_existing = 0
+        rejected_off_category = 0
+        fetch_report = []
+        fetched_pids = set()
+        for part in parts:
+            for product in part["products"]:
+                pid = str(product.get("pid") or "")
+                # Two categories searching at once can both meet one item.
+                if pid and pid in fetched_pids:
+                    skipped_existing += 1
+                    continue
+                fetched_pids.add(pid)
+                products.append(product)
+            skipped_existing += part["skipped_existing"]
+            rejected_off_category += part["rejected_off_category"]
+            fetch_report.extend(part["report"])
 
         total = len(products)
         imported_count = 0
@@ -436,160 +589,110 @@ async def background_import_cj_products(
             }
         )
         
-        # Import each product
-        for idx, product in enumerate(products, 1):
-            try:
-                product_id = product.get('pid')
+        # Page-wise: one `$in` read tells which of a page the shop already
+        # holds, the page is transformed in memory, and the new rows go out in
+        # one unordered insert_many. The per-product round trips and the
+        # 0.05 s nap after each are what made a 1,000-product sweep crawl.
+        started = time.monotonic()
+        last_report = started
+        processed = 0
+
+        def throughput() -> float:
+            elapsed = time.monotonic() - started
+            return round(processed / elapsed, 1) if elapsed > 0 else 0.0
+
+        def progress(percent: int) -> Dict[str, Any]:
+            return {
+                "total": total,
+                "processed": processed,
+                "imported": imported_count,
+                "skipped_existing": skipped_existing,
+                "rejected_off_category": rejected_off_category,
+                "failed": failed_count,
+                "percent": percent,
+                "by_category": by_category,
+                "products_per_sec": throughput(),
+            }
+
+        for start in range(0, total, IMPORT_PAGE_SIZE):
+            page = products[start:start + IMPORT_PAGE_SIZE]
+            processed += len(page)
+
+            fresh: Dict[str, dict] = {}
+            for product in page:
+                product_id = str(product.get('pid') or '')
                 if not product_id:
                     failed_count += 1
-                    continue
-                
-                # Skip anything this shop already has — staging or live, from
-                # any job. The old check filtered on `import_job_id == this
-                # job`, which no earlier import can ever match, so every
-                # re-import re-created the whole catalogue under fresh ids:
-                # press "استيراد سريع" twice and every product exists twice.
-                # A supplier item's identity is (source, external_id), nothing
-                # narrower.
-                existing = await db.products.find_one({
-                    "source": "cj_dropshipping",
-                    "external_id": product_id,
-                })
-
-                if existing:
-                    # Not a failure: the product is in the shop, which is what
-                    # importing it asks for. Counted separately so the job
-                    # report says "already there", not "broke".
+                elif product_id in fresh:
                     skipped_existing += 1
-                    continue
-                
-                # Calculate pricing with automatic markup (200% profit + taxes + shipping)
-                base_cost = float(product.get('sellPrice', 0))
-                shipping_cost = float(product.get('shippingPrice', 0))
-                weight = float(product.get('weight', 0.5))
-                
-                # Calculate final price for Saudi Arabia (default)
-                pricing = pricing_service.calculate_final_price(
-                    base_cost=base_cost,
-                    shipping_cost=shipping_cost,
-                    country_code="SA",  # Default country
-                    weight_kg=weight,
-                    original_currency="USD",  # CJ prices are usually in USD
-                    profit_margin_percent=pricing_cfg["profit_margin_percent"],
-                    minimum_profit_sar=pricing_cfg["minimum_profit_sar"],
-                )
-                
-                english_name = _product_name(
-                    product.get('productNameEn') or product.get('productName', '')
-                )
-                english_description = _clean_description(product)
-                # CJ's own materials field first, and the title only when it
-                # sent none. The field is a taxonomy — "Stainless Steel",
-                # "Zinc Alloy", "Copper", "Iron" — while the title is
-                # advertising, and reading the advertising when the taxonomy
-                # was right there is why so much of this catalogue states no
-                # material at all.
-                declared = supplier_material(product)
-                material = material_from_supplier(declared) \
-                    or material_of(english_name, english_description)
-
-                # Create product document (in STAGING area for editing before publish)
-                product_data = {
-                    "id": str(uuid.uuid4()),
-                    "source": "cj_dropshipping",
-                    "external_id": product_id,
-                    "name": english_name,
-                    # CJ has no Arabic. Both of its title fields are English, so
-                    # writing productName here — as this did — filled the Arabic
-                    # column with English and the store's language button had
-                    # nothing to switch the catalogue to. The Arabic is composed
-                    # from the attributes the supplier actually stated; when the
-                    # title states none we know, it stays None and the storefront
-                    # falls back to the English above, which is at least true.
-                    "name_ar": translate_title(english_name),
-                    # The supplier's full title becomes the description when CJ
-                    # sends no real one. It must never fall back to `name` —
-                    # that printed the identical sentence as heading and as body
-                    # on every product page.
-                    "description": english_description or (product.get('productNameEn') or ''),
-                    "description_ar": translate_description(english_name, english_description),
-                    # The English half of the same specification. CJ's own text
-                    # is keyword padding that names no material, and naming the
-                    # material is what iyzico refused this shop for missing —
-                    # in the language its reviewer reads. None when the title
-                    # states too little, and then the storefront falls back to
-                    # `description` above, which is what it always showed.
-                    "description_en": describe_in_english(english_name, english_description),
-                    # And on a line of its own, because a material buried in a
-                    # sentence is one the shopper skips and the reviewer hunts
-                    # for. None when the supplier named none — the product page
-                    # then shows no material row rather than an invented one,
-                    # and the admin catalogue lists it as needing one.
-                    "material_ar": material["ar"] if material else None,
-                    "material_en": material["en"] if material else None,
-                    # Kept raw and unread by any screen: when a customer asks
-                    # what a piece is made of, the answer has to be traceable
-                    # to something the supplier actually said, not to a parse
-                    # of its marketing.
-                    "supplier_material": declared,
-                    "price": pricing['final_price_sar'],  # profit + tax + shipping included
-                    # Deliberately no "original_price". It used to be set to the
-                    # supplier's cost, which the product page renders struck
-                    # through next to a "Save %" badge — so every import claimed
-                    # a discount off a price that was *lower* than the one being
-                    # charged, and printed the wholesale cost for every shopper
-                    # to read. A crossed-out price means "this used to cost
-                    # more"; only the owner lowering a price can create one.
-                    "supplier_price": base_cost,  # CJ price, admin-only
-                    "is_active": True,
-                    "supplier_shipping": shipping_cost,
-                    "price_breakdown": pricing['breakdown'],  # Full pricing details
-                    "images": _collect_images(product),
-                    "sku": product.get('productSku', ''),
-                    "stock": product.get('sellQuantity', 0),
-                    "in_stock": True,
-                    "category": classify_category(product),
-                    "supplier_category": product.get('categoryName', ''),
-                    "category_auto": True,
-                    "weight_kg": weight,
-                    "created_at": datetime.now(timezone.utc).isoformat(),
-                    "updated_at": datetime.now(timezone.utc).isoformat(),
-                    "imported_from_cj": True,
-                    "import_job_id": job_id,
-                    "pricing_auto_calculated": True,
-                    "staging": True  # Mark as staging - not yet published to live store
-                }
-                
-                await db.products.insert_one(product_data)
-                imported_count += 1
-                imported_products.append(product_data)
-                by_category[product_data["category"]] = by_category.get(product_data["category"], 0) + 1
-                
-                # Update progress every 10 products
-                if idx % 10 == 0 or idx == total:
-                    percent = int((idx / total) * 100)
-                    await job_manager.update_job_status(
-                        job_id,
-                        "running",
-                        progress={
-                            "total": total,
-                            "processed": idx,
-                            "imported": imported_count,
-                            "skipped_existing": skipped_existing,
-                            "rejected_off_category": rejected_off_category,
-                            "failed": failed_count,
-                            "percent": percent,
-                            "by_category": by_category
-                        }
-                    )
-                
-                # Small delay to avoid overwhelming DB
-                await asyncio.sleep(0.05)
-                
-            except Exception as e:
-                logger.error(f"Failed to import product {product.get('pid')}: {e}")
-                failed_count += 1
-        
+                else:
+                    fresh[product_id] = product
+
+            # Skip anything this shop already has — staging or live, from any
+            # job. A supplier item's identity is (source, external_id), nothing
+            # narrower: the old check filtered on `import_job_id == this job`,
+            # which no earlier import can ever match, so pressing
+            # "استيراد سريع" twice made every product exist twice. The fetcher
+            # already read past owned_ids; this catches what another job wrote
+            # since, and the unique index catches what lands in between.
+            if fresh:
+                taken = await db.products.find(
+                    {"source": "cj_dropshipping", "external_id": {"$in": list(fresh)}},
+                    {"_id": 0, "external_id": 1},
+                ).to_list(length=None)
+                for doc in taken:
+                    if fresh.pop(str(doc.get("external_id")), None) is not None:
+                        # Not a failure: the product is in the shop, which is
+                        # what importing it asks for.
+                        skipped_existing += 1
+
+            docs = []
+            for product_id, product in fresh.items():
+                try:
+                    docs.append(_product_document(
+                        product, job_id, pricing_cfg, datetime.now(timezone.utc).isoformat()))
+                except Exception as e:
+                    logger.error(f"Failed to import product {product_id}: {e}")
+                    failed_count += 1
+
+            written = docs
+            if docs:
+                try:
+                    await db.products.insert_many(docs, ordered=False)
+                except BulkWriteError as e:
+                    refused = {err["index"]: err for err in e.details.get("writeErrors", [])}
+                    for err in refused.values():
+                        if err.get("code") == 11000:
+                            skipped_existing += 1
+                        else:
+                            logger.error(f"Failed to import product {docs[err['index']].get('external_id')}: {err.get('errmsg')}")
+                            failed_count += 1
+                    written = [doc for i, doc in enumerate(docs) if i not in refused]
+                owned_ids.update(doc["external_id"] for doc in written)
+                # Staged rows are not on sale yet, but a cached listing must
+                # not outlive the write that might have touched it.
+                catalogue_cache.invalidate(doc["id"] for doc in written)
+
+            imported_count += len(written)
+            for doc in written:
+                by_category[doc["category"]] = by_category.get(doc["category"], 0) + 1
+            room = 5 - len(imported_products)
+            if room > 0:
+                # insert_many stamped each document with its ObjectId; the
+                # job's result is read back as JSON.
+                imported_products.extend(
+                    {k: v for k, v in doc.items() if k != "_id"} for doc in written[:room])
+
+            # By the clock, not every N rows: a fast run does not spend its
+            # time reporting, and a slow one still shows it is alive.
+            if time.monotonic() - last_report >= PROGRESS_INTERVAL_SECONDS:
+                last_report = time.monotonic()
+                await job_manager.update_job_status(
+                    job_id, "running", progress=progress(int(processed / total * 100)))
+
+        duration = round(time.monotonic() - started, 2)
+        logger.info(f"⚡ Wrote {imported_count} products in {duration}s ({throughput()} products/sec)")
+
         # Mark as completed
         result = {
             "total_found": total,
@@ -599,22 +702,15 @@ async def background_import_cj_products(
             "failed": failed_count,
             "by_category": by_category,
             "fetch_report": fetch_report,
+            "duration_seconds": duration,
+            "products_per_sec": throughput(),
             "sample_products": imported_products[:5]
         }
 
         await job_manager.update_job_status(
             job_id,
             "completed",
-            progress={
-                "total": total,
-                "processed": total,
-                "imported": imported_count,
-                "skipped_existing": skipped_existing,
-                "rejected_off_category": rejected_off_category,
-                "failed": failed_count,
-                "percent": 100,
-                "by_category": by_category
-            },
+            progress=progress(100),
             result=result
         )
         
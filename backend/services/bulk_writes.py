@@ -0,0 +1,34 @@
+"""
+One place that sends a batch of writes to MongoDB.
+
+Catalogue-wide jobs — repricing, backfills, the importer — used to issue one
+update_one per product, a round trip each. They build pymongo operations
+instead and hand them here, where they go out as unordered bulk_write calls
+of at most CHUNK operations.
+"""
+import logging
+from typing import Any, Dict, Iterable
+
+logger = logging.getLogger(__name__)
+
+CHUNK = 1000
+
+
+async def bulk_write(collection, requests: Iterable[Any], chunk: int = CHUNK) -> Dict[str, int]:
+    """
+    Apply `requests` unordered, in chunks; return what they did.
+
+    Unordered: one failing row (a duplicate key, say) does not stop the rest
+    of its chunk — the caller gets the BulkWriteError after the chunk ran.
+    """
+    totals = {"inserted": 0, "matched": 0, "modified": 0, "upserted": 0, "deleted": 0}
+    requests = list(requests)
+    for start in range(0, len(requests), chunk):
+        part = requests[start:start + chunk]
+        result = await collection.bulk_write(part, ordered=False)
+        totals["inserted"] += result.inserted_count
+        totals["matched"] += result.matched_count
+        totals["modified"] += result.modified_count
+        totals["upserted"] += result.upserted_count
+        totals["deleted"] += result.deleted_count
+    return totals
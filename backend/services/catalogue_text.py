@@ -0,0 +1,260 @@
+"""
+The catalogue's text: what each product is missing in either language, and
+which material claims on it the shop cannot stand behind.
+
+Everything here is a pure function of one product document, so the same
+rules serve the boot-time migration (server.CATALOGUE_TEXT_MIGRATION), the
+importer and the admin's translate button — and so the button can run them
+in worker processes. They are plain string work in Python, a few hundred
+microseconds a product, and a catalogue of tens of thousands of products
+read on the event loop held every other request up behind it.
+
+review_many() fans a batch out over a process pool of CATALOGUE_TEXT_WORKERS
+processes. The workers are started with "spawn", not forked: the server has
+live threads (the bcrypt pool, the database driver) by the time anyone
+presses the button, and forking a process with threads can hand the child a
+lock nobody will ever release. Spawning costs a second or so, once; a worker
+imports this module and product_translation, nothing else.
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional
+
+from .product_translation import (
+    translate_title,
+    translate_description,
+    describe_in_english,
+    material_of,
+    looks_untranslated,
+    states_unnameable_stone,
+    states_retired_metal,
+    sanitise_supplier_text,
+)
+
+logger = logging.getLogger(__name__)
+
+# Processes the translate job reads on; 0 reads on a thread of this one.
+CATALOGUE_TEXT_WORKERS = int(os.getenv("CATALOGUE_TEXT_WORKERS", str(min(4, os.cpu_count() or 1))))
+# Fewer products than this are not worth shipping to another process.
+MIN_SLICE = 50
+
+# What the rules read of a product.
+CATALOGUE_TEXT_INPUTS = {
+    "name": 1, "name_en": 1, "name_ar": 1, "source": 1, "description": 1,
+    "description_ar": 1, "description_en": 1, "material_ar": 1, "material_en": 1,
+}
+
+
+def states_unbacked_claim(*values: Optional[str]) -> bool:
+    """A stone or a metal this shop cannot vouch for, in any of these strings."""
+    return states_unnameable_stone(*values) or states_retired_metal(*values)
+
+
+def unnameable_stone_corrections(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Strip a material claim this shop cannot stand behind, wherever it is stored.
+
+    This exists because of a real deception that reached real customers. The
+    shop sold «خاتم لامع فاخر مرصّع بالألماس» — a ring set with diamonds — for
+    fifty-four dollars, with «الخامة: الماس» printed under it, and a pearl ring
+    for thirty-seven. The supplier pays a few dollars for those pieces. There
+    is no diamond and no pearl in them, and the shop said there was, in
+    writing, on the page where the customer presses buy.
+
+    Correcting the composer is not enough on its own: the sentences are already
+    written into the database, and the gentle backfill beside this one only
+    fills fields that are empty. This one overwrites — it has to — and it does
+    so only for products that came from the supplier, because a name the owner
+    wrote himself about goods he has held is his to stand behind, not mine to
+    rewrite. Those are reported instead.
+    """
+    english = sanitise_supplier_text(doc.get("name") or doc.get("name_en") or "")
+    english_description = sanitise_supplier_text(doc.get("description") or "")
+    updates: Dict[str, Any] = {}
+
+    for field, value in (("name", doc.get("name")), ("name_en", doc.get("name_en")),
+                         ("description", doc.get("description"))):
+        if value and states_unbacked_claim(value):
+            cleaned = sanitise_supplier_text(value)
+            if cleaned and cleaned != value:
+                updates[field] = cleaned
+
+    if states_unbacked_claim(doc.get("name_ar")):
+        # Recomposed from the cleaned English, not patched: removing a phrase
+        # from Arabic by hand leaves «خاتم لامع فاخر مرصّع ب» behind.
+        updates["name_ar"] = translate_title(english)
+
+    if states_unbacked_claim(doc.get("description_ar")):
+        updates["description_ar"] = translate_description(english, english_description)
+
+    if states_unbacked_claim(doc.get("description_en")):
+        updates["description_en"] = describe_in_english(english, english_description)
+
+    if states_unbacked_claim(doc.get("material_ar"), doc.get("material_en")):
+        material = material_of(english, english_description)
+        updates["material_ar"] = material["ar"] if material else None
+        updates["material_en"] = material["en"] if material else None
+
+    # A recomposition that comes back empty is still a correction: no name is
+    # better than a false one, and the storefront falls back to the English.
+    return {k: v for k, v in updates.items() if k not in ("name",) or v}
+
+
+def catalogue_language_updates(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    What a product document is still missing in either language.
+
+    One function because there are two callers — the admin's button and the
+    boot-time pass — and they were separate copies of the same loop. The copies
+    had already begun to differ, and the next field added to one of them would
+    have been missing from the other.
+
+    Nothing here overwrites. A field the owner filled in himself is left as he
+    wrote it, and running this twice changes nothing the second time.
+    """
+    english = doc.get("name") or doc.get("name_en") or ""
+    english_description = doc.get("description") or ""
+    updates: Dict[str, Any] = {}
+
+    if looks_untranslated(doc.get("name_ar")):
+        arabic_name = translate_title(english)
+        if arabic_name:
+            updates["name_ar"] = arabic_name
+
+    if looks_untranslated(doc.get("description_ar")):
+        arabic_description = translate_description(english, english_description)
+        if arabic_description:
+            updates["description_ar"] = arabic_description
+
+    # The English specification, and the material on a line of its own. This is
+    # the half iyzico asked for: the Arabic description had been naming the
+    # material since the day it was written, and the English one — the one a
+    # Turkish reviewer opens — named none.
+    if not (doc.get("description_en") or "").strip():
+        english_specification = describe_in_english(english, english_description)
+        if english_specification:
+            updates["description_en"] = english_specification
+
+    if not (doc.get("material_ar") or "").strip() and not (doc.get("material_en") or "").strip():
+        material = material_of(english, english_description)
+        if material:
+            updates["material_ar"] = material["ar"]
+            updates["material_en"] = material["en"]
+
+    return updates
+
+
+def catalogue_text_updates(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """What the boot pass changes about one product's text; {} for nothing."""
+    updates: Dict[str, Any] = {}
+    # First: take down any claim of a material the shop cannot stand behind.
+    # This does not wait for the owner to press a button — a ring advertised
+    # as set with diamonds for fifty-four dollars is on sale to somebody
+    # right now.
+    if (doc.get("source") or "").startswith("cj") and states_unbacked_claim(
+        doc.get("name"), doc.get("name_en"), doc.get("name_ar"),
+        doc.get("description"), doc.get("description_ar"),
+        doc.get("description_en"), doc.get("material_ar"), doc.get("material_en"),
+    ):
+        updates.update(unnameable_stone_corrections(doc))
+        doc = {**doc, **updates}
+    updates.update(catalogue_language_updates(doc))
+    return updates
+
+
+def review(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    What the translate button does to one product, and what it reports.
+
+    The boot pass corrects supplier claims and fills gaps; the button does
+    the same and also names what it could not do — the products whose titles
+    it cannot read, the ones that state no material, and the false claims
+    the owner wrote himself, which are his to settle rather than ours.
+    """
+    english = doc.get("name") or doc.get("name_en") or ""
+    updates: Dict[str, Any] = {}
+    corrected = owner_written_claim = False
+
+    claims = states_unbacked_claim(
+        doc.get("name"), doc.get("name_en"), doc.get("name_ar"),
+        doc.get("description"), doc.get("description_ar"),
+        doc.get("description_en"), doc.get("material_ar"), doc.get("material_en"),
+    )
+    if claims:
+        if (doc.get("source") or "").startswith("cj"):
+            updates.update(unnameable_stone_corrections(doc))
+            doc = {**doc, **updates}
+            english = doc.get("name") or doc.get("name_en") or ""
+            corrected = True
+        else:
+            # Not rewritten: the owner may have held this piece and known
+            # what is in it. Named so he can check it himself.
+            owner_written_claim = True
+
+    updates.update(catalogue_language_updates(doc))
+
+    stated = (
+        updates.get("material_ar")
+        or doc.get("material_ar")
+        or updates.get("material_en")
+        or doc.get("material_en")
+    )
+    return {
+        "id": doc.get("id"),
+        "name": english,
+        "updates": updates,
+        "corrected": corrected,
+        "owner_written_claim": owner_written_claim,
+        "unreadable": looks_untranslated(doc.get("name_ar")) and "name_ar" not in updates,
+        "without_material": not (stated or "").strip(),
+    }
+
+
+def review_batch(docs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """review() over a list; the unit of work a pool worker is sent."""
+    return [review(doc) for doc in docs]
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _executor() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(CATALOGUE_TEXT_WORKERS,
+                                    mp_context=multiprocessing.get_context("spawn"))
+    return _pool
+
+
+async def review_many(docs: List[Dict[str, Any]],
+                      workers: int = CATALOGUE_TEXT_WORKERS) -> List[Dict[str, Any]]:
+    """
+    review() every product in `docs`, in order, off the event loop.
+
+    Split into at most `workers` slices of at least MIN_SLICE products, one
+    per worker process. A pool that cannot start or has died — a host that
+    forbids processes, a worker killed for memory — is logged and the batch
+    read on a thread instead: slower, but the job finishes.
+    """
+    global _pool
+    if workers <= 0 or not docs:
+        return await asyncio.to_thread(review_batch, docs)
+
+    size = max(MIN_SLICE, -(-len(docs) // workers))
+    slices = [docs[i:i + size] for i in range(0, len(docs), size)]
+    loop = asyncio.get_running_loop()
+    try:
+        pool = _executor()
+        results = await asyncio.gather(
+            *(loop.run_in_executor(pool, review_batch, part) for part in slices))
+    except (BrokenProcessPool, OSError) as e:
+        logger.warning(f"⚠️ Catalogue text pool unavailable ({e}); reading on a thread")
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+        return await asyncio.to_thread(review_batch, docs)
+    return [row for part in results for row in part]
@@ -1,14 +1,75 @@
 import asyncio
 import aiohttp
-from datetime import datetime, timedelta
-from typing import Dict, Optional, List
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, NamedTuple, Optional, List
 from pydantic import BaseModel
+from pymongo import UpdateOne
 import logging
 import os
 from motor.motor_asyncio import AsyncIOMotorDatabase
+import numpy as np
+
+from .bulk_writes import bulk_write
 
 logger = logging.getLogger(__name__)
 
+
+class RateSnapshot(NamedTuple):
+    """
+    Every rate this process converts with, as fetched at one moment.
+
+    Conversions used to read exchange_rates row by row: up to four
+    find_one calls per conversion (direct, reverse, and the two legs of a
+    cross through USD), repeated for every currency of a multi-currency
+    price, and the public rates endpoint — which every visitor's page load
+    calls — went to the provider each time. A snapshot is fetched once an
+    hour and every conversion in between is two dictionary lookups.
+    """
+    # Bumped by every refresh, so a caller can tell two tables apart.
+    version: int
+    fetched_at: datetime
+    # "live" or "fallback", as get_latest_rates reported it.
+    source: str
+    # USD -> currency, as the provider states them.
+    usd: Dict[str, float]
+    # matrix[a][b] converts a into b: usd[b] / usd[a], worked out once.
+    matrix: Dict[str, Dict[str, float]]
+    # time.monotonic() at the fetch; what expiry is measured from.
+    taken: float
+
+    def rate(self, from_currency: str, to_currency: str) -> Optional[float]:
+        if from_currency == to_currency:
+            return 1.0
+        return self.matrix.get(from_currency, {}).get(to_currency)
+
+
+def _cross_rates(usd: Dict[str, float]) -> Dict[str, Dict[str, float]]:
+    """The full matrix, through USD — the only base the provider is asked for."""
+    usable = {code: float(rate) for code, rate in usd.items() if rate and rate > 0}
+    usable["USD"] = 1.0
+    return {a: {b: rate_b / rate_a for b, rate_b in usable.items()}
+            for a, rate_a in usable.items()}
+
+
+# The process's one snapshot, shared by every CurrencyService instance — the
+# scheduler builds its own, the routes share get_currency_service's — and the
+# refresh currently fetching it, if any. A task, not a lock: everyone who finds
+# the table missing or expired at once awaits the same fetch, so a burst of
+# requests after expiry makes one provider call, not one each.
+_snapshot: Optional[RateSnapshot] = None
+_refreshing: Optional["asyncio.Task"] = None
+# True while this process runs the scheduler's hourly currency_rates_update
+# job. The job is what swaps the snapshot then; a request refreshes only when
+# the job has fallen a whole interval behind (see CurrencyService.snapshot).
+_refreshed_by_schedule = False
+
+
+def refresh_on_schedule(enabled: bool) -> None:
+    """Say whether the scheduler's hourly job keeps this process's rates fresh."""
+    global _refreshed_by_schedule
+    _refreshed_by_schedule = enabled
+
 class ExchangeRate(BaseModel):
     """Exchange rate model"""
     base_currency: str
@@ -17,6 +78,20 @@ class ExchangeRate(BaseModel):
     updated_at: datetime
     source: str = "exchangerate-api"
 
+def kept_snapshot() -> Optional[RateSnapshot]:
+    """The snapshot this process holds, fresh or not; None before the first fetch."""
+    return _snapshot
+
+
+def to_cents(amount: float) -> float:
+    """
+    `amount` rounded to the cent the way np.round rounds: the nightly price
+    job rounds a whole chunk with it, and a price must not depend on which
+    path computed it. Python's round() differs on some halfway cases.
+    """
+    return float(np.round(amount, 2))
+
+
 class CurrencyService:
     """Real-time currency conversion service with automatic updates"""
     
@@ -108,99 +183,117 @@ class CurrencyService:
         self.last_source = "fallback"
         return await self._get_fallback_rates(base_currency)
     
+    async def _fetch_snapshot(self) -> RateSnapshot:
+        """One provider call (or the fallback table), kept and stored."""
+        global _snapshot
+        rates = await self.get_latest_rates("USD")
+        previous = _snapshot
+        snapshot = RateSnapshot(
+            version=(previous.version if previous else 0) + 1,
+            fetched_at=datetime.now(timezone.utc),
+            source=self.last_source,
+            usd=dict(rates),
+            matrix=_cross_rates(rates),
+            taken=time.monotonic(),
+        )
+        _snapshot = snapshot
+
+        # Store every rate the provider returns. This used to filter
+        # through a seven-currency Gulf list, so the storefront happily
+        # displayed prices in TRY (and EUR, GBP, ...) from the unfiltered
+        # /auto-update/currency-rates response while the charge path could
+        # not price those same currencies and refused every card session
+        # with a 503. Anything the shop can display, this table must be able
+        # to price. The rows are the record of what was fetched when; the
+        # snapshot above is what converts.
+        try:
+            now = datetime.utcnow()
+            await bulk_write(self.db.exchange_rates, [
+                UpdateOne({"base_currency": "USD", "target_currency": code},
+                          {"$set": ExchangeRate(base_currency="USD", target_currency=code,
+                                                rate=rate, updated_at=now).model_dump()},
+                          upsert=True)
+                for code, rate in rates.items()
+            ])
+        except Exception as e:
+            logger.error(f"Could not store exchange rates: {e}")
+        logger.info(f"💱 Exchange rates v{snapshot.version}: {len(rates)} currencies "
+                    f"({snapshot.source})")
+        return snapshot
+
+    async def refresh(self) -> RateSnapshot:
+        """
+        Fetch a new snapshot — or, if a fetch is already under way, wait for
+        that one. Shielded: a request that gives up waiting does not cancel
+        the fetch everyone else is waiting for.
+        """
+        global _refreshing
+        loop = asyncio.get_running_loop()
+        task = _refreshing
+        if task is None or task.done() or task.get_loop() is not loop:
+            task = _refreshing = loop.create_task(self._fetch_snapshot())
+        return await asyncio.shield(task)
+
+    def is_fresh(self, snapshot: Optional[RateSnapshot], lifetimes: int = 1) -> bool:
+        return (snapshot is not None
+                and time.monotonic() - snapshot.taken
+                < lifetimes * self.cache_duration.total_seconds())
+
+    async def snapshot(self) -> RateSnapshot:
+        """
+        The rates to convert with. No I/O but in the fallback case.
+
+        With the scheduler running, its hourly currency_rates_update job swaps
+        the snapshot in the background, and a request takes whatever is kept:
+        expiring on the request path made whichever shopper arrived first
+        after the hour wait on the provider, and the job fire at the same
+        moment a request had already refetched. A request fetches only when
+        there is no snapshot yet, or the job has missed a whole interval — it
+        failed, or this process does not run it — and then the kept snapshot
+        expires after cache_duration, as it always did.
+        """
+        current = _snapshot
+        if self.is_fresh(current, 2 if _refreshed_by_schedule else 1):
+            return current
+        return await self.refresh()
+
     async def update_exchange_rates(self) -> bool:
         """
-        Update exchange rates in database
-        
+        Refresh the rates now and swap the new snapshot in; the scheduler's
+        hourly currency_rates_update job.
+
         Returns:
             True if update was successful, False otherwise
         """
         try:
-            rates_data = await self.get_latest_rates("USD")
-            
-            if not rates_data:
+            snapshot = await self.refresh()
+            if not snapshot.usd:
                 logger.warning("No exchange rate data received")
                 return False
-            
-            # Store every rate the provider returns. This used to filter
-            # through a seven-currency Gulf list, so the storefront happily
-            # displayed prices in TRY (and EUR, GBP, ...) from the unfiltered
-            # /auto-update/currency-rates response while the charge path —
-            # which reads this table — could not price those same currencies
-            # and refused every card session with a 503. Anything the shop
-            # can display, this table must be able to price.
-            updated_count = 0
-            for currency_code, rate in rates_data.items():
-                exchange_rate = ExchangeRate(
-                    base_currency="USD",
-                    target_currency=currency_code,
-                    rate=rate,
-                    updated_at=datetime.utcnow()
-                )
-
-                await self.db.exchange_rates.update_one(
-                    {"base_currency": "USD", "target_currency": currency_code},
-                    {"$set": exchange_rate.model_dump()},
-                    upsert=True
-                )
-                updated_count += 1
-            
-            logger.info(f"Updated {updated_count} exchange rates in database")
             return True
-            
         except Exception as e:
             logger.error(f"Error updating exchange rates: {str(e)}")
             return False
-    
+
     async def get_cached_rate(self, from_currency: str, to_currency: str) -> Optional[float]:
         """
-        Get exchange rate from database cache
-        
+        The rate from one currency to another, from the current snapshot.
+
         Args:
             from_currency: Source currency code
             to_currency: Target currency code
-            
+
         Returns:
-            Exchange rate if found and not expired, None otherwise
+            The rate, or None when the table has no such currency
         """
         if from_currency == to_currency:
             return 1.0
-        
         try:
-            # Direct rate lookup
-            rate_doc = await self.db.exchange_rates.find_one({
-                "base_currency": from_currency,
-                "target_currency": to_currency,
-                "updated_at": {"$gte": datetime.utcnow() - self.cache_duration}
-            })
-            
-            if rate_doc:
-                return rate_doc["rate"]
-            
-            # Reverse rate lookup (if we have USD->SAR, calculate SAR->USD)
-            reverse_rate_doc = await self.db.exchange_rates.find_one({
-                "base_currency": to_currency,
-                "target_currency": from_currency,
-                "updated_at": {"$gte": datetime.utcnow() - self.cache_duration}
-            })
-            
-            if reverse_rate_doc and reverse_rate_doc["rate"] != 0:
-                return 1.0 / reverse_rate_doc["rate"]
-            
-            # Cross-currency calculation via USD
-            if from_currency != "USD" and to_currency != "USD":
-                usd_to_target = await self.get_cached_rate("USD", to_currency)
-                usd_to_source = await self.get_cached_rate("USD", from_currency)
-                
-                if usd_to_target and usd_to_source and usd_to_source != 0:
-                    return usd_to_target / usd_to_source
-            
-            return None
-            
+            return (await self.snapshot()).rate(from_currency, to_currency)
         except Exception as e:
             logger.error(f"Error fetching cached rate: {str(e)}")
             return None
-    
+
     async def convert_currency(
         self, 
         amount: float, 
@@ -220,15 +313,8 @@ class CurrencyService:
         """
         if from_currency == to_currency:
             return amount
-        
-        # Try to get cached rate first
+
         rate = await self.get_cached_rate(from_currency, to_currency)
-        
-        if rate is None:
-            # Update rates and try again
-            await self.update_exchange_rates()
-            rate = await self.get_cached_rate(from_currency, to_currency)
-        
         if rate is not None:
             converted = amount * rate
             return round(converted, 2)
@@ -242,7 +328,7 @@ class CurrencyService:
         base_currency: str = "USD"
     ) -> Dict[str, float]:
         """
-        Get prices in multiple currencies
+        Get prices in multiple currencies, all from one snapshot
         
         Args:
             base_amount: Amount in base currency
@@ -251,12 +337,16 @@ class CurrencyService:
         Returns:
             Dictionary of currency codes to converted amounts
         """
+        snapshot = await self.snapshot()
         prices = {}
         
         for currency in self.supported_currencies:
-            converted = await self.convert_currency(base_amount, base_currency, currency)
-            if converted is not None:
-                prices[currency] = converted
+            if currency == base_currency:
+                prices[currency] = base_amount
+                continue
+            rate = snapshot.rate(base_currency, currency)
+            if rate is not None:
+                prices[currency] = to_cents(base_amount * rate)
         
         return prices
     
@@ -279,7 +369,7 @@ class CurrencyService:
         multiplier = 1 + (markup_percentage / 100)
         
         for currency, price in base_prices.items():
-            marked_up_prices[currency] = round(price * multiplier, 2)
+            marked_up_prices[currency] = to_cents(price * multiplier)
         
         return marked_up_prices
     
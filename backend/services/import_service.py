@@ -1,7 +1,9 @@
 # services/import_service.py
 import asyncio
+import hashlib
+import os
 from typing import List, Dict, Any, Optional, Set
-from services.cj_client import list_products, get_product_details
+from services.cj_client import list_products, get_product_details, MAX_CONCURRENCY
 import logging
 
 logger = logging.getLogger(__name__)
@@ -46,6 +48,48 @@ async def chunked(lst: List[Any], size: int):
 # request, small enough to end a hopeless keyword in a couple of minutes.
 MAX_PAGES = 40
 
+# Pages requested ahead of the one being read. cj_client's semaphore and
+# per-second limiter pace every request, so keeping this many in flight fills
+# CJ's budget instead of idling between pages — the old fixed sleep after each
+# page did both at once: stayed under the limit and wasted most of it.
+PREFETCH_PAGES = int(os.getenv("CJ_PREFETCH_PAGES", str(MAX_CONCURRENCY)))
+
+
+class _PagePrefetcher:
+    """
+    CJ's listing pages for one keyword, read in order with the next few
+    already on their way.
+
+    A page is only requested when the reader asks for an earlier one, so
+    once the reader stops — quota met, an empty or repeated page — nothing
+    further is issued, and close() cancels what is still in flight.
+    """
+
+    def __init__(self, keyword: str, page_size: int, depth: int = PREFETCH_PAGES,
+                 last_page: int = MAX_PAGES):
+        self.keyword = keyword
+        self.page_size = page_size
+        self.depth = max(1, depth)
+        self.last_page = last_page
+        self._pending: Dict[int, asyncio.Task] = {}
+
+    def _request(self, page_num: int) -> None:
+        if page_num <= self.last_page and page_num not in self._pending:
+            self._pending[page_num] = asyncio.ensure_future(list_products(
+                page_num=page_num, page_size=self.page_size, keyword=self.keyword))
+
+    async def page(self, page_num: int) -> Dict[str, Any]:
+        for ahead in range(page_num, page_num + self.depth):
+            self._request(ahead)
+        return await self._pending.pop(page_num)
+
+    async def close(self) -> None:
+        tasks = list(self._pending.values())
+        self._pending.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
 
 # CJ's keyword search answers loosely: «bracelet women» brings dresses and
 # boots along for the ride, and the category classifier used to file anything
@@ -154,54 +198,49 @@ def looks_like_adornment(product: Dict[str, Any]) -> bool:
     return any(term in named for term in _ADORNMENT_POSITIVE)
 
 
-async def bulk_import_products(
-    total_count: int,
-    keyword: str = "luxury jewelry",
-    exclude_ids: Optional[Set[str]] = None,
-) -> Dict[str, Any]:
-    """
-    Fetch `total_count` products the shop does NOT already have.
+# The revision of the rules above, stored beside every verdict reached under
+# them (see off_niche_fields). It is read from the vocabularies themselves, so
+# editing a word list or a pattern is all it takes for every stored verdict to
+# go stale and be re-judged by the next backfill. A change to
+# looks_like_adornment's logic that leaves the lists alone must bump the
+# revision at the end by hand.
+ADORNMENT_VERSION = hashlib.sha1("\n".join([
+    _OFF_NICHE_NEGATIVE.pattern, _ADORNMENT_TYPES.pattern, _NOT_THE_JEWEL_ITSELF.pattern,
+    *_ADORNMENT_POSITIVE, "rules:1",
+]).encode("utf-8")).hexdigest()[:12]
+
+
+def as_supplier_shape(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """Adapt a stored product document to the import gate's field names, so
+    one vocabulary decides what belongs to the shop — at import and after."""
+    return {
+        "productNameEn": doc.get("name") or doc.get("name_en") or "",
+        "productName": doc.get("name_ar") or "",
+        "categoryName": doc.get("supplier_category") or "",
+    }
 
-    The old version computed how many pages `total_count` needs and read
-    exactly those, starting from page 1 — the same first page every run. After
-    the first import ever, every product it fetched already existed, the
-    importer skipped them all, and the owner pressed «استيراد» to watch fifty
-    duplicates get refused: requested 50, imported 0, reported success.
 
-    `exclude_ids` carries the external ids the shop already owns; pages are
-    read until enough NEW products are found or the supplier runs dry.
-    """
-    exclude = set(exclude_ids or ())
-    results = {
-        "total_requested": total_count,
-        "total_fetched": 0,
-        "ok": 0,
-        "failed": 0,
-        "skipped_existing": 0,
-        "rejected_off_category": 0,
-        "batches": [],
-        "products": []
+def off_niche_fields(doc: Dict[str, Any]) -> Dict[str, Any]:
+    """The adornment verdict on a stored product document, ready to `$set`."""
+    return {
+        "off_niche": not looks_like_adornment(as_supplier_shape(doc)),
+        "off_niche_version": ADORNMENT_VERSION,
     }
 
-    page_size = BATCH_SIZE
-    logger.info(f"🚀 Starting bulk import: {total_count} new products, {len(exclude)} already owned")
 
-    # CJ can repeat an item across pages; one run must not import it twice.
-    seen_pids = set()
+async def _read_pages(pager: _PagePrefetcher, total_count: int, exclude: Set[str],
+                      seen_pids: Set[str], results: Dict[str, Any]) -> None:
+    """Read pages from `pager` into `results` until the quota is met or CJ runs dry."""
+    page_size = pager.page_size
     products_fetched = 0
-
     for page_num in range(1, MAX_PAGES + 1):
         if products_fetched >= total_count:
             break
 
         try:
-            logger.info(f"📦 Page {page_num}: fetching (have {products_fetched}/{total_count})")
+            logger.info(f"📦 Page {page_num}: reading (have {products_fetched}/{total_count})")
 
-            response = await list_products(
-                page_num=page_num,
-                page_size=page_size,
-                keyword=keyword
-            )
+            response = await pager.page(page_num)
 
             page_products = _products_from(response)
             if not page_products:
@@ -243,8 +282,8 @@ async def bulk_import_products(
             # not sell; continue so a later page can still yield jewellery.
             # Re-seeing only products already encountered is different: it is
             # a repeated page (common in mocks and in a few degraded supplier
-            # responses), so continuing would burn every page and sleep between
-            # them without any chance of progress.
+            # responses), so continuing would burn every page without any chance
+            # of progress.
             new_unique_on_page = len(seen_pids) - unique_before_page
             if not fresh and new_unique_on_page == 0:
                 results["batches"].append({
@@ -274,10 +313,48 @@ async def bulk_import_products(
                 "status": f"error: {str(e)[:100]}"
             })
 
-        # راحة قصيرة بين الدفعات لتفادي 429
-        if products_fetched < total_count and page_num < MAX_PAGES:
-            logger.info(f"😴 Sleeping {PAUSE_BETWEEN_BATCHES}s before next page...")
-            await asyncio.sleep(PAUSE_BETWEEN_BATCHES)
+
+async def bulk_import_products(
+    total_count: int,
+    keyword: str = "luxury jewelry",
+    exclude_ids: Optional[Set[str]] = None,
+) -> Dict[str, Any]:
+    """
+    Fetch `total_count` products the shop does NOT already have.
+
+    The old version computed how many pages `total_count` needs and read
+    exactly those, starting from page 1 — the same first page every run. After
+    the first import ever, every product it fetched already existed, the
+    importer skipped them all, and the owner pressed «استيراد» to watch fifty
+    duplicates get refused: requested 50, imported 0, reported success.
+
+    `exclude_ids` carries the external ids the shop already owns; pages are
+    read until enough NEW products are found or the supplier runs dry.
+    """
+    exclude = set(exclude_ids or ())
+    results = {
+        "total_requested": total_count,
+        "total_fetched": 0,
+        "ok": 0,
+        "failed": 0,
+        "skipped_existing": 0,
+        "rejected_off_category": 0,
+        "batches": [],
+        "products": []
+    }
+
+    page_size = BATCH_SIZE
+    logger.info(f"🚀 Starting bulk import: {total_count} new products, {len(exclude)} already owned")
+
+    # CJ can repeat an item across pages; one run must not import it twice.
+    seen_pids: Set[str] = set()
+    pager = _PagePrefetcher(keyword, page_size)
+    try:
+        await _read_pages(pager, total_count, exclude, seen_pids, results)
+    finally:
+        # The pages requested ahead of a stop are not wanted; do not wait on CJ for them.
+        await pager.close()
+    products_fetched = results["ok"]
 
     results["total_fetched"] = products_fetched
 
@@ -0,0 +1,230 @@
+"""
+Every index the backend reads through, declared in one place.
+
+For a long time the only index this code ever created was the order
+idempotency one, tucked into a startup hook about Arabic names. Every other
+hot lookup — a product by id, an order by its number or its payment token, a
+cart or a wishlist by its owner, a user by email, a refresh token's
+revocation by jti — was a collection scan, and got slower with every row.
+
+INDEXES below is the list: collection -> [(keys, options)], in
+create_index's own terms. reconcile() brings a database in line with it at
+every boot, and on demand through /api/admin/indexes. It is idempotent: an
+index already there with the same keys and options is left alone, whatever
+it is named. It never drops anything. What it cannot settle it reports:
+
+  missing      declared, not present (creation failed, or this was a check)
+  conflicting  present under the same keys with different options — unique
+               or TTL — which only a person should resolve, by dropping it
+  undeclared   present in the database, not declared here
+  unused       never used since the server started ($indexStats; MongoDB
+               only — None where the backend cannot say)
+
+A new query path ships with its index by adding a line here; the report
+says when it did not.
+
+A unique index cannot be built over rows that already break it. The
+(source, external_id) one is the case in point: a catalogue the old importer
+filled twice fails it until /api/admin/products/dedupe has run. It is then
+reported missing, the importer's own $in check guards it meanwhile, and the
+next reconcile creates it.
+"""
+import logging
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from core.security import REFRESH_TOKEN_EXPIRE_DAYS
+from . import recommendations, sales_rollup
+
+logger = logging.getLogger(__name__)
+
+Keys = List[Tuple[str, int]]
+IndexSpec = Tuple[Keys, Dict[str, Any]]
+
+# The options that make two indexes on the same keys different indexes.
+_MEANINGFUL = ("unique", "sparse", "partialFilterExpression", "expireAfterSeconds")
+
+# A value that is really there: null and missing fields are left out of
+# unique indexes, so rows without one do not all collide.
+_IS_STRING = {"$type": "string"}
+
+# The storefront grid: the live-product predicate (`listed`, matched by
+# equality), the category it is filtered by, then the sort key with `id` as
+# the tie-breaker. One of each without the category for the unfiltered grid.
+# Every field ahead of the sort key is a single value, so the index hands rows
+# back in sort order; either direction of a sort walks the same index.
+PRODUCT_LISTING_INDEXES: List[Keys] = [
+    *([("listed", 1), ("category", 1), (field, 1), ("id", 1)]
+      for field in ("created_at", "price", "rating")),
+    *([("listed", 1), (field, 1), ("id", 1)] for field in ("created_at", "price", "rating")),
+]
+
+INDEXES: Dict[str, List[IndexSpec]] = {
+    "products": [
+        ([("id", 1)], {"unique": True, "partialFilterExpression": {"id": _IS_STRING}}),
+        # One product per supplier item; see the module docstring.
+        ([("source", 1), ("external_id", 1)],
+         {"unique": True, "partialFilterExpression": {"external_id": _IS_STRING}}),
+        *((keys, {}) for keys in PRODUCT_LISTING_INDEXES),
+        # The admin catalogue's pages: published or staged, newest first, and
+        # the same within a category.
+        ([("staging", 1), ("created_at", 1), ("id", 1)], {}),
+        ([("staging", 1), ("category", 1), ("created_at", 1), ("id", 1)], {}),
+        # What the storefront backfill looks for.
+        ([("storefront_version", 1)], {}),
+        ([("off_niche_version", 1)], {}),
+        # The off-niche screen's pages, newest first.
+        ([("off_niche", 1), ("created_at", 1), ("id", 1)], {}),
+        # What the catalogue text migration looks for (services/migrations.py).
+        ([("translation_version", 1)], {}),
+    ],
+    "orders": [
+        ([("id", 1)], {"unique": True, "partialFilterExpression": {"id": _IS_STRING}}),
+        ([("order_number", 1)],
+         {"unique": True, "partialFilterExpression": {"order_number": _IS_STRING}}),
+        # The iyzico callback finds its order by the token alone.
+        ([("payment_token", 1)],
+         {"unique": True, "partialFilterExpression": {"payment_token": _IS_STRING}}),
+        # "My orders", newest first.
+        ([("user_id", 1), ("created_at", -1)], {}),
+        # A retried checkout finds the order it already placed.
+        ([("user_id", 1), ("idempotency_key", 1)],
+         {"unique": True, "sparse": True, "name": "orders_user_id_idempotency_unique"}),
+        # What the sales rollup and the admin list range over.
+        ([("created_at", 1)], {}),
+        # Which products an order points at, for the dedupe job.
+        ([("items.product_id", 1)], {}),
+    ],
+    "carts": [
+        # One cart per shopper: get_cart creates it on a miss, and two tabs
+        # missing at once made two.
+        ([("user_id", 1)], {"unique": True}),
+    ],
+    "wishlists": [
+        ([("user_id", 1)], {"unique": True}),
+    ],
+    "users": [
+        ([("id", 1)], {"unique": True, "partialFilterExpression": {"id": _IS_STRING}}),
+        ([("email", 1)], {"unique": True, "partialFilterExpression": {"email": _IS_STRING}}),
+    ],
+    "refresh_tokens": [
+        ([("jti", 1)], {}),
+        # Signing a user out everywhere reads every token they hold.
+        ([("user_id", 1)], {}),
+    ],
+    "revoked_tokens": [
+        ([("jti", 1)], {"unique": True}),
+        # A revoked refresh token only needs remembering until it would have
+        # expired anyway; MongoDB deletes the row after that.
+        ([("revoked_at", 1)], {"expireAfterSeconds": REFRESH_TOKEN_EXPIRE_DAYS * 24 * 60 * 60}),
+    ],
+    "password_reset_tokens": [
+        ([("token_hash", 1)], {}),
+        # Gone once expired: a reset link is good for minutes, not forever.
+        ([("expires_at", 1)], {"expireAfterSeconds": 0}),
+    ],
+    "recommendation_events": [
+        ([("created_at", 1)], {}),
+    ],
+    "import_jobs": [
+        ([("job_id", 1)], {"unique": True}),
+        # Whether a translate run is under way, and which ran before it.
+        ([("type", 1), ("status", 1), ("created_at", 1)], {}),
+    ],
+    # A translate run's lists, paged in the order they were found.
+    "translation_reports": [
+        ([("job_id", 1), ("kind", 1), ("seq", 1)], {}),
+    ],
+    **{name: list(specs) for name, specs in recommendations.INDEXES.items()},
+    **{name: list(specs) for name, specs in sales_rollup.INDEXES.items()},
+}
+
+
+def index_name(keys: Keys) -> str:
+    """The name MongoDB gives an index on `keys` when none is set."""
+    return "_".join(f"{field}_{direction}" for field, direction in keys)
+
+
+def _describe(keys: Keys, options: Dict[str, Any]) -> Dict[str, Any]:
+    return {"name": options.get("name") or index_name(keys),
+            "keys": [[field, direction] for field, direction in keys],
+            **{k: options[k] for k in _MEANINGFUL if k in options}}
+
+
+def _differences(options: Dict[str, Any], info: Dict[str, Any]) -> Dict[str, Any]:
+    wanted = {k: options.get(k) for k in _MEANINGFUL}
+    found = {k: info.get(k) for k in _MEANINGFUL}
+    # Absent and false say the same thing.
+    for side in (wanted, found):
+        for k in ("unique", "sparse"):
+            side[k] = bool(side[k])
+    return {k: {"declared": wanted[k], "found": found[k]}
+            for k in _MEANINGFUL if wanted[k] != found[k]}
+
+
+async def _usage(collection) -> Optional[Dict[str, int]]:
+    try:
+        stats = await collection.aggregate([{"$indexStats": {}}]).to_list(None)
+    except Exception:
+        return None
+    return {s["name"]: int((s.get("accesses") or {}).get("ops") or 0) for s in stats}
+
+
+async def reconcile(db, create: bool = True,
+                    collections: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """
+    Create every declared index not yet present (unless `create` is False),
+    and report on the rest. Never raises; never drops.
+    """
+    report: Dict[str, Any] = {}
+    created = missing = conflicting = 0
+    for name in (collections or INDEXES):
+        collection = db[name]
+        entry: Dict[str, Any] = {"created": [], "missing": [], "conflicting": [],
+                                 "undeclared": [], "unused": None}
+        try:
+            existing = await collection.index_information()
+        except Exception as e:
+            logger.error(f"⚠️ Could not list the indexes of {name}: {e}")
+            existing = {}
+        by_keys = {tuple(tuple(k) for k in info["key"]): (index, info)
+                   for index, info in existing.items()}
+
+        declared = set()
+        for keys, options in INDEXES.get(name, []):
+            key = tuple(tuple(k) for k in keys)
+            declared.add(key)
+            if key in by_keys:
+                index, info = by_keys[key]
+                differences = _differences(options, info)
+                if differences:
+                    entry["conflicting"].append({**_describe(keys, options),
+                                                 "present_as": index, "differences": differences})
+                continue
+            if not create:
+                entry["missing"].append(_describe(keys, options))
+                continue
+            try:
+                await collection.create_index(keys, **options)
+                entry["created"].append(_describe(keys, options))
+            except Exception as e:
+                logger.error(f"⚠️ Could not create index {index_name(keys)} on {name}: {e}")
+                entry["missing"].append({**_describe(keys, options), "error": str(e)[:300]})
+
+        entry["undeclared"] = [index for key, (index, _) in by_keys.items()
+                               if key not in declared and index != "_id_"]
+        usage = await _usage(collection)
+        if usage is not None:
+            entry["unused"] = sorted(index for index, ops in usage.items()
+                                     if ops == 0 and index != "_id_")
+
+        created += len(entry["created"])
+        missing += len(entry["missing"])
+        conflicting += len(entry["conflicting"])
+        report[name] = entry
+
+    if created:
+        logger.info(f"✅ Created {created} index(es)")
+    if missing or conflicting:
+        logger.warning(f"⚠️ Indexes: {missing} missing, {conflicting} conflicting — see /api/admin/indexes")
+    return {"ok": not (missing or conflicting), "created": created, "missing": missing,
+            "conflicting": conflicting, "collections": report}
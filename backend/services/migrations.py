@@ -0,0 +1,140 @@
+"""
+Catalogue migrations: a rule applied to every product once, in the
+background, where it can stop and carry on.
+
+A migration is a function from a product to the fields it should change,
+and a version. Every product it has seen is stamped with that version in
+`stamp_field`, changed or not, so a later run reads only what is older:
+products added since, and every product again once the version is bumped
+because the rule changed. The query is on an indexed field, so a run with
+nothing to do costs one index lookup.
+
+Its progress lives in the `migrations` collection, one document per
+migration:
+
+  _id         the migration's name
+  version     the version being (or last) applied
+  status      running | completed | failed
+  checkpoint  the id of the last product written — a run cut short by a
+              deploy or a crash carries on after it instead of from the top
+  processed   products read and stamped in this run
+  changed     of those, the ones the rule changed
+
+Batches are read in `id` order, BATCH_SIZE at a time with only the fields
+the rule reads, judged on a thread, and written back as one bulk write. This replaces a boot
+hook that read the whole catalogue into memory and wrote it back a row at a
+time before the app would answer, so cold start grew with the catalogue.
+"""
+import asyncio
+import logging
+from datetime import datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+from pymongo import UpdateOne
+
+from .bulk_writes import bulk_write
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+
+
+class Migration(NamedTuple):
+    name: str
+    version: int
+    # The product field that records the version a row was last migrated at.
+    stamp_field: str
+    # What `apply` reads; `id` is always included.
+    projection: Dict[str, int]
+    # The fields to $set on a product, or {} to leave it as it is.
+    apply: Callable[[Dict[str, Any]], Dict[str, Any]]
+    batch_size: int = BATCH_SIZE
+
+    def pending(self) -> Dict[str, Any]:
+        """Products not yet migrated at this version: unstamped, or older."""
+        return {self.stamp_field: {"$not": {"$gte": self.version}}}
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+async def run(
+    db,
+    migration: Migration,
+    on_written: Optional[Callable[[List[str]], Awaitable[None]]] = None,
+) -> Dict[str, Any]:
+    """
+    Apply `migration` to every product it has not yet seen at its version.
+
+    `on_written(ids)` is awaited after each batch with the products that
+    changed. Returns the migration's document as it stands at the end.
+    Raises what a batch raised, after recording it.
+    """
+    state = await db.migrations.find_one({"_id": migration.name}) or {}
+    resuming = state.get("version") == migration.version and state.get("status") in ("running", "failed")
+    checkpoint = state.get("checkpoint") if resuming else None
+    processed = state.get("processed", 0) if resuming else 0
+    changed = state.get("changed", 0) if resuming else 0
+    if checkpoint:
+        logger.info(f"🔁 Migration {migration.name} v{migration.version} resuming after {checkpoint}")
+
+    await db.migrations.update_one({"_id": migration.name}, {"$set": {
+        "version": migration.version,
+        "status": "running",
+        "checkpoint": checkpoint,
+        "processed": processed,
+        "changed": changed,
+        "started_at": state.get("started_at") if resuming else _now(),
+        "updated_at": _now(),
+        "finished_at": None,
+        "error": None,
+    }}, upsert=True)
+
+    projection = {**migration.projection, "_id": 0, "id": 1}
+    try:
+        while True:
+            query = {**migration.pending(), "id": {"$gt": checkpoint or ""}}
+            docs = await db.products.find(query, projection).sort("id", 1) \
+                .limit(migration.batch_size).to_list(length=None)
+            if not docs:
+                break
+
+            # The rule is plain Python over every row of the batch: on a
+            # thread, so the requests this worker serves are not held up.
+            changes = await asyncio.to_thread(lambda: [migration.apply(doc) for doc in docs])
+            ops, written = [], []
+            for doc, updates in zip(docs, changes):
+                if updates:
+                    written.append(doc["id"])
+                ops.append(UpdateOne({"id": doc["id"]},
+                                     {"$set": {**updates, migration.stamp_field: migration.version}}))
+            await bulk_write(db.products, ops)
+            if written and on_written is not None:
+                await on_written(written)
+
+            checkpoint = docs[-1]["id"]
+            processed += len(docs)
+            changed += len(written)
+            await db.migrations.update_one({"_id": migration.name}, {"$set": {
+                "checkpoint": checkpoint, "processed": processed, "changed": changed,
+                "updated_at": _now(),
+            }})
+            if len(docs) < migration.batch_size:
+                break
+            # Let the requests this worker is serving in.
+            await asyncio.sleep(0)
+    except Exception as e:
+        await db.migrations.update_one({"_id": migration.name}, {"$set": {
+            "status": "failed", "error": str(e)[:500], "updated_at": _now(),
+        }})
+        raise
+
+    # Done: the next run starts from the top, for whatever is added meanwhile.
+    await db.migrations.update_one({"_id": migration.name}, {"$set": {
+        "status": "completed", "checkpoint": None, "finished_at": _now(), "updated_at": _now(),
+    }})
+    if processed:
+        logger.info(f"✅ Migration {migration.name} v{migration.version}: "
+                    f"{processed} product(s) checked, {changed} changed")
+    return await db.migrations.find_one({"_id": migration.name})
@@ -0,0 +1,355 @@
+"""
+A cache of catalogue reads, in front of db.products.
+
+The storefront asks MongoDB for the same hot documents over and over: the
+product page, "add to cart", the wishlist, the comparison table, checkout,
+the category grids and the recommendation rows all read the same few
+hundred live products, one find per request. This keeps what they read:
+
+  by id       the live document of a product (LIVE_ONLY; the storefront's
+              own checks still run on it, as they did on the database row)
+  by listing  the documents a listing query returned, keyed by the query,
+              its sort, skip and limit
+
+Entries live at most CATALOGUE_CACHE_TTL seconds, and at most
+CATALOGUE_CACHE_SIZE of them, taking at most CATALOGUE_CACHE_BYTES between
+them, are kept, the least recently read going first. The byte bound is the
+one that matters for listings: a listing entry holds every document of its
+page, and the search box can make one for every query anyone types.
+
+Every read hands out its own deep copy. The storefront rewrites what it is
+given — the display corrections, the localised name, nested specifications
+— and a shallow copy let one request's edits leak into the cached document
+and into every later reader's.
+
+Writes invalidate. Every product write in this process already reports
+itself through server.catalogue_changed(); that calls invalidate(ids),
+which drops those products and every listing (any write may move a product
+into or out of any listing). With no ids it drops everything. The importer
+reports the rows it inserts the same way. Writes from other processes are
+picked up when the entry's TTL runs out — or at once, with a shared backend.
+
+Backends:
+
+  MemoryBackend   per process, the default
+  RedisBackend    shared by every worker; set CATALOGUE_CACHE_REDIS_URL.
+                  Anything with redis.asyncio's get/mget/set/delete/incr
+                  will do, which is how the tests run it against a fake.
+
+Listings and products are filed under generation counters kept in the
+backend, so "drop every listing" is one INCR rather than a key scan, and
+entries of a past generation simply age out.
+"""
+from __future__ import annotations
+
+import asyncio
+import copy
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Set
+
+import bson
+
+logger = logging.getLogger(__name__)
+
+CATALOGUE_CACHE_TTL = float(os.getenv("CATALOGUE_CACHE_TTL", "60"))
+CATALOGUE_CACHE_SIZE = int(os.getenv("CATALOGUE_CACHE_SIZE", "5000"))
+CATALOGUE_CACHE_BYTES = int(os.getenv("CATALOGUE_CACHE_BYTES", str(64 * 1024 * 1024)))
+CATALOGUE_CACHE_REDIS_URL = os.getenv("CATALOGUE_CACHE_REDIS_URL", "")
+
+# Generation counters: ALL files everything, LISTINGS the listing entries.
+_ALL = "gen:all"
+_LISTINGS = "gen:listings"
+
+
+class MemoryBackend:
+    """
+    An LRU of at most `size` entries and about `max_bytes` of documents,
+    each kept for at most `ttl` seconds. An entry is weighed by its BSON
+    length, what the same value costs in Redis.
+    """
+
+    def __init__(self, size: int = CATALOGUE_CACHE_SIZE, ttl: float = CATALOGUE_CACHE_TTL,
+                 max_bytes: int = CATALOGUE_CACHE_BYTES):
+        self.size = size
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.evictions = 0
+        # key -> (expires, value, bytes)
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._counters: Dict[str, int] = {}
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+
+    async def get_many(self, keys: List[str]) -> List[Any]:
+        now = time.monotonic()
+        out = []
+        for key in keys:
+            entry = self._entries.get(key)
+            if entry is None:
+                out.append(None)
+            elif entry[0] <= now:
+                self._drop(key)
+                out.append(None)
+            else:
+                self._entries.move_to_end(key)
+                out.append(entry[1])
+        return out
+
+    async def set_many(self, items: Dict[str, Any]) -> None:
+        expires = time.monotonic() + self.ttl
+        for key, value in items.items():
+            weight = len(bson.encode({"v": value}))
+            self._drop(key)
+            if weight > self.max_bytes:
+                continue
+            self._entries[key] = (expires, value, weight)
+            self.bytes += weight
+        while len(self._entries) > self.size or self.bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    async def delete(self, keys: List[str]) -> None:
+        for key in keys:
+            self._drop(key)
+
+    async def counters(self, names: List[str]) -> List[int]:
+        return [self._counters.get(name, 0) for name in names]
+
+    async def incr(self, name: str) -> None:
+        self._counters[name] = self._counters.get(name, 0) + 1
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class RedisBackend:
+    """
+    The same cache in Redis, shared by every worker.
+
+    Values are stored as BSON — what the documents were in MongoDB — so a
+    datetime comes back a datetime. Redis does its own eviction (set a
+    maxmemory policy); `evictions` here only counts what this class drops.
+    """
+
+    def __init__(self, client, ttl: float = CATALOGUE_CACHE_TTL, prefix: str = "catalogue:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.evictions = 0
+
+    async def get_many(self, keys: List[str]) -> List[Any]:
+        if not keys:
+            return []
+        raw = await self.client.mget([self.prefix + key for key in keys])
+        return [bson.decode(blob)["v"] if blob is not None else None for blob in raw]
+
+    async def set_many(self, items: Dict[str, Any]) -> None:
+        ttl = max(1, int(self.ttl))
+        for key, value in items.items():
+            await self.client.set(self.prefix + key, bson.encode({"v": value}), ex=ttl)
+
+    async def delete(self, keys: List[str]) -> None:
+        if keys:
+            await self.client.delete(*[self.prefix + key for key in keys])
+
+    async def counters(self, names: List[str]) -> List[int]:
+        raw = await self.client.mget([self.prefix + name for name in names])
+        return [int(value or 0) for value in raw]
+
+    async def incr(self, name: str) -> None:
+        await self.client.incr(self.prefix + name)
+
+    def __len__(self) -> int:
+        return 0
+
+
+def _query_key(parts: Dict[str, Any]) -> str:
+    text = json.dumps(parts, sort_keys=True, default=str, separators=(",", ":"))
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class ProductCache:
+    """Catalogue documents by id and by listing query; see the module docstring."""
+
+    def __init__(self, backend=None):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.hits = 0
+        self.misses = 0
+        # Bumped by every invalidate(). A read that began before a write
+        # in this process does not file what it read under the new state.
+        self._version = 0
+        self._pending_ids: Set[str] = set()
+        self._pending_all = False
+        self._db = None
+
+    def bind(self, db) -> None:
+        """Serve `db`: a different database than last time starts empty."""
+        if self._db is not db:
+            self._db = db
+            self.invalidate()
+
+    # -- invalidation ------------------------------------------------------
+
+    def invalidate(self, ids: Optional[Iterable[str]] = None) -> None:
+        """
+        Forget these products and every listing; with no ids, everything.
+
+        Synchronous, like the catalogue_changed() it is called from: the
+        drop is recorded here and applied before the next read, and sent
+        to a shared backend straight away in the background.
+        """
+        self._version += 1
+        if ids is None:
+            self._pending_all = True
+            self._pending_ids.clear()
+        elif not self._pending_all:
+            self._pending_ids.update(i for i in ids if i)
+        try:
+            asyncio.get_running_loop().create_task(self._flush())
+        except RuntimeError:
+            pass
+
+    async def _flush(self) -> None:
+        if not (self._pending_all or self._pending_ids):
+            return
+        everything, ids = self._pending_all, list(self._pending_ids)
+        self._pending_all = False
+        self._pending_ids = set()
+        try:
+            if everything:
+                await self.backend.incr(_ALL)
+            else:
+                (all_gen,) = await self.backend.counters([_ALL])
+                await self.backend.delete([f"p:{all_gen}:{pid}" for pid in ids])
+                await self.backend.incr(_LISTINGS)
+        except Exception as e:
+            logger.error(f"⚠️ Catalogue cache invalidation failed, dropping everything next time: {e}")
+            self._pending_all = True
+
+    # -- reads -------------------------------------------------------------
+
+    async def _read(self, keys: List[str]) -> List[Any]:
+        try:
+            return await self.backend.get_many(keys)
+        except Exception as e:
+            logger.error(f"⚠️ Catalogue cache read failed, going to the database: {e}")
+            return [None] * len(keys)
+
+    async def _keep(self, version: int, items: Dict[str, Any]) -> None:
+        if version != self._version or not items:
+            return
+        try:
+            await self.backend.set_many(items)
+        except Exception as e:
+            logger.error(f"⚠️ Catalogue cache write failed: {e}")
+
+    async def _generations(self) -> List[int]:
+        try:
+            return await self.backend.counters([_ALL, _LISTINGS])
+        except Exception as e:
+            logger.error(f"⚠️ Catalogue cache unreachable: {e}")
+            return [0, 0]
+
+    async def products(
+        self,
+        ids: List[str],
+        load: Callable[[List[str]], Awaitable[List[Dict[str, Any]]]],
+        fresh: bool = False,
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        id -> document for those of `ids` that exist; `load(missing)` reads
+        the ones not kept, in one call. Absent products are not remembered.
+
+        `fresh` reads every one from `load` and keeps what it read — for the
+        reads that must not be a TTL behind another worker's write.
+        """
+        await self._flush()
+        version = self._version
+        ids = list(dict.fromkeys(i for i in ids if i))
+        all_gen, _ = await self._generations()
+        found: Dict[str, Dict[str, Any]] = {}
+        missing: List[str] = []
+        if fresh:
+            missing = ids
+        else:
+            keys = [f"p:{all_gen}:{pid}" for pid in ids]
+            for pid, doc in zip(ids, await self._read(keys)):
+                if doc is None:
+                    missing.append(pid)
+                else:
+                    found[pid] = copy.deepcopy(doc)
+            self.hits += len(found)
+            self.misses += len(missing)
+        if missing:
+            loaded = {doc["id"]: doc for doc in await load(missing) if doc.get("id")}
+            for doc in loaded.values():
+                doc.pop("_id", None)
+            await self._keep(version, {f"p:{all_gen}:{pid}": doc for pid, doc in loaded.items()})
+            found.update((pid, copy.deepcopy(doc)) for pid, doc in loaded.items())
+        return found
+
+    async def product(
+        self,
+        product_id: str,
+        load: Callable[[List[str]], Awaitable[List[Dict[str, Any]]]],
+    ) -> Optional[Dict[str, Any]]:
+        return (await self.products([product_id], load)).get(product_id)
+
+    async def listing(
+        self,
+        query: Dict[str, Any],
+        load: Callable[[], Awaitable[List[Dict[str, Any]]]],
+    ) -> List[Dict[str, Any]]:
+        """The documents `load()` returns for `query` (any JSON-able description)."""
+        await self._flush()
+        version = self._version
+        all_gen, list_gen = await self._generations()
+        key = f"l:{all_gen}:{list_gen}:{_query_key(query)}"
+        (docs,) = await self._read([key])
+        if docs is not None:
+            self.hits += 1
+            return copy.deepcopy(docs)
+        self.misses += 1
+        docs = await load()
+        for doc in docs:
+            doc.pop("_id", None)
+        await self._keep(version, {key: docs})
+        return copy.deepcopy(docs)
+
+    def stats(self) -> Dict[str, Any]:
+        reads = self.hits + self.misses
+        return {
+            "backend": type(self.backend).__name__,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / reads, 4) if reads else None,
+            "evictions": self.backend.evictions,
+            "entries": len(self.backend),
+            "bytes": getattr(self.backend, "bytes", None),
+            "ttl_seconds": self.backend.ttl,
+        }
+
+
+def _backend_from_env():
+    if not CATALOGUE_CACHE_REDIS_URL:
+        return MemoryBackend()
+    try:
+        import redis.asyncio as redis
+    except ImportError:
+        logger.error("⚠️ CATALOGUE_CACHE_REDIS_URL is set but the redis package is not installed; "
+                     "caching the catalogue per process instead")
+        return MemoryBackend()
+    return RedisBackend(redis.from_url(CATALOGUE_CACHE_REDIS_URL))
+
+
+# The one cache every catalogue reader and writer in this process shares.
+catalogue_cache = ProductCache(_backend_from_env())
@@ -28,6 +28,7 @@ them since the day it was written; the English one, which is what a Turkish
 reviewer reads, carried CJ's keyword padding and named no material at all.
 """
 import re
+from functools import lru_cache
 from typing import Any, Dict, List, Optional, Tuple
 
 # ── Product types ────────────────────────────────────────────────────────────
@@ -515,6 +516,51 @@ def _spans(haystack: str, key: str) -> Optional[str]:
     return None
 
 
+class _Table:
+    """
+    A vocabulary table compiled for reading, once, at import.
+
+    Reading used to sort the table and probe the title for every key in it,
+    three plural forms each — a few hundred substring searches per table,
+    per title, for the handful of words a title actually has. Here the
+    entries are sorted once, and indexed by the words they need: a probe
+    only happens for entries whose every word is in the title. The order
+    they are probed in, and what each probe matches and consumes, is
+    exactly the old one — only the entries that could not have matched are
+    skipped.
+    """
+
+    __slots__ = ("entries", "_needs", "_by_word")
+
+    def __init__(self, table: List):
+        self.entries = _by_length(table)
+        # Per entry: the words it needs as they are, and the forms its last
+        # word may take (the plurals _spans accepts).
+        self._needs: List[Tuple[frozenset, Tuple[str, ...]]] = []
+        self._by_word: Dict[str, List[int]] = {}
+        for rank, entry in enumerate(self.entries):
+            words = entry[0].split()
+            last = words[-1]
+            forms = (last, f"{last}s", f"{last}es")
+            self._needs.append((frozenset(words[:-1]), forms))
+            for word in (words[:1] if len(words) > 1 else forms):
+                self._by_word.setdefault(word, []).append(rank)
+
+    def candidates(self, haystack: str) -> List[Tuple]:
+        """The entries that could match `haystack` or anything left of it, in order."""
+        present = set(haystack.split())
+        ranks = set()
+        for word in present:
+            ranks.update(self._by_word.get(word, ()))
+        out = []
+        for rank in sorted(ranks):
+            fixed, forms = self._needs[rank]
+            if fixed <= present and (forms[0] in present or forms[1] in present
+                                     or forms[2] in present):
+                out.append(self.entries[rank])
+        return out
+
+
 class _Reader:
     """
     One pass over a title, where matching consumes what it matched.
@@ -525,10 +571,10 @@ class _Reader:
     shop offered a snake bracelet decorated with a flower it does not have.
     """
 
-    def __init__(self, text: str):
-        self.remaining = _normalise(text)
+    def __init__(self, text: str, normalised: bool = False):
+        self.remaining = text if normalised else _normalise(text)
 
-    def take(self, table: List) -> List[Tuple[Tuple, str]]:
+    def take(self, table: "_Table") -> List[Tuple[Tuple, str]]:
         """
         Every entry the text names, paired with the words that named it.
 
@@ -539,14 +585,14 @@ class _Reader:
         free to drift away from it.
         """
         found = []
-        for entry in _by_length(table):
+        for entry in table.candidates(self.remaining):
             present = _spans(self.remaining, entry[0])
             if present:
                 found.append((entry, present))
                 self.remaining = self.remaining.replace(f" {present} ", " ")
         return found
 
-    def take_head(self, table: List) -> Optional[Tuple[Tuple, str]]:
+    def take_head(self, table: "_Table") -> Optional[Tuple[Tuple, str]]:
         """
         The product type, read as English reads it: the head noun is the last.
 
@@ -559,7 +605,7 @@ class _Reader:
         `_by_length` has already put it first.
         """
         best = None
-        for entry in _by_length(table):
+        for entry in table.candidates(self.remaining):
             present = _spans(self.remaining, entry[0])
             if not present:
                 continue
@@ -573,6 +619,22 @@ class _Reader:
         return entry, present
 
 
+# Compiled once. The stone table is read with the unnameable stones beside
+# it; see analyse.
+_TYPES_TABLE = _Table(_TYPES)
+_MATERIALS_TABLE = _Table(_MATERIALS)
+_ALL_STONES_TABLE = _Table(_STONES + _UNNAMEABLE_STONES)
+_MOTIFS_TABLE = _Table(_MOTIFS)
+_STYLES_TABLE = _Table(_STYLES)
+_OCCASIONS_TABLE = _Table(_OCCASIONS)
+_AUDIENCES_TABLE = _Table(_AUDIENCES)
+
+# Distinct normalised titles whose reading is remembered. The importer, the
+# boot pass, the translate button and the material refresh all read the same
+# titles, and a catalogue repeats the same few hundred phrasings endlessly.
+ANALYSE_CACHE_SIZE = 20_000
+
+
 def _agree(pair: Tuple[str, str], gender: str) -> str:
     return pair[1] if gender == "f" else pair[0]
 
@@ -654,11 +716,19 @@ def analyse(english_title: str) -> Dict:
 
     Returned as plain data so both the title and the description can be built
     from one pass, and so a test can assert on what was understood rather than
-    only on the sentence that came out.
+    only on the sentence that came out. Remembered per normalised title; each
+    caller gets its own copy of the lists.
     """
-    reader = _Reader(english_title)
+    facts = _analyse_normalised(_normalise(english_title))
+    return {key: list(value) if isinstance(value, list) else value
+            for key, value in facts.items()}
+
+
+@lru_cache(maxsize=ANALYSE_CACHE_SIZE)
+def _analyse_normalised(text: str) -> Dict:
+    reader = _Reader(text, normalised=True)
 
-    head = reader.take_head(_TYPES)
+    head = reader.take_head(_TYPES_TABLE)
     if head:
         (type_key, arabic_type, gender), type_span = head
     else:
@@ -671,7 +741,7 @@ def analyse(english_title: str) -> Dict:
     # Read, then filtered: a material with no Arabic behind it is one the shop
     # refuses to name — "18K" with no "plated" after it — and it is here so it
     # gets consumed rather than left for another table to misread.
-    material_hits = reader.take(_MATERIALS)
+    material_hits = reader.take(_MATERIALS_TABLE)
     noun_hits = [(entry, span) for entry, span in material_hits
                  if entry[2] == "noun" and entry[1]]
     adjective_hits = [(entry, span) for entry, span in material_hits
@@ -681,11 +751,11 @@ def analyse(english_title: str) -> Dict:
     # and the styles table finds nothing but the motif table is still hunting,
     # and a word we refused to print as a stone comes back as a shape.
     stone_hits = [(entry, span) for entry, span
-                  in reader.take(_STONES + _UNNAMEABLE_STONES) if entry[1]]
-    motif_hits = reader.take(_MOTIFS)
-    style_hits = reader.take(_STYLES)
-    occasion_hits = reader.take(_OCCASIONS)
-    audience_hits = reader.take(_AUDIENCES)
+                  in reader.take(_ALL_STONES_TABLE) if entry[1]]
+    motif_hits = reader.take(_MOTIFS_TABLE)
+    style_hits = reader.take(_STYLES_TABLE)
+    occasion_hits = reader.take(_OCCASIONS_TABLE)
+    audience_hits = reader.take(_AUDIENCES_TABLE)
 
     audiences = _dedupe([entry[1] for entry, _ in audience_hits])
 
@@ -1039,10 +1109,10 @@ def material_from_supplier(raw: Optional[str], gender: str = "m") -> Optional[Di
         return None
 
     reader = _Reader(str(raw))
-    material_hits = reader.take(_MATERIALS)
+    material_hits = reader.take(_MATERIALS_TABLE)
     nouns = [e[1] for e, _ in material_hits if e[2] == "noun" and e[1]]
     adjectives = [_agree(e[1], gender) for e, _ in material_hits if e[2] == "adj" and e[1][0]]
-    stone_hits = [(e, s) for e, s in reader.take(_STONES + _UNNAMEABLE_STONES) if e[1]]
+    stone_hits = [(e, s) for e, s in reader.take(_ALL_STONES_TABLE) if e[1]]
 
     # Stones sit beside the metals here rather than behind them, unlike the
     # title reading: CJ's field is a list of what the piece is made of —
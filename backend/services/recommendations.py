@@ -0,0 +1,316 @@
+"""
+Recommendation tables, kept current as orders are paid and products opened.
+
+Every /api/recommendations request used to compute its answer from the raw
+history: bestsellers and "bought together" walked the whole orders
+collection, trending walked a fortnight of click events, and "personalized"
+did a product lookup for every line of every order the shopper ever placed.
+The row under every product page cost more the longer the shop traded.
+
+The answers are kept as small tables instead, each updated the moment the
+fact behind it happens and read with one indexed query:
+
+  rec_bestsellers   product -> units sold in paid orders (and its category)
+  rec_copurchase    (product, other) -> paid orders containing both
+  rec_trending      product -> time-decayed count of opens
+  rec_affinity      (user, category) -> how much they buy and open there
+
+Only paid orders count. An order placed and never paid for is not a sale,
+and counting it let one abandoned checkout make a product a "bestseller".
+
+Trending decays without anyone rewriting it: an open at time t weighs
+2 ** ((t - TRENDING_EPOCH) / half-life). Every product's sum of weights is
+then its decayed count scaled by the same factor, so sorting by the sum is
+sorting by the decayed count — and a click from a fortnight ago weighs a few
+percent of a click today. The sum itself passes what a float holds about eight
+years after the epoch, and loses the resolution to count one more open long
+before that, so what is stored is its log2, `log_score`, and an open adds
+its weight with logaddexp2 in a compare-and-set.
+
+Whatever this module stores differently from before bumps TABLES_VERSION,
+and the next boot rebuilds every table from history. One worker does it:
+the first to claim the state document.
+"""
+import logging
+import math
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from .bulk_writes import bulk_write
+
+logger = logging.getLogger(__name__)
+
+TRENDING_EPOCH = datetime(2026, 1, 1, tzinfo=timezone.utc)
+TRENDING_HALF_LIFE_DAYS = 3.0
+
+# How much one line of a paid order says about a shopper's taste, against
+# one product opened. The same two-to-one the strategy has always used.
+AFFINITY_PER_PURCHASE = 2
+AFFINITY_PER_OPEN = 1
+
+STATE_ID = "recommendations"
+# 2: trending stored as log2 (`log_score`), no longer as the raw sum.
+TABLES_VERSION = 2
+# A rebuild claimed longer ago than this is taken to have died with its
+# worker, and the next boot claims it again.
+REBUILD_CLAIM_TIMEOUT = timedelta(hours=1)
+
+# Created with every other index by services/indexes.py.
+INDEXES = {
+    "rec_bestsellers": [
+        ([("product_id", 1)], {"unique": True}),
+        ([("units", -1)], {}),
+        ([("category", 1), ("units", -1)], {}),
+    ],
+    "rec_copurchase": [
+        ([("product_id", 1), ("other_id", 1)], {"unique": True}),
+        ([("product_id", 1), ("count", -1)], {}),
+    ],
+    "rec_trending": [
+        ([("product_id", 1)], {"unique": True}),
+        ([("log_score", -1)], {}),
+    ],
+    "rec_affinity": [
+        ([("user_id", 1), ("category", 1)], {"unique": True}),
+        ([("user_id", 1), ("score", -1)], {}),
+    ],
+}
+
+
+def _line_product(item: Dict[str, Any]) -> Optional[str]:
+    return item.get("product_id") or item.get("id")
+
+
+def trending_weight(when: datetime) -> float:
+    """log2 of what one open at `when` adds to a product's trending sum."""
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    days = (when - TRENDING_EPOCH).total_seconds() / 86400
+    return days / TRENDING_HALF_LIFE_DAYS
+
+
+def logaddexp2(a: float, b: float) -> float:
+    """log2(2**a + 2**b), without computing either power."""
+    high, low = max(a, b), min(a, b)
+    return high + math.log2(1.0 + 2.0 ** (low - high))
+
+
+async def _categories(db, product_ids: Iterable[str]) -> Dict[str, str]:
+    ids = list({pid for pid in product_ids if pid})
+    if not ids:
+        return {}
+    docs = await db.products.find({"id": {"$in": ids}}, {"_id": 0, "id": 1, "category": 1}).to_list(None)
+    return {d["id"]: d.get("category") for d in docs if d.get("id")}
+
+
+def _order_updates(order: Dict[str, Any], categories: Dict[str, str], sign: int) -> Dict[str, List[UpdateOne]]:
+    units: Dict[str, int] = {}
+    for item in order.get("items") or []:
+        pid = _line_product(item)
+        if pid:
+            units[pid] = units.get(pid, 0) + int(item.get("quantity") or 1)
+
+    ops: Dict[str, List[UpdateOne]] = {name: [] for name in INDEXES}
+    for pid, count in units.items():
+        ops["rec_bestsellers"].append(UpdateOne(
+            {"product_id": pid},
+            {"$inc": {"units": sign * count}, "$set": {"category": categories.get(pid)}},
+            upsert=True,
+        ))
+        for other in units:
+            if other != pid:
+                ops["rec_copurchase"].append(UpdateOne(
+                    {"product_id": pid, "other_id": other},
+                    {"$inc": {"count": sign}}, upsert=True,
+                ))
+
+    user_id = order.get("user_id")
+    if user_id:
+        per_category: Dict[str, int] = {}
+        for pid in units:
+            category = categories.get(pid)
+            if category:
+                per_category[category] = per_category.get(category, 0) + AFFINITY_PER_PURCHASE
+        for category, score in per_category.items():
+            ops["rec_affinity"].append(UpdateOne(
+                {"user_id": user_id, "category": category},
+                {"$inc": {"score": sign * score}}, upsert=True,
+            ))
+    return ops
+
+
+async def _apply(db, ops: Dict[str, List[UpdateOne]]) -> None:
+    for collection, requests in ops.items():
+        if requests:
+            await bulk_write(db[collection], requests)
+
+
+async def record_paid_order(db, order_id: str) -> bool:
+    """
+    Count a paid order into the tables, once.
+
+    The order is claimed with a flag in the same write that checks it, so a
+    payment confirmed twice — an iyzico retry, a double click — is counted
+    once. Returns whether this call did the counting.
+    """
+    order = await db.orders.find_one_and_update(
+        {"id": order_id, "payment_status": "paid", "recommendations_counted": {"$ne": True}},
+        {"$set": {"recommendations_counted": True}},
+        projection={"_id": 0, "items": 1, "user_id": 1},
+    )
+    if not order:
+        return False
+    categories = await _categories(db, (_line_product(i) for i in order.get("items") or []))
+    await _apply(db, _order_updates(order, categories, +1))
+    return True
+
+
+async def forget_paid_order(db, order_id: str) -> bool:
+    """Take back what record_paid_order counted, when a payment is withdrawn."""
+    order = await db.orders.find_one_and_update(
+        {"id": order_id, "recommendations_counted": True},
+        {"$set": {"recommendations_counted": False}},
+        projection={"_id": 0, "items": 1, "user_id": 1},
+    )
+    if not order:
+        return False
+    categories = await _categories(db, (_line_product(i) for i in order.get("items") or []))
+    await _apply(db, _order_updates(order, categories, -1))
+    return True
+
+
+async def record_open(db, product_id: str, user_id: Optional[str], when: Optional[datetime] = None) -> None:
+    """Count one open of a product into trending, and the shopper's taste."""
+    weight = trending_weight(when or datetime.now(timezone.utc))
+    # logaddexp2 is no update operator, so: read the score, write the sum only
+    # if the score is still the one read, and read again if it is not.
+    while True:
+        doc = await db.rec_trending.find_one({"product_id": product_id}, {"_id": 0, "log_score": 1})
+        if doc is None:
+            result = await db.rec_trending.update_one(
+                {"product_id": product_id}, {"$setOnInsert": {"log_score": weight}}, upsert=True)
+            if result.upserted_id is not None:
+                break
+            continue
+        result = await db.rec_trending.update_one(
+            {"product_id": product_id, "log_score": doc["log_score"]},
+            {"$set": {"log_score": logaddexp2(doc["log_score"], weight)}})
+        if result.matched_count:
+            break
+    if user_id:
+        category = (await _categories(db, [product_id])).get(product_id)
+        if category:
+            await db.rec_affinity.update_one(
+                {"user_id": user_id, "category": category},
+                {"$inc": {"score": AFFINITY_PER_OPEN}}, upsert=True,
+            )
+
+
+# -- reading ---------------------------------------------------------------
+
+async def bestseller_ids(db, limit: int, category: Optional[str] = None,
+                         exclude: Optional[str] = None) -> List[str]:
+    query: Dict[str, Any] = {"units": {"$gt": 0}}
+    if category:
+        query["category"] = category
+    if exclude:
+        query["product_id"] = {"$ne": exclude}
+    docs = await db.rec_bestsellers.find(query, {"_id": 0, "product_id": 1}).sort(
+        "units", -1).limit(limit).to_list(None)
+    return [d["product_id"] for d in docs]
+
+
+async def bought_with_ids(db, product_id: str, limit: int) -> List[str]:
+    docs = await db.rec_copurchase.find(
+        {"product_id": product_id, "count": {"$gt": 0}}, {"_id": 0, "other_id": 1}
+    ).sort("count", -1).limit(limit).to_list(None)
+    return [d["other_id"] for d in docs]
+
+
+async def trending_ids(db, limit: int) -> List[str]:
+    docs = await db.rec_trending.find({}, {"_id": 0, "product_id": 1}).sort(
+        "log_score", -1).limit(limit).to_list(None)
+    return [d["product_id"] for d in docs]
+
+
+async def favourite_categories(db, user_id: str, limit: int = 3) -> List[str]:
+    docs = await db.rec_affinity.find(
+        {"user_id": user_id, "score": {"$gt": 0}}, {"_id": 0, "category": 1}
+    ).sort("score", -1).limit(limit).to_list(None)
+    return [d["category"] for d in docs]
+
+
+# -- building from history -------------------------------------------------
+
+async def rebuild(db, events_since: Optional[datetime] = None) -> Dict[str, int]:
+    """
+    Recompute every table from the order book and the click log.
+
+    For the first boot after the tables were introduced, and for repair. The
+    incremental writes above keep them current from then on; this is the
+    only place that reads the whole history.
+    """
+    for collection in INDEXES:
+        await db[collection].delete_many({})
+    await db.orders.update_many({}, {"$unset": {"recommendations_counted": ""}})
+
+    orders = 0
+    async for order in db.orders.find({"payment_status": "paid"}, {"_id": 0, "id": 1}):
+        if await record_paid_order(db, order["id"]):
+            orders += 1
+
+    query: Dict[str, Any] = {}
+    if events_since is not None:
+        query["created_at"] = {"$gte": events_since.isoformat()}
+    events = 0
+    async for ev in db.recommendation_events.find(query, {"_id": 0}):
+        if not ev.get("product_id"):
+            continue
+        try:
+            when = datetime.fromisoformat(str(ev.get("created_at")))
+        except ValueError:
+            when = None
+        await record_open(db, ev["product_id"], ev.get("user_id"), when)
+        events += 1
+
+    await db.site_config.update_one(
+        {"_id": STATE_ID},
+        {"$set": {"built_at": datetime.now(timezone.utc).isoformat(),
+                  "version": TABLES_VERSION, "orders": orders, "events": events}},
+        upsert=True,
+    )
+    logger.info(f"✅ Recommendation tables rebuilt from {orders} paid orders and {events} opens")
+    return {"orders": orders, "events": events}
+
+
+async def ensure_built(db) -> bool:
+    """
+    Build the tables from history if they were never built at this
+    TABLES_VERSION. Returns whether this call built them.
+
+    Every worker calls this at boot. Reading the state and then rebuilding
+    let two of them rebuild at once, each wiping the tables under the other
+    and counting every paid order twice between them. The rebuild is claimed
+    first, in one write to the state document: whoever's write inserts or
+    flips `in_progress` builds, and everyone else returns.
+    """
+    now = datetime.now(timezone.utc)
+    try:
+        await db.site_config.find_one_and_update(
+            {"_id": STATE_ID, "version": {"$ne": TABLES_VERSION},
+             "$or": [{"in_progress": {"$ne": True}},
+                     {"claimed_at": {"$lt": (now - REBUILD_CLAIM_TIMEOUT).isoformat()}}]},
+            {"$set": {"in_progress": True, "claimed_at": now.isoformat()}},
+            upsert=True,
+        )
+    except DuplicateKeyError:
+        # The document exists and did not match: built, or being built.
+        return False
+    try:
+        await rebuild(db)
+    finally:
+        await db.site_config.update_one({"_id": STATE_ID}, {"$set": {"in_progress": False}})
+    return True
@@ -0,0 +1,247 @@
+"""
+Per-day sales figures for the admin analytics page.
+
+/api/admin/analytics used to load every order ever placed into memory, parse
+each created_at in Python and sum revenue, statuses and units in loops — then
+look each of the top five products up one by one. The dashboard got slower
+with every sale.
+
+The sums are done by MongoDB instead ($match/$group, see aggregate_days), and
+closed days are kept as one row each in daily_sales_rollup:
+
+  day               "YYYY-MM-DD", UTC
+  orders            orders placed that day, any status
+  paid_orders       of those, paid and not cancelled
+  revenue           their total_amount
+  orders_by_status  status -> count
+  units             [{product_id, units}] sold in the paid ones
+
+roll_up() writes the rows for every day up to yesterday; the server runs it
+at boot and SchedulerService nightly (see start_scheduled_upkeep). A window of 7, 30 or 90 days is then a read of that many
+small rows plus an aggregation over today's orders.
+
+A rolled day can still change: an order placed on Monday is paid on
+Wednesday, or cancelled, or deleted. The write that changes it calls
+order_changed(), which marks that day's row stale; stale days are
+aggregated live until the next roll_up() rewrites them.
+
+Orders store created_at as a BSON date; rows written before the Order model
+did so hold ISO strings. Both are matched and bucketed, each its own way.
+"""
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import DeleteOne, ReplaceOne
+
+from .bulk_writes import bulk_write
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "daily_sales_rollup"
+STATE_ID = "daily_sales_rollup"
+
+# Created with every other index by services/indexes.py. The orders'
+# created_at, which every $match here ranges over, is declared there too.
+INDEXES = {
+    COLLECTION: [([("day", 1)], {"unique": True})],
+}
+
+# A span of days, [first, last) — `last` None meaning "up to now".
+Span = Tuple[date, Optional[date]]
+
+# Paid money is revenue; a created order, or a paid one later cancelled, is not.
+_PAID = {"$and": [
+    {"$eq": ["$payment_status", "paid"]},
+    {"$ne": [{"$ifNull": ["$status", "pending"]}, "cancelled"]},
+]}
+
+
+def day_of(when: Any) -> Optional[str]:
+    """The UTC day an order's created_at falls on, as stored in the rollup."""
+    if isinstance(when, str):
+        return when[:10] or None
+    if isinstance(when, datetime):
+        if when.tzinfo is not None:
+            when = when.astimezone(timezone.utc)
+        return when.date().isoformat()
+    return None
+
+
+def _start(day: date) -> datetime:
+    return datetime(day.year, day.month, day.day)
+
+
+def _window_match(spans: Iterable[Span]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Split `spans` into a date branch and a string branch.
+
+    pymongo hands MongoDB naive datetimes as UTC, which is what the date
+    branch compares against; the string branch compares ISO prefixes, so
+    "2026-03-04T09:00:00Z" >= "2026-03-04" and < "2026-03-05".
+    """
+    dates, strings = [], []
+    for first, last in spans:
+        d: Dict[str, Any] = {"$gte": _start(first)}
+        s: Dict[str, Any] = {"$gte": first.isoformat()}
+        if last is not None:
+            d["$lt"] = _start(last)
+            s["$lt"] = last.isoformat()
+        dates.append({"created_at": {"$type": "date", **d}})
+        strings.append({"created_at": {"$type": "string", **s}})
+    return {"date": dates, "string": strings}
+
+
+def _branches(kind: str, clauses: List[Dict[str, Any]], day: Dict[str, Any]) -> Dict[str, list]:
+    match = {"$match": {"$or": clauses}}
+    shaped = {"$project": {
+        "_id": 0,
+        "day": day,
+        "status": {"$ifNull": ["$status", "pending"]},
+        "paid": _PAID,
+        "total_amount": {"$ifNull": ["$total_amount", 0]},
+        "items": 1,
+    }}
+    return {
+        f"{kind}_orders": [match, shaped, {"$group": {
+            "_id": {"day": "$day", "status": "$status"},
+            "orders": {"$sum": 1},
+            "paid_orders": {"$sum": {"$cond": ["$paid", 1, 0]}},
+            "revenue": {"$sum": {"$cond": ["$paid", "$total_amount", 0]}},
+        }}],
+        f"{kind}_units": [match, shaped, {"$match": {"paid": True}},
+                          {"$unwind": "$items"},
+                          {"$group": {
+                              "_id": {"day": "$day", "product_id": "$items.product_id"},
+                              "units": {"$sum": {"$ifNull": ["$items.quantity", 0]}},
+                          }}],
+    }
+
+
+def empty_day(day: str) -> Dict[str, Any]:
+    return {"day": day, "orders": 0, "paid_orders": 0, "revenue": 0.0,
+            "orders_by_status": {}, "units": []}
+
+
+async def aggregate_days(db, spans: Iterable[Span]) -> Dict[str, Dict[str, Any]]:
+    """
+    Per-day figures for the orders placed in `spans`, summed by MongoDB.
+
+    One round trip: a $facet runs the date-typed and string-typed orders
+    through the same $group stages.
+    """
+    match = _window_match(list(spans))
+    if not match["date"]:
+        return {}
+    facets: Dict[str, list] = {}
+    facets.update(_branches("date", match["date"],
+                            {"$dateToString": {"format": "%Y-%m-%d", "date": "$created_at"}}))
+    facets.update(_branches("string", match["string"], {"$substr": ["$created_at", 0, 10]}))
+    result = (await db.orders.aggregate([{"$facet": facets}]).to_list(None)) or [{}]
+    result = result[0]
+
+    days: Dict[str, Dict[str, Any]] = {}
+    units: Dict[str, Dict[str, int]] = {}
+    for kind in ("date", "string"):
+        for g in result.get(f"{kind}_orders", []):
+            row = days.setdefault(g["_id"]["day"], empty_day(g["_id"]["day"]))
+            row["orders"] += g["orders"]
+            row["paid_orders"] += g["paid_orders"]
+            row["revenue"] += g["revenue"] or 0
+            status = g["_id"]["status"]
+            row["orders_by_status"][status] = row["orders_by_status"].get(status, 0) + g["orders"]
+        for g in result.get(f"{kind}_units", []):
+            pid = g["_id"].get("product_id")
+            if pid:
+                per_day = units.setdefault(g["_id"]["day"], {})
+                per_day[pid] = per_day.get(pid, 0) + (g["units"] or 0)
+    for day, sold in units.items():
+        days.setdefault(day, empty_day(day))["units"] = [
+            {"product_id": pid, "units": n} for pid, n in sold.items()
+        ]
+    return days
+
+
+async def rolled_through(db) -> Optional[date]:
+    state = await db.site_config.find_one({"_id": STATE_ID}, {"through": 1})
+    through = (state or {}).get("through")
+    return date.fromisoformat(through) if through else None
+
+
+async def roll_up(db, today: Optional[date] = None) -> Dict[str, int]:
+    """
+    Write the rollup rows for every closed day not yet rolled, and every
+    stale one.
+
+    The first run rolls the whole order book; each run after that only the
+    days since the last one.
+    """
+    today = today or datetime.now(timezone.utc).date()
+    through = await rolled_through(db)
+    spans: List[Span] = []
+    if through is None or through < today - timedelta(days=1):
+        first = through + timedelta(days=1) if through else date(1970, 1, 1)
+        spans.append((first, today))
+
+    stale = [d["day"] for d in await db[COLLECTION].find(
+        {"stale": True}, {"_id": 0, "day": 1}).to_list(None)]
+    for day in stale:
+        first = date.fromisoformat(day)
+        spans.append((first, first + timedelta(days=1)))
+
+    days = await aggregate_days(db, spans) if spans else {}
+    now = datetime.now(timezone.utc).isoformat()
+    ops: List[Any] = []
+    for day, row in days.items():
+        if day >= today.isoformat():
+            continue
+        row["revenue"] = round(row["revenue"], 2)
+        ops.append(ReplaceOne({"day": day}, {**row, "rolled_at": now}, upsert=True))
+    # A stale day whose last order was deleted has nothing left to say.
+    ops.extend(DeleteOne({"day": day}) for day in stale if day not in days)
+    if ops:
+        await bulk_write(db[COLLECTION], ops)
+
+    yesterday = (today - timedelta(days=1)).isoformat()
+    await db.site_config.update_one(
+        {"_id": STATE_ID},
+        {"$set": {"through": yesterday, "rolled_at": now}},
+        upsert=True,
+    )
+    logger.info(f"✅ Sales rollup through {yesterday}: {len(days)} days written, {len(stale)} were stale")
+    return {"days": len(days), "stale": len(stale)}
+
+
+async def order_changed(db, created_at: Any) -> None:
+    """Mark the day an order was placed on for re-rolling, if it was rolled."""
+    day = day_of(created_at)
+    if day:
+        await db[COLLECTION].update_one({"day": day}, {"$set": {"stale": True}})
+
+
+async def window(db, first: Optional[date], today: Optional[date] = None) -> List[Dict[str, Any]]:
+    """
+    Per-day rows from `first` (None: the beginning) through today.
+
+    Rolled, fresh days come from the rollup; the rest — today, anything
+    after the last roll_up(), and stale days — are aggregated live.
+    """
+    today = today or datetime.now(timezone.utc).date()
+    through = await rolled_through(db)
+    rows: List[Dict[str, Any]] = []
+    live: List[Span] = []
+    if through is not None and (first is None or first <= through):
+        query: Dict[str, Any] = {"day": {"$lte": through.isoformat()}}
+        if first is not None:
+            query["day"]["$gte"] = first.isoformat()
+        for row in await db[COLLECTION].find(query, {"_id": 0}).to_list(None):
+            if row.get("stale"):
+                day = date.fromisoformat(row["day"])
+                live.append((day, day + timedelta(days=1)))
+            else:
+                rows.append(row)
+        live.append((through + timedelta(days=1), None))
+    else:
+        live.append((first or date(1970, 1, 1), None))
+    rows.extend((await aggregate_days(db, live)).values())
+    return rows
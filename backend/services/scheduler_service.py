@@ -1,15 +1,29 @@
 import asyncio
 import logging
+import time
 from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Optional
+import numpy as np
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
 from apscheduler.triggers.interval import IntervalTrigger
 from apscheduler.triggers.cron import CronTrigger
 from motor.motor_asyncio import AsyncIOMotorDatabase
-from .currency_service import CurrencyService
+from pymongo import UpdateOne
+from .bulk_writes import bulk_write
+from .currency_service import CurrencyService, refresh_on_schedule
 from .product_sync_service import ProductSyncService
+from . import sales_rollup
 
 logger = logging.getLogger(__name__)
 
+# Products read, priced and written per round of the nightly price update.
+PRICE_UPDATE_CHUNK = 1000
+# The currencies a product stores a price in, and the field each goes to.
+PRICE_FIELDS = (("USD", "price_usd"), ("SAR", "price_sar"),
+                ("AED", "price_aed"), ("QAR", "price_qar"))
+_PRICE_INPUTS = {"_id": 1, "base_price_usd": 1, "markup_percentage": 1,
+                 **{field: 1 for _, field in PRICE_FIELDS}}
+
 class SchedulerService:
     """Background task scheduler for automated updates"""
     
@@ -20,8 +34,8 @@ class SchedulerService:
         self.product_sync_service = ProductSyncService(database)
         self._is_running = False
     
-    async def start_scheduler(self):
-        """Start the task scheduler"""
+    async def start_scheduler(self, only: Optional[Iterable[str]] = None):
+        """Start the task scheduler; with `only`, just the jobs of those ids"""
         if self._is_running:
             logger.warning("Scheduler is already running")
             return
@@ -77,10 +91,28 @@ class SchedulerService:
                 max_instances=1
             )
             
+            # Roll yesterday's orders into daily_sales_rollup just after midnight UTC
+            self.scheduler.add_job(
+                func=self.roll_up_daily_sales,
+                trigger=CronTrigger(hour=0, minute=15, timezone="UTC"),
+                id="daily_sales_rollup",
+                name="Roll Up Daily Sales",
+                replace_existing=True,
+                max_instances=1
+            )
+            
+            if only is not None:
+                wanted = set(only)
+                for job in self.scheduler.get_jobs():
+                    if job.id not in wanted:
+                        self.scheduler.remove_job(job.id)
+
             self.scheduler.start()
             self._is_running = True
+            # Requests stop refreshing the rates themselves while the job does.
+            refresh_on_schedule(self.scheduler.get_job("currency_rates_update") is not None)
             
-            logger.info("Scheduler started successfully with 5 scheduled tasks")
+            logger.info(f"Scheduler started successfully with {len(self.scheduler.get_jobs())} scheduled tasks")
             
         except Exception as e:
             logger.error(f"Error starting scheduler: {str(e)}")
@@ -91,6 +123,7 @@ class SchedulerService:
         if self._is_running:
             self.scheduler.shutdown()
             self._is_running = False
+            refresh_on_schedule(False)
             logger.info("Scheduler stopped successfully")
     
     async def _update_currency_rates(self):
@@ -137,58 +170,120 @@ class SchedulerService:
             await self._log_scheduled_task("inventory_sync", "error", str(e))
     
     async def _update_product_prices(self):
-        """Scheduled task to update product prices with current exchange rates"""
+        """
+        Scheduled task to update product prices with current exchange rates.
+
+        PRICE_UPDATE_CHUNK products at a time, keyset-paged on _id with only
+        the fields pricing reads. One rate snapshot serves the whole run, the
+        chunk's conversions are one array product, and only rows whose prices
+        moved are written, in one bulk_write per chunk. This used to await a
+        multi-currency conversion (seven currencies, each a few rate queries),
+        the markup and an update_one for every product in turn — a dozen round
+        trips a product, serially, every night.
+        """
         try:
             logger.info("Starting scheduled price update...")
-            
-            # Get all products
-            products_cursor = self.db.products.find({})
-            updated_count = 0
-            
-            async for product in products_cursor:
-                try:
-                    base_price_usd = product.get("base_price_usd")
-                    if not base_price_usd:
+            started = time.monotonic()
+            snapshot = await self.currency_service.snapshot()
+            currencies = [code for code, _ in PRICE_FIELDS]
+            rates = [snapshot.rate("USD", code) for code in currencies]
+            if any(rate is None for rate in rates):
+                raise ValueError(f"rate table v{snapshot.version} cannot price "
+                                 f"{[c for c, r in zip(currencies, rates) if r is None]}")
+            rate_row = np.array(rates, dtype=np.float64)
+            usd_column = currencies.index("USD")
+
+            processed = updated_count = failed = 0
+            last_id = None
+            while True:
+                query = {"base_price_usd": {"$gt": 0}}
+                if last_id is not None:
+                    query["_id"] = {"$gt": last_id}
+                chunk = await self.db.products.find(query, _PRICE_INPUTS).sort(
+                    "_id", 1).limit(PRICE_UPDATE_CHUNK).to_list(PRICE_UPDATE_CHUNK)
+                if not chunk:
+                    break
+                last_id = chunk[-1]["_id"]
+                processed += len(chunk)
+
+                rows, bases, multipliers = [], [], []
+                for product in chunk:
+                    try:
+                        base = float(product["base_price_usd"])
+                        multiplier = 1 + (float(product.get("markup_percentage", 50.0)) / 100)
+                    except (TypeError, ValueError) as e:
+                        logger.error(f"Error updating price for product {product.get('_id')}: {str(e)}")
+                        failed += 1
                         continue
-                    
-                    # Get current multi-currency prices
-                    multi_currency_prices = await self.currency_service.get_multi_currency_prices(
-                        base_price_usd, "USD"
-                    )
-                    
-                    # Apply luxury markup
-                    markup_percentage = product.get("markup_percentage", 50.0)
-                    final_prices = await self.currency_service.apply_luxury_markup(
-                        multi_currency_prices, markup_percentage
-                    )
-                    
-                    # Update product in database
-                    update_data = {
-                        "price_usd": final_prices.get("USD"),
-                        "price_sar": final_prices.get("SAR"),
-                        "price_aed": final_prices.get("AED"),
-                        "price_qar": final_prices.get("QAR"),
-                        "updated_at": datetime.utcnow()
-                    }
-                    
-                    await self.db.products.update_one(
-                        {"_id": product["_id"]},
-                        {"$set": update_data}
-                    )
-                    
-                    updated_count += 1
-                    
-                except Exception as e:
-                    logger.error(f"Error updating price for product {product.get('_id')}: {str(e)}")
+                    rows.append(product)
+                    bases.append(base)
+                    multipliers.append(multiplier)
+                if not rows:
                     continue
-            
-            logger.info(f"Price update completed: {updated_count} products updated")
-            await self._log_scheduled_task("price_update", "success", f"Updated {updated_count} product prices")
+
+                # Products x currencies in one multiplication, rounded to the
+                # cent in one call — as currency_service.to_cents rounds one
+                # price, so the per-product path gives the same numbers.
+                base_column = np.array(bases, dtype=np.float64)
+                converted = np.round(base_column[:, None] * rate_row[None, :], 2)
+                # The base currency is the amount itself, unrounded, as
+                # get_multi_currency_prices gives it.
+                converted[:, usd_column] = base_column
+                marked_up = np.round(converted * np.array(multipliers, dtype=np.float64)[:, None], 2)
+
+                now = datetime.utcnow()
+                ops = []
+                for product, prices in zip(rows, marked_up.tolist()):
+                    update_data = {field: price for (_, field), price in zip(PRICE_FIELDS, prices)}
+                    if all(product.get(field) == value for field, value in update_data.items()):
+                        continue
+                    update_data["updated_at"] = now
+                    ops.append(UpdateOne({"_id": product["_id"]}, {"$set": update_data}))
+                if ops:
+                    await bulk_write(self.db.products, ops)
+                    updated_count += len(ops)
+                # Let the requests this worker is serving in.
+                await asyncio.sleep(0)
+
+            duration = time.monotonic() - started
+            per_sec = round(processed / duration, 1) if duration > 0 else None
+            logger.info(f"Price update completed: {updated_count} of {processed} products updated "
+                        f"in {duration:.2f}s")
+            await self._log_scheduled_task(
+                "price_update", "success",
+                f"Updated {updated_count} of {processed} product prices in {duration:.2f}s",
+                details={
+                    "processed": processed,
+                    "updated": updated_count,
+                    "unchanged": processed - updated_count - failed,
+                    "failed": failed,
+                    "duration_seconds": round(duration, 3),
+                    "products_per_sec": per_sec,
+                    "rates_version": snapshot.version,
+                    "rates_source": snapshot.source,
+                },
+            )
             
         except Exception as e:
             logger.error(f"Error in scheduled price update: {str(e)}")
             await self._log_scheduled_task("price_update", "error", str(e))
     
+    async def roll_up_daily_sales(self):
+        """
+        Write the per-day sales rows the analytics page reads; the scheduled
+        daily_sales_rollup job, and what the server runs once at boot.
+        """
+        try:
+            logger.info("Starting scheduled sales rollup...")
+            result = await sales_rollup.roll_up(self.db)
+            await self._log_scheduled_task(
+                "sales_rollup", "success",
+                f"Rolled up {result['days']} days ({result['stale']} stale)"
+            )
+        except Exception as e:
+            logger.error(f"Error in scheduled sales rollup: {str(e)}")
+            await self._log_scheduled_task("sales_rollup", "error", str(e))
+    
     async def _process_bulk_imports(self):
         """Scheduled task to process bulk import requests"""
         try:
@@ -306,8 +401,9 @@ class SchedulerService:
             logger.error(f"Error processing import task: {str(e)}")
             raise
     
-    async def _log_scheduled_task(self, task_type: str, status: str, message: str):
-        """Log scheduled task execution"""
+    async def _log_scheduled_task(self, task_type: str, status: str, message: str,
+                                  details: Optional[Dict[str, Any]] = None):
+        """Log scheduled task execution, with the run's figures when it has any"""
         try:
             log_entry = {
                 "task_type": task_type,
@@ -319,6 +415,8 @@ class SchedulerService:
                     "scheduler_version": "1.0"
                 }
             }
+            if details:
+                log_entry["details"] = details
             
             await self.db.scheduled_task_logs.insert_one(log_entry)
             
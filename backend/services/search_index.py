@@ -0,0 +1,360 @@
+"""
+In-process full-text index for the storefront search box.
+
+/api/search used to be ten case-insensitive `$regex` clauses under one `$or`.
+No MongoDB index can serve an unanchored regex, so every keystroke in the
+search box read the whole products collection — and with the storefront
+searching as the visitor types, one shopper typing "necklace" was eight full
+scans. The ranking was whatever order the scan happened to meet the rows in,
+while the sort menu offered "relevance".
+
+This module keeps an inverted index of the live catalogue in memory instead:
+token -> {product: weight}, where the weight says which field the word was
+found in (a word in the name outranks the same word in the description). The
+filters the panel sends — category, price, rating, stock, sale, material —
+are held per product next to the postings, so a query is answered without a
+database read at all; only the page of winners is fetched, by id.
+
+Why not a MongoDB `$text` index: it tokenises Arabic as one long word per
+whitespace run with no normalisation, so «الخاتم» never finds «خاتم», and it
+cannot prefix-match, which is what a search-as-you-type box needs.
+
+Freshness: write paths in this process call `mark_stale()`; writes from other
+processes (the scheduler, a second worker) are picked up by a full rebuild
+once the index is older than SEARCH_INDEX_MAX_AGE seconds.
+"""
+from __future__ import annotations
+
+import asyncio
+import bisect
+import logging
+import math
+import os
+import re
+import time
+import unicodedata
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds before the index is rebuilt from the database even if nothing in
+# this process reported a write.
+SEARCH_INDEX_MAX_AGE = float(os.getenv("SEARCH_INDEX_MAX_AGE", "300"))
+
+# How much a word counts for by where it was found. The name is what a shopper
+# is searching for; the description is full of supplier keyword padding.
+FIELD_WEIGHTS: Dict[str, float] = {
+    "name": 10.0, "name_en": 10.0, "name_ar": 10.0,
+    "sku": 8.0,
+    "material_en": 5.0, "material_ar": 5.0,
+    "category": 4.0,
+    "description": 1.0, "description_en": 1.0, "description_ar": 1.0,
+}
+
+# Where a material is stated. The dedicated columns first, then the places the
+# specification is written out — a shopper asking for pearl means the piece,
+# not the column it happens to be recorded in.
+MATERIAL_FIELDS = ("material_en", "material_ar", "description_en",
+                   "description_ar", "name", "name_en")
+
+# Only what the index reads is fetched when it is built.
+PROJECTION = {
+    "_id": 0, "id": 1, "staging": 1, "is_active": 1, "price": 1, "rating": 1,
+    "reviews_count": 1, "created_at": 1, "in_stock": 1, "discount_percentage": 1,
+    "storefront_ready": 1, "storefront_version": 1,
+    **{field: 1 for field in FIELD_WEIGHTS},
+}
+
+# A prefix match is a guess at what the visitor is still typing, so it counts
+# for less than the whole word.
+PREFIX_FACTOR = 0.6
+
+_ARABIC_DIACRITICS = re.compile("[\u0610-\u061a\u064b-\u065f\u0670\u06d6-\u06ed\u0640]")
+_ARABIC_LETTERS = str.maketrans({
+    "أ": "ا", "إ": "ا", "آ": "ا", "ٱ": "ا",
+    "ى": "ي", "ئ": "ي", "ؤ": "و", "ة": "ه",
+})
+_TOKEN = re.compile("[0-9a-z\u0621-\u064a\u0660-\u0669]+")
+
+
+def normalise(text: Any) -> str:
+    """
+    Fold `text` to the form both the index and the query are compared in.
+
+    Latin: lower case, accents dropped («Crème» is "creme"). Arabic: the
+    vowel marks and tatweel removed and the letters written several ways
+    unified — a shopper types «اساور» for «أساور» and «ه» for «ة» far more
+    often than not.
+    """
+    if text is None:
+        return ""
+    text = unicodedata.normalize("NFKD", str(text).lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch) or "\u0600" <= ch <= "\u06ff")
+    text = _ARABIC_DIACRITICS.sub("", text)
+    return text.translate(_ARABIC_LETTERS)
+
+
+def _stem(token: str) -> str:
+    """
+    A light stem, the same for documents and queries.
+
+    Arabic: the definite article, which is written onto the word («الخاتم» is
+    "the ring"). English: a plural -s, so "earrings" finds "earring".
+    """
+    if token.startswith("ال") and len(token) > 4:
+        return token[2:]
+    if token.startswith("وال") and len(token) > 5:
+        return token[3:]
+    if token[-1:] == "s" and len(token) > 3 and not token.endswith("ss") and token.isascii():
+        return token[:-1]
+    return token
+
+
+def tokenize(text: Any) -> List[str]:
+    """Normalised, stemmed word tokens of `text`."""
+    return [_stem(t) for t in _TOKEN.findall(normalise(text))]
+
+
+def _float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class _Entry:
+    """What a search needs to filter and order one product without a read."""
+
+    __slots__ = ("id", "category", "price", "rating", "reviews", "created_at",
+                 "in_stock", "on_sale", "materials")
+
+    def __init__(self, doc: Dict[str, Any], materials: Set[str]):
+        self.id = doc["id"]
+        self.category = doc.get("category")
+        self.price = _float(doc.get("price"))
+        self.rating = _float(doc.get("rating"))
+        self.reviews = _float(doc.get("reviews_count"))
+        self.created_at = str(doc.get("created_at") or "")
+        self.in_stock = doc.get("in_stock") is True
+        self.on_sale = _float(doc.get("discount_percentage")) > 0
+        self.materials = materials
+
+
+_SORT_KEYS: Dict[str, Callable[[_Entry], Any]] = {
+    "price-low-high": lambda e: e.price,
+    "price-high-low": lambda e: -e.price,
+    "rating": lambda e: -e.rating,
+    "popular": lambda e: -e.reviews,
+}
+
+
+class SearchIndex:
+    """
+    The live catalogue as postings lists.
+
+    `is_listable(doc)` decides which products are indexed at all — the caller
+    passes the storefront's own rule, so a product the shop will not show can
+    never be found here either.
+    """
+
+    def __init__(self, is_listable: Callable[[Dict[str, Any]], bool]):
+        self._is_listable = is_listable
+        self._db = None
+        self._built_at = 0.0
+        self._stale_ids: Set[str] = set()
+        self._full_rebuild = True
+        self._lock = asyncio.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._entries: Dict[str, _Entry] = {}
+        self._postings: Dict[str, Dict[str, float]] = {}
+        self._doc_terms: Dict[str, Dict[str, float]] = {}
+        self._vocabulary: List[str] = []
+        self._vocabulary_dirty = False
+
+    # -- keeping it current ------------------------------------------------
+
+    def mark_stale(self, ids: Optional[Iterable[str]] = None) -> None:
+        """
+        Report a write to the catalogue.
+
+        With ids, only those products are re-read before the next search;
+        without, the whole index is rebuilt — for the bulk operations whose
+        affected ids nobody collected.
+        """
+        if ids is None:
+            self._full_rebuild = True
+        else:
+            self._stale_ids.update(i for i in ids if i)
+
+    async def ensure_current(self, db) -> None:
+        """Bring the index up to date with `db` before it is read."""
+        if (self._db is db and not self._full_rebuild and not self._stale_ids
+                and time.monotonic() - self._built_at < SEARCH_INDEX_MAX_AGE):
+            return
+        async with self._lock:
+            if self._db is not db or self._full_rebuild or \
+                    time.monotonic() - self._built_at >= SEARCH_INDEX_MAX_AGE:
+                await self._rebuild(db)
+            elif self._stale_ids:
+                ids, self._stale_ids = list(self._stale_ids), set()
+                docs = await db.products.find({"id": {"$in": ids}}, PROJECTION).to_list(None)
+                for pid in ids:
+                    self._remove(pid)
+                for doc in docs:
+                    self._add(doc)
+
+    async def _rebuild(self, db) -> None:
+        """
+        Index the live catalogue from scratch.
+
+        Built aside and swapped in whole: a search arriving mid-build reads
+        the previous index rather than half of the new one.
+        """
+        started = time.perf_counter()
+        self._full_rebuild = False
+        self._stale_ids = set()
+        fresh = SearchIndex(self._is_listable)
+        # The storefront's LIVE_ONLY, in server.py.
+        async for doc in db.products.find({"listed": True}, PROJECTION):
+            fresh._add(doc)
+        self._entries, self._postings, self._doc_terms = (
+            fresh._entries, fresh._postings, fresh._doc_terms)
+        self._vocabulary_dirty = True
+        self._db = db
+        self._built_at = time.monotonic()
+        logger.info(f"🔎 Search index built: {len(self._entries)} products, "
+                    f"{len(self._postings)} terms in {time.perf_counter() - started:.2f}s")
+
+    def _add(self, doc: Dict[str, Any]) -> None:
+        pid = doc.get("id")
+        if not pid or doc.get("staging") is True or doc.get("is_active") is False:
+            return
+        if not self._is_listable(doc):
+            return
+        terms: Dict[str, float] = {}
+        for field, weight in FIELD_WEIGHTS.items():
+            seen: Dict[str, int] = {}
+            for token in tokenize(doc.get(field)):
+                seen[token] = seen.get(token, 0) + 1
+            for token, count in seen.items():
+                # Repeating a word is how supplier titles game marketplaces;
+                # a third "ring" in one field says nothing the first did not.
+                terms[token] = terms.get(token, 0.0) + weight * min(count, 3)
+        materials: Set[str] = set()
+        for field in MATERIAL_FIELDS:
+            materials.update(tokenize(doc.get(field)))
+
+        self._entries[pid] = _Entry(doc, materials)
+        self._doc_terms[pid] = terms
+        for token, weight in terms.items():
+            postings = self._postings.get(token)
+            if postings is None:
+                postings = self._postings[token] = {}
+                self._vocabulary_dirty = True
+            postings[pid] = weight
+
+    def _remove(self, pid: str) -> None:
+        self._entries.pop(pid, None)
+        for token in self._doc_terms.pop(pid, {}):
+            postings = self._postings.get(token)
+            if postings is not None:
+                postings.pop(pid, None)
+                if not postings:
+                    del self._postings[token]
+                    self._vocabulary_dirty = True
+
+    # -- reading it --------------------------------------------------------
+
+    def _expand(self, token: str) -> List[Tuple[str, float]]:
+        """The indexed terms `token` stands for: itself, and what it begins."""
+        if self._vocabulary_dirty:
+            self._vocabulary = sorted(self._postings)
+            self._vocabulary_dirty = False
+        out = []
+        start = bisect.bisect_left(self._vocabulary, token)
+        for term in self._vocabulary[start:]:
+            if not term.startswith(token):
+                break
+            out.append((term, 1.0 if term == token else PREFIX_FACTOR))
+        return out
+
+    def _matching(self, tokens: List[str]) -> Dict[str, float]:
+        """Score every product holding all of `tokens` (each as word or prefix)."""
+        total = max(1, len(self._entries))
+        scores: Optional[Dict[str, float]] = None
+        for token in tokens:
+            found: Dict[str, float] = {}
+            for term, factor in self._expand(token):
+                postings = self._postings[term]
+                idf = math.log(1.0 + total / len(postings))
+                for pid, weight in postings.items():
+                    score = weight * idf * factor
+                    if score > found.get(pid, 0.0):
+                        found[pid] = score
+            if scores is None:
+                scores = found
+            else:
+                scores = {pid: s + found[pid] for pid, s in scores.items() if pid in found}
+            if not scores:
+                return {}
+        return scores or {}
+
+    def search(
+        self,
+        q: Optional[str] = None,
+        *,
+        category: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        material: Optional[str] = None,
+        rating: Optional[float] = None,
+        in_stock: Optional[bool] = None,
+        on_sale: Optional[bool] = None,
+        sort: Optional[str] = None,
+        limit: int = 24,
+    ) -> List[str]:
+        """Ids of the best `limit` live products for the query, best first."""
+        tokens = tokenize(q)
+        if tokens:
+            scores = self._matching(tokens)
+            candidates: Iterable[str] = scores.keys()
+        elif q and q.strip():
+            # Only punctuation — nothing a product could be named.
+            return []
+        else:
+            scores = {}
+            candidates = self._entries.keys()
+
+        wanted_materials = tokenize(material) if material and material.strip() else []
+
+        def accepted(entry: _Entry) -> bool:
+            if category and entry.category != category:
+                return False
+            if min_price is not None and entry.price < min_price:
+                return False
+            if max_price is not None and entry.price > max_price:
+                return False
+            if rating is not None and entry.rating < rating:
+                return False
+            if in_stock and not entry.in_stock:
+                return False
+            if on_sale and not entry.on_sale:
+                return False
+            for token in wanted_materials:
+                if not any(m.startswith(token) for m in entry.materials):
+                    return False
+            return True
+
+        hits = [e for e in (self._entries[pid] for pid in candidates) if accepted(e)]
+        if sort == "newest":
+            hits.sort(key=lambda e: e.created_at, reverse=True)
+        elif sort in _SORT_KEYS:
+            hits.sort(key=_SORT_KEYS[sort])
+        elif scores:
+            hits.sort(key=lambda e: (-scores[e.id], -e.rating))
+        return [e.id for e in hits[:max(0, limit)]]
+
+    def __len__(self) -> int:
+        return len(self._entries)
@@ -0,0 +1,218 @@
+"""
+sitemap.xml, built from the catalogue and served from memory.
+
+The old endpoint built an ElementTree of every URL, serialised it, parsed the
+result back with minidom only to indent it, and capped the products at 500 —
+so past the 500th live product the rest of the shop was simply missing from
+Search Console. And it did all of that again on every crawler hit.
+
+Here the files are written from the catalogue read a keyset page at a time
+(`id` after the last one read, never a skip, so the last file costs what the
+first does). Once the shop outgrows one file (URLS_PER_FILE, the limit search
+engines accept), /sitemap.xml becomes a sitemap index pointing at:
+
+  /sitemap-pages.xml          the static and category pages
+  /sitemap-products-<n>.xml   the n-th run of URLS_PER_FILE live products
+
+Every file comes out of one pass over the catalogue, and concurrent hits on
+a cold sitemap wait for the same build — a crawler fetching the index and
+its files together reads the catalogue once. Each file is kept with an ETag
+taken from its content, so a rebuild that changed nothing answers a
+crawler's If-None-Match with a 304. Product writes in this process call
+invalidate(); writes from other processes are picked up once a copy is older
+than SITEMAP_MAX_AGE seconds, the same hour the response tells caches.
+"""
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+from xml.sax.saxutils import escape
+
+logger = logging.getLogger(__name__)
+
+URLS_PER_FILE = 50_000
+SITEMAP_MAX_AGE = float(os.getenv("SITEMAP_MAX_AGE", "3600"))
+
+# Products per keyset page read from the catalogue.
+_CHUNK = 500
+
+_URLSET_OPEN = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+_URLSET_CLOSE = '</urlset>\n'
+_INDEX_OPEN = ('<?xml version="1.0" encoding="UTF-8"?>\n'
+               '<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">\n')
+_INDEX_CLOSE = '</sitemapindex>\n'
+
+# (path, priority, changefreq)
+Page = Tuple[str, str, str]
+
+
+def _day(value: Any) -> Optional[str]:
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d')
+    if isinstance(value, str) and len(value) >= 10:
+        return value[:10]
+    return None
+
+
+def _url(loc: str, lastmod: str, changefreq: str, priority: str) -> str:
+    return (f"  <url>\n    <loc>{escape(loc)}</loc>\n    <lastmod>{lastmod}</lastmod>\n"
+            f"    <changefreq>{changefreq}</changefreq>\n    <priority>{priority}</priority>\n  </url>\n")
+
+
+class _Copy:
+    __slots__ = ("body", "etag", "last_modified", "built_at", "generation")
+
+    def __init__(self, body: bytes, last_modified: datetime, generation: int):
+        self.body = body
+        self.etag = f'"{hashlib.sha1(body).hexdigest()[:16]}"'
+        self.last_modified = last_modified
+        self.built_at = time.monotonic()
+        self.generation = generation
+
+
+class Sitemap:
+    """The store's sitemap files, built together on demand and kept until invalidated."""
+
+    def __init__(self, base_url: str, pages: Sequence[Page], categories: Sequence[str],
+                 query: Dict[str, Any], projection: Dict[str, Any],
+                 is_listed: Callable[[Dict[str, Any]], bool]):
+        self.base_url = base_url
+        self.pages = list(pages)
+        self.categories = list(categories)
+        self.query = query
+        self.projection = projection
+        self._is_listed = is_listed
+        self._copies: Dict[str, _Copy] = {}
+        self._generation = 0
+        self._building: Optional["asyncio.Task"] = None
+        self._db = None
+
+    def invalidate(self) -> None:
+        """Mark every kept file stale; the next hit rebuilds them all."""
+        self._generation += 1
+
+    # -- serving -----------------------------------------------------------
+
+    def _current(self) -> bool:
+        return bool(self._copies) and all(
+            copy.generation == self._generation
+            and time.monotonic() - copy.built_at < SITEMAP_MAX_AGE
+            for copy in self._copies.values())
+
+    async def file(self, db, name: str) -> Optional[_Copy]:
+        """
+        The kept copy of `name` ("sitemap", "pages", "products-<n>"), built
+        first if it is missing or stale; None when there is no such file.
+
+        A build already under way is waited on rather than started again,
+        and shielded: a crawler that hangs up does not cancel the build
+        the others are waiting for.
+        """
+        if self._db is not db:
+            self._db = db
+            self._copies = {}
+            self.invalidate()
+        if not self._current():
+            loop = asyncio.get_running_loop()
+            task = self._building
+            if task is None or task.done() or task.get_loop() is not loop:
+                task = self._building = loop.create_task(self._build(db, self._generation))
+            files = await asyncio.shield(task)
+            return files.get(name)
+        return self._copies.get(name)
+
+    @staticmethod
+    def not_modified(copy_etag: str, last_modified: datetime,
+                     if_none_match: Optional[str], if_modified_since: Optional[str]) -> bool:
+        """RFC 9110: If-None-Match decides when sent; If-Modified-Since otherwise."""
+        if if_none_match is not None:
+            return copy_etag in [tag.strip() for tag in if_none_match.split(",")] \
+                or if_none_match.strip() == "*"
+        if if_modified_since:
+            try:
+                since = parsedate_to_datetime(if_modified_since)
+            except (TypeError, ValueError):
+                return False
+            return since >= last_modified.replace(microsecond=0)
+        return False
+
+    @staticmethod
+    def headers(etag: str, last_modified: datetime) -> Dict[str, str]:
+        return {
+            "ETag": etag,
+            "Last-Modified": format_datetime(last_modified, usegmt=True),
+            "Cache-Control": f"public, max-age={int(SITEMAP_MAX_AGE)}",
+        }
+
+    # -- building ----------------------------------------------------------
+
+    async def _build(self, db, generation: int) -> Dict[str, _Copy]:
+        """
+        Every file, from one keyset pass over the catalogue. Kept as the
+        current copies unless a write invalidated the sitemap meanwhile —
+        they are still the answer for the hits that were waiting on them.
+        """
+        static = self._static_urls()
+        products = [url async for url in self._product_urls(db)]
+        if len(static) + len(products) <= URLS_PER_FILE:
+            bodies = {"sitemap": _URLSET_OPEN + "".join(static + products) + _URLSET_CLOSE}
+        else:
+            bodies = {"pages": _URLSET_OPEN + "".join(static) + _URLSET_CLOSE}
+            for n, start in enumerate(range(0, len(products), URLS_PER_FILE), start=1):
+                bodies[f"products-{n}"] = (_URLSET_OPEN + "".join(products[start:start + URLS_PER_FILE])
+                                           + _URLSET_CLOSE)
+            bodies["sitemap"] = self._index(list(bodies))
+
+        built = datetime.now(timezone.utc).replace(microsecond=0)
+        files: Dict[str, _Copy] = {}
+        for name, text in bodies.items():
+            copy = _Copy(text.encode("utf-8"), built, generation)
+            previous = self._copies.get(name)
+            if previous is not None and previous.etag == copy.etag:
+                # Unchanged: still modified when it last changed.
+                copy.last_modified = previous.last_modified
+            files[name] = copy
+        if generation == self._generation and self._db is db:
+            self._copies = files
+            logger.info(f"🗺️ Sitemap built: {len(files)} file(s), {len(products)} products, "
+                        f"{sum(len(c.body) for c in files.values())} bytes")
+        return files
+
+    def _static_urls(self) -> List[str]:
+        today = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        urls = [_url(f"{self.base_url}{path}", today, changefreq, priority)
+                for path, priority, changefreq in self.pages]
+        urls += [_url(f"{self.base_url}/products?category={category}", today, "daily", "0.8")
+                 for category in self.categories]
+        return urls
+
+    async def _product_urls(self, db):
+        today = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        last_id = None
+        while True:
+            query = {**self.query, "id": {"$gt": last_id}} if last_id is not None else self.query
+            page = await db.products.find(query, self.projection).sort("id", 1) \
+                .limit(_CHUNK).to_list(length=None)
+            for product in page:
+                if self._is_listed(product):
+                    lastmod = _day(product.get("last_synced_at") or product.get("created_at")) or today
+                    yield _url(f"{self.base_url}/product/{product['id']}", lastmod, "weekly", "0.7")
+            if len(page) < _CHUNK:
+                return
+            last_id = page[-1]["id"]
+
+    def _index(self, children: List[str]) -> str:
+        today = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        entries = "".join(
+            f"  <sitemap>\n    <loc>{escape(f'{self.base_url}/sitemap-{child}.xml')}</loc>\n"
+            f"    <lastmod>{today}</lastmod>\n  </sitemap>\n"
+            for child in children
+        )
+        return _INDEX_OPEN + entries + _INDEX_CLOSE
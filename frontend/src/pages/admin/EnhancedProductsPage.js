@@ -23,6 +23,9 @@ import { Input } from '../../components/ui/input';
 import { API_BASE_URL } from '../../api';
 import { toast } from 'sonner';
 
+// Products per page of the admin catalogue.
+const PAGE_SIZE = 60;
+
 const EnhancedProductsPage = () => {
   const { language, currency, convert } = useLanguage();
   const API_URL = API_BASE_URL;
@@ -56,59 +59,75 @@ const EnhancedProductsPage = () => {
     { value: 'black', label: isRTL ? 'أسود' : 'Black', color: '#000000' }
   ];
 
-  // Filter products based on search term, category, and status. Supplier and
-  // legacy products may omit `name_en`, `name_ar`, or `sku`; normalise every
-  // field so a single incomplete record cannot crash the whole admin catalogue.
-  const normalizedSearchTerm = searchTerm.trim().toLocaleLowerCase();
-  const filteredProducts = products.filter(product => {
-    const searchableFields = [
-      product.name,
-      product.name_ar,
-      product.name_en,
-      product.sku,
-    ].map((value) => String(value ?? '').toLocaleLowerCase());
-    const matchesSearch = !normalizedSearchTerm || searchableFields.some(
-      (value) => value.includes(normalizedSearchTerm)
-    );
+  // The catalogue comes a page at a time, filtered by the server: it used to
+  // arrive whole and be filtered here, and every import made the screen
+  // slower to open. The search box waits for the typing to pause.
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+  const [exporting, setExporting] = useState(false);
+  const [summary, setSummary] = useState(null);
+  const [debouncedSearch, setDebouncedSearch] = useState('');
 
-    const matchesCategory = categoryFilter === 'all' || product.category === categoryFilter;
-    // "Low Stock" was on the dropdown and in no branch of this condition, so
-    // choosing it matched nothing and the catalogue went blank — a shop with
-    // products in it reporting that it had none.
-    const stock = Number(product.stock_quantity ?? product.stock ?? 0);
-    const statedMaterial = String(product.material_ar || product.material_en || '').trim();
-    const matchesStatus = statusFilter === 'all' ||
-      (statusFilter === 'active' && product.is_active) ||
-      (statusFilter === 'inactive' && !product.is_active) ||
-      (statusFilter === 'featured' && product.is_featured) ||
-      (statusFilter === 'low-stock' && stock <= 5) ||
-      // The products a payment provider will stop on: no material stated, in
-      // either language. The translate button counts them; this is how the
-      // owner reaches them one by one to write the material himself.
-      (statusFilter === 'no-material' && !statedMaterial);
+  useEffect(() => {
+    const timer = setTimeout(() => setDebouncedSearch(searchTerm.trim()), 300);
+    return () => clearTimeout(timer);
+  }, [searchTerm]);
 
-    return matchesSearch && matchesCategory && matchesStatus;
-  });
+  const listParams = useCallback((cursor) => {
+    const params = { view: 'list', limit: PAGE_SIZE };
+    if (cursor) params.cursor = cursor;
+    if (debouncedSearch) params.q = debouncedSearch;
+    if (categoryFilter !== 'all') params.category = categoryFilter;
+    // The products a payment provider will stop on: no material stated, in
+    // either language. The translate button counts them; this is how the
+    // owner reaches them one by one to write the material himself.
+    if (statusFilter === 'no-material') params.missing_material = true;
+    else if (statusFilter !== 'all') params.status = statusFilter;
+    return params;
+  }, [debouncedSearch, categoryFilter, statusFilter]);
 
   // Keep the loader stable so effects and post-mutation refreshes share one
   // implementation without a stale dependency warning.
   const fetchProducts = useCallback(async () => {
     try {
       setLoading(true);
-      const response = await axios.get(`${API_URL}/api/admin/products`);
-      setProducts(response.data || []);
+      const [{ data: page }, { data: counts }] = await Promise.all([
+        axios.get(`${API_URL}/api/admin/products`, { params: listParams(null) }),
+        axios.get(`${API_URL}/api/admin/products/summary`),
+      ]);
+      setProducts(page.items || []);
+      setNextCursor(page.next_cursor || null);
+      setSummary(counts);
       setLoadError('');
     } catch (error) {
       // Invented products are worse than none: the owner sees a catalogue that
       // isn't theirs and cannot tell.
       console.error('Error fetching products:', error);
       setProducts([]);
+      setNextCursor(null);
       setLoadError(error.response?.data?.detail
         || (isRTL ? 'تعذّر تحميل المنتجات' : 'Could not load products'));
     } finally {
       setLoading(false);
     }
-  }, [API_URL, isRTL]);
+  }, [API_URL, isRTL, listParams]);
+
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+    try {
+      const { data: page } = await axios.get(`${API_URL}/api/admin/products`, {
+        params: listParams(nextCursor),
+      });
+      setProducts((loaded) => [...loaded, ...(page.items || [])]);
+      setNextCursor(page.next_cursor || null);
+    } catch (error) {
+      toast.error(error.response?.data?.detail
+        || (isRTL ? 'تعذّر تحميل المزيد' : 'Could not load more products'));
+    } finally {
+      setLoadingMore(false);
+    }
+  };
 
   useEffect(() => {
     fetchProducts();
@@ -142,9 +161,17 @@ const EnhancedProductsPage = () => {
     }
   };
 
-  const handleEditProduct = (product) => {
-    setEditingProduct(product);
-    setShowModal(true);
+  // The list carries only what a card shows; the editor needs the product
+  // whole, or saving it would write back a description it never had.
+  const handleEditProduct = async (product) => {
+    try {
+      const { data } = await axios.get(`${API_URL}/api/admin/products/${product.id}`);
+      setEditingProduct(data);
+      setShowModal(true);
+    } catch (error) {
+      toast.error(error.response?.data?.detail
+        || (isRTL ? 'تعذّر فتح المنتج' : 'Could not open the product'));
+    }
   };
 
   // ---- Off-niche broom: scan → owner confirms → purge -------------------
@@ -198,7 +225,18 @@ const EnhancedProductsPage = () => {
   const translateCatalogue = async () => {
     setTranslating(true);
     try {
-      const { data } = await axios.post(`${API_URL}/api/admin/products/translate`);
+      // A background job: a big catalogue used to outlast the request. Poll
+      // it until its report is in.
+      const { data: job } = await axios.post(`${API_URL}/api/admin/products/translate`);
+      let { data: status } = await axios.get(`${API_URL}/api/imports/${job.jobId}/status`);
+      while (status.state === 'pending' || status.state === 'running') {
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        ({ data: status } = await axios.get(`${API_URL}/api/imports/${job.jobId}/status`));
+      }
+      if (status.state !== 'completed' || !status.result) {
+        throw new Error(status.error || status.state);
+      }
+      const data = status.result;
       if (data.translated === 0 && data.unreadable === 0) {
         toast.success(isRTL ? 'كل المنتجات لها أسماء عربية بالفعل' : 'Every product already has an Arabic name');
       } else {
@@ -219,8 +257,8 @@ const EnhancedProductsPage = () => {
       }
       await fetchProducts();
     } catch (error) {
-      toast.error(error.response?.data?.detail
-        || (isRTL ? 'فشلت الترجمة — لم يتغيّر شيء' : 'Translation failed — nothing changed'));
+      toast.error(error.response?.data?.detail || error.message
+        || (isRTL ? 'فشلت الترجمة' : 'Translation failed'));
     } finally {
       setTranslating(false);
     }
@@ -326,57 +364,94 @@ const EnhancedProductsPage = () => {
   // shop whose owner pressed "استيراد سريع" twice sells every product twice.
   // The server keeps the copy order history points at, then live over
   // staging, then the oldest — and re-points carts and wishlists at it.
+  // Both passes are background jobs: a dry run first, whose report is what
+  // the owner confirms, then the real one.
+  const runDedupe = async (dryRun) => {
+    const { data: job } = await axios.post(`${API_URL}/api/admin/products/dedupe`, null,
+      { params: { dry_run: dryRun } });
+    let { data: status } = await axios.get(`${API_URL}/api/imports/${job.jobId}/status`);
+    while (status.state === 'pending' || status.state === 'running') {
+      await new Promise((resolve) => setTimeout(resolve, 1000));
+      ({ data: status } = await axios.get(`${API_URL}/api/imports/${job.jobId}/status`));
+    }
+    if (status.state !== 'completed' || !status.result) {
+      throw new Error(status.error || status.state);
+    }
+    return status.result;
+  };
+
   const removeDuplicates = async () => {
     try {
-      const { data } = await axios.get(`${API_URL}/api/admin/products/duplicates`);
-      if (!data.duplicates) {
+      const plan = await runDedupe(true);
+      if (!plan.removed) {
         toast.success(isRTL ? 'لا توجد منتجات مكرّرة' : 'No duplicate products');
         return;
       }
       // eslint-disable-next-line no-restricted-globals
       if (!confirm(isRTL
-        ? `وُجدت ${data.duplicates} نسخة مكرّرة من ${data.groups.length} منتجاً. تُحذف النسخ الزائدة ويبقى من كل منتج نسخة واحدة. متابعة؟`
-        : `Found ${data.duplicates} duplicate copies across ${data.groups.length} products. Extra copies will be deleted, one of each kept. Continue?`)) {
+        ? `وُجدت ${plan.removed} نسخة مكرّرة من ${plan.groups} منتجاً، وتشير إليها ${plan.carts_repointed} سلة. تُحذف النسخ الزائدة ويبقى من كل منتج نسخة واحدة. متابعة؟`
+        : `Found ${plan.removed} duplicate copies across ${plan.groups} products, in ${plan.carts_repointed} carts. Extra copies will be deleted, one of each kept. Continue?`)) {
         return;
       }
-      const res = await axios.post(`${API_URL}/api/admin/products/dedupe`);
+      const result = await runDedupe(false);
       toast.success(isRTL
-        ? `حُذفت ${res.data.removed} نسخة مكرّرة`
-        : `Removed ${res.data.removed} duplicate copies`);
+        ? `حُذفت ${result.removed} نسخة مكرّرة`
+        : `Removed ${result.removed} duplicate copies`);
       fetchProducts();
     } catch (error) {
-      toast.error(error.response?.data?.detail
-        || (isRTL ? 'تعذّرت إزالة المكرّرات — لم يُحذف شيء' : 'Could not remove duplicates — nothing was deleted'));
+      toast.error(error.response?.data?.detail || error.message
+        || (isRTL ? 'تعذّرت إزالة المكرّرات' : 'Could not remove duplicates'));
     }
   };
 
-  // Export writes what is on screen, from what the page already holds. No
-  // endpoint is invented for it, and it never claims rows it does not have.
-  const exportCsv = () => {
+  // Export writes every product the filters match, not the pages loaded so
+  // far: it reads the same keyset pages the screen does, to the last one.
+  // The server caps a page at 200 rows, so that is what each read asks for.
+  const exportCsv = async () => {
     const columns = ['id', 'name', 'sku', 'category', 'price', 'stock_quantity', 'is_active'];
     const escape = (value) => {
       const text = value === null || value === undefined ? '' : String(value);
       return /[",\n]/.test(text) ? `"${text.replace(/"/g, '""')}"` : text;
     };
-    const rows = [columns.join(',')];
-    for (const product of filteredProducts) {
-      rows.push(columns.map(c => escape(product[c])).join(','));
+    setExporting(true);
+    try {
+      const all = [];
+      let cursor = null;
+      do {
+        const { data: page } = await axios.get(`${API_URL}/api/admin/products`, {
+          params: { ...listParams(cursor), limit: 200 },
+        });
+        all.push(...(page.items || []));
+        cursor = page.next_cursor || null;
+      } while (cursor);
+
+      const rows = [columns.join(',')];
+      for (const product of all) {
+        rows.push(columns.map(c => escape(product[c])).join(','));
+      }
+      // A BOM, or Excel opens Arabic product names as mojibake.
+      const blob = new Blob(['\uFEFF' + rows.join('\n')], { type: 'text/csv;charset=utf-8;' });
+      const url = URL.createObjectURL(blob);
+      const a = document.createElement('a');
+      a.href = url;
+      a.download = `auraa-products-${all.length}.csv`;
+      a.click();
+      URL.revokeObjectURL(url);
+    } catch (error) {
+      toast.error(error.response?.data?.detail
+        || (isRTL ? 'تعذّر التصدير' : 'Could not export products'));
+    } finally {
+      setExporting(false);
     }
-    // A BOM, or Excel opens Arabic product names as mojibake.
-    const blob = new Blob(['\uFEFF' + rows.join('\n')], { type: 'text/csv;charset=utf-8;' });
-    const url = URL.createObjectURL(blob);
-    const a = document.createElement('a');
-    a.href = url;
-    a.download = `auraa-products-${filteredProducts.length}.csv`;
-    a.click();
-    URL.revokeObjectURL(url);
   };
 
-  const handleSelectAll = () => {
-    if (selectedProducts.length === filteredProducts.length) {
+  // Selects the rows loaded so far — with more pages to come, not every
+  // product the filters match — and the checkbox says so.
+  const handleSelectLoaded = () => {
+    if (selectedProducts.length === products.length) {
       setSelectedProducts([]);
     } else {
-      setSelectedProducts(filteredProducts.map(p => p.id));
+      setSelectedProducts(products.map(p => p.id));
     }
   };
 
@@ -441,7 +516,7 @@ const EnhancedProductsPage = () => {
               {isRTL ? 'إدارة المنتجات' : 'Products Management'}
             </h1>
             <p className="text-gray-600 mt-1">
-              {isRTL ? `${filteredProducts.length} منتج إجمالي` : `${filteredProducts.length} total products`}
+              {isRTL ? `${summary?.total ?? products.length} منتج إجمالي` : `${summary?.total ?? products.length} total products`}
             </p>
           </div>
         </div>
@@ -455,9 +530,9 @@ const EnhancedProductsPage = () => {
             {isRTL ? 'إضافة منتج' : 'Add Product'}
           </Button>
           
-          <Button variant="outline" onClick={exportCsv} data-testid="export-products">
+          <Button variant="outline" onClick={exportCsv} disabled={exporting} data-testid="export-products">
             <Download className="h-4 w-4 me-2" />
-            {isRTL ? 'تصدير' : 'Export'}
+            {exporting ? (isRTL ? 'جارٍ التصدير…' : 'Exporting…') : (isRTL ? 'تصدير' : 'Export')}
           </Button>
 
           {/* The broom: finds clothes/shoes/decor that entered before the
@@ -517,7 +592,7 @@ const EnhancedProductsPage = () => {
           <div className="flex items-center justify-between">
             <div>
               <p className="text-sm font-medium text-blue-600">{isRTL ? 'إجمالي المنتجات' : 'Total Products'}</p>
-              <p className="text-3xl font-bold text-blue-900">{products.length}</p>
+              <p className="text-3xl font-bold text-blue-900">{summary?.total ?? products.length}</p>
             </div>
             <Package className="h-8 w-8 text-blue-600" />
           </div>
@@ -527,7 +602,7 @@ const EnhancedProductsPage = () => {
           <div className="flex items-center justify-between">
             <div>
               <p className="text-sm font-medium text-green-600">{isRTL ? 'منتجات نشطة' : 'Active Products'}</p>
-              <p className="text-3xl font-bold text-green-900">{products.filter(p => p.is_active).length}</p>
+              <p className="text-3xl font-bold text-green-900">{summary?.active ?? '—'}</p>
             </div>
             <Check className="h-8 w-8 text-green-600" />
           </div>
@@ -537,7 +612,7 @@ const EnhancedProductsPage = () => {
           <div className="flex items-center justify-between">
             <div>
               <p className="text-sm font-medium text-amber-600">{isRTL ? 'منتجات مميزة' : 'Featured Products'}</p>
-              <p className="text-3xl font-bold text-amber-900">{products.filter(p => p.is_featured).length}</p>
+              <p className="text-3xl font-bold text-amber-900">{summary?.featured ?? '—'}</p>
             </div>
             <Star className="h-8 w-8 text-amber-600" />
           </div>
@@ -547,7 +622,7 @@ const EnhancedProductsPage = () => {
           <div className="flex items-center justify-between">
             <div>
               <p className="text-sm font-medium text-red-600">{isRTL ? 'مخزون منخفض' : 'Low Stock'}</p>
-              <p className="text-3xl font-bold text-red-900">{products.filter(p => p.stock_quantity < 10).length}</p>
+              <p className="text-3xl font-bold text-red-900">{summary?.low_stock ?? '—'}</p>
             </div>
             <AlertCircle className="h-8 w-8 text-red-600" />
           </div>
@@ -654,7 +729,7 @@ const EnhancedProductsPage = () => {
         <div className="bg-white rounded-lg shadow-sm border border-gray-200 overflow-hidden">
           {viewMode === 'grid' ? (
             <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 xl:grid-cols-4 gap-6 p-6">
-              {filteredProducts.map((product) => (
+              {products.map((product) => (
                 <div key={product.id} className="group relative bg-white border border-gray-200 rounded-lg overflow-hidden hover:shadow-lg transition-all duration-300">
                   {/* Selection Checkbox */}
                   <div className="absolute top-3 left-3 z-10">
@@ -817,8 +892,11 @@ const EnhancedProductsPage = () => {
                     <th className="px-6 py-3 text-right text-xs font-medium text-gray-500 uppercase tracking-wider">
                       <input
                         type="checkbox"
-                        checked={selectedProducts.length === filteredProducts.length && filteredProducts.length > 0}
-                        onChange={handleSelectAll}
+                        checked={selectedProducts.length === products.length && products.length > 0}
+                        onChange={handleSelectLoaded}
+                        title={isRTL ? `تحديد المحمّل (${products.length})` : `Select loaded (${products.length})`}
+                        aria-label={isRTL ? 'تحديد المنتجات المحمّلة' : 'Select loaded products'}
+                        data-testid="select-loaded"
                         className="rounded border-gray-300 text-amber-600 focus:ring-amber-500"
                       />
                     </th>
@@ -843,7 +921,7 @@ const EnhancedProductsPage = () => {
                   </tr>
                 </thead>
                 <tbody className="bg-white divide-y divide-gray-200">
-                  {filteredProducts.map((product) => (
+                  {products.map((product) => (
                     <tr key={product.id} className="hover:bg-gray-50">
                       <td className="px-6 py-4 whitespace-nowrap">
                         <input
@@ -936,8 +1014,18 @@ const EnhancedProductsPage = () => {
         </div>
       )}
 
+      {!loading && nextCursor && (
+        <div className="flex justify-center">
+          <Button variant="outline" onClick={loadMore} disabled={loadingMore} data-testid="load-more-products">
+            {loadingMore
+              ? (isRTL ? 'جارٍ التحميل…' : 'Loading…')
+              : (isRTL ? 'عرض المزيد' : 'Load more')}
+          </Button>
+        </div>
+      )}
+
       {/* Empty State */}
-      {!loading && filteredProducts.length === 0 && (
+      {!loading && products.length === 0 && (
         <div className="text-center py-16 bg-white rounded-lg shadow-sm border border-gray-200">
           <Package className="h-16 w-16 text-gray-300 mx-auto mb-4" />
           <h3 className="text-lg font-medium text-gray-900 mb-2">
@@ -74,7 +74,18 @@ const PricingPage = () => {
     setRepricing(true);
     setRepriceReport(null);
     try {
-      const report = await apiPost('/api/admin/pricing-settings/reprice', {});
+      // The reprice runs as a background job — a big catalogue used to hold
+      // this request open for minutes. Poll it until its report is in.
+      const { jobId } = await apiPost('/api/admin/pricing-settings/reprice', {});
+      let status = await apiGet(`/api/imports/${jobId}/status`);
+      while (status.state === 'pending' || status.state === 'running') {
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        status = await apiGet(`/api/imports/${jobId}/status`);
+      }
+      if (status.state !== 'completed' || !status.result) {
+        throw new Error(status.error || status.state);
+      }
+      const report = status.result;
       setRepriceReport(report);
       toast.success(isRTL
         ? `أعيد تسعير ${report.repriced} منتجاً بهامش ${report.profit_margin_percent}%`
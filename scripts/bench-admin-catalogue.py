@@ -0,0 +1,81 @@
+"""
+Opening the admin catalogue, whole and validated, and a page at a time.
+
+    python scripts/bench-admin-catalogue.py
+    python scripts/bench-admin-catalogue.py --products 50000 --queries 20
+
+"before" is admin_list_products as it was: every non-staging product read
+whole, corrected for display and validated against the Product model to
+flag the rows the storefront will not show. "after" is the route as it is,
+called the way the screen calls it — the first page of the list view, a
+page further in by cursor, and a search — with every row stamped first by
+backfill_storefront_fields, whose one-off cost is reported apart.
+
+The size of each reply is reported too: it is what the admin's browser
+waits for and parses, whatever the database. mongomock has no indexes, so
+there a page still sorts the whole collection and the stamping updates scan
+it row by row; --mongo-url shows the indexed times.
+"""
+import asyncio
+import json
+import time
+
+from benchlib import arguments, database, report, seed_products, timed
+
+import server
+
+ADMIN = None
+
+
+def after(**params):
+    defaults = dict(include_staging=False, staging=None, category=None, source=None,
+                    status=None, visibility=None, missing_material=False, q=None,
+                    view="list", limit=60, cursor=None, admin=ADMIN)
+    return server.admin_list_products(**{**defaults, **params})
+
+
+async def before():
+    products = await server.db.products.find({"staging": {"$ne": True}}).sort(
+        "created_at", -1).to_list(length=None)
+    for p in products:
+        p.pop("_id", None)
+        p.setdefault("is_active", True)
+        server._readable_name(server._sane_reference_price(p))
+        try:
+            server.Product(**p)
+            p["storefront_visible"] = True
+        except Exception:
+            p["storefront_visible"] = False
+    return products
+
+
+def size(reply):
+    return f"{len(json.dumps(reply, default=str).encode()) / 1024:,.0f} KiB"
+
+
+async def main():
+    args = arguments(__doc__, products=5_000, queries=10)
+    db, drop = database(args)
+    server.db = db
+    await seed_products(db, args.products, args.seed)
+
+    report("before: whole, validated", await timed(lambda i: before(), max(1, args.queries // 5)))
+    print(f"{'':<28} {size(await before())} per reply")
+
+    started = time.perf_counter()
+    stamped = await server.backfill_storefront_fields()
+    print(f"{'stamping, once':<28} {stamped} products in {time.perf_counter() - started:.2f} s")
+
+    report("after: first page", await timed(lambda i: after(), args.queries))
+    print(f"{'':<28} {size(await after())} per reply")
+    page = await after()
+    for _ in range(10):
+        page = await after(cursor=page["next_cursor"])
+    cursor = page["next_cursor"]
+    report("after: page 12, by cursor", await timed(lambda i: after(cursor=cursor), args.queries))
+    report("after: search 'pearl'", await timed(lambda i: after(q="pearl"), args.queries))
+    await drop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,99 @@
+"""
+POST /api/orders end to end, by the number of lines in the basket.
+
+    python scripts/bench-checkout.py
+    python scripts/bench-checkout.py --queries 100 --mongo-url mongodb://localhost:27017
+
+Orders are driven straight into the app's ASGI callable with a bearer
+token, against benchlib's synthetic catalogue. Each order's basket is
+written to the database first and is not timed; the order is. "before"
+reads the basket through the catalogue cache with fresh=True, the way
+create_order used to, and reads the payment document on every order;
+"after" is checkout_docs() and payment_config_snapshot() as they are.
+Against mongomock a round trip costs next to nothing, so the gap is the
+work done per order; --mongo-url shows what the saved round trips are
+worth on a real server.
+"""
+import asyncio
+import logging
+import os
+import random
+import time
+import uuid
+
+os.environ.setdefault("COOKIE_SECURE", "false")
+
+from benchlib import arguments, database, product, report
+
+import httpx
+
+import server
+from core.security import create_access_token
+
+BASKETS = (1, 5, 10, 20)
+SHIPPING = {
+    "firstName": "Younes", "lastName": "S", "email": "c@x.com",
+    "phone": "+966500000000", "street": "King Fahd Rd 12",
+    "city": "Riyadh", "state": "Riyadh", "zipCode": "11564", "country": "SA",
+}
+
+
+async def before_docs(product_ids):
+    return await server.live_docs(product_ids, fresh=True)
+
+
+async def before_payment_config():
+    return await server._get_singleton(server.PAYMENT_DOC_ID)
+
+
+async def main():
+    # Every order tries to email the owner, and there is no SendGrid key here.
+    logging.disable(logging.CRITICAL)
+    args = arguments(__doc__, products=2_000, queries=50)
+    db, drop = database(args)
+    server.db = db
+    server.app.state.db = db
+
+    rng = random.Random(args.seed)
+    docs = [product(i, rng) for i in range(args.products)]
+    for doc in docs:
+        doc.update(in_stock=True, staging=False)
+    await db.products.insert_many(docs)
+    # Stamped as the boot backfill would: the storefront sells listed rows only.
+    await server.backfill_storefront_fields()
+    ids = [doc["id"] for doc in docs]
+
+    user_id = str(uuid.uuid4())
+    await db.users.insert_one({"id": user_id, "email": "bench@auraaluxury.com", "name": "Bench",
+                               "is_active": True, "is_admin": False})
+    token = create_access_token({"user_id": user_id, "sub": "bench@auraaluxury.com"})
+    headers = {"Authorization": f"Bearer {token}"}
+
+    checkout_docs, payment_config = server.checkout_docs, server.payment_config_snapshot
+    transport = httpx.ASGITransport(app=server.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for size in BASKETS:
+            for label, docs_fn, config_fn in (
+                ("before", before_docs, before_payment_config),
+                ("after", checkout_docs, payment_config),
+            ):
+                server.checkout_docs, server.payment_config_snapshot = docs_fn, config_fn
+
+                samples = []
+                for _ in range(args.queries + 1):
+                    await db.carts.update_one({"user_id": user_id}, {"$set": {"items": [
+                        {"product_id": pid, "quantity": 1, "price": 1.0}
+                        for pid in rng.sample(ids, size)]}}, upsert=True)
+                    started = time.perf_counter()
+                    r = await client.post("/api/orders", headers=headers, json={
+                        "shipping_address": SHIPPING, "payment_method": "on_confirmation"})
+                    samples.append(time.perf_counter() - started)
+                    assert r.status_code == 200, r.text
+                # The first order of each pair warms what it reads.
+                report(f"{label}: {size:>2} line(s)", samples[1:])
+    server.checkout_docs, server.payment_config_snapshot = checkout_docs, payment_config
+    await drop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+"""
+Collapsing a catalogue the old importer filled twice.
+
+    python scripts/bench-dedupe.py
+    python scripts/bench-dedupe.py --products 50000 --mongo-url mongodb://localhost:27017
+
+Every product in benchlib's catalogue gets a second copy under a new id, a
+tenth of the copies sit in a cart and as many in a wishlist, and orders
+point at a few originals. "before" is POST /admin/products/dedupe as it
+was: every product with a supplier id and every order read whole, grouped
+in Python, and each group's carts and wishlists read and rewritten one
+document at a time. "after" is _dedupe_job(), once as a dry run and once
+for real. Each runs on its own copy of the same data, and is checked to
+leave the same catalogue behind.
+"""
+import asyncio
+import random
+import time
+import uuid
+from typing import Any, Dict, List
+
+from benchlib import arguments, database, seed_products
+
+import server
+
+
+async def seed(db, args):
+    await seed_products(db, args.products, args.seed)
+    rng = random.Random(args.seed)
+    originals = await db.products.find({}, {"_id": 0}).to_list(length=None)
+    copies = [{**doc, "id": f"copy-{doc['id']}"} for doc in originals]
+    await db.products.insert_many(copies)
+    held = rng.sample([doc["id"] for doc in copies], max(1, len(copies) // 10))
+    await db.carts.insert_many([
+        {"user_id": f"cart-{i}", "items": [{"product_id": pid, "quantity": 1, "price": 100.0}],
+         "total_amount": 100.0} for i, pid in enumerate(held)])
+    await db.wishlists.insert_many([
+        {"user_id": f"wish-{i}", "product_ids": [pid]} for i, pid in enumerate(held)])
+    await db.orders.insert_many([
+        {"id": str(uuid.uuid4()), "items": [{"product_id": doc["id"], "quantity": 1}]}
+        for doc in rng.sample(originals, max(1, len(originals) // 100))])
+
+
+async def before(db):
+    docs = await db.products.find({"external_id": {"$exists": True}}).to_list(length=None)
+    groups: Dict[Any, List[Dict[str, Any]]] = {}
+    for doc in docs:
+        if doc.get("external_id") and doc.get("id"):
+            groups.setdefault((doc.get("source") or "", str(doc["external_id"])), []).append(doc)
+    groups = [group for group in groups.values() if len(group) > 1]
+    referenced = set()
+    for order in await db.orders.find({}, {"items.product_id": 1}).to_list(length=None):
+        referenced.update(item["product_id"] for item in order.get("items") or [])
+
+    def keep_rank(doc):
+        return (0 if doc["id"] in referenced else 1, 0 if not doc.get("staging") else 1,
+                str(doc.get("created_at") or ""), str(doc["id"]))
+
+    removed = []
+    for group in groups:
+        keeper = sorted(group, key=keep_rank)[0]["id"]
+        losers = [doc["id"] for doc in group if doc["id"] != keeper]
+        removed.extend(losers)
+        for cart in await db.carts.find({"items.product_id": {"$in": losers}}).to_list(length=None):
+            await db.carts.update_one({"user_id": cart["user_id"]}, {"$set": {"items": [
+                {**item, "product_id": keeper if item["product_id"] in losers else item["product_id"]}
+                for item in cart["items"]]}})
+        for wishlist in await db.wishlists.find({"product_ids": {"$in": losers}}).to_list(length=None):
+            await db.wishlists.update_one({"user_id": wishlist["user_id"]}, {"$set": {
+                "product_ids": [keeper if pid in losers else pid for pid in wishlist["product_ids"]]}})
+    await db.products.delete_many({"id": {"$in": removed}})
+
+
+async def after(db, dry_run):
+    job_id = await server.ImportJobManager(db).create_job(
+        job_type="dedupe", supplier="catalogue", params={"dry_run": dry_run}, user_id="bench")
+    await server._dedupe_job(job_id, dry_run, "bench")
+    return (await server.ImportJobManager(db).get_job(job_id))["result"]
+
+
+async def main():
+    args = arguments(__doc__, products=5_000)
+    left = {}
+    for label in ("before", "after: dry run", "after"):
+        db, drop = database(args)
+        server.db = db
+        await seed(db, args)
+        started = time.perf_counter()
+        if label == "before":
+            await before(db)
+        else:
+            result = await after(db, label.endswith("dry run"))
+        elapsed = time.perf_counter() - started
+        detail = "" if label == "before" else (
+            f" — {result['groups']} groups, {result['removed']} copies,"
+            f" {result['carts_repointed']} carts, {result['wishlists_repointed']} wishlists")
+        print(f"{label:<28} {elapsed:8.2f} s{detail}")
+        left[label] = sorted(await db.products.distinct("id"))
+        await drop()
+    assert left["before"] == left["after"], "the two left different catalogues behind"
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,130 @@
+"""
+Per-request cost of the CORS and rate-limit middlewares, before and after
+they became plain ASGI.
+
+    python scripts/bench-middleware.py
+    python scripts/bench-middleware.py --requests 20000
+
+Requests are driven straight into the ASGI callable — no sockets, no
+database — at a one-route app answering a small JSON body, so what is timed
+is the middleware stack and nothing else. "before" is the two
+BaseHTTPMiddleware classes as they were; "after" is middleware/cors.py and
+middleware/rate_limiter.py. "bare" is the route with no middleware at all.
+"""
+import argparse
+import asyncio
+
+from benchlib import report, timed
+
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import Response
+
+from core.origins import is_origin_allowed
+from middleware.cors import CustomCORSMiddleware
+from middleware.rate_limiter import MemoryStore, RateLimitMiddleware
+
+ORIGIN = "https://auraaluxury.com"
+
+
+class OldCORSMiddleware(BaseHTTPMiddleware):
+    async def dispatch(self, request, call_next):
+        origin = request.headers.get("origin")
+        is_allowed = is_origin_allowed(origin)
+        if request.method == "OPTIONS":
+            response = Response(status_code=200)
+            if is_allowed and origin:
+                response.headers["Access-Control-Allow-Origin"] = origin
+                response.headers["Access-Control-Allow-Credentials"] = "true"
+                response.headers["Access-Control-Allow-Methods"] = "GET, POST, PUT, DELETE, PATCH, OPTIONS"
+                response.headers["Access-Control-Allow-Headers"] = "Content-Type, Authorization, Accept, Origin, User-Agent, X-Requested-With, Idempotency-Key"
+                response.headers["Access-Control-Expose-Headers"] = "*"
+                response.headers["Access-Control-Max-Age"] = "3600"
+            return response
+        try:
+            response = await call_next(request)
+        except Exception as e:
+            response = JSONResponse(status_code=500,
+                                    content={"detail": f"Internal error: {type(e).__name__}"})
+        if is_allowed and origin:
+            response.headers["Access-Control-Allow-Origin"] = origin
+            response.headers["Access-Control-Allow-Credentials"] = "true"
+            response.headers["Access-Control-Expose-Headers"] = "*"
+        return response
+
+
+class OldRateLimitMiddleware(BaseHTTPMiddleware):
+    """The old shape: a prefix check on the way to call_next."""
+
+    def __init__(self, app):
+        super().__init__(app)
+        self.prefixes = ("/api/auth/login", "/api/auth/register")
+
+    async def dispatch(self, request, call_next):
+        if not request.url.path.startswith(self.prefixes):
+            return await call_next(request)
+        return await call_next(request)
+
+
+def build(stack):
+    app = FastAPI()
+
+    @app.get("/api/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.get("/api/products")
+    async def products():
+        return [{"id": f"p{i}", "name": "Ring", "price": 100.0} for i in range(24)]
+
+    if stack == "before":
+        app.add_middleware(OldRateLimitMiddleware)
+        app.add_middleware(OldCORSMiddleware)
+    elif stack == "after":
+        app.add_middleware(RateLimitMiddleware, store=MemoryStore())
+        app.add_middleware(CustomCORSMiddleware)
+    return app
+
+
+def request(path, method="GET"):
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1",
+        "method": method, "scheme": "https", "path": path, "raw_path": path.encode(),
+        "root_path": "", "query_string": b"", "client": ("203.0.113.1", 5000),
+        "server": ("api.auraaluxury.com", 443),
+        "headers": [(b"host", b"api.auraaluxury.com"), (b"origin", ORIGIN.encode()),
+                    (b"access-control-request-method", b"GET")],
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    return scope, receive, send
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=5000)
+    args = parser.parse_args()
+
+    for path, method in (("/api/health", "GET"), ("/api/products", "GET"),
+                         ("/api/products", "OPTIONS")):
+        for stack in ("bare", "before", "after"):
+            if stack == "bare" and method == "OPTIONS":
+                continue
+            app = build(stack)
+
+            async def one(i):
+                await app(*request(path, method))
+
+            await timed(one, 200)  # warm up: routing tables, middleware stack
+            report(f"{stack}: {method} {path}", await timed(one, args.requests))
+        print()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
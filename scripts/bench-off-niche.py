@@ -0,0 +1,57 @@
+"""
+Opening the off-niche broom: the whole catalogue judged, or the stored verdict.
+
+    python scripts/bench-off-niche.py
+    python scripts/bench-off-niche.py --products 50000 --mongo-url mongodb://localhost:27017
+
+benchlib's catalogue is all jewellery, so one product in fifty is renamed
+into something the shop does not sell. "before" is the screen as it was:
+every product read whole and run through looks_like_adornment. "after" is
+list_off_niche_products as it is — whole, and a page at a time — once
+backfill_storefront_fields has stamped every row, whose one-off cost is
+reported apart. mongomock has no indexes; --mongo-url shows the indexed times.
+"""
+import asyncio
+import time
+
+from benchlib import arguments, database, report, seed_products, timed
+
+import server
+from services.import_service import as_supplier_shape, looks_like_adornment
+
+INTRUDERS = ("Elegant Evening Dress", "Running Shoes Men Sneakers",
+             "Scented Candles Home Decor Set", "Plush Toy Bear Gift")
+
+
+async def before():
+    docs = await server.db.products.find({}).to_list(100000)
+    return [d for d in docs if not looks_like_adornment(as_supplier_shape(d))]
+
+
+async def main():
+    args = arguments(__doc__, products=5_000, queries=10)
+    db, drop = database(args)
+    server.db = db
+    await seed_products(db, args.products, args.seed)
+    for i in range(0, args.products, 50):
+        await db.products.update_one({"id": f"bench-{i}"}, {"$set": {
+            "name": INTRUDERS[i // 50 % len(INTRUDERS)], "name_ar": ""}})
+
+    report("before: every row judged", await timed(lambda i: before(), max(1, args.queries // 5)))
+    found = len(await before())
+
+    started = time.perf_counter()
+    stamped = await server.backfill_storefront_fields()
+    print(f"{'stamping, once':<28} {stamped} products in {time.perf_counter() - started:.2f} s")
+
+    listed = await server.list_off_niche_products(limit=None, cursor=None, admin=None)
+    assert len(listed) == found, f"{len(listed)} listed, {found} judged"
+    report("after: whole list", await timed(
+        lambda i: server.list_off_niche_products(limit=None, cursor=None, admin=None), args.queries))
+    report("after: first page", await timed(
+        lambda i: server.list_off_niche_products(limit=60, cursor=None, admin=None), args.queries))
+    await drop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,66 @@
+"""
+/api/search before and after the in-process index, on a seeded catalogue.
+
+    python scripts/bench-search.py                      # 50k products, mongomock
+    python scripts/bench-search.py --mongo-url mongodb://localhost:27017
+
+"before" is the ten-field `$regex` `$or` the endpoint used to send; "after"
+is a lookup in services/search_index.py plus the one `$in` read of the page
+of winners. Index build time is reported separately — it is paid at boot and
+on rebuild, not per search.
+"""
+import asyncio
+import re
+import time
+
+from benchlib import arguments, database, report, seed_products, timed
+
+QUERIES = ["silver", "gold ring", "pearl", "necklace", "خاتم", "قلادة فضة",
+           "vintage", "zircon hoop", "rose", "bangle", "AU-0012", "minimal"]
+
+_FIELDS = ("name", "description", "name_en", "name_ar", "description_en",
+           "description_ar", "material_en", "material_ar", "sku", "category")
+
+
+async def main():
+    args = arguments(__doc__, queries=100)
+    db, drop = database(args)
+    import server
+    from services.search_index import SearchIndex
+
+    print(f"seeding {args.products} products…")
+    await seed_products(db, args.products, args.seed)
+    # The index reads the stamped live set, as the storefront does.
+    server.db = db
+    await server.backfill_storefront_fields()
+
+    async def before(i):
+        escaped = re.escape(QUERIES[i % len(QUERIES)])
+        query = {"$or": [{f: {"$regex": escaped, "$options": "i"}} for f in _FIELDS],
+                 "staging": {"$ne": True}}
+        docs = await db.products.find(query).limit(24).to_list(None)
+        [server._catalogue_ready(d) for d in docs]
+
+    index = SearchIndex(server._catalogue_ready)
+    started = time.perf_counter()
+    await index.ensure_current(db)
+    print(f"index build: {time.perf_counter() - started:.2f} s for {len(index)} live products")
+
+    async def after(i):
+        await index.ensure_current(db)
+        ids = index.search(QUERIES[i % len(QUERIES)], limit=24)
+        await db.products.find({"id": {"$in": ids}, "staging": {"$ne": True}}).to_list(None)
+
+    async def lookup(i):
+        index.search(QUERIES[i % len(QUERIES)], limit=24)
+
+    report("before: regex $or scan", await timed(before, args.queries))
+    report("after: index + $in page", await timed(after, args.queries))
+    # mongomock has no indexes, so its `$in` is itself a scan; this is the
+    # part of "after" that does not depend on the database.
+    report("after: index lookup only", await timed(lookup, args.queries))
+    await drop()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
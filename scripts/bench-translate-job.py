@@ -0,0 +1,64 @@
+"""
+The translate button's per-product work, read on the event loop and fanned
+out to services/catalogue_text.py's process pool.
+
+    python scripts/bench-translate-job.py
+    python scripts/bench-translate-job.py --products 5000 --workers 8
+
+The products are benchlib's synthetic catalogue with its Arabic and its
+material blanked, so every one of them has the full set of rules to go
+through — the state of a catalogue imported before the translator existed.
+"before" is review() over every product in this process, as the route used
+to do inside the request; "after" is review_many() in chunks of the job's
+size. Pool start-up is timed apart: it is paid once per server.
+"""
+import asyncio
+import random
+import time
+
+from benchlib import arguments, product
+
+from services import catalogue_text
+
+CHUNK = 500
+
+
+def catalogue(count, seed):
+    rng = random.Random(seed)
+    docs = []
+    for i in range(count):
+        doc = product(i, rng)
+        doc.update(name_ar=doc["name"], description_ar="", description_en="",
+                   material_ar="", material_en="")
+        docs.append({field: doc.get(field)
+                     for field in (*catalogue_text.CATALOGUE_TEXT_INPUTS, "id")})
+    return docs
+
+
+def rate(label, count, elapsed):
+    print(f"{label:<28} {count / elapsed:10,.0f} products/s   ({elapsed:.2f} s)")
+
+
+async def main():
+    args = arguments(__doc__, products=10_000)
+    docs = catalogue(args.products, args.seed)
+
+    started = time.perf_counter()
+    inline = catalogue_text.review_batch(docs)
+    rate("before: on the event loop", len(docs), time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await catalogue_text.review_many(docs[:catalogue_text.MIN_SLICE])
+    print(f"{'pool start-up':<28} {time.perf_counter() - started:10.2f} s"
+          f"   ({catalogue_text.CATALOGUE_TEXT_WORKERS} workers)")
+
+    started = time.perf_counter()
+    pooled = []
+    for i in range(0, len(docs), CHUNK):
+        pooled += await catalogue_text.review_many(docs[i:i + CHUNK])
+    rate("after: process pool", len(docs), time.perf_counter() - started)
+    assert pooled == inline, "the pool must read exactly what this process does"
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
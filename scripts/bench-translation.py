@@ -0,0 +1,123 @@
+"""
+Titles per second through the product_translation analyser, before and
+after its vocabulary was compiled.
+
+    python scripts/bench-translation.py
+    python scripts/bench-translation.py --products 20000
+
+"before" is the reader as it was: every table sorted, and every key probed
+in all three plural forms, on every call. "after" is analyse() as it is —
+compiled tables, with the memo on the normalised title both cold (cleared
+before the run) and warm (a second pass over the same titles, the way the
+importer, the boot pass and the translate button go over one catalogue).
+Before any timing, both readings of every title are checked to be the same.
+
+The corpus is real CJ titles, the ones the tests were written against,
+followed by --products synthetic ones from benchlib.
+"""
+import random
+import time
+
+from benchlib import arguments, product
+
+from services import product_translation as t
+
+CJ_TITLES = [
+    "S925 Sterling Silver Butterfly Pendant Necklace for Women",
+    "Adjustable Rose Gold Snake Bangle Bracelet Ladies",
+    "Rose Gold Color Zinc Alloy Flower Earrings for Women",
+    "Stainless Steel Cuban Chain Bracelet for Men",
+    "Women Vintage Lace Halo Cubic Zirconia Ring",
+    "Luxury Shiny Diamond Zircon Ring",
+    "Cubic Zirconia Drop Earrings Wedding",
+    "Fashion Simple Alloy Stud Earrings",
+    "Gold Colour Pearl Hair Clip",
+    "Shell Shape Pearl Pendant Necklace",
+    "Vintage Owl Pendant Long Chain Necklace",
+    "18K Gold Plated Cubic Zirconia Heart Ring",
+    "Stainless Steel Evil Eye Bracelet",
+    "Women Stud Earrings",
+    "Quartz Wristwatch",
+    "Necklace Pendant",
+    "Butterfly Pendant Necklace",
+    "Minimalist Titanium Steel Hoop Earrings Unisex",
+    "925 Silver Moissanite Tennis Bracelet Women And Men",
+    "Bohemian Turquoise Beaded Anklet Summer Beach",
+]
+
+
+class OldReader:
+    """services/product_translation._Reader before the tables were compiled."""
+
+    def __init__(self, text):
+        self.remaining = t._normalise(text)
+
+    def take(self, table):
+        found = []
+        for entry in t._by_length(table):
+            present = t._spans(self.remaining, entry[0])
+            if present:
+                found.append((entry, present))
+                self.remaining = self.remaining.replace(f" {present} ", " ")
+        return found
+
+    def take_head(self, table):
+        best = None
+        for entry in t._by_length(table):
+            present = t._spans(self.remaining, entry[0])
+            if not present:
+                continue
+            position = self.remaining.rindex(f" {present} ") + len(present)
+            if best is None or position > best[0]:
+                best = (position, present, entry)
+        if not best:
+            return None
+        _, present, entry = best
+        self.remaining = self.remaining.replace(f" {present} ", " ")
+        return entry, present
+
+
+def old_reading(title):
+    reader = OldReader(title)
+    head = reader.take_head(t._TYPES)
+    return (head, reader.take(t._MATERIALS), reader.take(t._STONES + t._UNNAMEABLE_STONES),
+            reader.take(t._MOTIFS), reader.take(t._STYLES), reader.take(t._OCCASIONS),
+            reader.take(t._AUDIENCES))
+
+
+def new_reading(title):
+    reader = t._Reader(title)
+    head = reader.take_head(t._TYPES_TABLE)
+    return (head, reader.take(t._MATERIALS_TABLE), reader.take(t._ALL_STONES_TABLE),
+            reader.take(t._MOTIFS_TABLE), reader.take(t._STYLES_TABLE),
+            reader.take(t._OCCASIONS_TABLE), reader.take(t._AUDIENCES_TABLE))
+
+
+def rate(label, fn, titles):
+    started = time.perf_counter()
+    for title in titles:
+        fn(title)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} {len(titles) / elapsed:12,.0f} titles/s"
+          f"   ({elapsed * 1e6 / len(titles):.1f} µs each)")
+
+
+def main():
+    args = arguments(__doc__, products=20_000)
+    rng = random.Random(args.seed)
+    titles = CJ_TITLES + [product(i, rng)["name"] for i in range(args.products)]
+
+    for title in titles:
+        assert old_reading(title) == new_reading(title), title
+    print(f"{len(titles)} titles read identically")
+
+    rate("before: probe every key", old_reading, titles)
+    rate("after: compiled tables", new_reading, titles)
+    t._analyse_normalised.cache_clear()
+    rate("after: analyse(), cold", t.analyse, titles)
+    rate("after: analyse(), warm", t.analyse, titles)
+    print(t._analyse_normalised.cache_info())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Shared pieces of the scripts/bench-*.py benchmarks.
+
+Each benchmark seeds a synthetic catalogue shaped like a CJ import — long
+supplier titles, Arabic names, materials, a spread of prices — and times the
+code path it is about, old way and new. By default the catalogue lives in an
+in-memory mongomock database so the numbers need no server; pass
+--mongo-url to measure against a real MongoDB (a throwaway database is used
+and dropped afterwards).
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+BACKEND = Path(__file__).resolve().parents[1] / "backend"
+sys.path.insert(0, str(BACKEND))
+
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "bench_db")
+os.environ.setdefault("JWT_SECRET_KEY", "bench-secret-key")
+os.environ.setdefault("ENV", "test")
+
+CATEGORIES = ["earrings", "necklaces", "bracelets", "rings", "watches", "sets"]
+METALS = [("Sterling Silver", "فضة استرليني"), ("Gold Plated", "مطلي بالذهب"),
+          ("Stainless Steel", "فولاذ مقاوم للصدأ"), ("Rose Gold", "ذهب وردي"),
+          ("Titanium", "تيتانيوم"), ("Copper", "نحاس")]
+STYLES = ["Elegant", "Vintage", "Minimalist", "Luxury", "Bohemian", "Classic",
+          "Dainty", "Chunky", "Geometric", "Layered"]
+TYPES = {"earrings": ("Hoop Earrings", "أقراط حلقية"), "necklaces": ("Pendant Necklace", "قلادة"),
+         "bracelets": ("Bangle Bracelet", "سوار"), "rings": ("Cocktail Ring", "خاتم"),
+         "watches": ("Quartz Watch", "ساعة"), "sets": ("Jewelry Set", "طقم مجوهرات")}
+STONES = ["Zircon", "Crystal", "Pearl", "Opal", "Moissanite", "Turquoise", "Onyx"]
+
+
+def arguments(description: str, **defaults) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--products", type=int, default=defaults.get("products", 50_000))
+    parser.add_argument("--queries", type=int, default=defaults.get("queries", 200))
+    parser.add_argument("--mongo-url", default=None,
+                        help="measure against a real MongoDB instead of mongomock")
+    parser.add_argument("--seed", type=int, default=7)
+    return parser.parse_args()
+
+
+def database(args):
+    """A fresh database for the run, and a coroutine function that drops it."""
+    if args.mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(args.mongo_url)
+        name = f"bench_{uuid.uuid4().hex[:8]}"
+
+        async def drop():
+            await client.drop_database(name)
+        return client[name], drop
+
+    from mongomock.collection import BulkOperationBuilder
+    from mongomock_motor import AsyncMongoMockClient
+
+    # pymongo 4.9+ hands bulk operations a `sort` argument mongomock's builder
+    # does not take; drop it, so bulk_write runs as one bulk write here too.
+    for name in ("add_update", "add_replace"):
+        add = getattr(BulkOperationBuilder, name)
+        if not getattr(add, "drops_sort", False):
+            def without_sort(self, *a, sort=None, _add=add, **kw):
+                return _add(self, *a, **kw)
+            without_sort.drops_sort = True
+            setattr(BulkOperationBuilder, name, without_sort)
+
+    async def nothing():
+        return None
+    return AsyncMongoMockClient()["bench_db"], nothing
+
+
+def product(i: int, rng: random.Random) -> dict:
+    category = rng.choice(CATEGORIES)
+    metal_en, metal_ar = rng.choice(METALS)
+    kind_en, kind_ar = TYPES[category]
+    style = rng.choice(STYLES)
+    stone = rng.choice(STONES)
+    name = f"{style} {metal_en} {stone} {kind_en}"
+    created = datetime(2024, 1, 1, tzinfo=timezone.utc) + timedelta(minutes=i)
+    return {
+        "id": f"bench-{i}",
+        "name": name,
+        "name_en": name,
+        "name_ar": f"{kind_ar} {metal_ar}",
+        "description": f"{name} for women, {stone.lower()} setting, gift box included",
+        "description_en": f"{name}. Material: {metal_en}.",
+        "description_ar": f"{kind_ar} أنيق. الخامة: {metal_ar}.",
+        "material_en": metal_en,
+        "material_ar": metal_ar,
+        "sku": f"AU-{i:06d}",
+        "category": category,
+        "price": float(rng.randint(40, 900)),
+        "rating": round(rng.uniform(3.0, 5.0), 1),
+        "reviews_count": rng.randint(0, 400),
+        "in_stock": rng.random() > 0.1,
+        "discount_percentage": rng.choice([0, 0, 0, 10, 20]),
+        "images": [f"https://img.example/{i}.jpg"],
+        "source": "cj",
+        "external_id": f"CJ{i:08d}",
+        "supplier_price": round(rng.uniform(2, 60), 2),
+        "staging": rng.random() < 0.05,
+        "is_active": True,
+        "created_at": created.isoformat(),
+    }
+
+
+async def seed_products(db, count: int, seed: int = 7) -> None:
+    rng = random.Random(seed)
+    batch = []
+    for i in range(count):
+        batch.append(product(i, rng))
+        if len(batch) == 1000:
+            await db.products.insert_many(batch)
+            batch = []
+    if batch:
+        await db.products.insert_many(batch)
+
+
+async def timed(fn, runs):
+    """Seconds each of `runs` awaits of fn(i) took."""
+    out = []
+    for i in range(runs):
+        started = time.perf_counter()
+        await fn(i)
+        out.append(time.perf_counter() - started)
+    return out
+
+
+def report(label: str, samples) -> None:
+    ms = sorted(s * 1000 for s in samples)
+    p99 = ms[min(len(ms) - 1, int(round(0.99 * (len(ms) - 1))))]
+    print(f"{label:<28} n={len(ms):<5} p50={statistics.median(ms):9.2f} ms"
+          f"   p99={p99:9.2f} ms")
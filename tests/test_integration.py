@@ -30,7 +30,9 @@ os.environ.setdefault("COOKIE_SECURE", "false")
 os.environ.setdefault("UPLOAD_DIR", tempfile.mkdtemp(prefix="auraa-test-uploads-"))
 
 from fastapi.testclient import TestClient  # noqa: E402
-from mongomock_motor import AsyncMongoMockClient  # noqa: E402
+from mongomock_motor import AsyncMongoMockClient, AsyncMongoMockCollection  # noqa: E402
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReplaceOne, UpdateMany, UpdateOne  # noqa: E402
+from pymongo.results import BulkWriteResult  # noqa: E402
 
 import server  # noqa: E402
 from auth.oauth_service import oauth_service  # noqa: E402
@@ -52,12 +54,56 @@ PRODUCTS = [
 ]
 
 
+async def _bulk_write_one_by_one(self, requests, ordered=True, **kwargs):
+    """
+    AsyncMongoMockCollection.bulk_write for the operations pymongo builds.
+
+    mongomock's own bulk_write cannot take them: pymongo 4.9+ passes a `sort`
+    argument its builder does not know, and it raises TypeError. The same
+    operations applied one at a time, counted the way the server counts them.
+    """
+    counts = {"nInserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": []}
+    for op in requests:
+        if isinstance(op, InsertOne):
+            await self.insert_one(op._doc)
+            counts["nInserted"] += 1
+            continue
+        if isinstance(op, (DeleteOne, DeleteMany)):
+            delete = self.delete_one if isinstance(op, DeleteOne) else self.delete_many
+            counts["nRemoved"] += (await delete(op._filter)).deleted_count
+            continue
+        if isinstance(op, ReplaceOne):
+            result = await self.replace_one(op._filter, op._doc, upsert=bool(op._upsert))
+        elif isinstance(op, (UpdateOne, UpdateMany)):
+            update = self.update_one if isinstance(op, UpdateOne) else self.update_many
+            options = {"upsert": bool(op._upsert)}
+            if op._array_filters:
+                options["array_filters"] = op._array_filters
+            result = await update(op._filter, op._doc, **options)
+        else:
+            raise TypeError(f"unsupported bulk operation {type(op).__name__}")
+        counts["nMatched"] += result.matched_count
+        counts["nModified"] += result.modified_count
+        if result.upserted_id is not None:
+            counts["upserted"].append({"index": len(counts["upserted"]), "_id": result.upserted_id})
+    counts["nUpserted"] = len(counts["upserted"])
+    return BulkWriteResult(counts, True)
+
+
+@pytest.fixture(autouse=True)
+def mongomock_bulk_write(monkeypatch):
+    monkeypatch.setattr(AsyncMongoMockCollection, "bulk_write", _bulk_write_one_by_one)
+
+
 @pytest.fixture
 def client(monkeypatch):
     """Fresh app state + empty in-memory database per test."""
     db = AsyncMongoMockClient()["test_db"]
     monkeypatch.setattr(server, "db", db)
     server.app.state.db = db
+    # A test's orders are dated by the test, after the boot rollup would have
+    # run; a test that wants the scheduler starts it itself.
+    monkeypatch.setattr(server, "RUN_SCHEDULER", False)
 
     # The app object is module-level and shared, so rate-limit buckets would
     # otherwise carry over and 429 later tests.
@@ -74,9 +120,27 @@ def seeded(client):
     asyncio.get_event_loop().run_until_complete(
         client._db.products.insert_many([dict(p) for p in PRODUCTS])
     )
+    # Written behind the API's back, so stamped and reported the way the
+    # server would have.
+    stamp(client)
     return client
 
 
+def stamp(client, ids=None):
+    """
+    Products written behind the API's back, stamped the way the server stamps
+    them: these ids as a write path does, or with none, every row not yet
+    stamped, as the boot backfill does. The storefront lists stamped rows only.
+    """
+    import asyncio
+    loop = asyncio.get_event_loop()
+    if ids is None:
+        loop.run_until_complete(server.backfill_storefront_fields())
+        server.catalogue_changed()
+    else:
+        loop.run_until_complete(server.catalogue_written(ids))
+
+
 # The payload CheckoutPage actually posts. Pinning the tests to it means a
 # validator that would reject a real customer fails here first.
 SHIPPING = {
@@ -93,12 +157,50 @@ def register(client, email="user@example.com", password="pw123456", **extra):
 
 def make_admin(client, email, super_admin=False):
     import asyncio
+    from core.security import forget_user
     asyncio.get_event_loop().run_until_complete(
         client._db.users.update_one(
             {"email": email},
             {"$set": {"is_admin": True, "is_super_admin": super_admin}},
         )
     )
+    # Written behind the API's back, so say so the way the admin routes do.
+    forget_user()
+
+
+class FakeRedis:
+    """The slice of redis.asyncio the shared backends use, over a dict."""
+
+    def __init__(self):
+        self.data = {}
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def mget(self, keys):
+        return [self.data.get(k) for k in keys]
+
+    async def set(self, key, value, ex=None):
+        assert isinstance(value, bytes) and ex
+        self.data[key] = value
+
+    async def delete(self, *keys):
+        for k in keys:
+            self.data.pop(k, None)
+
+    async def incr(self, key):
+        value = int(self.data.get(key) or 0) + 1
+        self.data[key] = str(value).encode()
+        return value
+
+    async def decr(self, key):
+        value = int(self.data.get(key) or 0) - 1
+        self.data[key] = str(value).encode()
+        return value
+
+    async def expire(self, key, seconds):
+        assert seconds > 0
+        return True
 
 
 # ---------------------------------------------------------------------------
@@ -264,6 +366,76 @@ def test_password_reset_is_single_use_and_revokes_old_password(client, monkeypat
     assert new_login.status_code == 200
 
 
+def test_login_brings_a_password_up_to_the_current_cost(client, monkeypatch):
+    """Raising BCRYPT_ROUNDS must not lock anyone out, and must take effect."""
+    import asyncio
+    from core.passwords import cost_of, passwords
+
+    register(client, email="cost@b.com", password="pw123456")
+    stored = lambda: asyncio.get_event_loop().run_until_complete(
+        client._db.users.find_one({"email": "cost@b.com"}))["password"]
+    assert cost_of(stored()) == passwords.rounds
+
+    monkeypatch.setattr(passwords, "rounds", 4)
+    rehashed = passwords.rehashed
+    login = lambda: client.post("/api/auth/login",
+                                json={"identifier": "cost@b.com", "password": "pw123456"})
+    assert login().status_code == 200
+    assert cost_of(stored()) == 4
+    assert login().status_code == 200
+    assert passwords.rehashed == rehashed + 1, "re-hashed a password already at the current cost"
+    assert client.post("/api/auth/login", json={
+        "identifier": "cost@b.com", "password": "wrong-one"}).status_code == 401
+
+
+def test_hashing_leaves_the_event_loop_free_and_turns_a_flood_away():
+    import asyncio
+    import threading
+    from fastapi import HTTPException
+    from core.passwords import PasswordHasher
+
+    async def scenario():
+        hasher = PasswordHasher(rounds=10, threads=1, max_waiting=1)
+
+        # The loop keeps ticking while a hash is computed.
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.001)
+                ticks += 1
+
+        beat = asyncio.ensure_future(ticker())
+        hashed = await hasher.hash("pw123456")
+        beat.cancel()
+        assert ticks >= 5, f"the loop stalled while hashing ({ticks} ticks)"
+        assert await hasher.verify("pw123456", hashed)
+        assert not await hasher.verify("pw123456", "not-a-bcrypt-hash")
+
+        # One running, one waiting: the next is refused rather than queued.
+        release = threading.Event()
+        running = asyncio.ensure_future(hasher._run(release.wait))
+        while hasher.stats()["running"] < 1:
+            await asyncio.sleep(0.001)
+        waiting = asyncio.ensure_future(hasher._run(lambda: True))
+        await asyncio.sleep(0)
+        try:
+            await hasher._run(lambda: True)
+            raise AssertionError("a third sign-in was queued past the cap")
+        except HTTPException as e:
+            assert e.status_code == 503
+        release.set()
+        await asyncio.gather(running, waiting)
+
+        stats = hasher.stats()
+        assert stats["rejected"] == 1
+        assert stats["max_waiting_seen"] == 1
+        assert stats["waiting"] == 0 and stats["running"] == 0
+
+    asyncio.get_event_loop().run_until_complete(scenario())
+
+
 def test_refresh_hands_back_a_token_the_client_can_store(client):
     """
     The interceptor now writes this into localStorage and the default header;
@@ -334,6 +506,202 @@ def test_product_detail_and_404(seeded):
     assert seeded.get("/api/products/missing").status_code == 404
 
 
+def _grid(client, **params):
+    """Every id the cursor listing hands out, page by page."""
+    pages, cursor = [], None
+    while True:
+        r = client.get("/api/products", params={**params, **({"cursor": cursor} if cursor else {})})
+        assert r.status_code == 200, r.text
+        body = r.json()
+        pages.append([p["id"] for p in body["items"]])
+        cursor = body["next_cursor"]
+        if not cursor:
+            return pages
+        params.pop("sort", None)
+
+
+def test_cursor_pages_are_full_and_never_repeat_or_skip(client):
+    """
+    A page used to be cut by the database and then filtered here, so a page
+    with a malformed row in it came back short and the grid stopped loading.
+    """
+    import asyncio
+    from datetime import datetime
+    docs = []
+    for i in range(11):
+        docs.append({"id": f"c{i:02d}", "name": f"Ring {i}", "description": "d",
+                     "price": float(100 + i % 4), "rating": 4.0, "category": "rings",
+                     "images": [], "created_at": f"2025-01-{i + 1:02d}T00:00:00+00:00"})
+    # Refused by _catalogue_ready, in the middle of the order.
+    docs.append({"id": "c-bad", "name": "[\"women ring\"", "description": "d", "price": 101.0,
+                 "category": "rings", "images": [], "created_at": "2025-01-05T12:00:00+00:00"})
+    # Written by the admin form: a real datetime, not a string.
+    docs.append({"id": "c-dt", "name": "Admin Ring", "description": "d", "price": 103.0,
+                 "category": "rings", "images": [], "created_at": datetime(2024, 6, 1)})
+    asyncio.get_event_loop().run_until_complete(client._db.products.insert_many(docs))
+    stamp(client)
+
+    for sort in ("newest", "price-low-high", "price-high-low", "rating"):
+        pages = _grid(client, sort=sort, limit=4)
+        assert [len(p) for p in pages][:-1] == [4] * (len(pages) - 1), (sort, pages)
+        seen = [pid for page in pages for pid in page]
+        assert sorted(seen) == sorted([f"c{i:02d}" for i in range(11)] + ["c-dt"]), (sort, seen)
+
+    newest = [pid for page in _grid(client, sort="newest", limit=5) for pid in page]
+    assert [pid for pid in newest if pid != "c-dt"] == [f"c{i:02d}" for i in reversed(range(11))]
+    cheapest = [pid for page in _grid(client, sort="price-low-high", limit=3) for pid in page]
+    assert cheapest[:3] == ["c00", "c04", "c08"]
+
+
+def test_every_listing_page_is_read_in_the_order_of_a_declared_index(seeded, monkeypatch):
+    """
+    A keyset page is only cheap when an index hands rows back already in
+    order, and that needs every indexed field ahead of the sort key matched
+    by one value. The live rule was three `$ne`s — two ranges each — so
+    every page sorted the whole live catalogue in memory.
+    """
+    from mongomock_motor import AsyncMongoMockCollection
+    from services.indexes import PRODUCT_LISTING_INDEXES
+
+    reads = []
+    real_find = AsyncMongoMockCollection.find
+
+    def spy(self, *args, **kwargs):
+        if self.name == "products":
+            reads.append(args[0] if args else kwargs.get("filter"))
+        return real_find(self, *args, **kwargs)
+    monkeypatch.setattr(AsyncMongoMockCollection, "find", spy)
+
+    def index_for(query, field):
+        for keys in PRODUCT_LISTING_INDEXES:
+            fields = [name for name, _ in keys]
+            if fields[-2:] != [field, "id"]:
+                continue
+            ahead = fields[:-2]
+            if all(name in query and not isinstance(query[name], dict) for name in ahead) \
+                    and ("category" in ahead) == ("category" in query):
+                return keys
+        return None
+
+    for params in ({"sort": "newest"}, {"sort": "price-low-high", "category": "rings"},
+                   {"sort": "rating", "limit": 1}):
+        reads.clear()
+        server.catalogue_cache.invalidate()
+        r = seeded.get("/api/products", params=params)
+        assert r.status_code == 200, r.text
+        field = server.LISTING_SORTS[params["sort"]][0]
+        assert reads, params
+        for query in reads:
+            flat = query["$and"][0] if "$and" in query else query
+            assert index_for(flat, field), (params, query)
+
+
+def test_cursor_listing_refuses_what_it_did_not_issue(seeded):
+    assert seeded.get("/api/products", params={"cursor": "not-a-cursor"}).status_code == 400
+    assert seeded.get("/api/products", params={"sort": "cheapest"}).status_code == 400
+    cursor = seeded.get("/api/products", params={"sort": "rating", "limit": 1}).json()["next_cursor"]
+    assert cursor
+    r = seeded.get("/api/products", params={"sort": "newest", "cursor": cursor})
+    assert r.status_code == 400
+
+
+def test_skip_and_limit_still_answer_a_plain_list(seeded):
+    r = seeded.get("/api/products", params={"skip": 1, "limit": 1})
+    assert r.status_code == 200
+    assert isinstance(r.json(), list) and len(r.json()) == 1
+
+
+# --- the storefront verdict, stored ----------------------------------------
+
+def _product_doc(client, product_id):
+    import asyncio
+    return asyncio.get_event_loop().run_until_complete(
+        client._db.products.find_one({"id": product_id}))
+
+
+def test_a_product_is_judged_once_when_it_is_written(client):
+    as_admin(client)
+    base = {"description": "d", "price": 80.0, "category": "bracelets", "images": []}
+    ok = client.post("/api/products", json={**base, "name": "Cuff Bracelet"}).json()["id"]
+    off = client.post("/api/products", json={**base, "name": "Dried Flower Bouquet"}).json()["id"]
+
+    assert _product_doc(client, ok)["storefront_ready"] is True
+    assert _product_doc(client, ok)["storefront_version"] == server.STOREFRONT_VERSION
+    assert _product_doc(client, off)["storefront_ready"] is False
+    assert [p["id"] for p in client.get("/api/products").json()] == [ok]
+
+    # An edit is judged again.
+    client.put(f"/api/products/{ok}", json={**base, "name": "Dried Flower Cuff"})
+    assert _product_doc(client, ok)["storefront_ready"] is False
+    assert client.get("/api/products").json() == []
+
+
+def test_the_backfill_stamps_rows_older_than_the_stamp(client):
+    import asyncio
+    seeded = client
+    asyncio.get_event_loop().run_until_complete(
+        client._db.products.insert_many([dict(p) for p in PRODUCTS]))
+    as_admin(seeded)
+    assert "storefront_version" not in _product_doc(seeded, "p1")
+    # Not stamped, not listed: the storefront fails closed.
+    assert seeded.get("/api/products").json() == []
+
+    r = seeded.post("/api/admin/products/storefront-backfill")
+    assert r.status_code == 200, r.text
+    status = seeded.get(f"/api/imports/{r.json()['jobId']}/status").json()
+    assert status["state"] == "completed", status
+
+    assert _product_doc(seeded, "p1")["storefront_ready"] is True
+    assert _product_doc(seeded, "p4")["storefront_ready"] is False
+    assert {p["id"] for p in seeded.get("/api/products").json()} == {"p1", "p2"}
+    # Reads now trust the stamp: a stored refusal keeps a product out even
+    # though nothing about the product itself changed.
+    asyncio.get_event_loop().run_until_complete(seeded._db.products.update_one(
+        {"id": "p2"}, {"$set": {"listed": False}}))
+    server.catalogue_changed(["p2"])
+    assert {p["id"] for p in seeded.get("/api/products").json()} == {"p1"}
+
+
+def test_a_first_deploy_lists_the_whole_catalogue_from_the_first_request(monkeypatch):
+    """
+    The boot backfill ran in the background, and a row it had not reached is
+    not listed: a first deploy served an empty storefront, then a partial
+    one. The app stamps before it serves now.
+    """
+    import asyncio
+    db = AsyncMongoMockClient()["boot_db"]
+    asyncio.get_event_loop().run_until_complete(
+        db.products.insert_many([dict(p) for p in PRODUCTS]))
+    monkeypatch.setattr(server, "db", db)
+    server.app.state.db = db
+    monkeypatch.setattr(server, "RUN_SCHEDULER", False)
+    reset_rate_limits()
+
+    with TestClient(server.app, raise_server_exceptions=False) as c:
+        assert {p["id"] for p in c.get("/api/products").json()} == {"p1", "p2"}
+    unstamped = asyncio.get_event_loop().run_until_complete(
+        db.products.count_documents({"listed": {"$exists": False}}))
+    assert unstamped == 0
+
+
+def test_a_stored_supplier_title_is_shortened_once_not_on_every_read(client):
+    import asyncio
+    title = ("Fashion Women Jewelry Necklace, Elegant Pendant For Party Wedding "
+             "Birthday Gift, Luxury Style")
+    asyncio.get_event_loop().run_until_complete(client._db.products.insert_one({
+        "id": "cj-1", "name": title, "description": title, "price": 50.0,
+        "original_price": 20.0, "category": "necklaces", "images": [],
+        "source": "cj_dropshipping"}))
+    asyncio.get_event_loop().run_until_complete(server.refresh_storefront_fields(["cj-1"]))
+
+    doc = _product_doc(client, "cj-1")
+    assert doc["name"] == title, "the stored title is the supplier's, untouched"
+    assert doc["storefront_overrides"]["original_price"] is None
+    shown = client.get("/api/products/cj-1").json()
+    assert len(shown["name"]) <= server.NAME_MAX
+    assert shown["original_price"] is None
+
+
 # --- the staging boundary --------------------------------------------------
 #
 # Quick Import writes supplier products with staging=True so the owner can fix
@@ -367,6 +735,9 @@ def test_a_product_pulled_back_to_staging_leaves_the_wishlist(seeded):
     asyncio.get_event_loop().run_until_complete(
         seeded._db.products.update_one({"id": "p1"}, {"$set": {"staging": True}})
     )
+    # Reported the way every write in the server reports itself; a write
+    # from outside the process shows once the catalogue cache's TTL runs out.
+    server.catalogue_changed(["p1"])
     body = seeded.get("/api/wishlist").json()
     assert body["products"] == [], "a withdrawn product still rendered"
     assert body["product_ids"] == ["p1"], "the id is kept so it returns if re-published"
@@ -383,6 +754,98 @@ def test_staging_products_are_not_submitted_to_google(seeded):
     assert "/product/p3" not in body, "an unreviewed product was published to Google"
 
 
+def test_the_sitemap_is_served_from_memory_until_a_product_changes(seeded):
+    first = seeded.get("/sitemap.xml")
+    assert first.status_code == 200
+    etag = first.headers["etag"]
+    assert seeded.get("/sitemap.xml").headers["etag"] == etag, "rebuilt on a second hit"
+    assert seeded.get("/sitemap.xml", headers={"If-None-Match": etag}).status_code == 304
+    assert seeded.get("/sitemap.xml", headers={
+        "If-Modified-Since": first.headers["last-modified"]}).status_code == 304
+
+    as_admin(seeded)
+    seeded.delete("/api/products/p1")
+    after = seeded.get("/sitemap.xml", headers={"If-None-Match": etag})
+    assert after.status_code == 200
+    assert "/product/p1" not in after.text
+
+
+def test_a_large_catalogue_is_split_behind_a_sitemap_index(seeded, monkeypatch):
+    import asyncio
+    from services import sitemap
+    monkeypatch.setattr(sitemap, "URLS_PER_FILE", 20)
+    asyncio.get_event_loop().run_until_complete(seeded._db.products.insert_many([
+        {"id": f"bulk-{i:02d}", "name": f"Bulk Ring {i}", "description": "A ring", "price": 90.0,
+         "category": "rings", "images": ["http://img/b.jpg"], "in_stock": True}
+        for i in range(30)
+    ]))
+    stamp(seeded)
+
+    index = seeded.get("/sitemap.xml").text
+    assert "<sitemapindex" in index
+    for child in ("pages", "products-1", "products-2"):
+        assert f"/sitemap-{child}.xml" in index
+    assert "/product/" not in index
+
+    listed = []
+    for n in (1, 2):
+        body = seeded.get(f"/sitemap-products-{n}.xml").text
+        assert body.count("<url>") <= 20
+        listed += [line for line in body.splitlines() if "/product/" in line]
+    assert len(listed) == 31, "every live product exactly once"
+    assert "/products?category=rings" in seeded.get("/sitemap-pages.xml").text
+    assert seeded.get("/sitemap-products-3.xml").status_code == 404
+
+
+def test_crawler_hits_on_a_cold_sitemap_share_one_build_and_a_content_etag(seeded, monkeypatch):
+    """
+    Each file was built on its own, the n-th product file skipping n * 50,000
+    rows to find its start, and a crawler fetching the index and its files
+    together read the catalogue once per file. Its ETag was a random token,
+    so a rebuild after any write — even one that changed nothing listed —
+    cost every crawler a full download.
+    """
+    import asyncio
+    from mongomock_motor import AsyncCursor
+    from services import sitemap as sitemap_module
+
+    monkeypatch.setattr(sitemap_module, "URLS_PER_FILE", 20)
+    monkeypatch.setattr(sitemap_module, "_CHUNK", 7)
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(seeded._db.products.insert_many([
+        {"id": f"bulk-{i:02d}", "name": f"Bulk Ring {i}", "description": "A ring", "price": 90.0,
+         "category": "rings", "images": ["http://img/b.jpg"], "in_stock": True}
+        for i in range(30)
+    ]))
+    stamp(seeded)
+
+    def no_skip(self, *args, **kwargs):
+        raise AssertionError("a sitemap page was read with skip()")
+    monkeypatch.setattr(AsyncCursor, "skip", no_skip, raising=False)
+    builds = []
+    real_build = server.sitemap._build
+
+    async def counted(db, generation):
+        builds.append(generation)
+        await asyncio.sleep(0.01)
+        return await real_build(db, generation)
+    monkeypatch.setattr(server.sitemap, "_build", counted)
+
+    async def crawl():
+        return await asyncio.gather(*(server.sitemap.file(seeded._db, name) for name in (
+            "sitemap", "pages", "products-1", "products-2")))
+    files = loop.run_until_complete(crawl())
+    assert len(builds) == 1 and all(files)
+    listed = sum(f.body.decode().count("/product/") for f in files[2:])
+    assert listed == 31, "every live product exactly once"
+
+    etag = seeded.get("/sitemap-products-1.xml").headers["etag"]
+    # A write that changed nothing in this file: rebuilt, and still the same file.
+    server.catalogue_changed(["p2"])
+    assert seeded.get("/sitemap-products-1.xml", headers={"If-None-Match": etag}).status_code == 304
+    assert len(builds) == 2
+
+
 def test_a_staging_product_is_not_priceable_at_checkout(seeded):
     r = seeded.post("/api/shipping/estimate", json={
         "country_code": "SA",
@@ -432,6 +895,78 @@ def test_cart_remove(seeded):
     assert seeded.get("/api/cart").json()["total_amount"] == 0.0
 
 
+def test_a_cart_click_is_one_update_and_adds_from_two_tabs_both_count(seeded, monkeypatch):
+    """
+    Adding to the cart used to read it, change it in Python and write the
+    whole list back, so two tabs adding at once kept only one of the adds.
+    Now a click is a single update that moves the line and the total
+    together, and the total always matches the lines.
+    """
+    import asyncio
+    from mongomock_motor import AsyncMongoMockCollection
+
+    register(seeded, email="tabs@b.com")
+    loop = asyncio.get_event_loop()
+    user = loop.run_until_complete(seeded._db.users.find_one({"email": "tabs@b.com"}))
+
+    calls = []
+    for name in ("find_one", "find_one_and_update", "update_one"):
+        def spy(self, *args, _real=getattr(AsyncMongoMockCollection, name), _name=name, **kwargs):
+            if self.name == "carts":
+                calls.append(_name)
+            return _real(self, *args, **kwargs)
+        monkeypatch.setattr(AsyncMongoMockCollection, name, spy)
+
+    # The first add creates the cart and every later one grows the line:
+    # each is a single update, with nothing read first.
+    assert seeded.post("/api/cart/add?product_id=p1&quantity=1").status_code == 200
+    assert calls == ["find_one_and_update"], calls
+    calls.clear()
+    r = seeded.post("/api/cart/add?product_id=p1&quantity=1")
+    assert r.json()["total_amount"] == 500.0
+    assert calls == ["find_one_and_update"], calls
+
+    async def tabs():
+        await asyncio.gather(*[server.add_cart_line(user["id"], "p1", 1, 250.0) for _ in range(8)],
+                             *[server.add_cart_line(user["id"], "p2", 1, 120.0) for _ in range(4)])
+    loop.run_until_complete(tabs())
+
+    # Repriced since it went in: the line keeps the price it was added at.
+    loop.run_until_complete(seeded._db.products.update_one({"id": "p1"}, {"$set": {"price": 300.0}}))
+    server.catalogue_changed(["p1"])
+    assert seeded.post("/api/cart/add?product_id=p1&quantity=1").json()["total_amount"] == 11 * 250.0 + 4 * 120.0
+
+    calls.clear()
+    assert seeded.delete("/api/cart/remove/p2").json()["total_amount"] == 11 * 250.0
+    assert calls == ["find_one_and_update"], calls
+    assert seeded.delete("/api/cart/remove/p2").json()["total_amount"] == 11 * 250.0
+    cart = seeded.get("/api/cart").json()
+    assert [(i["product_id"], i["quantity"], i["price"]) for i in cart["items"]] == [("p1", 11, 250.0)]
+    assert cart["total_amount"] == 11 * 250.0
+
+
+def test_a_repriced_line_adds_to_the_one_cart_without_the_unique_index(seeded):
+    """
+    A database holding duplicate carts from before the unique index cannot
+    build it. The add must not lean on the index to find out the line is
+    there at another price: without it, that used to upsert a second cart
+    and report only the new line's total.
+    """
+    import asyncio
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(seeded._db.carts.drop_index("user_id_1"))
+
+    assert loop.run_until_complete(server.add_cart_line("u1", "p1", 1, 10.0)) == 10.0
+    assert loop.run_until_complete(server.add_cart_line("u1", "p1", 1, 12.0)) == 20.0
+    assert loop.run_until_complete(server.add_cart_line("u1", "p2", 2, 5.0)) == 30.0
+
+    carts = loop.run_until_complete(seeded._db.carts.find({"user_id": "u1"}).to_list(length=None))
+    assert len(carts) == 1, carts
+    assert [(i["product_id"], i["quantity"], i["price"]) for i in carts[0]["items"]] == [
+        ("p1", 2, 10.0), ("p2", 2, 5.0)]
+    assert carts[0]["total_amount"] == 30.0
+
+
 def test_order_flow_clears_cart_and_is_trackable(seeded):
     register(seeded, email="order@b.com")
     seeded.post("/api/cart/add?product_id=p1&quantity=2")
@@ -731,6 +1266,64 @@ def test_an_order_cannot_be_placed_by_a_method_the_shop_does_not_offer(seeded):
     assert seeded.get("/api/cart").json()["items"], "the cart was emptied by a rejected order"
 
 
+def test_checkout_reads_the_basket_in_one_query_and_the_payment_setup_once(seeded, monkeypatch):
+    """
+    Placing an order re-reads every line of the basket, and it must: the
+    price and the stock are what the customer is charged on. It does that in
+    one projected read, and takes the payment setup from a copy that saving
+    the settings replaces at once.
+    """
+    from mongomock_motor import AsyncMongoMockCollection
+
+    reads = []
+    find = AsyncMongoMockCollection.find
+
+    def spy(self, *args, **kwargs):
+        if self.name == "products":
+            reads.append(args)
+        return find(self, *args, **kwargs)
+
+    singleton_reads = []
+    get_singleton = server._get_singleton
+
+    async def counted(doc_id):
+        singleton_reads.append(doc_id)
+        return await get_singleton(doc_id)
+
+    monkeypatch.setattr(server, "_get_singleton", counted)
+    server.forget_payment_config()
+
+    register(seeded, email="basket@b.com")
+    for attempt in range(2):
+        for pid in ("p1", "p2"):
+            assert seeded.post(f"/api/cart/add?product_id={pid}&quantity=2").status_code == 200
+        monkeypatch.setattr(AsyncMongoMockCollection, "find", spy)
+        # Keyed, as CheckoutPage sends every order.
+        r = seeded.post("/api/orders", headers={"Idempotency-Key": f"basket-order-{attempt:04d}"},
+                        json={"shipping_address": SHIPPING, "payment_method": "on_confirmation"})
+        monkeypatch.setattr(AsyncMongoMockCollection, "find", find)
+        assert r.status_code == 200, r.text
+        assert r.json()["total_amount"] == 2 * 250.0 + 2 * 120.0
+
+    assert len(reads) == 2, f"one read of the basket per order, not {len(reads)}"
+    query, projection = reads[0][:2]
+    assert sorted(query["id"]["$in"]) == ["p1", "p2"]
+    assert "images" not in projection and projection.get("price") == 1, projection
+    assert singleton_reads.count(server.PAYMENT_DOC_ID) == 1, singleton_reads
+
+    # Switching cash-on-confirmation off takes effect on the next order: with
+    # no bank set up either, the shop has nothing left to take payment by.
+    register(seeded, email="adm-cod@b.com")
+    make_admin(seeded, "adm-cod@b.com")
+    assert seeded.put("/api/admin/payment-settings", json={
+        "on_confirmation": {"enabled": False}}).status_code == 200
+    register(seeded, email="basket2@b.com")
+    seeded.post("/api/cart/add?product_id=p1&quantity=1")
+    r = seeded.post("/api/orders", json={
+        "shipping_address": SHIPPING, "payment_method": "on_confirmation"})
+    assert r.status_code == 503, r.text
+
+
 def test_a_customer_can_read_back_how_to_pay_for_their_own_order(seeded):
     """
     A customer who closes the tab after checkout has no other route back to the
@@ -1707,6 +2300,111 @@ def test_analytics_empty_store_does_not_divide_by_zero(client):
     assert data["average_order_value"] == 0
 
 
+def _past_order(order_id, days_ago, total, items, paid=True, status="pending", as_string=False):
+    from datetime import datetime, timedelta, timezone
+    created = datetime.now(timezone.utc) - timedelta(days=days_ago)
+    return {
+        "id": order_id, "user_id": f"u-{order_id}", "total_amount": total, "status": status,
+        "payment_status": "paid" if paid else "awaiting_payment",
+        "items": [{"product_id": pid, "quantity": qty} for pid, qty in items],
+        "created_at": created.isoformat() if as_string else created,
+    }
+
+
+def test_analytics_windows_read_the_nightly_rollup_and_today_live(seeded):
+    import asyncio
+    from services import sales_rollup
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(seeded._db.orders.insert_many([
+        _past_order("o-old", 40, 100.0, [("p2", 1)]),
+        # Written before created_at was a BSON date.
+        _past_order("o-str", 3, 50.0, [("p1", 2)], as_string=True),
+        _past_order("o-unpaid", 3, 70.0, [("p1", 5)], paid=False),
+        _past_order("o-today", 0, 25.0, [("p2", 1)]),
+    ]))
+    loop.run_until_complete(sales_rollup.roll_up(seeded._db))
+    rows = loop.run_until_complete(seeded._db.daily_sales_rollup.find({}).to_list(None))
+    assert len(rows) == 2, "closed days only; today stays live"
+
+    as_admin(seeded)
+    week = seeded.get("/api/admin/analytics?range=7d").json()
+    assert week["total_orders"] == 3
+    assert week["paid_orders"] == 2
+    assert week["total_revenue"] == 75.0
+    assert [(t["product_id"], t["quantity_sold"]) for t in week["top_products"]] == [("p1", 2), ("p2", 1)]
+    assert week["top_products"][0]["name"] == "Gold Ring"
+
+    everything = seeded.get("/api/admin/analytics?range=all").json()
+    assert everything["total_revenue"] == 175.0
+    assert everything["orders_by_status"] == {"pending": 4}
+
+
+def test_the_server_runs_the_rollup_so_closed_days_are_not_summed_live(seeded, monkeypatch):
+    """
+    The rollup only ever ran from a scheduler nothing started, so analytics
+    found no rolled day and aggregated the whole order book on every request.
+    The server now starts the scheduler's rollup job, and rolls up at boot; a
+    window then sums only today live. The nightly repricing stays off.
+    """
+    import asyncio
+    from datetime import date, datetime, timezone
+    from services import sales_rollup
+    loop = asyncio.get_event_loop()
+
+    loop.run_until_complete(seeded._db.orders.insert_many([
+        _past_order("o-3", 3, 50.0, [("p1", 1)]),
+        _past_order("o-now", 0, 25.0, [("p2", 1)]),
+    ]))
+    monkeypatch.setattr(server, "RUN_SCHEDULER", True)
+    loop.run_until_complete(server.start_scheduled_upkeep())
+    try:
+        scheduler = server.app.state.scheduler
+        assert sorted(job.id for job in scheduler.scheduler.get_jobs()) == sorted(server.SCHEDULED_JOBS)
+        assert scheduler.scheduler.get_job("price_update") is None
+        assert server.app.state.scheduler_running is True
+        # The boot rollup.
+        loop.run_until_complete(server.app.state.boot_rollup)
+    finally:
+        loop.run_until_complete(server.stop_scheduled_upkeep())
+
+    spans = []
+    real = sales_rollup.aggregate_days
+
+    async def spy(db, wanted):
+        wanted = list(wanted)
+        spans.extend(wanted)
+        return await real(db, wanted)
+    monkeypatch.setattr(sales_rollup, "aggregate_days", spy)
+
+    as_admin(seeded)
+    week = seeded.get("/api/admin/analytics?range=7d").json()
+    assert week["total_revenue"] == 75.0
+    today = datetime.now(timezone.utc).date()
+    assert spans and all(first == today for first, _ in spans), spans
+    assert loop.run_until_complete(seeded._db.daily_sales_rollup.count_documents({})) == 1
+    assert isinstance(loop.run_until_complete(sales_rollup.rolled_through(seeded._db)), date)
+
+
+def test_a_cancellation_after_the_rollup_leaves_the_window_at_once(seeded):
+    import asyncio
+    from services import sales_rollup
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(seeded._db.orders.insert_one(
+        _past_order("o-late", 2, 80.0, [("p1", 1)])))
+    loop.run_until_complete(sales_rollup.roll_up(seeded._db))
+
+    as_admin(seeded)
+    assert seeded.get("/api/admin/analytics?range=7d").json()["total_revenue"] == 80.0
+    seeded.put("/api/admin/orders/o-late", json={"status": "cancelled"})
+    data = seeded.get("/api/admin/analytics?range=7d").json()
+    assert data["total_revenue"] == 0
+    assert data["orders_by_status"] == {"cancelled": 1}
+
+    loop.run_until_complete(sales_rollup.roll_up(seeded._db))
+    row = loop.run_until_complete(seeded._db.daily_sales_rollup.find_one({}))
+    assert row["revenue"] == 0 and not row.get("stale")
+
+
 # ---------------------------------------------------------------------------
 # Setup bootstrap
 # ---------------------------------------------------------------------------
@@ -1839,6 +2537,82 @@ def test_disabled_account_cannot_log_in_or_use_existing_token(client):
     assert client.get("/api/auth/me").status_code == 403
 
 
+def test_a_session_reads_its_user_once_and_still_sees_every_revocation(client, monkeypatch):
+    """
+    Each authenticated request read the caller's row before doing anything.
+    Now the row is kept for a few seconds — but a role change, a disable, a
+    delete or a password reset must still bite on the very next request,
+    made on this worker or another. A role change or a disable moves
+    auth_version, so the old session ends rather than carrying on under the
+    new role.
+    """
+    import asyncio
+    from core.security import user_cache
+
+    loop = asyncio.get_event_loop()
+    captured = {}
+    import services.email_service as email_service
+    monkeypatch.setattr(email_service, "send_password_reset_email",
+                        lambda email, name, url: captured.update(url=url) or True)
+
+    def session(email):
+        client.cookies.clear()
+        register(client, email=email)
+        cookies = dict(client.cookies)
+        user = loop.run_until_complete(client._db.users.find_one({"email": email}))
+        return user["id"], cookies
+
+    def me(cookies):
+        client.cookies.clear()
+        for k, v in cookies.items():
+            client.cookies.set(k, v)
+        return client.get("/api/auth/me")
+
+    promoted, promoted_session = session("promoted@b.com")
+    disabled, disabled_session = session("disabled@b.com")
+    deleted, deleted_session = session("deleted@b.com")
+    _, reset_session = session("reset2@b.com")
+    as_admin(client, email="root@b.com")
+    admin_session = dict(client.cookies)
+
+    misses = user_cache.misses
+    for _ in range(5):
+        assert me(promoted_session).json()["is_admin"] is False
+    assert user_cache.misses == misses + 1, "the user row was read more than once"
+    for cookies in (disabled_session, deleted_session, reset_session):
+        assert me(cookies).status_code == 200
+
+    me(admin_session)
+    assert client.patch(f"/api/admin/users/{promoted}/toggle-admin").status_code == 200
+    assert client.post("/api/admin/super-admin-toggle-status",
+                       json={"user_id": disabled, "is_active": False}).status_code == 200
+    assert client.delete(f"/api/admin/users/{deleted}").status_code == 200
+
+    # A role change ends the sessions signed in under the old role.
+    assert me(promoted_session).status_code == 401
+    promoted_row = loop.run_until_complete(client._db.users.find_one({"id": promoted}))
+    assert promoted_row["is_admin"] is True and promoted_row["auth_version"] == 1
+    assert me(disabled_session).status_code == 403
+    assert loop.run_until_complete(
+        client._db.users.find_one({"id": disabled}))["auth_version"] == 1
+    assert me(deleted_session).status_code == 401
+
+    # Disabled by another worker: this one's forget_user never ran, and the
+    # kept row still says active. The stored auth_version gives it away.
+    _, elsewhere_session = session("elsewhere@b.com")
+    assert me(elsewhere_session).status_code == 200
+    loop.run_until_complete(client._db.users.update_one(
+        {"email": "elsewhere@b.com"}, {"$set": {"is_active": False}, "$inc": {"auth_version": 1}}))
+    assert me(elsewhere_session).status_code == 403
+
+    client.cookies.clear()
+    client.post("/api/auth/forgot-password", json={"email": "reset2@b.com"})
+    token = parse_qs(urlparse(captured["url"]).query)["token"][0]
+    assert client.post("/api/auth/reset-password",
+                       json={"token": token, "new_password": "new-pass-9"}).status_code == 200
+    assert me(reset_session).status_code == 401
+
+
 # ---------------------------------------------------------------------------
 # Geo and placeholder
 # ---------------------------------------------------------------------------
@@ -1968,6 +2742,69 @@ def test_cors_allows_trusted_origins(client, origin):
     assert r.headers.get("Access-Control-Allow-Origin") == origin
 
 
+def test_errors_and_refusals_are_readable_cross_origin(client):
+    """
+    A 500 or a 429 without CORS headers reaches the storefront as a bare
+    network error, and the message it carries is lost.
+    """
+    from fastapi.testclient import TestClient
+    from middleware.cors import CustomCORSMiddleware
+
+    origin = "https://auraaluxury.com"
+
+    async def crashing_app(scope, receive, send):
+        raise RuntimeError("connection string in here")
+
+    raw = TestClient(CustomCORSMiddleware(crashing_app), raise_server_exceptions=False)
+    r = raw.get("/api/products", headers={"Origin": origin})
+    assert r.status_code == 500
+    assert r.json() == {"detail": "Internal error: RuntimeError"}
+    assert r.headers["Access-Control-Allow-Origin"] == origin
+    assert r.headers["Access-Control-Allow-Credentials"] == "true"
+
+    for _ in range(25):
+        r = client.post("/api/auth/login",
+                        json={"identifier": "x@b.com", "password": "wrong"},
+                        headers={"Origin": origin, "X-Forwarded-For": "203.0.113.88"})
+        if r.status_code == 429:
+            break
+    assert r.status_code == 429
+    assert r.headers["Access-Control-Allow-Origin"] == origin
+
+    # Ordinary responses too, and an untrusted origin gets nothing.
+    assert client.get("/api/health", headers={"Origin": origin}).headers[
+        "Access-Control-Allow-Origin"] == origin
+    assert "Access-Control-Allow-Origin" not in client.get(
+        "/api/health", headers={"Origin": "https://evil.com"}).headers
+
+
+def test_preflight_answers_are_worked_out_once_per_origin(monkeypatch):
+    from fastapi.testclient import TestClient
+    import middleware.cors as cors
+
+    checked = []
+    real = cors.is_origin_allowed
+    monkeypatch.setattr(cors, "is_origin_allowed", lambda o: checked.append(o) or real(o))
+    monkeypatch.setattr(cors, "MAX_ORIGINS", 3)
+
+    async def app(scope, receive, send):
+        raise AssertionError("a preflight reached the app")
+
+    raw = TestClient(cors.CustomCORSMiddleware(app))
+    for _ in range(5):
+        r = raw.options("/api/cart/add", headers={"Origin": "https://www.auraaluxury.com",
+                                                  "Access-Control-Request-Method": "POST"})
+        assert r.status_code == 200
+        assert r.headers["Access-Control-Allow-Methods"] == cors.ALLOW_METHODS
+        assert r.headers["Access-Control-Max-Age"] == "3600"
+    assert checked == ["https://www.auraaluxury.com"]
+
+    # Made-up origins cannot grow the table without bound.
+    for n in range(10):
+        raw.options("/api/cart/add", headers={"Origin": f"https://x{n}.example"})
+    assert len(raw.app._answers) <= 3
+
+
 # ---------------------------------------------------------------------------
 # Rate limiting
 # ---------------------------------------------------------------------------
@@ -2006,6 +2843,73 @@ def test_rate_limit_is_per_ip(client):
     assert r.status_code == 200, r.text
 
 
+def test_the_limiter_slides_its_window_instead_of_resetting_it():
+    """
+    A fixed window lets 2x the limit through across its edge; the sliding
+    estimate carries the last window's hits over, and refused requests do
+    not count against the client.
+    """
+    import asyncio
+    from middleware.rate_limiter import MemoryStore, Policy, RedisStore
+
+    loop = asyncio.get_event_loop()
+    policy = Policy(limit=3, window=10)
+
+    for store in (MemoryStore(), RedisStore(FakeRedis())):
+        def hit(t):
+            return loop.run_until_complete(store.hit("login|1.2.3.4", policy, 1000.0 + t))
+
+        assert [hit(t)[0] for t in (0, 1, 2)] == [True, True, True]
+        allowed, retry_after = hit(3)
+        assert not allowed and 1 <= retry_after <= 7
+        # The next window opened, but most of the last one still overlaps.
+        assert not hit(10)[0]
+        # Far enough in that its share has decayed.
+        assert hit(15)[0]
+        # Another client is unaffected throughout.
+        assert loop.run_until_complete(store.hit("login|5.6.7.8", policy, 1003.0))[0]
+
+
+def test_the_limiter_keeps_a_bounded_table_and_shares_one_in_redis():
+    import asyncio
+    from middleware.rate_limiter import MemoryStore, Policy, RedisStore
+
+    loop = asyncio.get_event_loop()
+    policy = Policy(limit=2, window=60)
+
+    store = MemoryStore(shards=2, max_clients=4)
+    for n in range(50):
+        loop.run_until_complete(store.hit(f"login|10.0.0.{n}", policy, 0.0))
+    assert len(store) <= 4
+    assert store.evictions >= 46
+
+    # Two workers over one Redis enforce one budget between them.
+    shared = FakeRedis()
+    worker_a, worker_b = RedisStore(shared), RedisStore(shared)
+    results = [loop.run_until_complete(worker.hit("login|9.9.9.9", policy, 5.0))[0]
+               for worker in (worker_a, worker_b, worker_a, worker_b)]
+    assert results == [True, True, False, False]
+
+
+def test_each_auth_route_has_its_own_budget(client):
+    """Spending the login attempts must not lock the same client out of signing up."""
+    headers = {"X-Forwarded-For": "203.0.113.77"}
+    for _ in range(25):
+        r = client.post("/api/auth/login",
+                        json={"identifier": "nobody@b.com", "password": "wrong"},
+                        headers=headers)
+        if r.status_code == 429:
+            break
+    assert r.status_code == 429
+    assert int(r.headers["Retry-After"]) >= 1
+    assert r.json()["detail"]["retry_after"] == int(r.headers["Retry-After"])
+
+    r = client.post("/api/auth/register",
+                    json={"email": "fresh@b.com", "password": "pw123456", "name": "User"},
+                    headers=headers)
+    assert r.status_code == 200, r.text
+
+
 # ---------------------------------------------------------------------------
 # Sign in with Google
 #
@@ -2270,6 +3174,115 @@ def test_tracking_a_click_feeds_trending(seeded):
     assert r.json()[0]["id"] == "p2", "the most-opened product must lead the row"
 
 
+def test_a_recent_open_outweighs_an_old_one():
+    import math
+    from datetime import datetime, timedelta, timezone
+    from services.recommendations import trending_weight
+    now = datetime.now(timezone.utc)
+    # Weights are log2: ten times the weight is log2(10) more.
+    assert trending_weight(now) - trending_weight(now - timedelta(days=14)) > math.log2(10)
+
+
+def test_trending_keeps_counting_long_after_the_epoch(client):
+    """
+    An open used to add 2 ** (days since the epoch / 3) to a stored sum: a
+    float overflows on that some eight years on, and long before then a new
+    open no longer changed the sum at all. The score is kept as log2 now.
+    """
+    import asyncio
+    import math
+    from datetime import datetime, timezone
+    from services import recommendations
+
+    loop = asyncio.get_event_loop()
+    late = datetime(2040, 1, 1, tzinfo=timezone.utc)
+    for pid, opens in (("a", 3), ("b", 2)):
+        for _ in range(opens):
+            loop.run_until_complete(recommendations.record_open(client._db, pid, None, late))
+    assert loop.run_until_complete(recommendations.trending_ids(client._db, 2)) == ["a", "b"]
+    doc = loop.run_until_complete(client._db.rec_trending.find_one({"product_id": "a"}))
+    assert math.isclose(doc["log_score"], recommendations.trending_weight(late) + math.log2(3))
+
+
+def test_workers_booting_together_build_the_recommendation_tables_once(client, monkeypatch):
+    """
+    Each worker checked for the state document and rebuilt if it was missing,
+    so workers booting together wiped the tables under each other and counted
+    paid orders twice. The rebuild is claimed in one write first.
+    """
+    import asyncio
+    from services import recommendations
+
+    loop = asyncio.get_event_loop()
+    builds = []
+    real_rebuild = recommendations.rebuild
+
+    async def slow_rebuild(db, events_since=None):
+        builds.append(1)
+        await asyncio.sleep(0.01)
+        return await real_rebuild(db, events_since)
+
+    monkeypatch.setattr(recommendations, "rebuild", slow_rebuild)
+    # A database that has never had the tables (the app's own boot built them).
+    loop.run_until_complete(client._db.site_config.delete_one({"_id": recommendations.STATE_ID}))
+
+    async def boot():
+        return await asyncio.gather(*(recommendations.ensure_built(client._db) for _ in range(4)))
+
+    assert sorted(loop.run_until_complete(boot())) == [False, False, False, True]
+    assert len(builds) == 1
+    state = loop.run_until_complete(client._db.site_config.find_one({"_id": recommendations.STATE_ID}))
+    assert state["version"] == recommendations.TABLES_VERSION and state["in_progress"] is False
+
+    # Built at this version: nothing to do on the next boot.
+    assert loop.run_until_complete(recommendations.ensure_built(client._db)) is False
+    # Tables from an older version are rebuilt, once.
+    loop.run_until_complete(client._db.site_config.update_one(
+        {"_id": recommendations.STATE_ID}, {"$set": {"version": 1}}))
+    assert sorted(loop.run_until_complete(boot())) == [False, False, False, True]
+    assert len(builds) == 2
+
+
+def _order_basket(seeded, email, product_ids):
+    """A customer orders these products; nobody has paid yet."""
+    register(seeded, email=email)
+    for pid in product_ids:
+        seeded.post(f"/api/cart/add?product_id={pid}&quantity=1")
+    order = seeded.post("/api/orders", json={
+        "shipping_address": SHIPPING, "payment_method": "on_confirmation"}).json()
+    return order
+
+
+def test_only_paid_orders_make_bestsellers_and_each_counts_once(seeded):
+    import asyncio
+    loop = asyncio.get_event_loop()
+    order = _order_basket(seeded, "pair@b.com", ["p1", "p2"])
+    units = lambda: {d["product_id"]: d["units"] for d in loop.run_until_complete(
+        seeded._db.rec_bestsellers.find({}).to_list(None))}
+    assert units() == {}, "an order nobody has paid for is not a sale"
+
+    register(seeded, email="rec-admin@b.com")
+    make_admin(seeded, "rec-admin@b.com")
+    _confirm_payment(seeded, order["id"])
+    _confirm_payment(seeded, order["id"])
+    assert units() == {"p1": 1, "p2": 1}
+
+    bought_with = seeded.get("/api/recommendations",
+                             params={"type": "complements", "productId": "p1", "limit": 1}).json()
+    assert [p["id"] for p in bought_with] == ["p2"]
+
+    seeded.post(f"/api/admin/orders/{order['id']}/confirm-payment", json={"paid": False})
+    assert units() == {"p1": 0, "p2": 0}
+
+
+def test_personalized_follows_what_the_shopper_opens(seeded):
+    register(seeded, email="taste@b.com")
+    for _ in range(2):
+        seeded.post("/api/recommendations/track", json={"productId": "p2"})
+    r = seeded.get("/api/recommendations", params={"type": "personalized", "limit": 1})
+    assert [p["id"] for p in r.json()] == ["p2"]
+
+
 def test_compare_returns_stored_values_and_never_invents_specifications(seeded):
     r = seeded.post("/api/products/compare", json={"productIds": ["p1", "p2"]})
     assert r.status_code == 200, r.text
@@ -2309,6 +3322,52 @@ def test_search_treats_the_query_as_text_not_a_pattern(seeded):
     assert r.json() == []
 
 
+def test_search_reads_arabic_the_way_shoppers_type_it(seeded):
+    """«الخاتم» with the article, «خاتم» without it, and a half-typed word."""
+    for q in ("الخاتم", "خاتم", "ذهب", "Neckl", "rings"):
+        ids = [p["id"] for p in seeded.get("/api/search", params={"q": q}).json()]
+        assert ids, q
+    assert [p["id"] for p in seeded.get("/api/search", params={"q": "necklaces"}).json()] == ["p2"]
+
+
+def test_search_relevance_puts_the_name_ahead_of_the_description(seeded):
+    import asyncio
+    asyncio.get_event_loop().run_until_complete(seeded._db.products.insert_many([
+        {"id": "d1", "name": "Plain Bangle", "description": "goes with any pearl",
+         "price": 90.0, "rating": 5.0, "category": "bracelets", "images": []},
+        {"id": "d2", "name": "Pearl Bangle", "description": "a bangle",
+         "price": 95.0, "rating": 1.0, "category": "bracelets", "images": []},
+    ]))
+    stamp(seeded)
+    r = seeded.get("/api/search", params={"q": "pearl", "sortBy": "relevance"})
+    assert [p["id"] for p in r.json()] == ["d2", "d1"]
+    r = seeded.get("/api/search", params={"q": "pearl", "sortBy": "rating"})
+    assert [p["id"] for p in r.json()] == ["d1", "d2"]
+
+
+def test_search_filters_still_apply(seeded):
+    assert [p["id"] for p in seeded.get(
+        "/api/search", params={"minPrice": 200}).json()] == ["p1"]
+    assert [p["id"] for p in seeded.get(
+        "/api/search", params={"material": "silver"}).json()] == ["p2"]
+    assert [p["id"] for p in seeded.get(
+        "/api/search", params={"inStock": True, "category": "rings"}).json()] == ["p1"]
+    assert seeded.get("/api/search", params={"q": "ring", "category": "necklaces"}).json() == []
+
+
+def test_search_follows_edits_made_through_the_api(seeded):
+    as_admin(seeded)
+    assert [p["id"] for p in seeded.get("/api/search", params={"q": "silver"}).json()] == ["p2"]
+    r = seeded.put("/api/products/p2", json={
+        "name": "Gold Chain", "description": "A chain", "price": 120.0,
+        "category": "necklaces", "images": []})
+    assert r.status_code == 200, r.text
+    assert seeded.get("/api/search", params={"q": "silver"}).json() == []
+    assert [p["id"] for p in seeded.get("/api/search", params={"q": "chain"}).json()] == ["p2"]
+    seeded.delete("/api/products/p2")
+    assert seeded.get("/api/search", params={"q": "chain"}).json() == []
+
+
 # ---------------------------------------------------------------------------
 # Quick import
 # ---------------------------------------------------------------------------
@@ -2553,6 +3612,67 @@ def test_import_refuses_clothes_and_shoes_and_digs_for_real_adornment(client, mo
     assert status["rejected_off_category"] == 3
 
 
+def test_pages_are_prefetched_and_the_pager_stops_at_the_quota(monkeypatch):
+    """
+    Pages were read strictly one after another with a two-second nap between
+    them. They are requested a few ahead now, paced by cj_client's limiter,
+    and nothing past the quota is asked for.
+    """
+    import asyncio
+    import services.import_service as import_service
+
+    in_flight, peak, requested = [0], [0], []
+
+    async def fake_list_products(page_num=1, page_size=50, keyword=""):
+        requested.append(page_num)
+        in_flight[0] += 1
+        peak[0] = max(peak[0], in_flight[0])
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            in_flight[0] -= 1
+        return {"code": 200, "data": {"list": [{
+            "pid": f"PF-{page_num}-{i}", "productNameEn": f"Zircon Ring {page_num}-{i}",
+            "productName": "خاتم", "categoryName": "Jewelry"} for i in range(2)]}}
+
+    monkeypatch.setattr(import_service, "list_products", fake_list_products)
+    monkeypatch.setattr(import_service, "PREFETCH_PAGES", 3)
+
+    result = asyncio.get_event_loop().run_until_complete(
+        import_service.bulk_import_products(total_count=4, keyword="ring"))
+    assert len(result["products"]) == 4
+    assert peak[0] > 1, "pages were still read one at a time"
+    assert max(requested) <= 4, f"pages far past the quota were requested: {requested}"
+    assert in_flight[0] == 0, "requests issued ahead of the stop were left running"
+
+
+def test_a_sweep_searches_its_categories_side_by_side(client, monkeypatch):
+    import asyncio
+    import services.import_service as import_service
+    from services.background_import import background_import_cj_products, ImportJobManager
+
+    active, peak = set(), [0]
+
+    async def fake_list_products(page_num=1, page_size=50, keyword=""):
+        active.add(keyword)
+        peak[0] = max(peak[0], len(active))
+        await asyncio.sleep(0.01)
+        active.discard(keyword)
+        return {"code": 200, "data": {"list": []}}
+
+    monkeypatch.setattr(import_service, "list_products", fake_list_products)
+    loop = asyncio.get_event_loop()
+    manager = ImportJobManager(client._db)
+    job_id = loop.run_until_complete(manager.create_job(
+        job_type="bulk_import", supplier="cj", params={"max_products": 6, "mode": "sweep"}))
+    loop.run_until_complete(background_import_cj_products(
+        job_id=job_id, keyword=None, category_id=None,
+        max_products=6, db=client._db, sweep=True))
+
+    assert loop.run_until_complete(manager.get_job(job_id))["status"] == "completed"
+    assert peak[0] >= 6, f"only {peak[0]} category searches ever ran at once"
+
+
 def test_off_niche_broom_finds_and_purges_only_true_intruders(client):
     """
     Dresses and flower bouquets entered before the import gate existed. The
@@ -2596,6 +3716,90 @@ def test_off_niche_broom_finds_and_purges_only_true_intruders(client):
     assert {p["id"] for p in left} == {"jewel-1"}, "the jewel must survive the broom"
 
 
+def test_the_broom_reads_a_stored_verdict_and_rejudges_when_the_words_change(client, monkeypatch):
+    """
+    The broom used to read the whole catalogue and judge every product on
+    every visit. The verdict is now stored on the product, stamped with the
+    revision of the vocabularies that reached it: the screen pages an indexed
+    query, a change to the words sends every row back to the backfill, and
+    the purge still judges afresh — but only the ids it was handed.
+    """
+    import asyncio
+    from mongomock_motor import AsyncMongoMockCollection
+    from services.background_import import _product_document
+    from services.import_service import ADORNMENT_VERSION
+
+    register(client, email="broom2@b.com")
+    make_admin(client, "broom2@b.com")
+    loop = asyncio.get_event_loop()
+
+    # An import judges what it writes.
+    staged = _product_document({"pid": "P1", "productNameEn": "Elegant Evening Dress",
+                                "categoryName": "Clothing", "sellPrice": 10},
+                               "job", {"profit_margin_percent": 200, "minimum_profit_sar": 0},
+                               "2025-01-01T00:00:00")
+    assert staged["off_niche"] is True and staged["off_niche_version"] == ADORNMENT_VERSION
+
+    def item(i, name):
+        return {"id": f"n{i}", "name": name, "description": "d", "price": 10.0,
+                "category": "sets", "images": ["a.jpg", "b.jpg"],
+                "created_at": f"2025-01-{i + 1:02d}T00:00:00"}
+    loop.run_until_complete(client._db.products.insert_many([
+        item(0, "Elegant Evening Dress"), item(1, "Zircon Pendant Necklace"),
+        item(2, "Running Shoes Men Sneakers"), item(3, "Scented Candles Home Decor Set"),
+        item(4, "Vintage Flower Ring"),
+    ]))
+    loop.run_until_complete(server.backfill_storefront_fields())
+    stored = loop.run_until_complete(client._db.products.find_one({"id": "n0"}))
+    assert stored["off_niche"] is True and stored["off_niche_version"] == ADORNMENT_VERSION
+
+    # Stamped rows are not judged to list them.
+    judge = server.looks_like_adornment
+
+    def unexpected(*args, **kwargs):
+        raise AssertionError("judged at read time")
+    monkeypatch.setattr(server, "looks_like_adornment", unexpected)
+
+    seen, cursor = [], None
+    while True:
+        r = client.get("/api/admin/products/off-niche",
+                       params={"limit": 2, **({"cursor": cursor} if cursor else {})})
+        assert r.status_code == 200, r.text
+        seen += [row["id"] for row in r.json()["items"]]
+        cursor = r.json()["next_cursor"]
+        if not cursor:
+            break
+    assert seen == ["n3", "n2", "n0"], seen
+    assert [row["id"] for row in client.get("/api/admin/products/off-niche").json()] == seen
+    assert client.get("/api/admin/products/off-niche").json()[0]["image"] == "a.jpg"
+    monkeypatch.setattr(server, "looks_like_adornment", judge)
+
+    # New words: every verdict is stale, and judged on read until restamped.
+    monkeypatch.setattr(server, "ADORNMENT_VERSION", "next-words")
+    monkeypatch.setattr(server, "_STALE_STAMP", {"$or": [
+        {"storefront_version": {"$ne": server.STOREFRONT_VERSION}},
+        {"off_niche_version": {"$ne": "next-words"}}]})
+    assert {row["id"] for row in client.get("/api/admin/products/off-niche").json()} == set(seen)
+    import services.import_service as import_service
+    monkeypatch.setattr(import_service, "ADORNMENT_VERSION", "next-words")
+    assert loop.run_until_complete(server.backfill_storefront_fields()) == 5
+    stored = loop.run_until_complete(client._db.products.find_one({"id": "n1"}))
+    assert stored["off_niche"] is False and stored["off_niche_version"] == "next-words"
+
+    # The purge reads the submitted ids and nothing else.
+    filters = []
+    real_find = AsyncMongoMockCollection.find
+
+    def spy(self, *args, **kwargs):
+        if self.name == "products":
+            filters.append(args[0] if args else kwargs.get("filter"))
+        return real_find(self, *args, **kwargs)
+    monkeypatch.setattr(AsyncMongoMockCollection, "find", spy)
+    r = client.post("/api/admin/products/off-niche/purge", json={"ids": ["n0", "n1"]})
+    assert r.json() == {"deleted": 1, "refused": ["n1"]}, r.text
+    assert filters == [{"id": {"$in": ["n0", "n1"]}}], filters
+
+
 # ---------------------------------------------------------------------------
 # Pricing: the owner's profit dial
 # ---------------------------------------------------------------------------
@@ -2706,6 +3910,7 @@ def test_business_verification_reports_only_real_stored_facts(client):
         "id": "bv-1", "name": "Ring", "description": "d", "price": 100.0,
         "category": "rings", "images": [], "staging": False, "is_active": True,
     }))
+    stamp(client)
 
     filled = client.get("/api/admin/business-verification").json()
     assert filled["contact"]["email"] == "younes.sowady2011@gmail.com"
@@ -2779,7 +3984,9 @@ def test_reprice_applies_the_new_margin_and_spares_hand_set_prices(client):
 
     r = client.post("/api/admin/pricing-settings/reprice")
     assert r.status_code == 200, r.text
-    report = r.json()
+    status = client.get(f"/api/imports/{r.json()['jobId']}/status").json()
+    assert status["state"] == "completed", status
+    report = status["result"]
     assert report["repriced"] == 2, report
     assert report["kept_manual"] == 1
 
@@ -2796,6 +4003,59 @@ def test_reprice_applies_the_new_margin_and_spares_hand_set_prices(client):
     assert manual["price"] == 77.0, "a hand-set price was overwritten by bulk repricing"
 
 
+def test_batch_pricing_matches_the_one_product_calculation():
+    from services.pricing_service import pricing_service, COUNTRY_CONFIGS
+
+    costs = [0.4, 3.33, 10.0, 27.5, 149.99, 1200.0]
+    shipping = [0.0, 1.25, 4.5, 0.0, 12.0, 30.0]
+    weights = [0.1, 0.5, 0.73, 1.2, 3.0, 0.5]
+    for country in list(COUNTRY_CONFIGS) + ["FR"]:
+        batch = pricing_service.calculate_final_prices(
+            costs, shipping, weights, country,
+            profit_margin_percent=137.5, minimum_profit_sar=12)
+        for i in range(len(costs)):
+            one = pricing_service.calculate_final_price(
+                base_cost=costs[i], shipping_cost=shipping[i], country_code=country,
+                weight_kg=weights[i], profit_margin_percent=137.5, minimum_profit_sar=12)
+            assert batch["final_price_sar"][i] == one["final_price_sar"], (country, i)
+            assert batch["final_price_local"][i] == one["final_price_local"], (country, i)
+            assert batch["local_currency"][i] == one["local_currency"]
+            assert batch["breakdowns"][i] == one["breakdown"], (country, i)
+
+
+def test_a_second_reprice_at_the_same_margin_writes_nothing(client, monkeypatch):
+    import asyncio
+    import server
+
+    register(client, email="pr4@b.com")
+    make_admin(client, "pr4@b.com")
+    monkeypatch.setattr(server, "REPRICE_CHUNK", 2)
+
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(client._db.products.insert_many([
+        {"id": f"c-{i}", "source": "cj_dropshipping", "external_id": f"C{i}",
+         "name": "Ring", "description": "d", "price": 1.0,
+         "supplier_price": 5.0 + i, "supplier_shipping": 0.0, "weight_kg": 0.5,
+         "category": "rings", "images": [], "staging": False}
+        for i in range(5)
+    ]))
+
+    first = client.get(
+        f"/api/imports/{client.post('/api/admin/pricing-settings/reprice').json()['jobId']}/status").json()
+    assert first["state"] == "completed", first
+    assert (first["processed"], first["total"]) == (5, 5), "a chunk was skipped by the keyset paging"
+    assert first["result"]["repriced"] == 5
+
+    stamp = loop.run_until_complete(client._db.products.find_one({"id": "c-0"}))["updated_at"]
+    second = client.get(
+        f"/api/imports/{client.post('/api/admin/pricing-settings/reprice').json()['jobId']}/status").json()
+    assert second["result"]["repriced"] == 0, second
+    assert second["result"]["unchanged"] == 5
+    assert loop.run_until_complete(
+        client._db.products.find_one({"id": "c-0"}))["updated_at"] == stamp, \
+        "an unchanged price was written again"
+
+
 def test_editing_a_price_by_hand_pins_it_against_reprice(client):
     import asyncio
 
@@ -2840,6 +4100,7 @@ def test_supplier_cost_never_reaches_the_public_api(client):
         "price_breakdown": {"base_cost_sar": 31.9},
         "category": "rings", "images": [], "in_stock": True, "staging": False,
     }))
+    stamp(client)
 
     secret_fields = {"supplier_price", "supplier_shipping", "price_breakdown"}
 
@@ -2900,6 +4161,7 @@ def test_an_imported_product_is_visible_in_the_shop(client):
         "price": 180.0, "images": _collect_images(cj),
         "category": classify_category(cj), "in_stock": True, "staging": False,
     }))
+    stamp(client)
 
     listed = client.get("/api/products").json()
     assert [p["id"] for p in listed] == ["cj-1"], "the imported product never reached the shop"
@@ -2935,6 +4197,85 @@ def test_admin_listing_flags_products_the_shop_will_not_show(client):
     assert "category" in (rows["bad"]["storefront_issue"] or "")
 
 
+def test_the_admin_catalogue_pages_filters_and_reads_the_stored_verdict(client, monkeypatch):
+    """
+    The admin catalogue was the whole collection in one reply, every row
+    validated against the Product model on the way out. It now pages newest
+    first, filters in the database, sends a card's fields in the list view,
+    and reads whether the storefront shows a row from the row's stamp.
+    """
+    import asyncio
+    register(client, email="cat@b.com")
+    make_admin(client, "cat@b.com")
+    loop = asyncio.get_event_loop()
+
+    def item(i, **extra):
+        return {"id": f"c{i}", "name": f"Ring {i}", "description": "long words " * 50,
+                "price": 10.0 + i, "category": "rings", "images": ["a.jpg", "b.jpg"],
+                "sku": f"AU-{i:03d}", "source": "cj", "material_en": "Silver",
+                "created_at": f"2025-01-{i + 1:02d}T00:00:00", **extra}
+
+    loop.run_until_complete(client._db.products.insert_many([
+        # Low on stock under either name the count is stored as; a
+        # stock_quantity, where there is one, is the count.
+        item(0, stock_quantity=3), item(1, category="necklaces", stock=2),
+        item(2, source="manual", stock_quantity=50, stock=1),
+        item(3, material_en=" "), item(4, category="Jewelry & Accessories"),
+        item(5, staging=True), item(6, is_active=False),
+    ]))
+    loop.run_until_complete(server.backfill_storefront_fields())
+    stored = loop.run_until_complete(client._db.products.find_one({"id": "c4"}))
+    assert "category" in stored["storefront_issue"]
+
+    # Every row is stamped: nothing is validated to answer.
+    judge = server._storefront_issue
+
+    def unexpected(*args, **kwargs):
+        raise AssertionError("validated at read time")
+    monkeypatch.setattr(server, "_storefront_issue", unexpected)
+
+    def listing(**params):
+        r = client.get("/api/admin/products", params={"view": "list", **params})
+        assert r.status_code == 200, r.text
+        return r.json()
+
+    seen, cursor = [], None
+    while True:
+        page = listing(limit=2, **({"cursor": cursor} if cursor else {}))
+        assert len(page["items"]) <= 2
+        seen += [row["id"] for row in page["items"]]
+        cursor = page["next_cursor"]
+        if not cursor:
+            break
+    assert seen == ["c6", "c4", "c3", "c2", "c1", "c0"], seen
+    card = listing(limit=1)["items"][0]
+    assert "description" not in card and card["images"] == ["a.jpg"]
+
+    def ids(**params):
+        return [row["id"] for row in listing(**params)]
+    assert ids(category="necklaces") == ["c1"]
+    assert ids(source="manual") == ["c2"]
+    assert ids(visibility="hidden") == ["c4"]
+    assert ids(missing_material=True) == ["c3"]
+    assert ids(q="au-002") == ["c2"]
+    assert ids(staging=True) == ["c5"]
+    assert ids(status="inactive") == ["c6"]
+    assert ids(status="low-stock") == ["c1", "c0"]
+    assert client.get("/api/admin/products", params={"status": "lost"}).status_code == 400
+    assert client.get("/api/admin/products", params={"cursor": "nonsense"}).status_code == 400
+
+    # The editor reads the product whole.
+    assert client.get("/api/admin/products/c0").json()["description"].startswith("long words")
+    assert client.get("/api/admin/products/summary").json() == {
+        "total": 6, "active": 5, "featured": 0, "low_stock": 2, "hidden": 1}
+
+    # A row written behind the stamp's back is judged on read, as before.
+    monkeypatch.setattr(server, "_storefront_issue", judge)
+    loop.run_until_complete(client._db.products.insert_one(
+        item(9, category="Jewelry & Accessories")))
+    assert ids(visibility="hidden") == ["c9", "c4"]
+
+
 # ---------------------------------------------------------------------------
 # CJ access tokens
 #
@@ -3178,6 +4519,7 @@ def test_a_supplier_title_already_in_the_catalogue_is_shortened_on_read(seeded):
         seeded._db.products.update_one({"id": "p1"}, {"$set": {
             "source": "cj_dropshipping", "name": LONG_CJ_NAME,
             "description": LONG_CJ_NAME}}))
+    stamp(seeded, ["p1"])
 
     detail = seeded.get("/api/products/p1").json()
     assert len(detail["name"]) <= 60, detail["name"]
@@ -3238,6 +4580,180 @@ def test_the_rates_endpoint_says_whether_it_is_live(client):
     assert body["source"] in ("live", "fallback"), body
 
 
+def test_rates_are_fetched_once_an_hour_and_converted_without_a_query(monkeypatch):
+    """
+    A conversion read up to four exchange_rates rows, and the public rates
+    endpoint called the provider on every page load. One snapshot is kept per
+    process now: a burst of conversions with none in hand waits on a single
+    fetch, and every conversion after it is arithmetic.
+    """
+    import asyncio
+    from datetime import timedelta
+    import services.currency_service as currency_service
+    from services.currency_service import CurrencyService
+    from mongomock_motor import AsyncMongoMockClient
+
+    monkeypatch.setattr(currency_service, "_snapshot", None)
+    monkeypatch.setattr(currency_service, "_refreshing", None)
+    db = AsyncMongoMockClient()["t"]
+    service = CurrencyService(db)
+    fetches = []
+
+    async def provider(base_currency="USD"):
+        fetches.append(base_currency)
+        await asyncio.sleep(0.01)
+        service.last_source = "live"
+        return {"USD": 1.0, "SAR": 3.75, "TRY": 40.0, "EUR": 0.8}
+
+    monkeypatch.setattr(service, "get_latest_rates", provider)
+
+    async def burst():
+        return await asyncio.gather(*(service.convert_currency(100, "SAR", "TRY")
+                                      for _ in range(20)))
+
+    loop = asyncio.get_event_loop()
+    assert set(loop.run_until_complete(burst())) == {round(100 * 40.0 / 3.75, 2)}
+    assert len(fetches) == 1, "twenty misses at once must make one provider call"
+    stored = loop.run_until_complete(db.exchange_rates.count_documents({}))
+    assert stored == 4, "the fetched table is still recorded"
+
+    # With a fresh snapshot in hand, converting touches no database at all.
+    class NoDatabase:
+        def __getattr__(self, name):
+            raise AssertionError(f"a conversion read {name}")
+
+    service.db = NoDatabase()
+    prices = loop.run_until_complete(service.get_multi_currency_prices(10, "EUR"))
+    assert prices["USD"] == 12.5 and prices["SAR"] == round(10 * 3.75 / 0.8, 2), prices
+    assert loop.run_until_complete(service.get_cached_rate("TRY", "GBP")) is None
+    assert len(fetches) == 1
+
+    # Expired, it is fetched again, under a new version.
+    service.db = db
+    first = currency_service.kept_snapshot()
+    monkeypatch.setattr(service, "cache_duration", timedelta(0))
+    loop.run_until_complete(service.convert_currency(1, "USD", "SAR"))
+    assert len(fetches) == 2
+    assert currency_service.kept_snapshot().version == first.version + 1
+
+
+def test_the_hourly_job_swaps_the_rates_and_requests_do_not_fetch(monkeypatch):
+    """
+    The snapshot only ever expired on the request path, so the first shopper
+    after the hour waited on the provider. With the scheduler running, its
+    currency_rates_update job swaps the snapshot; a request serves what is
+    kept and fetches only once the job has missed a whole interval.
+    """
+    import asyncio
+    from datetime import timedelta
+    import services.currency_service as currency_service
+    from services.currency_service import CurrencyService
+    from services.scheduler_service import SchedulerService
+    from mongomock_motor import AsyncMongoMockClient
+
+    monkeypatch.setattr(currency_service, "_snapshot", None)
+    monkeypatch.setattr(currency_service, "_refreshing", None)
+    monkeypatch.setattr(currency_service, "_refreshed_by_schedule", False)
+    db = AsyncMongoMockClient()["t"]
+    fetches = []
+
+    async def provider(self, base_currency="USD"):
+        fetches.append(base_currency)
+        self.last_source = "live"
+        return {"USD": 1.0, "SAR": 3.75}
+
+    monkeypatch.setattr(CurrencyService, "get_latest_rates", provider)
+    loop = asyncio.get_event_loop()
+    scheduler = SchedulerService(db)
+    loop.run_until_complete(scheduler.start_scheduler(only=["currency_rates_update"]))
+    try:
+        assert currency_service._refreshed_by_schedule is True
+        loop.run_until_complete(scheduler._update_currency_rates())
+        first = currency_service.kept_snapshot()
+        assert len(fetches) == 1 and first.version == 1
+
+        # Past cache_duration, a request still serves the kept snapshot: the
+        # job is what refreshes it.
+        service = CurrencyService(db)
+        taken = first.taken - service.cache_duration.total_seconds() - 1
+        monkeypatch.setattr(currency_service, "_snapshot", first._replace(taken=taken))
+        assert loop.run_until_complete(service.convert_currency(1, "USD", "SAR")) == 3.75
+        assert len(fetches) == 1
+
+        loop.run_until_complete(scheduler._update_currency_rates())
+        assert len(fetches) == 2 and currency_service.kept_snapshot().version == 2
+
+        # A job that missed a whole interval: the request fetches after all.
+        stale = currency_service.kept_snapshot()
+        monkeypatch.setattr(currency_service, "_snapshot", stale._replace(
+            taken=stale.taken - 2 * service.cache_duration.total_seconds() - 1))
+        loop.run_until_complete(service.convert_currency(1, "USD", "SAR"))
+        assert len(fetches) == 3
+    finally:
+        loop.run_until_complete(scheduler.stop_scheduler())
+    assert currency_service._refreshed_by_schedule is False
+
+
+def test_the_nightly_price_update_writes_only_what_moved_and_says_how_fast(monkeypatch):
+    """
+    The nightly job converted, marked up and wrote every product one at a
+    time. It prices a chunk at once from one rate table now, writes only the
+    rows whose prices changed, and logs how long it took. The prices are the
+    ones the per-product path gave, to the halala.
+    """
+    import asyncio
+    import services.currency_service as currency_service
+    import services.scheduler_service as scheduler_service
+    from mongomock_motor import AsyncMongoMockClient
+
+    monkeypatch.setattr(currency_service, "_snapshot", None)
+    monkeypatch.setattr(currency_service, "_refreshing", None)
+    monkeypatch.setattr(scheduler_service, "PRICE_UPDATE_CHUNK", 2)
+    db = AsyncMongoMockClient()["t"]
+    scheduler = scheduler_service.SchedulerService(db)
+    rates = {"USD": 1.0, "SAR": 3.75, "AED": 3.6725, "QAR": 3.64}
+
+    async def provider(base_currency="USD"):
+        scheduler.currency_service.last_source = "live"
+        return rates
+
+    monkeypatch.setattr(scheduler.currency_service, "get_latest_rates", provider)
+
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(db.products.insert_many([
+        {"id": "a", "base_price_usd": 19.99},
+        {"id": "b", "base_price_usd": 7.335, "markup_percentage": 35.0},
+        {"id": "c", "base_price_usd": 120.0, "markup_percentage": 0},
+        {"id": "none", "name": "no supplier price"},
+        {"id": "bad", "base_price_usd": 5.0, "markup_percentage": None},
+    ]))
+
+    async def per_product(base, markup):
+        prices = await scheduler.currency_service.get_multi_currency_prices(base, "USD")
+        return await scheduler.currency_service.apply_luxury_markup(prices, markup)
+
+    loop.run_until_complete(scheduler._update_product_prices())
+    docs = {d["id"]: d for d in loop.run_until_complete(db.products.find({}).to_list(None))}
+    for pid, base, markup in (("a", 19.99, 50.0), ("b", 7.335, 35.0), ("c", 120.0, 0)):
+        expected = loop.run_until_complete(per_product(base, markup))
+        assert [docs[pid][f"price_{c.lower()}"] for c in ("USD", "SAR", "AED", "QAR")] == \
+            [expected[c] for c in ("USD", "SAR", "AED", "QAR")], docs[pid]
+    assert "price_sar" not in docs["none"] and "price_sar" not in docs["bad"]
+
+    log = loop.run_until_complete(db.scheduled_task_logs.find_one({"task_type": "price_update"}))
+    assert log["status"] == "success", log
+    assert log["details"]["processed"] == 4 and log["details"]["updated"] == 3, log
+    assert log["details"]["failed"] == 1 and log["details"]["products_per_sec"], log
+
+    # Same rates again: nothing moved, so nothing is written.
+    stamped = docs["a"]["updated_at"]
+    loop.run_until_complete(scheduler._update_product_prices())
+    again = loop.run_until_complete(db.scheduled_task_logs.find(
+        {"task_type": "price_update"}).sort("timestamp", -1).to_list(None))[0]
+    assert again["details"]["updated"] == 0 and again["details"]["unchanged"] == 3, again
+    assert loop.run_until_complete(db.products.find_one({"id": "a"}))["updated_at"] == stamped
+
+
 def test_a_reference_price_that_is_not_higher_never_reaches_a_shopper(seeded):
     """
     Rows imported before the fix still carry original_price = supplier cost, so
@@ -3250,6 +4766,7 @@ def test_a_reference_price_that_is_not_higher_never_reaches_a_shopper(seeded):
     asyncio.get_event_loop().run_until_complete(
         seeded._db.products.update_one({"id": "p1"}, {"$set": {
             "original_price": 25.8, "discount_percentage": 85}}))
+    stamp(seeded, ["p1"])
 
     listed = {p["id"]: p for p in seeded.get("/api/products").json()}
     assert listed["p1"]["original_price"] is None, listed["p1"]
@@ -3755,6 +5272,9 @@ def test_dedupe_keeps_the_copy_the_order_history_points_at(seeded):
 
     common = {"source": "cj_dropshipping", "external_id": "CJ-DUP-1",
               "name": "خاتم مكرّر", "price": 120.0, "is_active": True, "in_stock": True}
+    # A catalogue the old importer filled twice predates the unique index,
+    # which cannot be built over it until the copies are gone.
+    loop.run_until_complete(seeded._db.products.drop_index("source_1_external_id_1"))
     loop.run_until_complete(seeded._db.products.insert_many([
         {**common, "id": "dupA", "staging": True, "created_at": "2026-01-01T00:00:00"},
         {**common, "id": "dupB", "staging": False, "created_at": "2026-02-01T00:00:00"},
@@ -3777,9 +5297,24 @@ def test_dedupe_keeps_the_copy_the_order_history_points_at(seeded):
     report = seeded.get("/api/admin/products/duplicates").json()
     assert report["duplicates"] == 2, report
 
+    # A dry run says what would go, and what points at it, and writes nothing.
+    r = seeded.post("/api/admin/products/dedupe", params={"dry_run": True})
+    assert r.status_code == 200, r.text
+    plan = seeded.get(f"/api/imports/{r.json()['jobId']}/status").json()
+    assert plan["state"] == "completed", plan
+    assert plan["result"]["dry_run"] is True
+    assert plan["result"]["removed"] == 2 and plan["result"]["carts_repointed"] == 1
+    assert plan["result"]["group_list"][0]["keep"] == "dupA"
+    assert plan["result"]["group_list"][0]["remove"] == ["dupB", "dupC"]
+    assert loop.run_until_complete(seeded._db.products.count_documents({"external_id": "CJ-DUP-1"})) == 3
+
+    # The real run is a job too; the test client runs it before answering.
     r = seeded.post("/api/admin/products/dedupe")
     assert r.status_code == 200, r.text
-    assert r.json()["removed"] == 2, r.json()
+    done = seeded.get(f"/api/imports/{r.json()['jobId']}/status").json()
+    assert done["state"] == "completed", done
+    assert done["result"]["removed"] == 2, done
+    assert done["result"]["carts_repointed"] == 1, done
 
     left = loop.run_until_complete(
         seeded._db.products.find({"external_id": "CJ-DUP-1"}).to_list(length=None))
@@ -3788,6 +5323,53 @@ def test_dedupe_keeps_the_copy_the_order_history_points_at(seeded):
     cart = loop.run_until_complete(seeded._db.carts.find_one({"user_id": "u-cart"}))
     assert cart["items"][0]["product_id"] == "dupA", cart["items"]
     assert cart["items"][0]["quantity"] == 2, cart["items"]
+    assert cart["total_amount"] == 240.0, cart
+
+    # The index the duplicates kept out is reported, for a reconcile to build.
+    report = seeded.get("/api/admin/indexes").json()
+    assert report["ok"] is False
+    assert [i["name"] for i in report["collections"]["products"]["missing"]] == ["source_1_external_id_1"]
+
+
+def test_every_hot_lookup_has_its_index_after_boot(client):
+    import asyncio
+    from services import indexes
+
+    report = client.get("/api/admin/indexes")
+    assert report.status_code == 401
+
+    register(client, email="idx@b.com")
+    make_admin(client, "idx@b.com")
+    report = client.get("/api/admin/indexes").json()
+    assert report["ok"] is True, report
+    assert report["missing"] == 0 and report["conflicting"] == 0
+
+    loop = asyncio.get_event_loop()
+    info = {name: loop.run_until_complete(client._db[name].index_information())
+            for name in ("products", "orders", "carts", "users", "revoked_tokens")}
+    assert info["products"]["id_1"]["unique"] is True
+    assert info["orders"]["order_number_1"]["unique"] is True
+    assert "user_id_1_created_at_-1" in info["orders"]
+    assert info["carts"]["user_id_1"]["unique"] is True
+    assert info["users"]["email_1"]["unique"] is True
+    assert info["revoked_tokens"]["revoked_at_1"]["expireAfterSeconds"] > 0
+
+    # Reconciling again changes nothing, and an index someone made by hand
+    # under another name is recognised by its keys rather than made twice.
+    loop.run_until_complete(client._db.wishlists.drop_index("user_id_1"))
+    loop.run_until_complete(client._db.wishlists.create_index("user_id", unique=True, name="by_owner"))
+    loop.run_until_complete(client._db.wishlists.create_index("updated_at"))
+    again = loop.run_until_complete(indexes.reconcile(client._db))
+    assert again["created"] == 0, again
+    assert again["collections"]["wishlists"]["undeclared"] == ["updated_at_1"]
+
+    # Same keys, different promise: reported, never silently replaced.
+    loop.run_until_complete(client._db.carts.drop_index("user_id_1"))
+    loop.run_until_complete(client._db.carts.create_index("user_id"))
+    report = client.get("/api/admin/indexes").json()
+    assert report["ok"] is False
+    assert report["collections"]["carts"]["conflicting"][0]["differences"] == {
+        "unique": {"declared": True, "found": False}}
 
 
 def test_an_import_never_invents_a_discount(client, monkeypatch):
@@ -3860,6 +5442,7 @@ def test_a_hidden_product_leaves_the_storefront(seeded):
 
     asyncio.get_event_loop().run_until_complete(
         seeded._db.products.update_one({"id": "p1"}, {"$set": {"is_active": False}}))
+    server.catalogue_changed(["p1"])
 
     assert "p1" not in [p["id"] for p in seeded.get("/api/products").json()]
     assert seeded.get("/api/products/p1").status_code == 404
@@ -3872,6 +5455,117 @@ def test_a_product_with_no_is_active_field_is_still_sold(seeded):
     assert "p1" in ids and "p2" in ids
 
 
+def test_hot_products_are_read_once_until_a_write_invalidates_them(seeded):
+    import asyncio
+
+    register(seeded, email="cache-admin@b.com")
+    make_admin(seeded, "cache-admin@b.com")
+
+    def counts():
+        stats = seeded.get("/api/admin/catalogue-cache").json()
+        return stats["hits"], stats["misses"]
+
+    hits, misses = counts()
+    assert seeded.get("/api/products/p1").status_code == 200
+    assert seeded.get("/api/products/p1").status_code == 200
+    assert seeded.get("/api/products?category=rings").status_code == 200
+    assert seeded.get("/api/products?category=rings").status_code == 200
+    assert counts() == (hits + 2, misses + 2)
+
+    # An edit through the API drops the product and every listing.
+    body = {k: v for k, v in seeded.get("/api/products/p1").json().items()
+            if k in ("name", "description", "price", "category", "images")}
+    r = seeded.put("/api/products/p1", json={**body, "name": "Renamed Ring"})
+    assert r.status_code == 200, r.text
+    hits, misses = counts()
+    assert seeded.get("/api/products/p1").json()["name"] == "Renamed Ring"
+    seeded.get("/api/products?category=rings")
+    assert counts() == (hits, misses + 2), "a write left a cached copy behind"
+
+    # Checkout never trusts the cache: a price changed behind its back is
+    # still the price charged.
+    register(seeded, email="cache-buyer@b.com")
+    seeded.post("/api/cart/add?product_id=p1&quantity=1")
+    asyncio.get_event_loop().run_until_complete(
+        seeded._db.products.update_one({"id": "p1"}, {"$set": {"price": 321.0}}))
+    r = seeded.post("/api/orders", json={
+        "shipping_address": SHIPPING, "payment_method": "on_confirmation"})
+    assert r.status_code == 200, r.text
+    assert r.json()["total_amount"] == 321.0
+
+
+def test_the_catalogue_cache_is_bounded_expires_and_can_live_in_redis(monkeypatch):
+    import asyncio
+    import time
+    from services.product_cache import MemoryBackend, ProductCache, RedisBackend
+
+    loop = asyncio.get_event_loop()
+    loaded = []
+
+    async def load(ids):
+        loaded.extend(ids)
+        return [{"id": i, "price": 10.0} for i in ids]
+
+    cache = ProductCache(MemoryBackend(size=2, ttl=60))
+    for pid in ("a", "b", "c"):
+        loop.run_until_complete(cache.products([pid], load))
+    assert cache.stats()["evictions"] == 1 and cache.stats()["entries"] == 2
+    loop.run_until_complete(cache.products(["a"], load))
+    assert loaded == ["a", "b", "c", "a"], "the least recently read entry was not the one evicted"
+
+    # Listings are weighed, not counted: a few long pages fill the budget.
+    async def page():
+        return [{"id": f"x{n}", "description": "d" * 1000} for n in range(10)]
+
+    cache = ProductCache(MemoryBackend(size=1000, ttl=60, max_bytes=25_000))
+    for query in range(5):
+        loop.run_until_complete(cache.listing({"q": query}, page))
+    stats = cache.stats()
+    assert stats["entries"] == 2 and stats["evictions"] == 3 and stats["bytes"] <= 25_000, stats
+
+    # What a reader changes, even deep inside, is its own copy.
+    async def nested(ids):
+        return [{"id": i, "specifications": {"material": "gold"}} for i in ids]
+
+    cache = ProductCache(MemoryBackend(size=10, ttl=60))
+    first = loop.run_until_complete(cache.product("n", nested))
+    first["specifications"]["material"] = "brass"
+    again = loop.run_until_complete(cache.product("n", nested))
+    assert again["specifications"]["material"] == "gold"
+
+    clock = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: clock[0])
+    cache = ProductCache(MemoryBackend(size=10, ttl=5))
+    loaded.clear()
+    loop.run_until_complete(cache.products(["a"], load))
+    clock[0] += 4
+    loop.run_until_complete(cache.products(["a"], load))
+    clock[0] += 2
+    loop.run_until_complete(cache.products(["a"], load))
+    assert loaded == ["a", "a"], "an entry outlived its TTL"
+
+    shared = FakeRedis()
+    worker_a, worker_b = ProductCache(RedisBackend(shared)), ProductCache(RedisBackend(shared))
+    loaded.clear()
+    loop.run_until_complete(worker_a.products(["a"], load))
+    assert loop.run_until_complete(worker_b.products(["a"], load)) == {"a": {"id": "a", "price": 10.0}}
+    assert loaded == ["a"], "the second worker did not share the first one's read"
+
+    async def listing():
+        loaded.append("listing")
+        return [{"id": "a"}]
+
+    loop.run_until_complete(worker_a.listing({"category": "rings"}, listing))
+    loop.run_until_complete(worker_b.listing({"category": "rings"}, listing))
+    assert loaded.count("listing") == 1
+    # A write on one worker is seen by the other at once.
+    worker_a.invalidate(["a"])
+    loop.run_until_complete(worker_a._flush())
+    loop.run_until_complete(worker_b.products(["a"], load))
+    loop.run_until_complete(worker_b.listing({"category": "rings"}, listing))
+    assert loaded == ["a", "listing", "a", "listing"]
+
+
 def test_shipping_is_free_because_the_price_already_contains_it(seeded):
     """
     pricing_service builds every sale price as
@@ -4220,6 +5914,14 @@ from services.product_translation import (          # noqa: E402
 ARABIC_LETTER = _re.compile(r"[؀-ۿ]")
 
 
+def translate_catalogue(client):
+    """Press the translate button and read the job's report."""
+    job = client.post("/api/admin/products/translate").json()
+    status = client.get(f"/api/imports/{job['jobId']}/status").json()
+    assert status["state"] == "completed", status
+    return status["result"]
+
+
 def test_a_supplier_title_becomes_arabic_a_person_can_read():
     """
     Not a word-for-word gloss — Arabic word order, with the noun first and its
@@ -4261,6 +5963,31 @@ def test_a_word_already_spent_is_not_read_a_second_time():
     assert "أفعى" in title
 
 
+def test_a_title_is_read_once_and_every_caller_gets_its_own_copy():
+    """
+    The compiled tables must read exactly as the old probe-every-key reader
+    did (scripts/bench-translation.py checks that over a corpus), and the memo
+    behind analyse() must neither mix titles up nor let one caller's edits
+    reach the next.
+    """
+    from services import product_translation as pt
+
+    pt._analyse_normalised.cache_clear()
+    first = analyse("18K Gold Plated Cubic Zirconia Heart Ring")
+    # The same title as the normaliser sees it: one reading, not two.
+    again = analyse("18k  gold-plated cubic zirconia HEART ring")
+    assert pt._analyse_normalised.cache_info().hits == 1
+    assert first == again and first["stones"]
+
+    first["stones"].append("poison")
+    assert "poison" not in analyse("18K Gold Plated Cubic Zirconia Heart Ring")["stones"]
+
+    # "Cubic zirconia" is spent whole, so "zircon" finds nothing left of it;
+    # a plural still matches its singular key.
+    assert len(analyse("Cubic Zirconia Drop Earrings")["stones"]) == 1
+    assert analyse("Women Stud Earrings")["type"] == analyse("Women Stud Earring")["type"]
+
+
 def test_a_title_that_names_nothing_we_know_stays_in_english():
     """
     The honest outcome. An invented Arabic name is worse than an English one,
@@ -4358,7 +6085,7 @@ def test_the_backfill_translates_the_catalogue_and_owns_up_to_what_it_cannot(cli
     assert pending["untranslated"] == 2, pending
     assert pending["translatable"] == 1, "the count must not promise what it cannot do"
 
-    report = client.post("/api/admin/products/translate").json()
+    report = translate_catalogue(client)
     # Two documents change: the English-named ring gains Arabic, and the ring
     # the owner named himself gains the English specification and the material
     # he never wrote. Neither of his own sentences is touched.
@@ -4389,7 +6116,7 @@ def test_the_backfill_translates_the_catalogue_and_owns_up_to_what_it_cannot(cli
     assert report["without_material_products"][0]["id"] == "opaque-1"
 
     # Running it twice must change nothing further.
-    again = client.post("/api/admin/products/translate").json()
+    again = translate_catalogue(client)
     assert again["translated"] == 0, again
 
 
@@ -4401,7 +6128,7 @@ def test_the_shop_fills_its_own_arabic_at_startup(client):
     named himself.
     """
     import asyncio
-    from server import fill_missing_arabic_names
+    from server import migrate_catalogue_text
 
     loop = asyncio.get_event_loop()
     loop.run_until_complete(client._db.products.insert_many([
@@ -4413,7 +6140,7 @@ def test_the_shop_fills_its_own_arabic_at_startup(client):
          "category": "rings", "images": []},
     ]))
 
-    loop.run_until_complete(fill_missing_arabic_names())
+    loop.run_until_complete(migrate_catalogue_text())
 
     docs = {d["id"]: d for d in
             loop.run_until_complete(client._db.products.find({}).to_list(100))}
@@ -4422,6 +6149,186 @@ def test_the_shop_fills_its_own_arabic_at_startup(client):
     assert docs["boot-mine"]["description_ar"] == "وصف كتبتُه"
 
 
+def test_the_translate_button_is_a_chunked_job_whose_lists_are_paged(client, monkeypatch):
+    """
+    The button read the whole catalogue inside the request and outlived
+    Cloudflare's cut-off on a big one. It is a job now: read a chunk at a
+    time, reviewed in worker processes, written in bulk, and the lists of
+    products needing the owner paged out of the run rather than cut at 100.
+    """
+    import asyncio
+    import server
+    from services import catalogue_text
+
+    register(client, email="chunks@b.com")
+    make_admin(client, "chunks@b.com")
+    monkeypatch.setattr(server, "TRANSLATE_CHUNK", 3)
+
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(client._db.products.insert_many([
+        {"id": f"opaque-{n}", "source": "cj_dropshipping", "external_id": f"O{n}",
+         "name": f"Hot Selling New Arrival {n}", "name_ar": f"Hot Selling New Arrival {n}",
+         "description": "d", "price": 20.0, "category": "sets", "images": []}
+        for n in range(7)
+    ] + [
+        {"id": "readable", "source": "cj_dropshipping", "external_id": "R1",
+         "name": "Stainless Steel Cuban Chain Bracelet for Men",
+         "name_ar": "Stainless Steel Cuban Chain Bracelet for Men",
+         "description": "d", "price": 50.0, "category": "bracelets", "images": []},
+    ]))
+
+    job = client.post("/api/admin/products/translate").json()
+    status = client.get(f"/api/imports/{job['jobId']}/status").json()
+    assert status["state"] == "completed", status
+    assert status["processed"] == status["total"] == 8
+    report = status["result"]
+    assert report["translated"] == 1 and report["unreadable"] == 7, report
+
+    pages = [client.get(f"/api/admin/products/translate/{job['jobId']}/report",
+                        params={"kind": "unreadable", "skip": skip, "limit": 3}).json()
+             for skip in (0, 3, 6)]
+    assert all(page["total"] == 7 for page in pages)
+    assert [item["id"] for page in pages for item in page["items"]] == \
+        [f"opaque-{n}" for n in range(7)], "every product, once, in the order found"
+    assert client.get(f"/api/admin/products/translate/{job['jobId']}/report",
+                      params={"kind": "everything"}).status_code == 400
+
+    # A second run writes nothing, and its report replaces the first one's.
+    again = client.post("/api/admin/products/translate").json()
+    assert client.get(f"/api/imports/{again['jobId']}/status").json()["result"]["translated"] == 0
+    assert client.get(f"/api/admin/products/translate/{job['jobId']}/report").json()["total"] == 0
+    assert client.get(f"/api/admin/products/translate/{again['jobId']}/report").json()["total"] == 7
+
+    # A press while a run is under way is refused, and touches nothing.
+    from datetime import datetime, timedelta, timezone
+    now = datetime.now(timezone.utc)
+    running = {"job_id": "live", "type": "translate", "status": "running",
+               "created_at": now.isoformat(), "updated_at": now.isoformat()}
+    loop.run_until_complete(client._db.import_jobs.insert_one(running))
+    r = client.post("/api/admin/products/translate")
+    assert r.status_code == 409, r.text
+    assert loop.run_until_complete(client._db.import_jobs.count_documents({"type": "translate"})) == 3
+    assert client.get(f"/api/admin/products/translate/{again['jobId']}/report").json()["total"] == 7
+
+    # One that stopped reporting died with its worker: it is failed, and
+    # blocks nothing.
+    stale = (now - server.TRANSLATE_STALE_AFTER - timedelta(minutes=1)).isoformat()
+    loop.run_until_complete(client._db.import_jobs.update_one(
+        {"job_id": "live"}, {"$set": {"created_at": stale, "updated_at": stale}}))
+    third = client.post("/api/admin/products/translate")
+    assert third.status_code == 200, third.text
+    assert loop.run_until_complete(
+        client._db.import_jobs.find_one({"job_id": "live"}))["status"] == "failed"
+    assert client.get(f"/api/imports/{third.json()['jobId']}/status").json()["state"] == "completed"
+
+    # And the worker processes read exactly what this one does.
+    docs = loop.run_until_complete(
+        client._db.products.find({}, {"_id": 0}).sort("id", 1).to_list(100))
+    monkeypatch.setattr(catalogue_text, "MIN_SLICE", 2)
+    pooled = loop.run_until_complete(catalogue_text.review_many(docs, workers=2))
+    assert pooled == catalogue_text.review_batch(docs)
+
+
+def test_the_boot_pass_reads_only_unchecked_products_and_resumes_where_it_stopped(client):
+    """
+    The boot pass read the whole catalogue and wrote it back before the API
+    answered. It now runs as a checkpointed migration: a product already
+    checked at the current version is not read again, and a run cut short
+    carries on after the last batch it finished.
+    """
+    import asyncio
+    import server
+    from services import migrations
+
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(client._db.products.insert_many([
+        {"id": f"mig-{n}", "name": "Women Vintage Zircon Ring",
+         "name_ar": "Women Vintage Zircon Ring", "description": "d", "source": "cj",
+         "price": 50.0, "category": "rings", "images": []}
+        for n in range(6)
+    ] + [
+        # Checked at this version already: left exactly as it is.
+        {"id": "mig-done", "name": "Women Vintage Zircon Ring",
+         "name_ar": "Women Vintage Zircon Ring", "description": "d", "source": "cj",
+         "translation_version": server.TRANSLATION_VERSION,
+         "price": 50.0, "category": "rings", "images": []},
+    ]))
+
+    def crash_on_mig_4(doc):
+        if doc["id"] == "mig-4":
+            raise RuntimeError("deploy")
+        return server.catalogue_text_updates(doc)
+
+    small = server.CATALOGUE_TEXT_MIGRATION._replace(batch_size=2)
+    try:
+        loop.run_until_complete(migrations.run(client._db, small._replace(apply=crash_on_mig_4)))
+        raise AssertionError("the crash did not surface")
+    except RuntimeError:
+        pass
+    state = loop.run_until_complete(client._db.migrations.find_one({"_id": "catalogue_text"}))
+    assert state["status"] == "failed"
+    assert state["checkpoint"] == "mig-3" and state["processed"] == 4, state
+
+    seen = []
+
+    def counting(doc):
+        seen.append(doc["id"])
+        return server.catalogue_text_updates(doc)
+
+    state = loop.run_until_complete(migrations.run(client._db, small._replace(apply=counting)))
+    assert seen == ["mig-4", "mig-5"], f"did not resume after the checkpoint: {seen}"
+    assert state["status"] == "completed" and state["processed"] == 6 and state["changed"] == 6
+
+    docs = {d["id"]: d for d in loop.run_until_complete(client._db.products.find({}).to_list(None))}
+    for n in range(6):
+        assert ARABIC_LETTER.search(docs[f"mig-{n}"]["name_ar"]), docs[f"mig-{n}"]["name_ar"]
+        assert docs[f"mig-{n}"]["translation_version"] == server.TRANSLATION_VERSION
+    assert docs["mig-done"]["name_ar"] == "Women Vintage Zircon Ring"
+
+    # Nothing left: the next boot reads nothing at all.
+    seen.clear()
+    loop.run_until_complete(migrations.run(client._db, small._replace(apply=counting)))
+    assert seen == []
+
+    register(client, email="mig@b.com")
+    make_admin(client, "mig@b.com")
+    (row,) = client.get("/api/admin/migrations").json()
+    assert row["name"] == "catalogue_text" and row["status"] == "completed", row
+    assert row["remaining"] == 0
+
+
+def test_an_edited_product_is_read_again_by_the_text_migration(client):
+    """
+    Every product the text migration has checked is stamped, and a run only
+    reads what is not. An edit that typed the English name back over the
+    Arabic kept that stamp, so no later boot would ever put the Arabic back.
+    """
+    import asyncio
+    from server import migrate_catalogue_text
+
+    loop = asyncio.get_event_loop()
+    as_admin(client)
+    base = {"description": "d", "price": 80.0, "category": "rings", "images": []}
+    pid = client.post("/api/products", json={**base, "name": "Women Vintage Zircon Ring"}).json()["id"]
+    loop.run_until_complete(migrate_catalogue_text())
+    checked = _product_doc(client, pid)
+    assert checked["translation_version"] == server.TRANSLATION_VERSION
+    assert ARABIC_LETTER.search(checked["name_ar"]), checked["name_ar"]
+
+    # Publishing or repricing leaves the text alone: still checked.
+    loop.run_until_complete(server.catalogue_written([pid], recheck_text=False))
+    assert _product_doc(client, pid)["translation_version"] == server.TRANSLATION_VERSION
+
+    client.put(f"/api/products/{pid}", json={
+        **base, "name": "Women Vintage Zircon Ring", "name_ar": "Women Vintage Zircon Ring"})
+    assert "translation_version" not in _product_doc(client, pid)
+
+    loop.run_until_complete(migrate_catalogue_text())
+    again = _product_doc(client, pid)
+    assert again["translation_version"] == server.TRANSLATION_VERSION
+    assert ARABIC_LETTER.search(again["name_ar"]), again["name_ar"]
+
+
 def test_the_api_actually_sends_the_arabic_name_it_stores(client):
     """
     The gap that made #153 invisible on the screen.
@@ -4447,6 +6354,7 @@ def test_the_api_actually_sends_the_arabic_name_it_stores(client):
         "price": 120.0, "category": "necklaces", "images": ["https://x/a.jpg"],
         "in_stock": True, "is_active": True,
     }))
+    stamp(client)
 
     listed = client.get("/api/products").json()
     row = next(p for p in listed if p["id"] == "wire-1")
@@ -4671,6 +6579,49 @@ def test_importing_prefers_the_supplier_material_over_the_title(client, monkeypa
     assert doc["supplier_material"] == "Stainless Steel", doc
 
 
+def test_a_page_is_checked_once_and_written_once_and_races_are_skipped(client, monkeypatch):
+    """
+    Another job can write an item between this job reading what the shop owns
+    and writing its page. That item is reported as already there, and the
+    database refuses a second copy even if both checks are raced past.
+    """
+    import asyncio
+    from pymongo.errors import DuplicateKeyError
+    from services import background_import as bg
+
+    def listing(pid, name):
+        return {"pid": pid, "productNameEn": name, "productName": name, "sellPrice": 5.0,
+                "productImage": "https://example.com/a.jpg", "categoryName": "Jewelry"}
+
+    async def fake_bulk(total_count=1, keyword=None, exclude_ids=None, **_):
+        # A concurrent import lands R-2 while this one is still fetching.
+        await client._db.products.insert_one({
+            "id": "other-job", "source": "cj_dropshipping", "external_id": "R-2",
+            "name": "Pearl Ring", "price": 10.0, "staging": True})
+        return {"products": [listing("R-1", "Zircon Ring"), listing("R-2", "Pearl Ring"),
+                             listing("R-1", "Zircon Ring"), listing("", "Nameless")]}
+
+    monkeypatch.setattr(bg, "bulk_import_products", fake_bulk)
+    loop = asyncio.get_event_loop()
+    manager = bg.ImportJobManager(client._db)
+    job_id = loop.run_until_complete(manager.create_job("bulk", "cj", {"max_products": 4}))
+    loop.run_until_complete(bg.background_import_cj_products(
+        job_id=job_id, keyword="ring", category_id=None, max_products=4, db=client._db))
+
+    job = loop.run_until_complete(manager.get_job(job_id))
+    assert job["status"] == "completed", job.get("error")
+    assert job["progress"]["imported"] == 1
+    assert job["progress"]["skipped_existing"] == 2
+    assert job["progress"]["failed"] == 1
+    assert job["result"]["products_per_sec"] >= 0 and "duration_seconds" in job["result"]
+    assert loop.run_until_complete(client._db.products.count_documents(
+        {"source": "cj_dropshipping", "external_id": "R-2"})) == 1
+
+    with pytest.raises(DuplicateKeyError):
+        loop.run_until_complete(client._db.products.insert_one(
+            {"id": "late", "source": "cj_dropshipping", "external_id": "R-1"}))
+
+
 def test_the_english_name_stops_repeating_the_suppliers_claim():
     from services.product_translation import sanitise_supplier_text
 
@@ -4712,7 +6663,7 @@ def test_a_claim_already_sitting_in_the_database_is_found_and_taken_down(client)
          "description": "d", "price": 300.0, "category": "rings", "images": []},
     ]))
 
-    report = client.post("/api/admin/products/translate").json()
+    report = translate_catalogue(client)
     assert report["corrected_claims"] == 1, report
 
     docs = {d["id"]: d for d in
@@ -4738,8 +6689,8 @@ def test_a_claim_already_sitting_in_the_database_is_found_and_taken_down(client)
     # button: the ring is on sale to somebody right now.
     loop.run_until_complete(client._db.products.update_one(
         {"id": "lie-1"}, {"$set": {"name_ar": "خاتم لامع فاخر مرصّع بالألماس"}}))
-    from server import fill_missing_arabic_names
-    loop.run_until_complete(fill_missing_arabic_names())
+    from server import migrate_catalogue_text
+    loop.run_until_complete(migrate_catalogue_text())
     again = loop.run_until_complete(client._db.products.find_one({"id": "lie-1"}))
     assert "ألماس" not in (again["name_ar"] or ""), again["name_ar"]
 
@@ -4773,6 +6724,7 @@ def test_the_api_sends_the_material_it_stores(client):
         "images": ["https://x/a.jpg"], "in_stock": True, "is_active": True,
         "material_ar": "ستانلس ستيل", "material_en": "Stainless steel",
     }))
+    stamp(client)
 
     one = client.get("/api/products/mat-1").json()
     assert one.get("material_en") == "Stainless steel", \
@@ -4838,6 +6790,7 @@ def test_the_storefront_filters_actually_filter(client):
          "material_en": "Stainless steel", "price": 40.0, "category": "bracelets",
          "images": ["https://x/b.jpg"], "in_stock": True, "is_active": True},
     ]))
+    stamp(client)
 
     # Filters alone, with no search term at all.
     everything = client.get("/api/search")
@@ -4952,6 +6905,7 @@ def test_a_stored_list_title_is_repaired_on_the_way_out(client):
         "description": "d", "price": 39.0, "category": "necklaces",
         "images": ["https://x/a.jpg"], "in_stock": True, "is_active": True,
     }))
+    stamp(client)
     row = next(p for p in client.get("/api/products").json() if p["id"] == "arr-1")
     assert row["name"] == "Sterling Silver Butterfly Necklace", \
         f"the storefront still prints a data structure: {row['name']!r}"